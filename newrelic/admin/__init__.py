@@ -17,6 +17,8 @@ from __future__ import print_function
 import sys
 import logging
 
+from newrelic.common.entry_points import iter_entry_points
+
 _builtin_plugins = [
     'debug_console',
     'generate_config',
@@ -122,14 +124,9 @@ def load_internal_plugins():
 
 
 def load_external_plugins():
-    try:
-        import pkg_resources
-    except ImportError:
-        return
-
     group = 'newrelic.admin'
 
-    for entrypoint in pkg_resources.iter_entry_points(group=group):
+    for entrypoint in iter_entry_points(group):
         __import__(entrypoint.module_name)
 
 
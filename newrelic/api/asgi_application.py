@@ -27,7 +27,7 @@ from newrelic.common.object_wrapper import (
     function_wrapper,
 )
 from newrelic.common.async_proxy import CoroutineProxy, LoopContext
-from newrelic.api.html_insertion import insert_html_snippet, verify_body_exists
+from newrelic.api.html_insertion import HTMLInsertionScanner
 
 
 def _bind_scope(scope, *args, **kwargs):
@@ -56,8 +56,7 @@ class ASGIBrowserMiddleware(object):
         self.send = None
         self.messages = []
         self.initial_message = None
-        self.body = b""
-        self.more_body = True
+        self.html_insertion = None
         self.transaction = transaction
         self.search_maximum = search_maximum
         self.pass_through = not (transaction and transaction.enabled)
@@ -69,25 +68,38 @@ class ASGIBrowserMiddleware(object):
         self.send = send
         return await self.app(scope, receive, self.send_inject_browser_agent)
 
-    async def send_buffered(self):
-        self.pass_through = True
-        await self.send(self.initial_message)
+    def html_to_be_inserted(self):
+        header = self.transaction.browser_timing_header()
+        if not header:
+            return b""
+
+        footer = self.transaction.browser_timing_footer()
+        return six.b(header) + six.b(footer)
+
+    async def send_body(self, body, more_body):
+        # Send the initial message if this is the first body data
+        # being passed on
+        for message in self.messages:
+            await self.send(message)
+        self.messages = []
+
+        # Once the insertion is done or abandoned, stop searching
+        self.pass_through = self.html_insertion.finished
+
         await self.send(
             {
                 "type": "http.response.body",
-                "body": self.body,
-                "more_body": self.more_body,
+                "body": body,
+                "more_body": more_body,
             }
         )
-        # Clear any saved messages
-        self.messages = None
 
     async def abort(self):
         self.pass_through = True
         for message in self.messages:
             await self.send(message)
         # Clear any saved messages
-        self.messages = None
+        self.messages = []
 
     def should_insert_html(self, headers):
         if self.transaction.autorum_disabled or self.transaction.rum_header_generated:
@@ -148,75 +160,73 @@ class ASGIBrowserMiddleware(object):
             if not self.should_insert_html(headers):
                 await self.abort()
                 return
-            message["headers"] = headers
-            self.initial_message = message
-        elif message_type == "http.response.body" and self.initial_message:
-            body = message.get("body", b"")
-            self.more_body = message.get("more_body", False)
-
-            # Add this message to the current body
-            self.body += body
-
-            # if there's a valid body string, attempt to insert the HTML
-            if verify_body_exists(self.body):
-                header = self.transaction.browser_timing_header()
-                if not header:
-                    # If there's no header, abort browser monitoring injection
-                    await self.send_buffered()
+
+            content_length = None
+            for header_name, header_value in headers:
+                if header_name.lower() == b"content-length":
+                    content_length = header_value
+
+            # Invalid content length results in an abort
+            if content_length is not None:
+                try:
+                    int(content_length)
+                except ValueError:
+                    await self.abort()
                     return
 
-                footer = self.transaction.browser_timing_footer()
-                browser_agent_data = six.b(header) + six.b(footer)
+            message["headers"] = headers
+            self.initial_message = message
 
-                body = insert_html_snippet(
-                    self.body, lambda: browser_agent_data, self.search_maximum
-                )
+            # Without a content length the response may be streamed, so
+            # body data is passed on as soon as it is known to come
+            # before the insertion point. Otherwise it is held back so
+            # the content length can be adjusted first.
+            self.html_insertion = HTMLInsertionScanner(
+                self.html_to_be_inserted,
+                self.search_maximum,
+                streaming=content_length is None,
+            )
 
-                # If we have inserted the browser agent
-                if len(body) != len(self.body):
-                    # check to see if we have to modify the content-length
-                    # header
-                    headers = self.initial_message["headers"]
-                    for header_index, header_data in enumerate(headers):
-                        header_name, header_value = header_data
-                        if header_name.lower() == b"content-length":
-                            break
-                    else:
-                        header_value = None
-
-                    try:
-                        content_length = int(header_value)
-                    except ValueError:
-                        # Invalid content length results in an abort
-                        await self.send_buffered()
-                        return
-
-                    if content_length is not None:
-                        delta = len(body) - len(self.body)
+        elif message_type == "http.response.body" and self.initial_message:
+            # The body message is not replayed on an abort, as the
+            # scanner holds any data not yet passed on
+            self.messages.pop()
+
+            html_insertion = self.html_insertion
+            more_body = message.get("more_body", False)
+
+            body = html_insertion.feed(message.get("body", b""))
+
+            # No more body, pass on anything which was held back
+            if not more_body and not html_insertion.finished:
+                body += html_insertion.close()
+
+            if html_insertion.inserted:
+                # check to see if we have to modify the content-length
+                # header
+                headers = self.initial_message["headers"]
+                for header_index, header_data in enumerate(headers):
+                    header_name, header_value = header_data
+                    if header_name.lower() == b"content-length":
+                        content_length = int(header_value) + html_insertion.inserted
                         headers[header_index] = (
                             b"content-length",
-                            str(content_length + delta).encode("utf-8"),
+                            str(content_length).encode("utf-8"),
                         )
+                        break
 
-                    # Body is found and modified so we can now send the
-                    # modified data and stop searching
-                    self.body = body
-                    await self.send_buffered()
-                    return
-
-            # 1. Body is found but not modified
-            # 2. Body is not found
-
-            # No more body
-            if not self.more_body:
-                await self.send_buffered()
-
-            # We have hit our search limit
-            elif len(self.body) >= self.search_maximum:
-                await self.send_buffered()
+            # 1. Insertion point is found, or we have hit our search limit
+            # 2. Data before the insertion point in a streamed response
+            if body or html_insertion.finished:
+                await self.send_body(body, more_body)
 
         # Protocol error, unexpected message: abort
         else:
+            held = self.html_insertion and self.html_insertion.close()
+            if held:
+                self.messages.insert(
+                    -1, {"type": "http.response.body", "body": held, "more_body": True}
+                )
             await self.abort()
 
 
@@ -16,8 +16,11 @@ from newrelic.common.encoding_utils import (obfuscate, deobfuscate,
         json_encode, json_decode, base64_encode, base64_decode)
 
 
-# CatHeaderMixin assumes the mixin class also inherits from TimeTrace
+# CatHeaderMixin assumes the mixin class also inherits from TimeTrace. As
+# TimeTrace uses slots, the class must also provide a slot for settings.
 class CatHeaderMixin(object):
+    __slots__ = ()
+
     cat_id_key = 'X-NewRelic-ID'
     cat_transaction_key = 'X-NewRelic-Transaction'
     cat_appdata_key = 'X-NewRelic-App-Data'
@@ -48,6 +48,10 @@ def enable_datastore_instance_feature(dbapi2_module):
 
 class DatabaseTrace(TimeTrace):
 
+    __slots__ = ('sql', 'dbapi2_module', 'connect_params', 'cursor_params',
+            'sql_parameters', 'execute_params', 'host', 'port_path_or_id',
+            'database_name', 'sql_format', 'stack_trace')
+
     __async_explain_plan_logged = False
 
     def __init__(self, sql, dbapi2_module=None,
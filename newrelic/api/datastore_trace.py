@@ -55,6 +55,10 @@ class DatastoreTrace(TimeTrace):
 
     """
 
+    __slots__ = ('product', 'target', 'operation', 'host', 'port_path_or_id',
+            'database_name', 'instance_reporting_enabled',
+            'database_name_enabled')
+
     def __init__(self, product, target, operation,
             host=None, port_path_or_id=None, database_name=None, **kwargs):
         parent = None
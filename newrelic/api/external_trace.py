@@ -23,6 +23,8 @@ from newrelic.common.object_wrapper import FunctionWrapper, wrap_object
 
 class ExternalTrace(CatHeaderMixin, TimeTrace):
 
+    __slots__ = ('library', 'url', 'method', 'params', 'settings')
+
     def __init__(self, library, url, method=None, **kwargs):
         parent = None
         if kwargs:
@@ -35,6 +37,7 @@ class ExternalTrace(CatHeaderMixin, TimeTrace):
         self.url = url
         self.method = method
         self.params = {}
+        self.settings = None
 
     def __repr__(self):
         return '<%s %s>' % (self.__class__.__name__, dict(
@@ -14,7 +14,7 @@
 
 import functools
 
-from newrelic.common.async_wrapper import async_wrapper
+from newrelic.common.async_wrapper import async_call, async_wrapper
 from newrelic.api.time_trace import TimeTrace, current_trace
 from newrelic.common.object_names import callable_name
 from newrelic.common.object_wrapper import FunctionWrapper, wrap_object
@@ -23,6 +23,8 @@ from newrelic.core.function_node import FunctionNode
 
 class FunctionTrace(TimeTrace):
 
+    __slots__ = ('name', 'group', 'label', 'params', 'terminal', 'rollup')
+
     def __init__(self, name, group=None, label=None,
             params=None, terminal=False, rollup=None, **kwargs):
         parent = None
@@ -166,7 +168,65 @@ def FunctionTraceWrapper(wrapped, name=None, group=None, label=None,
             callable(params)):
         return FunctionWrapper(wrapped, dynamic_wrapper)
 
-    return FunctionWrapper(wrapped, literal_wrapper)
+    # Class and static methods are only bound to the function which is
+    # called when accessed, so which kind of function it is can't be
+    # worked out in advance.
+
+    if isinstance(wrapped, (classmethod, staticmethod)):
+        return FunctionWrapper(wrapped, literal_wrapper)
+
+    # Otherwise work out up front what will be needed for each call.
+
+    call = async_call(wrapped)
+
+    if name is None:
+        function_name = callable_name(wrapped)
+
+        # When called as a method, the name is that of the class of the
+        # instance the method is bound to, so it's instead calculated
+        # when called. Remember the last one as it is usually the same
+        # class each time.
+
+        last_name = [(None, None)]
+
+        def _name(wrapped, instance):
+            if instance is None:
+                return function_name
+
+            owner = isinstance(instance, type) and instance or type(instance)
+
+            last_owner, method_name = last_name[0]
+            if last_owner is not owner:
+                method_name = callable_name(wrapped)
+                last_name[0] = (owner, method_name)
+
+            return method_name
+
+    else:
+        def _name(wrapped, instance):
+            return name
+
+    if call is None:
+        def sync_wrapper(wrapped, instance, args, kwargs):
+            parent = current_trace()
+            if not parent:
+                return wrapped(*args, **kwargs)
+
+            trace = FunctionTrace(_name(wrapped, instance), group, label,
+                    params, terminal, rollup, parent=parent)
+
+            with trace:
+                return wrapped(*args, **kwargs)
+
+        return FunctionWrapper(wrapped, sync_wrapper)
+
+    def async_call_wrapper(wrapped, instance, args, kwargs):
+        trace = FunctionTrace(_name(wrapped, instance), group, label,
+                params, terminal, rollup, parent=None)
+
+        return call(trace, wrapped, args, kwargs)
+
+    return FunctionWrapper(wrapped, async_call_wrapper)
 
 
 def function_trace(name=None, group=None, label=None, params=None,
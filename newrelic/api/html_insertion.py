@@ -95,3 +95,215 @@ def insert_html_snippet(data, html_to_be_inserted, search_limit=64*1024):
 
 def verify_body_exists(data):
     return _body_re.search(data)
+
+
+_tag_re = re.compile(b'<(?:(body)|(head)|\s*meta)', re.IGNORECASE)
+
+
+class HTMLInsertionScanner(object):
+
+    # Incremental version of insert_html_snippet() for use where the
+    # response content is being generated in chunks. Each chunk is
+    # scanned once, with state being carried across chunk boundaries,
+    # so that a tag split over two chunks is still found. Where the
+    # response is being streamed, any content which is known to come
+    # before where the snippet would be inserted is returned straight
+    # away rather than being buffered up until the insertion point is
+    # found. Where it is not being streamed, everything is held back
+    # until the decision has been made so that any content length can
+    # first be adjusted by the caller. The point at which the snippet
+    # is inserted is the same as for insert_html_snippet().
+
+    def __init__(self, html_to_be_inserted, search_limit=64*1024,
+            streaming=False):
+
+        self.html_to_be_inserted = html_to_be_inserted
+        self.search_limit = search_limit
+        self.streaming = streaming
+
+        self.finished = False
+        self.inserted = 0
+
+        # The buffer holds content not yet returned to the caller, with
+        # the offset being where it starts within the response as a
+        # whole. All other positions are also absolute offsets into
+        # the response, and not relative to the buffer.
+
+        self._buffer = bytearray()
+        self._offset = 0
+        self._position = 0
+
+        self._head_end = None
+        self._xua_meta_end = None
+        self._charset_meta_end = None
+
+    def feed(self, data):
+        # Returns the content which can now be passed on. This will be
+        # empty where everything is still being held back.
+
+        if self.finished:
+            return data
+
+        self._buffer += data
+
+        index = self._scan()
+
+        if self.finished:
+            return self._release(index)
+
+        if not self.streaming:
+            return b''
+
+        # Work out the earliest point at which the snippet could still
+        # be inserted. The first x-ua-compatible and charset meta tags
+        # have precedence over the head element, and the end of the
+        # later of the two is always used, so once one is seen nothing
+        # before it can be affected. Any tag seen will also have had
+        # its content scanned already for the start of the body.
+
+        if self._xua_meta_end or self._charset_meta_end:
+            boundary = max(self._xua_meta_end or 0,
+                    self._charset_meta_end or 0)
+        elif self._head_end:
+            boundary = self._head_end
+        else:
+            boundary = self._position
+
+        boundary = min(boundary, self._position) - self._offset
+
+        if boundary <= 0:
+            return b''
+
+        data = bytes(self._buffer[:boundary])
+
+        del self._buffer[:boundary]
+        self._offset += boundary
+
+        return data
+
+    def close(self):
+        # Returns any content still being held back, unmodified, where
+        # the end of the response was reached before the start of the
+        # body element was found.
+
+        self.finished = True
+
+        return self._release(None)
+
+    def _release(self, index):
+        buffer, self._buffer = self._buffer, bytearray()
+
+        if index is None:
+            return bytes(buffer)
+
+        text = self.html_to_be_inserted()
+
+        if not text:
+            return bytes(buffer)
+
+        self.inserted = len(text)
+
+        index -= self._offset
+
+        return b''.join((bytes(buffer[:index]), text, bytes(buffer[index:])))
+
+    def _scan(self):
+        # Scan any new content for tags of interest. Returns the index
+        # at which to insert the snippet, or None where no insertion
+        # is to be done, if a decision could be made.
+
+        buffer = self._buffer
+        offset = self._offset
+
+        # The body element must be found within the search limit, so
+        # nothing beyond that point needs to be scanned.
+
+        limit = self.search_limit - offset
+        end = min(len(buffer), limit)
+
+        position = self._position - offset
+
+        while True:
+            tag = _tag_re.search(buffer, position, end)
+
+            if tag is None:
+                # Hold back the last '<' where its tag hasn't been
+                # completed yet, as it may still turn out to be one
+                # which is of interest once more content is available.
+
+                start = buffer.rfind(b'<', position, end)
+
+                if start == -1 or buffer.find(b'>', start, end) != -1:
+                    position = end
+                else:
+                    position = start
+
+                break
+
+            start = tag.start()
+            close = buffer.find(b'>', start, end)
+
+            if close == -1:
+                position = start
+                break
+
+            close += 1
+
+            if tag.group(1):
+                # Only the content prior to the body is searched for
+                # the other tags, so ignore any tag that the start of
+                # the body appears within.
+
+                self.finished = True
+
+                head_end = self._head_end
+                xua_meta_end = self._xua_meta_end
+                charset_meta_end = self._charset_meta_end
+
+                if xua_meta_end and xua_meta_end > start + offset:
+                    xua_meta_end = None
+
+                if charset_meta_end and charset_meta_end > start + offset:
+                    charset_meta_end = None
+
+                if xua_meta_end or charset_meta_end:
+                    return max(xua_meta_end or 0, charset_meta_end or 0)
+
+                if head_end and head_end <= start + offset:
+                    return head_end
+
+                return start + offset
+
+            elif tag.group(2):
+                if self._head_end is None:
+                    self._head_end = close + offset
+
+            elif _attachment_meta_re.match(buffer, start, close):
+                # The response is being served up as an attachment,
+                # and would be saved as a file rather than being
+                # interpreted by a browser.
+
+                self.finished = True
+
+                return None
+
+            else:
+                if (self._xua_meta_end is None and
+                        _xua_meta_re.match(buffer, start, close)):
+                    self._xua_meta_end = close + offset
+
+                if (self._charset_meta_end is None and
+                        _charset_meta_re.match(buffer, start, close)):
+                    self._charset_meta_end = close + offset
+
+            position = tag.end()
+
+        self._position = position + offset
+
+        # Give up if the start of the body element wasn't found within
+        # the search limit.
+
+        if end >= limit:
+            self.finished = True
+
+        return None
@@ -19,9 +19,10 @@ import sys
 _logger = logging.getLogger(__name__)
 
 try:
-    from importlib.util import find_spec
+    from importlib.util import find_spec, spec_from_loader
 except ImportError:
     find_spec = None
+    spec_from_loader = None
 
 _import_hooks = {}
 
@@ -147,11 +148,105 @@ class _ImportHookChainedLoader:
         return module
 
 
+class _ImportHookChainedSpecLoader:
+
+    def __init__(self, loader):
+        self.loader = loader
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        create_module = getattr(self.loader, 'create_module', None)
+        if create_module is not None:
+            return create_module(spec)
+
+    def exec_module(self, module):
+        spec = module.__spec__
+
+        # Put back the original loader before the module is executed so
+        # the module looks the same as if no import hook was involved.
+
+        module.__loader__ = self.loader
+        if spec.loader is self:
+            spec.loader = self.loader
+
+        self.loader.exec_module(module)
+
+        # Call the import hooks on the module being handled. The module
+        # may have replaced itself in sys.modules, in which case it is
+        # the replacement the hooks need to see.
+
+        module = sys.modules.get(spec.name, module)
+        _notify_import_hooks(spec.name, module)
+
+
+def _find_spec_on_meta_path(fullname, path, target):
+    for finder in sys.meta_path:
+        if isinstance(finder, ImportHookFinder):
+            continue
+
+        try:
+            find = finder.find_spec
+        except AttributeError:
+            find_module = getattr(finder, 'find_module', None)
+            if find_module is None:
+                continue
+
+            loader = find_module(fullname, path)
+            if loader is not None:
+                return spec_from_loader(fullname, loader)
+
+        else:
+            spec = find(fullname, path, target)
+            if spec is not None:
+                return spec
+
+
 class ImportHookFinder:
 
     def __init__(self):
         self._skip = {}
 
+    def find_spec(self, fullname, path=None, target=None):
+
+        # If not something we are interested in we can return.
+
+        if fullname not in _import_hooks:
+            return None
+
+        # A finder further down the meta path may itself call back into
+        # import, in which case we drop out on that nested pass.
+
+        if fullname in self._skip:
+            return None
+
+        # Rather than going back through import, ask the other finders on
+        # the meta path for the spec directly, with the same path the
+        # import system gave us, so the search is only done the once.
+
+        self._skip[fullname] = True
+
+        try:
+            spec = _find_spec_on_meta_path(fullname, path, target)
+        finally:
+            del self._skip[fullname]
+
+        if spec is None:
+            return None
+
+        loader = spec.loader
+
+        if loader is None:
+            return spec
+
+        if hasattr(loader, 'exec_module'):
+            spec.loader = _ImportHookChainedSpecLoader(loader)
+        else:
+            spec.loader = _ImportHookChainedLoader(loader)
+
+        return spec
+
     def find_module(self, fullname, path=None):
 
         # If not something we are interested in we can return.
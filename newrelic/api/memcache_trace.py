@@ -22,6 +22,8 @@ from newrelic.common.object_wrapper import FunctionWrapper, wrap_object
 
 class MemcacheTrace(TimeTrace):
 
+    __slots__ = ('command',)
+
     def __init__(self, command, **kwargs):
         parent = None
         if kwargs:
@@ -23,6 +23,9 @@ from newrelic.core.message_node import MessageNode
 
 class MessageTrace(CatHeaderMixin, TimeTrace):
 
+    __slots__ = ('library', 'operation', 'params', 'destination_type',
+            'destination_name', 'settings')
+
     cat_id_key = 'NewRelicID'
     cat_transaction_key = 'NewRelicTransaction'
     cat_appdata_key = 'NewRelicAppData'
@@ -47,6 +50,8 @@ class MessageTrace(CatHeaderMixin, TimeTrace):
         self.destination_type = destination_type
         self.destination_name = destination_name
 
+        self.settings = None
+
     def __enter__(self):
         result = super(MessageTrace, self).__enter__()
 
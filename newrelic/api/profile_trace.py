@@ -22,6 +22,7 @@ from newrelic.api.time_trace import current_trace
 from newrelic.api.function_trace import FunctionTrace
 from newrelic.common.object_wrapper import FunctionWrapper, wrap_object
 from newrelic.common.object_names import callable_name
+from newrelic.core.trace_cache import trace_cache
 
 from newrelic import __file__ as AGENT_PACKAGE_FILE
 AGENT_PACKAGE_DIRECTORY = os.path.dirname(AGENT_PACKAGE_FILE) + '/'
@@ -49,8 +50,7 @@ class ProfileTrace(object):
         # coroutine systems based on greenlets so don't run
         # if we detect may be using greenlets.
 
-        if (hasattr(sys, '_current_frames') and
-                parent.thread_id not in sys._current_frames()):
+        if trace_cache().is_coroutine(parent.thread_id):
             return
 
         co = frame.f_code
@@ -20,6 +20,8 @@ import newrelic.api.object_wrapper
 
 class SolrTrace(newrelic.api.time_trace.TimeTrace):
 
+    __slots__ = ('library', 'command')
+
     def __init__(self, library, command, **kwargs):
         parent = None
         if kwargs:
@@ -28,6 +28,17 @@ _logger = logging.getLogger(__name__)
 
 class TimeTrace(object):
 
+    # The _task and _greenlet attributes are set by the trace cache when
+    # the trace is saved, with _task only being present while the trace
+    # is active within an asyncio task.
+
+    __slots__ = ('parent', 'root', 'child_count', 'children', 'start_time',
+            'end_time', 'duration', 'exclusive', 'thread_id', 'activated',
+            'exited', 'is_async', 'has_async_children',
+            'min_child_start_time', 'exc_data',
+            'should_record_segment_params', 'guid', 'agent_attributes',
+            'user_attributes', '_task', '_greenlet', '__weakref__')
+
     def __init__(self, parent=None):
         self.parent = parent
         self.root = None
@@ -419,7 +430,14 @@ class TimeTrace(object):
 
         if node:
             transaction._process_node(node)
-            parent.process_child(node, self.is_async)
+
+            # The time metrics for the node may be accumulated by the
+            # transaction as it completes. Once the segment budget for the
+            # transaction is used up, leaf nodes are only folded into
+            # those time metrics rather than being kept in the trace.
+
+            folded = transaction._fold_node(node, parent, not self.children)
+            parent.process_child(node, self.is_async, folded)
 
         # ----------------------------------------------------------------------
         # SYNC  | The parent will not have exited yet, so no node will be
@@ -470,8 +488,15 @@ class TimeTrace(object):
             self.parent.update_async_exclusive_time(min_child_start_time,
                     exclusive_duration_remaining)
 
-    def process_child(self, node, is_async):
-        self.children.append(node)
+    def process_child(self, node, is_async, folded=False):
+        # A folded child is not retained, so is no longer counted as a
+        # child of this trace.
+
+        if folded:
+            self.child_count -= 1
+        else:
+            self.children.append(node)
+
         if is_async:
 
             # record the lowest start time
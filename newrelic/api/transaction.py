@@ -15,7 +15,6 @@
 from __future__ import print_function
 import os
 import re
-import sys
 import time
 import threading
 import logging
@@ -32,7 +31,8 @@ import newrelic.core.root_node
 import newrelic.core.database_node
 import newrelic.core.error_node
 
-from newrelic.core.stats_engine import CustomMetrics, SampledDataSet
+from newrelic.core.stats_engine import (CustomMetrics, SampledDataSet,
+        StatsTable)
 from newrelic.core.trace_cache import (trace_cache,
         TraceCacheNoActiveTraceError,
         TraceCacheActiveTraceError)
@@ -52,6 +52,7 @@ from newrelic.common.encoding_utils import (generate_path_hash, obfuscate,
         W3CTraceParent, W3CTraceState, NrTraceState)
 
 from newrelic.api.time_trace import TimeTrace
+from newrelic.api.function_trace import FunctionTrace
 
 _logger = logging.getLogger(__name__)
 
@@ -70,6 +71,8 @@ PARENT_TYPE = {
 
 
 class Sentinel(TimeTrace):
+    __slots__ = ('_transaction',)
+
     def __init__(self, transaction):
         super(Sentinel, self).__init__(None)
         self.transaction = transaction
@@ -138,6 +141,33 @@ class CachedPath(object):
         return 'Unknown'
 
 
+# Placeholder for the scope of scoped metrics generated for segments as they
+# complete. It is replaced by the transaction path when the transaction
+# completes.
+
+FOLDED_SCOPE = object()
+
+
+class FoldedRoot(object):
+
+    """Stands in for the transaction node when generating the time metrics
+    for segments as they complete, rather than from the finished trace.
+    The transaction may yet be renamed, so scoped metrics are given a
+    placeholder scope.
+
+    """
+
+    path = FOLDED_SCOPE
+
+    def __init__(self, transaction):
+        self.settings = transaction._settings
+        self.transaction = weakref.ref(transaction)
+
+    @property
+    def type(self):
+        return self.transaction().type
+
+
 class Transaction(object):
 
     STATE_PENDING = 0
@@ -184,6 +214,11 @@ class Transaction(object):
         self.stopped = False
 
         self._trace_node_count = 0
+        self._segment_limit = None
+        self._incremental_time_metrics = False
+        self._folded_root = None
+        self._folded_metrics = StatsTable()
+        self._folded_count = 0
 
         self._errors = []
         self._slow_sql = []
@@ -302,6 +337,10 @@ class Transaction(object):
 
                 if self._settings:
                     self.enabled = True
+                    self._segment_limit = (self._settings.agent_limits
+                            .segments_per_transaction)
+                    self._incremental_time_metrics = (self._settings
+                            .stats_engine.incremental_time_metrics)
 
     def __del__(self):
         self._dead = True
@@ -348,8 +387,7 @@ class Transaction(object):
         # For now we only do this if we know it is an
         # actual thread and not a greenlet.
 
-        if (not hasattr(sys, '_current_frames') or
-                self.thread_id in sys._current_frames()):
+        if not trace_cache().is_coroutine(self.thread_id):
             thread_instance = threading.currentThread()
             self._utilization_tracker = utilization_tracker(
                     self.application.name)
@@ -512,7 +550,32 @@ class Transaction(object):
             # transaction when distributed tracing or span events are enabled.
             self._compute_sampled_and_priority()
 
+        # Where nothing recorded for the transaction will need the tree of
+        # nodes, the time metrics for the nodes are generated now and the
+        # tree dropped, so only a summary of the transaction is recorded.
+        # The root span is also cleared as the transaction object may be
+        # held on to by a framework well after it has exited.
+
+        if (root_node.children and
+                self._settings.stats_engine.prune_node_trees and
+                not self._needs_node_tree(duration)):
+            if not self._incremental_time_metrics:
+                self._fold_time_metrics(root_node.children)
+            root_node = root_node._replace(children=())
+            root.children = []
+
         self._cached_path._name = self.path
+
+        folded_metrics = []
+        for (name, scope), stats in six.iteritems(self._folded_metrics):
+            if scope is FOLDED_SCOPE:
+                scope = self.path
+            folded_metrics.append(((name, scope), stats))
+
+        if self._folded_count:
+            self.record_custom_metric('Supportability/Python/Transaction/'
+                    'Segments/Folded', {'count': self._folded_count})
+
         agent_attributes = self.agent_attributes
         agent_attributes.extend(self.filter_request_parameters(request_params))
         node = newrelic.core.transaction_node.TransactionNode(
@@ -572,6 +635,9 @@ class Transaction(object):
                 root=root_node,
         )
 
+        node.folded_metrics = folded_metrics
+        node.incremental_time_metrics = self._incremental_time_metrics
+
         # Clear settings as we are all done and don't need it
         # anymore.
 
@@ -1567,7 +1633,6 @@ class Transaction(object):
 
     def _process_node(self, node):
         self._trace_node_count += 1
-        node.node_count = self._trace_node_count
         self.total_time += node.exclusive
 
         if type(node) is newrelic.core.database_node.DatabaseNode:
@@ -1581,8 +1646,103 @@ class Transaction(object):
                 return
             if node.duration < settings.transaction_tracer.explain_threshold:
                 return
+
+            # The position of the node in the transaction trace is only
+            # needed for slow SQL, so is only recorded here, rather than
+            # creating an instance dictionary for every node.
+
+            node.node_count = self._trace_node_count
             self._slow_sql.append(node)
 
+    def _fold_node(self, node, parent, leaf=True):
+        # Accumulates the time metrics for a node as it completes, where
+        # that has been enabled, or where it is a leaf node beyond the
+        # segment budget for the transaction. Returns whether the node
+        # is to be dropped from the trace.
+
+        limit = self._segment_limit
+        incremental = self._incremental_time_metrics
+
+        if limit is None and not incremental:
+            return False
+
+        if not self._settings:
+            return False
+
+        dropped = (leaf and limit is not None and
+                self._trace_node_count > limit)
+
+        if not dropped and not incremental:
+            return False
+
+        if dropped:
+            self._folded_count += 1
+
+        # Only function nodes generate the time metrics for their
+        # children, so where any ancestor of the node isn't a function
+        # trace, no metrics are generated for it.
+
+        trace = parent
+        while trace.parent is not None:
+            if not isinstance(trace, FunctionTrace):
+                return dropped
+            trace = trace.parent
+
+        self._fold_time_metrics((node,), segment_only=True)
+
+        return dropped
+
+    def _fold_time_metrics(self, nodes, segment_only=False):
+        root = self._folded_root
+        if root is None:
+            root = self._folded_root = FoldedRoot(self)
+
+        record_time = self._folded_metrics.record_time
+
+        for node in nodes:
+            if segment_only:
+                metrics = node.segment_time_metrics(root, root, root)
+            else:
+                metrics = node.time_metrics(root, root, root)
+
+            for metric in metrics:
+                record_time((metric.name, metric.scope or ''),
+                        metric.duration, metric.exclusive)
+
+    def _needs_node_tree(self, duration):
+        settings = self._settings
+
+        # Span events are generated from the tree for sampled
+        # transactions, or for all transactions with infinite tracing.
+
+        if (settings.distributed_tracing.enabled and
+                settings.span_events.enabled and
+                settings.collect_span_events):
+            if settings.infinite_tracing.enabled or self.sampled:
+                return True
+
+        # A transaction trace may be kept for a synthetics transaction,
+        # or where the transaction is over the threshold. This mirrors
+        # the checks made in the stats engine. Slow SQL is captured
+        # from its own nodes, so doesn't require the tree.
+
+        transaction_tracer = settings.transaction_tracer
+
+        if (not self.suppress_transaction_trace and
+                transaction_tracer.enabled and settings.collect_traces):
+            if self.synthetics_resource_id:
+                return True
+
+            threshold = transaction_tracer.transaction_threshold
+
+            if threshold is None:
+                threshold = self.apdex * 4
+
+            if duration >= threshold:
+                return True
+
+        return False
+
     def stop_recording(self):
         if not self.enabled:
             return
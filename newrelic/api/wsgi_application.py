@@ -22,7 +22,7 @@ from newrelic.api.transaction import current_transaction
 from newrelic.api.time_trace import record_exception
 from newrelic.api.web_transaction import WSGIWebTransaction
 from newrelic.api.function_trace import FunctionTrace
-from newrelic.api.html_insertion import insert_html_snippet, verify_body_exists
+from newrelic.api.html_insertion import HTMLInsertionScanner
 
 from newrelic.common.object_names import callable_name
 from newrelic.common.object_wrapper import wrap_object, FunctionWrapper
@@ -165,16 +165,15 @@ class _WSGIApplicationMiddleware(object):
     # This is a WSGI middleware for automatically inserting RUM into
     # HTML responses. It only works for where a WSGI application is
     # returning response content via a iterable/generator. It does not
-    # work if the WSGI application write() callable is being used. It
-    # will buffer response content up to the start of <body>. This is
-    # technically in violation of the WSGI specification if one is
-    # strict, but will still work with all known WSGI servers. Because
-    # it does buffer, then technically it may cause a problem with
-    # streamed responses. For that to occur then it would have to be a
-    # HTML response that doesn't actually use <body> and so technically
-    # is not a valid HTML response. It is assumed though that in
-    # streaming a response, the <head> itself isn't streamed out only
-    # gradually.
+    # work if the WSGI application write() callable is being used. Where
+    # the response has a content length, it will buffer response content
+    # up to the start of <body> so the content length can be adjusted.
+    # This is technically in violation of the WSGI specification if one
+    # is strict, but will still work with all known WSGI servers. Where
+    # there is no content length, the response is assumed to be being
+    # streamed, and only content which may still come after the point at
+    # which the insertion is to be done is held back. Everything before
+    # that point is passed on as soon as it is yielded.
 
     search_maximum = 64 * 1024
 
@@ -195,8 +194,7 @@ class _WSGIApplicationMiddleware(object):
 
         self.content_length = None
 
-        self.response_length = 0
-        self.response_data = []
+        self.html_insertion = None
 
         settings = transaction.settings
 
@@ -207,89 +205,41 @@ class _WSGIApplicationMiddleware(object):
         self.iterable = self.application(self.request_environ,
                 self.start_response)
 
-    def process_data(self, data):
-        # If this is the first data block, then immediately try
-        # for an insertion using full set of criteria. If this
-        # works then we are done, else we move to next phase of
-        # buffering up content until we find the body element.
+    def html_to_be_inserted(self):
+        header = self.transaction.browser_timing_header()
+
+        if not header:
+            return b''
 
-        def html_to_be_inserted():
-            header = self.transaction.browser_timing_header()
+        footer = self.transaction.browser_timing_footer()
 
-            if not header:
-                return b''
+        return six.b(header) + six.b(footer)
 
-            footer = self.transaction.browser_timing_footer()
+    def process_data(self, data):
+        # Scan the data for the insertion point, carrying on from
+        # where any prior data left off. What is returned is the
+        # data which can be passed on now, which will be empty if
+        # it all needs to be held back for the time being. Once
+        # the insertion has been done, or it is known that it
+        # can't be, we switch to pass through mode.
 
-            return six.b(header) + six.b(footer)
+        html_insertion = self.html_insertion
 
-        if not self.response_data:
-            modified = insert_html_snippet(data, html_to_be_inserted)
+        data = html_insertion.feed(data)
+
+        if html_insertion.finished:
+            self.pass_through = True
 
-            if modified is not None:
+            if html_insertion.inserted:
                 if self.debug:
                     _logger.debug('RUM insertion from WSGI middleware '
-                            'triggered on first yielded string from '
-                            'response. Bytes added was %r.',
-                            len(modified) - len(data))
+                            'triggered on string yielded from response. '
+                            'Bytes added was %r.', html_insertion.inserted)
 
                 if self.content_length is not None:
-                    length = len(modified) - len(data)
-                    self.content_length += length
-
-                return [modified]
-
-        # Buffer up the data. If we haven't found the start of
-        # the body element, that is all we do. If we have reached
-        # the limit of buffering allowed, then give up and return
-        # the buffered data.
-
-        if not self.response_data or not verify_body_exists(data):
-            self.response_length += len(data)
-            self.response_data.append(data)
-
-            if self.response_length >= self.search_maximum:
-                buffered_data = self.response_data
-                self.response_data = []
-                return buffered_data
-
-            return
-
-        # Now join back together any buffered data into a single
-        # string. This makes it easier to process, but there is a
-        # risk that we could temporarily double memory use for
-        # the response content if had small data blocks followed
-        # by very large data block. Expect that the risk of this
-        # occurring is very small.
-
-        if self.response_data:
-            self.response_data.append(data)
-            data = b''.join(self.response_data)
-            self.response_data = []
-
-        # Perform the insertion of the HTML. This should always
-        # succeed as we would only have got here if we had found
-        # the body element, which is the fallback point for
-        # insertion.
-
-        modified = insert_html_snippet(data, html_to_be_inserted)
-
-        if modified is not None:
-            if self.debug:
-                _logger.debug('RUM insertion from WSGI middleware '
-                        'triggered on subsequent string yielded from '
-                        'response. Bytes added was %r.',
-                        len(modified) - len(data))
-
-            if self.content_length is not None:
-                length = len(modified) - len(data)
-                self.content_length += length
-
-            return [modified]
+                    self.content_length += html_insertion.inserted
 
-        # Something went very wrong as we should never get here.
-
-        return [data]
+        return data
 
     def flush_headers(self):
         # Add back in any response content length header. It will
@@ -320,10 +270,12 @@ class _WSGIApplicationMiddleware(object):
         # is used, it is supposed to be before any attempt to
         # yield a string. When done switch to pass through mode.
 
-        if self.response_data:
-            for buffered_data in self.response_data:
+        if (self.html_insertion is not None and
+                not self.html_insertion.finished):
+            buffered_data = self.html_insertion.close()
+
+            if buffered_data:
                 self.outer_write(buffered_data)
-            self.response_data = []
 
         return self.outer_write(data)
 
@@ -430,6 +382,17 @@ class _WSGIApplicationMiddleware(object):
             self.content_length = content_length
             self.response_headers = headers
 
+            # Where there is no content length the response may be
+            # being streamed, in which case we avoid holding back
+            # any more of it than we need to. If data was already
+            # held back from a prior call, keep on using the same
+            # scanner so it is not lost.
+
+            if self.html_insertion is None:
+                self.html_insertion = HTMLInsertionScanner(
+                        self.html_to_be_inserted, self.search_maximum,
+                        streaming=content_length is None)
+
         # If in pass through mode at this point, we need to flush
         # out the headers. We technically might do this again
         # later if start_response() was called more than once.
@@ -461,61 +424,48 @@ class _WSGIApplicationMiddleware(object):
 
                 continue
 
-            # If the headers haven't been flushed we need to
-            # check for the potential insertion point and
-            # buffer up data as necessary if we can't find it.
+            # Ignore any empty strings.
 
-            if self.outer_write is None:
-                # Ignore any empty strings.
-
-                if not data:
-                    continue
+            if not data:
+                continue
 
-                # Check for the insertion point. Will return
-                # None if data was buffered.
+            # Check for the insertion point. Will return an
+            # empty string if all the data was held back.
 
-                buffered_data = self.process_data(data)
+            data = self.process_data(data)
 
-                if buffered_data is None:
-                    continue
-
-                # The data was returned, with it being
-                # potentially modified. It would not have
-                # been modified if we had reached maximum to
-                # be buffer. Flush out the headers, switch to
-                # pass through mode and yield the data.
+            # Flush out the headers the first time we have data
+            # to pass on, or once we have switched to pass
+            # through mode. The content length will have been
+            # adjusted by then if it needed to be, as data is
+            # only ever held back until then if there is one.
 
+            if self.outer_write is None and (data or self.pass_through):
                 self.flush_headers()
-                self.pass_through = True
 
-                for data in buffered_data:
-                    yield data
+            if data:
+                yield data
 
-            else:
-                # Depending on how the WSGI specification is
-                # interpreted, this shouldn't occur. That is,
-                # nothing should be yielded prior to the
-                # start_response() function being called. The
-                # CGI/WSGI example in the WSGI specification
-                # does allow that though as do various WSGI
-                # servers that followed that example.
+        # Ensure that any data still held back is written out,
+        # as will be the case if the end of the response was
+        # reached before finding the start of the body.
 
-                yield data
+        data = b''
+
+        if (self.html_insertion is not None and
+                not self.html_insertion.finished):
+            data = self.html_insertion.close()
 
         # Ensure that headers have been written if the
         # response was actually empty.
 
         if self.outer_write is None:
             self.flush_headers()
-            self.pass_through = True
 
-        # Ensure that any remaining buffered data is also
-        # written. Technically this should never be able
-        # to occur at this point, but do it just in case.
+        self.pass_through = True
 
-        if self.response_data:
-            for data in self.response_data:
-                yield data
+        if data:
+            yield data
 
 
 def WSGIApplicationWrapper(wrapped, application=None, name=None,
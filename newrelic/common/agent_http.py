@@ -16,6 +16,7 @@ from __future__ import print_function
 
 import os
 import sys
+import threading
 import time
 import zlib
 from pprint import pprint
@@ -75,6 +76,11 @@ def _urllib3_ssl_recursion_workaround(wrapped, instance, args, kwargs):
 class BaseClient(object):
     AUDIT_LOG_ID = 0
 
+    # Whether send_request() accepts the payload as an iterable of byte
+    # strings, which are only joined or compressed as they are consumed.
+
+    STREAM_PAYLOADS = False
+
     def __init__(
         self,
         host,
@@ -92,6 +98,7 @@ class BaseClient(object):
         compression_method="gzip",
         max_payload_size_in_bytes=1000000,
         audit_log_fp=None,
+        max_connections=1,
     ):
         self._audit_log_fp = audit_log_fp
 
@@ -108,14 +115,26 @@ class BaseClient(object):
         pass
 
     @staticmethod
-    def _supportability_request(params, payload, body, compression_time):
+    def _supportability_request(params, payload_size, body, compression_time):
         pass
 
     @classmethod
     def log_request(
-        cls, fp, method, url, params, payload, headers, body=None, compression_time=None
+        cls,
+        fp,
+        method,
+        url,
+        params,
+        payload,
+        headers,
+        body=None,
+        compression_time=None,
+        payload_size=None,
     ):
-        cls._supportability_request(params, payload, body, compression_time)
+        if payload_size is None and payload is not None:
+            payload_size = len(payload)
+
+        cls._supportability_request(params, payload_size, body, compression_time)
 
         if not fp:
             return
@@ -217,6 +236,7 @@ class BaseClient(object):
 
 
 class HttpClient(BaseClient):
+    STREAM_PAYLOADS = True
     CONNECTION_CLS = urllib3.HTTPSConnectionPool
     PREFIX_SCHEME = "https://"
     BASE_HEADERS = urllib3.make_headers(
@@ -240,6 +260,7 @@ class HttpClient(BaseClient):
         compression_method="gzip",
         max_payload_size_in_bytes=1000000,
         audit_log_fp=None,
+        max_connections=1,
     ):
         self._host = host
         port = self._port = port
@@ -254,6 +275,7 @@ class HttpClient(BaseClient):
         self._headers = dict(self.BASE_HEADERS)
         self._connection_kwargs = connection_kwargs = {
             "timeout": timeout,
+            "maxsize": max_connections,
         }
         self._urlopen_kwargs = urlopen_kwargs = {}
 
@@ -301,6 +323,7 @@ class HttpClient(BaseClient):
         self._proxy = proxy
 
         self._connection_attr = None
+        self._connection_lock = threading.Lock()
 
     @staticmethod
     def _parse_proxy(scheme, host, port, username, password):
@@ -343,17 +366,25 @@ class HttpClient(BaseClient):
         if self._connection_attr:
             return self._connection_attr
 
-        retries = urllib3.Retry(
-            total=False, connect=None, read=None, redirect=0, status=None
-        )
-        self._connection_attr = self.CONNECTION_CLS(
-            self._host,
-            self._port,
-            strict=True,
-            retries=retries,
-            **self._connection_kwargs
-        )
-        return self._connection_attr
+        # The connection pool is shared by the threads uploading the
+        # payloads for a concurrent harvest, so make sure only the one
+        # pool is ever created.
+
+        with self._connection_lock:
+            if self._connection_attr:
+                return self._connection_attr
+
+            retries = urllib3.Retry(
+                total=False, connect=None, read=None, redirect=0, status=None
+            )
+            self._connection_attr = self.CONNECTION_CLS(
+                self._host,
+                self._port,
+                strict=True,
+                retries=retries,
+                **self._connection_kwargs
+            )
+            return self._connection_attr
 
     def close_connection(self):
         if self._connection_attr:
@@ -370,12 +401,21 @@ class HttpClient(BaseClient):
         headers,
         body=None,
         compression_time=None,
+        payload_size=None,
     ):
         if not self._prefix:
             url = self.CONNECTION_CLS.scheme + "://" + self._host + url
 
         return super(HttpClient, self).log_request(
-            fp, method, url, params, payload, headers, body, compression_time
+            fp,
+            method,
+            url,
+            params,
+            payload,
+            headers,
+            body,
+            compression_time,
+            payload_size,
         )
 
     @staticmethod
@@ -392,6 +432,51 @@ class HttpClient(BaseClient):
 
         return data, compression_time
 
+    def _compress_chunks(self, chunks):
+        # Buffers the chunks until they exceed the compression threshold.
+        # From that point on, the chunks are fed to the compressor as they
+        # are produced, so that the uncompressed payload never needs to
+        # be held in memory as a whole.
+
+        chunks = iter(chunks)
+
+        buffered = []
+        payload_size = 0
+
+        for chunk in chunks:
+            buffered.append(chunk)
+            payload_size += len(chunk)
+
+            if payload_size > self._compression_threshold:
+                break
+        else:
+            return b"".join(buffered), None, payload_size
+
+        level = self._compression_level or zlib.Z_DEFAULT_COMPRESSION
+        wbits = 31 if self._compression_method == "gzip" else 15
+
+        compression_time = 0.0
+        compression_start = time.time()
+
+        compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+        body = [compressor.compress(b"".join(buffered))]
+        buffered = None
+
+        compression_time += time.time() - compression_start
+
+        for chunk in chunks:
+            payload_size += len(chunk)
+
+            compression_start = time.time()
+            body.append(compressor.compress(chunk))
+            compression_time += time.time() - compression_start
+
+        compression_start = time.time()
+        body.append(compressor.flush())
+        compression_time += time.time() - compression_start
+
+        return b"".join(body), max(compression_time, 0.0), payload_size
+
     def send_request(
         self,
         method="POST",
@@ -410,15 +495,34 @@ class HttpClient(BaseClient):
         if headers:
             merged_headers.update(headers)
         path = self._prefix + path
+
+        # A payload supplied as chunks is compressed as the chunks are
+        # consumed, unless the whole payload is required for the audit log.
+
+        if (
+            payload is not None
+            and not isinstance(payload, bytes)
+            and self._audit_log_fp
+        ):
+            payload = b"".join(payload)
+
         body = payload
         compression_time = None
+        payload_size = None
         if payload is not None:
-            if len(payload) > self._compression_threshold:
+            if not isinstance(payload, bytes):
+                body, compression_time, payload_size = self._compress_chunks(
+                    payload
+                )
+                payload = None
+            elif len(payload) > self._compression_threshold:
                 body, compression_time = self._compress(
                     payload,
                     method=self._compression_method,
                     level=self._compression_level,
                 )
+
+            if compression_time is not None:
                 content_encoding = self._compression_method
             else:
                 content_encoding = "Identity"
@@ -434,6 +538,7 @@ class HttpClient(BaseClient):
             merged_headers,
             body,
             compression_time,
+            payload_size,
         )
 
         if body and len(body) > self._max_payload_size_in_bytes:
@@ -489,6 +594,7 @@ class InsecureHttpClient(HttpClient):
         compression_method="gzip",
         max_payload_size_in_bytes=1000000,
         audit_log_fp=None,
+        max_connections=1,
     ):
         proxy = self._parse_proxy(proxy_scheme, proxy_host, None, None, None)
         if proxy and proxy.scheme == "https":
@@ -515,12 +621,13 @@ class InsecureHttpClient(HttpClient):
             compression_method,
             max_payload_size_in_bytes,
             audit_log_fp,
+            max_connections,
         )
 
 
 class SupportabilityMixin(object):
     @staticmethod
-    def _supportability_request(params, payload, body, compression_time):
+    def _supportability_request(params, payload_size, body, compression_time):
         # *********
         # Used only for supportability metrics. Do not use to drive business
         # logic!
@@ -532,7 +639,7 @@ class SupportabilityMixin(object):
             if compression_time is not None:
                 internal_metric(
                     "Supportability/Python/Collector/ZLIB/Bytes/%s" % agent_method,
-                    len(payload),
+                    payload_size,
                 )
                 internal_metric(
                     "Supportability/Python/Collector/ZLIB/Compress/%s" % agent_method,
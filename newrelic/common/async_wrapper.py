@@ -18,6 +18,7 @@ from newrelic.common.coroutine import (
     is_coroutine_callable,
     is_asyncio_coroutine,
     is_generator_function,
+    is_async_generator_function,
 )
 
 
@@ -81,11 +82,122 @@ def generator_wrapper(wrapped, trace):
     return wrapper
 
 
+def async_generator_wrapper(wrapped, trace):
+    @functools.wraps(wrapped)
+    def wrapper(*args, **kwargs):
+        return async_generator_call(trace, wrapped, args, kwargs)
+
+    return wrapper
+
+
 def async_wrapper(wrapped):
     if is_coroutine_callable(wrapped):
         return coroutine_wrapper
+    elif is_async_generator_function(wrapped):
+        return async_generator_wrapper
     elif is_generator_function(wrapped):
         if is_asyncio_coroutine(wrapped):
             return awaitable_generator_wrapper
         else:
             return generator_wrapper
+
+
+# The following call the wrapped function within the trace given to them
+# with each call, rather than a wrapper function being generated for each
+# trace as for those above. They are generated only once, so that the
+# choice of which to use can be made when a function is first wrapped.
+
+def evaluate_call(call_string):
+    values = {'call': None}
+    try:
+        exec(call_string, values)
+    except Exception:
+        pass
+    return values['call']
+
+
+coroutine_call = evaluate_call(textwrap.dedent("""
+async def call(trace, wrapped, args, kwargs):
+    with trace:
+        return await wrapped(*args, **kwargs)
+"""))
+
+
+async_generator_call = evaluate_call(textwrap.dedent("""
+async def call(trace, wrapped, args, kwargs):
+    g = wrapped(*args, **kwargs)
+    with trace:
+        try:
+            yielded = await g.asend(None)
+            while True:
+                try:
+                    value = yield yielded
+                except BaseException as e:
+                    yielded = await g.athrow(type(e), e)
+                else:
+                    yielded = await g.asend(value)
+        except StopAsyncIteration:
+            return
+"""))
+
+
+_awaitable_generator_call = []
+
+
+def awaitable_generator_call(trace, wrapped, args, kwargs):
+    # This is generated on first use as it requires asyncio be imported.
+
+    if not _awaitable_generator_call:
+        _awaitable_generator_call.append(evaluate_call(textwrap.dedent("""
+        import asyncio
+
+        @asyncio.coroutine
+        def call(trace, wrapped, args, kwargs):
+            with trace:
+                result = yield from wrapped(*args, **kwargs)
+                return result
+        """)))
+
+    return _awaitable_generator_call[0](trace, wrapped, args, kwargs)
+
+
+def _generator_call(trace, wrapped, args, kwargs):
+    g = wrapped(*args, **kwargs)
+    value = None
+    with trace:
+        while True:
+            try:
+                yielded = g.send(value)
+            except StopIteration:
+                break
+
+            try:
+                value = yield yielded
+            except BaseException as e:
+                value = yield g.throw(type(e), e)
+
+
+def generator_call(trace, wrapped, args, kwargs):
+    # Applying asyncio.coroutine over the top of the wrapper marks the
+    # wrapped generator function as being a coroutine, which can happen
+    # after the choice of call has been made, so check each time.
+
+    if is_asyncio_coroutine(wrapped):
+        return awaitable_generator_call(trace, wrapped, args, kwargs)
+
+    return _generator_call(trace, wrapped, args, kwargs)
+
+
+def async_call(wrapped):
+    """Returns the function to use to call the wrapped function within a
+    trace, or None where the wrapped function is not a coroutine or
+    generator and so should just be called with the trace active.
+
+    """
+
+    if is_coroutine_callable(wrapped):
+        return coroutine_call
+    elif is_async_generator_function(wrapped):
+        return async_generator_call
+    elif is_generator_function(wrapped):
+        return generator_call
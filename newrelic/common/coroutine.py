@@ -37,6 +37,14 @@ def is_generator_function(wrapped):
     return inspect.isgeneratorfunction(wrapped)
 
 
+if hasattr(inspect, 'isasyncgenfunction'):
+    def is_async_generator_function(wrapped):
+        return inspect.isasyncgenfunction(wrapped)
+else:
+    def is_async_generator_function(wrapped):
+        return False
+
+
 def _iscoroutinefunction_tornado(fn):
     return hasattr(fn, '__tornado_coroutine__')
 
@@ -48,7 +48,7 @@ BASE64_DECODE_STR = getattr(base64, 'decodestring', None)
 # be supplied as key word arguments to allow the wrappers to supply
 # defaults.
 
-def json_encode(obj, **kwargs):
+def _json_encode_kwargs(kwargs):
     _kwargs = {}
 
     # This wrapper function needs to deal with a few issues.
@@ -102,7 +102,83 @@ def json_encode(obj, **kwargs):
 
     _kwargs.update(kwargs)
 
-    return json.dumps(obj, **_kwargs)
+    return _kwargs
+
+
+def json_encode(obj, **kwargs):
+    return json.dumps(obj, **_json_encode_kwargs(kwargs))
+
+
+def _is_json_array(obj):
+    # Mirrors which objects json_encode() will output as a JSON array,
+    # which besides lists and tuples, is any other iterable the fallback
+    # encoder expands into a list.
+
+    if isinstance(obj, (list, tuple, types.GeneratorType)):
+        return True
+    if isinstance(obj, (dict, bytes, six.text_type, six.string_types)):
+        return False
+    return hasattr(obj, '__iter__')
+
+
+def _json_encode_fragments(obj, encoder, depth, batch_size=100):
+    if not depth or not _is_json_array(obj):
+        yield encoder.encode(obj)
+        return
+
+    yield '['
+
+    separator = ''
+
+    if depth == 1:
+        # The items of the innermost array are encoded in batches, as
+        # encoding each of a large number of small items separately adds
+        # a significant overhead.
+
+        items = iter(obj)
+        while True:
+            batch = list(itertools.islice(items, batch_size))
+            if not batch:
+                break
+            yield separator
+            yield encoder.encode(batch)[1:-1]
+            separator = ','
+
+    else:
+        for item in obj:
+            yield separator
+            for fragment in _json_encode_fragments(item, encoder, depth - 1):
+                yield fragment
+            separator = ','
+
+    yield ']'
+
+
+def json_encode_chunks(obj, chunk_size=64 * 1024, depth=2):
+    """Encodes obj as JSON in the same way as json_encode(), but yields
+    the result as a sequence of strings of around chunk_size characters.
+    The outer depth levels of arrays are expanded one item at a time, so
+    that the encoding of a large payload, such as that for a list of
+    events, is never held in memory all at once.
+
+    """
+
+    encoder = json.JSONEncoder(**_json_encode_kwargs({}))
+
+    fragments = []
+    size = 0
+
+    for fragment in _json_encode_fragments(obj, encoder, depth):
+        fragments.append(fragment)
+        size += len(fragment)
+
+        if size >= chunk_size:
+            yield ''.join(fragments)
+            fragments = []
+            size = 0
+
+    if fragments:
+        yield ''.join(fragments)
 
 
 def json_decode(s, **kwargs):
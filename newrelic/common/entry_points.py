@@ -0,0 +1,101 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module implements a lookup of the entry points installed packages
+advertise, such as the import hooks and extensions for the agent.
+
+The lookup uses importlib.metadata where it is available, falling back to
+pkg_resources otherwise. Importing pkg_resources scans and indexes every
+installed distribution, which can take longer than the rest of the agent
+initialization put together.
+
+"""
+
+import re
+from collections import namedtuple
+
+try:
+    from importlib.metadata import entry_points as _entry_points
+except ImportError:
+    _entry_points = None
+
+EntryPoint = namedtuple('EntryPoint', ['name', 'module_name', 'attrs'])
+
+_ENTRY_POINT_RE = re.compile(r'(?P<module>[\w.]+)\s*'
+        r'(:\s*(?P<attr>[\w.]+)\s*)?((?P<extras>\[.*\])\s*)?$')
+
+
+_installed_entry_points = None
+
+
+def _importlib_entry_points(group):
+    global _installed_entry_points
+
+    # Finding the entry points means reading the metadata of every
+    # installed distribution, so it is only done the once. This is no
+    # different to pkg_resources, which builds its working set on import.
+
+    if _installed_entry_points is None:
+        _installed_entry_points = _entry_points()
+
+    entry_points = _installed_entry_points
+
+    # From Python 3.10 the entry points are selected by group, rather
+    # than being a dictionary keyed by the group.
+
+    if hasattr(entry_points, 'select'):
+        entry_points = entry_points.select(group=group)
+    else:
+        entry_points = entry_points.get(group, ())
+
+    seen = set()
+
+    for entry_point in entry_points:
+        key = (entry_point.name, entry_point.value)
+
+        # A distribution found more than once on sys.path reports its
+        # entry points each time.
+
+        if key in seen:
+            continue
+
+        seen.add(key)
+
+        match = _ENTRY_POINT_RE.match(entry_point.value)
+
+        if match is None:
+            continue
+
+        attr = match.group('attr')
+        attrs = attr and tuple(attr.split('.')) or ()
+
+        yield EntryPoint(entry_point.name, match.group('module'), attrs)
+
+
+def _pkg_resources_entry_points(group):
+    try:
+        import pkg_resources
+    except ImportError:
+        return
+
+    for entry_point in pkg_resources.iter_entry_points(group=group):
+        yield EntryPoint(entry_point.name, entry_point.module_name,
+                tuple(entry_point.attrs))
+
+
+def iter_entry_points(group):
+    if _entry_points is not None:
+        return _importlib_entry_points(group)
+
+    return _pkg_resources_entry_points(group)
@@ -0,0 +1,121 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module implements a bounded least recently used cache. It is used
+to memoize the results of computations done by the agent on values which
+repeat very often, but which could otherwise have an unbounded number of
+distinct values, such that a plain dictionary could grow without limit.
+
+"""
+
+import threading
+
+from collections import OrderedDict
+
+
+class LRUCache(object):
+
+    """A thread safe mapping holding at most maximum items. When full,
+    adding a new item evicts the item which was least recently looked up
+    or added. A count of cache hits and misses is kept so the cache can
+    be monitored.
+
+    """
+
+    def __init__(self, maximum=1000):
+        self.maximum = maximum
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __deepcopy__(self, memo):
+        # A copy of the cache starts out empty, as the cached values can
+        # always be derived again.
+
+        return type(self)(self.maximum)
+
+    def __reduce__(self):
+        # Likewise a pickled cache is restored empty, as the lock can't be
+        # pickled.
+
+        return (type(self), (self.maximum,))
+
+    def __contains__(self, key):
+        return key in self._items
+
+    if hasattr(OrderedDict, 'move_to_end'):
+        def get(self, key, default=None):
+            # Lookups don't take the lock, as each operation on the
+            # ordered dictionary is atomic. If the item is evicted between
+            # the lookup and moving it to the end, so it is kept in order
+            # of when last used, it is treated as a miss. The hit and miss
+            # counts are only approximate as a result.
+
+            try:
+                value = self._items[key]
+                self._items.move_to_end(key)
+
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+
+            return value
+
+    else:
+        def get(self, key, default=None):
+            with self._lock:
+                try:
+                    # Move the item to the end so the items are kept in
+                    # order of when they were last used.
+
+                    value = self._items.pop(key)
+
+                except KeyError:
+                    self.misses += 1
+                    return default
+
+                self._items[key] = value
+                self.hits += 1
+
+                return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+
+            while len(self._items) > self.maximum:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def reset_counts(self):
+        """Resets the hit and miss counts, returning the counts prior to
+        the reset as a tuple.
+
+        """
+
+        with self._lock:
+            counts = (self.hits, self.misses)
+            self.hits = 0
+            self.misses = 0
+            return counts
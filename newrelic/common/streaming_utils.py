@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import collections
+import itertools
 import threading
 
 try:
@@ -84,6 +85,137 @@ class StreamBuffer(object):
         return self
 
 
+class SpanBatchStreamBuffer(StreamBuffer):
+
+    """A stream buffer yielding the spans put into it grouped into lists,
+    for sending as a single span batch gRPC message per list.
+
+    Putting a span into the buffer doesn't take the lock unless the
+    consumer is waiting for spans to be put, as appending to and popping
+    from the underlying deque are themselves thread safe. Once woken, the
+    consumer takes all the spans which are available, up to the batch
+    size, so spans put while it is busy sending a batch are sent in the
+    next batch without waking it again.
+
+    """
+
+    BATCH_SIZE = 100
+
+    def __init__(self, maxlen, batch_size=None):
+        super(SpanBatchStreamBuffer, self).__init__(maxlen)
+        self._batch_size = batch_size or self.BATCH_SIZE
+        self._waiting = False
+
+        # The counts are kept using counters, as calling next() on them
+        # is atomic. The value of each counter when the counts were last
+        # reset is remembered so the counts since then can be derived.
+
+        self._seen = itertools.count()
+        self._dropped = itertools.count()
+        self._seen_reset = 0
+        self._dropped_reset = 0
+
+    def put(self, item):
+        if self._shutdown:
+            return
+
+        next(self._seen)
+
+        # NOTE: dropped can be over-counted as the queue approaches
+        # capacity while data is still being transmitted.
+
+        if len(self._queue) >= self._queue.maxlen:
+            next(self._dropped)
+
+        self._queue.append(item)
+
+        # Checking whether the consumer is waiting after appending the
+        # span means a consumer which starts waiting after the check
+        # will see the span when it checks whether the queue is empty.
+
+        if self._waiting:
+            with self._notify:
+                self._notify.notify_all()
+
+    def stats(self):
+        with self._notify:
+            # Deriving the counts also advances each counter by one, so
+            # this is accounted for when next deriving the counts.
+
+            seen = next(self._seen)
+            dropped = next(self._dropped)
+
+            seen, self._seen_reset = seen - self._seen_reset, seen + 1
+            dropped, self._dropped_reset = (dropped - self._dropped_reset,
+                    dropped + 1)
+
+        return seen, dropped
+
+    def _pop_batch(self):
+        spans = []
+        popleft = self._queue.popleft
+
+        try:
+            while len(spans) < self._batch_size:
+                spans.append(popleft())
+        except IndexError:
+            pass
+
+        return spans
+
+    def __next__(self):
+        while True:
+            if self._shutdown:
+                raise StopIteration
+
+            spans = self._pop_batch()
+
+            if spans:
+                return spans
+
+            with self._notify:
+                self._waiting = True
+
+                try:
+                    if not self._shutdown and not self._queue:
+                        self._notify.wait()
+                finally:
+                    self._waiting = False
+
+    next = __next__
+
+
+def _encode_varint(value):
+    encoded = bytearray()
+
+    while value > 0x7f:
+        encoded.append((value & 0x7f) | 0x80)
+        value >>= 7
+
+    encoded.append(value)
+
+    return bytes(encoded)
+
+
+def serialize_span_batch(spans):
+    """Serializes a list of spans as a span batch message. Constructing a
+    span batch message would copy each of the spans into it, so instead
+    the message is serialized directly from the serialized spans, each
+    being encoded as an entry of the repeated spans field.
+
+    """
+
+    chunks = []
+
+    for span in spans:
+        serialized = span.SerializeToString()
+        chunks.append(b'\n')  # Field 1 with wire type 2.
+        chunks.append(_encode_varint(len(serialized)))
+        chunks.append(serialized)
+
+    return b''.join(chunks)
+
+
 class SpanProtoAttrs(dict):
     def __init__(self, *args, **kwargs):
         super(SpanProtoAttrs, self).__init__()
@@ -122,3 +254,24 @@ class SpanProtoAttrs(dict):
             return AttributeValue(int_value=value)
         else:
             return AttributeValue(string_value=str(value))
+
+
+def set_attribute_values(attribute_values, attributes):
+    """Sets the entries of a protobuf map of attribute values, such as
+    that for the intrinsics of a span, from a dictionary of attributes.
+    Each attribute value is set in place in the map, rather than being
+    created separately and then copied into the map.
+
+    """
+
+    for key, value in attributes.items():
+        attribute_value = attribute_values[key]
+
+        if isinstance(value, bool):
+            attribute_value.bool_value = value
+        elif isinstance(value, float):
+            attribute_value.double_value = value
+        elif isinstance(value, int):
+            attribute_value.int_value = value
+        else:
+            attribute_value.string_value = str(value)
@@ -12,17 +12,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import errno
 import logging
 import os
 import re
 import socket
 import string
 import sys
+import tempfile
 import threading
+import time
+
+from newrelic.packages import six
 
 from newrelic.common.agent_http import InsecureHttpClient
-from newrelic.common.encoding_utils import json_decode
-from newrelic.core.internal_metrics import internal_count_metric
+from newrelic.common.encoding_utils import json_decode, json_encode
+from newrelic.core.internal_metrics import (InternalTraceContext,
+        current_internal_metrics, internal_count_metric)
 
 _logger = logging.getLogger(__name__)
 VALID_CHARS_RE = re.compile(r'[0-9a-zA-Z_ ./-]')
@@ -46,6 +52,30 @@ class UtilizationHttpClient(InsecureHttpClient):
         return super(UtilizationHttpClient, self).send_request(*args, **kwargs)
 
 
+class MetadataStatusError(ValueError):
+    """Raised when a metadata endpoint responds with an unsuccessful
+    status code.
+
+    """
+
+    @property
+    def status(self):
+        return self.args[0]
+
+
+# Records for the thread probing a vendor whether fetching its metadata
+# failed in a way which definitively means the host isn't running on it.
+
+_probe_state = threading.local()
+
+
+def _is_definitive_miss(exc):
+    if isinstance(exc, MetadataStatusError):
+        return exc.status == 404
+
+    return getattr(exc, 'errno', None) == errno.ECONNREFUSED
+
+
 class CommonUtilization(object):
     METADATA_HOST = ''
     METADATA_PATH = ''
@@ -74,9 +104,10 @@ class CommonUtilization(object):
                                            params=cls.METADATA_QUERY,
                                            headers=cls.HEADERS)
             if not 200 <= resp[0] < 300:
-                raise ValueError(resp[0])
+                raise MetadataStatusError(resp[0])
             return resp[1]
         except Exception as e:
+            _probe_state.definitive_miss = _is_definitive_miss(e)
             _logger.debug('Unable to fetch %s data from %s%s: %r',
                     cls.VENDOR_NAME, cls.METADATA_HOST, cls.METADATA_PATH, e)
             return None
@@ -337,3 +368,173 @@ class BootIdUtilization(CommonUtilization):
             cls.record_error(cls.METADATA_URL, stripped)
 
         return stripped[:128] or None
+
+
+class _VendorProbe(object):
+
+    """Detects a cloud vendor in a background thread. Any internal metrics
+    are recorded against those of the thread which started the probe.
+
+    """
+
+    def __init__(self, vendor):
+        self.vendor = vendor
+        self.metrics = current_internal_metrics()
+        self.metadata = None
+        self.definitive = False
+        self.exc_info = None
+        self.done = threading.Event()
+
+    def start(self):
+        thread = threading.Thread(target=self.run,
+                name='NR-Utilization-%s' % self.vendor.VENDOR_NAME)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def run(self):
+        try:
+            with InternalTraceContext(self.metrics):
+                _probe_state.definitive_miss = False
+                self.metadata = self.vendor.detect()
+
+            # Only valid metadata, or a failure to fetch it such as the
+            # connection being refused which couldn't succeed on retrying,
+            # is a definitive outcome. A timeout, other fetch error or
+            # invalid data may be transient.
+
+            self.definitive = bool(self.metadata or
+                    _probe_state.definitive_miss)
+        except Exception:
+            self.exc_info = sys.exc_info()
+        finally:
+            self.done.set()
+
+    def result(self):
+        self.done.wait()
+
+        if self.exc_info is not None:
+            six.reraise(*self.exc_info)
+
+        return self.metadata
+
+
+def _load_vendor_cache(cache_file, boot_id, cache_ttl):
+    try:
+        # Only trust a cache file written by this user, as it would
+        # otherwise be possible for someone else to plant one in a shared
+        # directory and control the metadata reported.
+
+        if hasattr(os, 'getuid'):
+            if os.stat(cache_file).st_uid != os.getuid():
+                return None
+
+        with open(cache_file, 'r') as fh:
+            cache = json_decode(fh.read())
+
+        if cache['boot_id'] != boot_id:
+            return None
+
+        if not 0 <= time.time() - cache['timestamp'] < cache_ttl:
+            return None
+
+        if not isinstance(cache['vendors'], dict):
+            return None
+
+        return cache
+
+    except Exception:
+        return None
+
+
+def _save_vendor_cache(cache_file, cache):
+    # The cache is written to a temporary file which replaces the existing
+    # one, so a process starting at the same time never sees it partially
+    # written.
+
+    try:
+        fd, path = tempfile.mkstemp(dir=os.path.dirname(cache_file) or '.',
+                prefix='.newrelic-utilization-')
+
+        try:
+            with os.fdopen(fd, 'w') as fh:
+                fh.write(json_encode(cache))
+
+            getattr(os, 'replace', os.rename)(path, cache_file)
+
+        except Exception:
+            os.unlink(path)
+            raise
+
+    except Exception as e:
+        _logger.debug('Unable to write the cloud vendor metadata to the '
+                'cache file %r: %r', cache_file, e)
+
+
+def detect_cloud_vendor(vendors, boot_id=None, cache_file=None,
+        cache_ttl=0):
+    """Returns the name and metadata of the first of the vendors, in the
+    order given, the host is found to be running on, or None.
+
+    The vendors are probed concurrently, so a host which isn't running on
+    any of them waits on the slowest probe rather than all of them in turn.
+
+    When a cache file and time to live are given, the results of the probes
+    of metadata endpoints are kept in the file for the boot of the host
+    identified by boot_id. Processes starting later, for example workers
+    being recycled, can then use the results without probing again.
+
+    """
+
+    use_cache = bool(cache_file and boot_id and cache_ttl > 0)
+
+    cache = use_cache and _load_vendor_cache(cache_file, boot_id,
+            cache_ttl) or None
+    cached = cache and cache['vendors'] or {}
+
+    # Probes are only started for vendors preceding the first one already
+    # known to be a match.
+
+    probes = []
+
+    for vendor in vendors:
+        if vendor.VENDOR_NAME in cached:
+            probes.append((vendor, None))
+
+            if cached[vendor.VENDOR_NAME]:
+                break
+        else:
+            probes.append((vendor, _VendorProbe(vendor).start()))
+
+    results = {}
+    detected = None
+
+    for vendor, probe in probes:
+        if probe is None:
+            metadata = cached[vendor.VENDOR_NAME]
+        else:
+            metadata = probe.result()
+
+            # Vendors detected from the environment of the process rather
+            # than a metadata endpoint can differ between processes on the
+            # same host, so aren't cached. Nor are outcomes which may be
+            # transient, else the vendor would go undetected until the
+            # cache expired.
+
+            if vendor.METADATA_HOST and probe.definitive:
+                results[vendor.VENDOR_NAME] = metadata
+
+        if metadata:
+            detected = (vendor.VENDOR_NAME, metadata)
+            break
+
+    if use_cache and results:
+        if cache is None:
+            cache = {'boot_id': boot_id, 'timestamp': time.time(),
+                    'vendors': {}}
+
+        cache['vendors'].update(results)
+
+        _save_vendor_cache(cache_file, cache)
+
+    return detected
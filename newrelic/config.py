@@ -25,6 +25,7 @@ except ImportError:
 
 from newrelic.packages import six
 
+from newrelic.common.entry_points import iter_entry_points
 from newrelic.common.log_file import initialize_logging
 from newrelic.common.object_names import expand_builtin_exception_name
 from newrelic.core.config import (Settings, apply_config_setting,
@@ -366,8 +367,17 @@ def _process_configuration(section):
                      'getboolean', None)
     _process_setting(section, 'gc_runtime_metrics.top_object_count_limit',
                      'getint', None)
+    _process_setting(section,
+                     'gc_runtime_metrics.top_object_count_sample_size',
+                     'getint', None)
     _process_setting(section, 'thread_profiler.enabled',
                      'getboolean', None)
+    _process_setting(section, 'thread_profiler.continuous.enabled',
+                     'getboolean', None)
+    _process_setting(section, 'thread_profiler.continuous.sample_period',
+                     'getfloat', None)
+    _process_setting(section, 'thread_profiler.continuous.max_overhead',
+                     'getfloat', None)
     _process_setting(section, 'transaction_tracer.enabled',
                      'getboolean', None)
     _process_setting(section, 'transaction_tracer.transaction_threshold',
@@ -482,6 +492,12 @@ def _process_configuration(section):
                      'getint', None)
     _process_setting(section, 'agent_limits.sql_explain_plans_per_harvest',
                      'getint', None)
+    _process_setting(section, 'agent_limits.sql_explain_plan_workers',
+                     'getint', None)
+    _process_setting(section, 'agent_limits.sql_explain_plan_budget',
+                     'getfloat', None)
+    _process_setting(section, 'agent_limits.sql_explain_plan_cache_ttl',
+                     'getfloat', None)
     _process_setting(section, 'agent_limits.slow_sql_data',
                      'getint', None)
     _process_setting(section, 'agent_limits.merge_stats_maximum',
@@ -502,6 +518,10 @@ def _process_configuration(section):
                      'getint', None)
     _process_setting(section, 'agent_limits.data_compression_level',
                      'getint', None)
+    _process_setting(section, 'agent_limits.max_harvest_connections',
+                     'getint', None)
+    _process_setting(section, 'agent_limits.segments_per_transaction',
+                     'getint', None)
     _process_setting(section, 'console.listener_socket',
                      'get', _map_console_listener_socket)
     _process_setting(section, 'console.allow_interpreter_cmd',
@@ -568,6 +588,16 @@ def _process_configuration(section):
                      'getint', None)
     _process_setting(section, 'utilization.billing_hostname',
                      'get', None)
+    _process_setting(section, 'utilization.cache_file',
+                     'get', None)
+    _process_setting(section, 'utilization.cache_ttl',
+                     'getint', None)
+    _process_setting(section, 'aggregator.enabled',
+                     'getboolean', None)
+    _process_setting(section, 'aggregator.socket_path',
+                     'get', None)
+    _process_setting(section, 'aggregator.timeout',
+                     'getfloat', None)
     _process_setting(section, 'strip_exception_messages.enabled',
                      'getboolean', None)
     _process_setting(section, 'strip_exception_messages.whitelist',
@@ -587,6 +617,20 @@ def _process_configuration(section):
                     'getboolean', None)
     _process_setting(section, 'event_loop_visibility.blocking_threshold',
                     'getfloat', None)
+    _process_setting(section, 'stats_engine.per_thread_shards',
+                    'getboolean', None)
+    _process_setting(section, 'stats_engine.columnar_metrics',
+                    'getboolean', None)
+    _process_setting(section, 'stats_engine.lazy_span_events',
+                    'getboolean', None)
+    _process_setting(section, 'stats_engine.concurrent_harvest',
+                    'getboolean', None)
+    _process_setting(section, 'stats_engine.incremental_time_metrics',
+                    'getboolean', None)
+    _process_setting(section, 'stats_engine.prune_node_trees',
+                    'getboolean', None)
+    _process_setting(section, 'trace_cache.context_vars',
+                    'getboolean', None)
     _process_setting(section,
                     'event_harvest_config.harvest_limits.analytic_event_data',
                     'getint', None)
@@ -608,6 +652,9 @@ def _process_configuration(section):
     _process_setting(section,
                      'infinite_tracing.span_queue_size',
                      'getint', None)
+    _process_setting(section,
+                     'infinite_tracing.batching',
+                     'getboolean', None)
 
 
 # Loading of configuration from specified file and for specified
@@ -2007,8 +2054,8 @@ def _process_module_definition(target, module, function='instrument'):
         if enabled and not execute:
             _module_import_hook_registry[target] = (module, function)
 
-            _logger.debug("register module %s" %
-                    ((target, module, function),))
+            _logger.debug("register module %s",
+                    (target, module, function))
 
             newrelic.api.import_hook.register_import_hook(target,
                     _module_import_hook(target, module, function))
@@ -2025,6 +2072,9 @@ GREENLET_HOOK = ('greenlet', 'newrelic.core.trace_cache', 'greenlet_loaded')
 
 
 def _process_trace_cache_import_hooks():
+    if _settings.trace_cache.context_vars:
+        trace_cache.use_context_trace_cache()
+
     _process_module_definition(*GREENLET_HOOK)
 
     if GREENLET_HOOK not in _module_import_hook_results:
@@ -2040,678 +2090,469 @@ def _process_trace_cache_import_hooks():
         trace_cache.trace_cache().asyncio = False
 
 
-def _process_module_builtin_defaults():
-    _process_module_definition('asyncio.base_events',
-            'newrelic.hooks.coroutines_asyncio',
-            'instrument_asyncio_base_events')
-    _process_module_definition('asyncio.events',
-            'newrelic.hooks.coroutines_asyncio',
-            'instrument_asyncio_events')
-
-    _process_module_definition('asgiref.sync',
-            'newrelic.hooks.adapter_asgiref',
-            'instrument_asgiref_sync')
-
-    _process_module_definition('django.core.handlers.base',
-            'newrelic.hooks.framework_django',
-            'instrument_django_core_handlers_base')
-    _process_module_definition('django.core.handlers.asgi',
-            'newrelic.hooks.framework_django',
-            'instrument_django_core_handlers_asgi')
-    _process_module_definition('django.core.handlers.wsgi',
-            'newrelic.hooks.framework_django',
-            'instrument_django_core_handlers_wsgi')
-    _process_module_definition('django.core.urlresolvers',
-            'newrelic.hooks.framework_django',
-            'instrument_django_core_urlresolvers')
-    _process_module_definition('django.template',
-            'newrelic.hooks.framework_django',
-            'instrument_django_template')
-    _process_module_definition('django.template.loader_tags',
-            'newrelic.hooks.framework_django',
-            'instrument_django_template_loader_tags')
-    _process_module_definition('django.core.servers.basehttp',
-            'newrelic.hooks.framework_django',
-            'instrument_django_core_servers_basehttp')
-    _process_module_definition('django.contrib.staticfiles.views',
-            'newrelic.hooks.framework_django',
-            'instrument_django_contrib_staticfiles_views')
-    _process_module_definition('django.contrib.staticfiles.handlers',
-            'newrelic.hooks.framework_django',
-            'instrument_django_contrib_staticfiles_handlers')
-    _process_module_definition('django.views.debug',
-            'newrelic.hooks.framework_django',
-            'instrument_django_views_debug')
-    _process_module_definition('django.http.multipartparser',
-            'newrelic.hooks.framework_django',
-            'instrument_django_http_multipartparser')
-    _process_module_definition('django.core.mail',
-            'newrelic.hooks.framework_django',
-            'instrument_django_core_mail')
-    _process_module_definition('django.core.mail.message',
-            'newrelic.hooks.framework_django',
-            'instrument_django_core_mail_message')
-    _process_module_definition('django.views.generic.base',
-            'newrelic.hooks.framework_django',
-            'instrument_django_views_generic_base')
-    _process_module_definition('django.core.management.base',
-            'newrelic.hooks.framework_django',
-            'instrument_django_core_management_base')
-    _process_module_definition('django.template.base',
-            'newrelic.hooks.framework_django',
-            'instrument_django_template_base')
-    _process_module_definition('django.middleware.gzip',
-            'newrelic.hooks.framework_django',
-            'instrument_django_gzip_middleware')
+# The import hooks for the modules instrumented out of the box, as entries
+# of (target module, hook module, hook function). Being a table of literals
+# it is built when the byte code is compiled and loaded as a single constant
+# rather than executing a call per hook on startup. The hook module itself is
+# only imported when the target module is.
+
+_BUILTIN_IMPORT_HOOKS = (
+    ('asyncio.base_events', 'newrelic.hooks.coroutines_asyncio',
+            'instrument_asyncio_base_events'),
+    ('asyncio.events', 'newrelic.hooks.coroutines_asyncio',
+            'instrument_asyncio_events'),
+
+    ('asgiref.sync', 'newrelic.hooks.adapter_asgiref',
+            'instrument_asgiref_sync'),
+
+    ('django.core.handlers.base', 'newrelic.hooks.framework_django',
+            'instrument_django_core_handlers_base'),
+    ('django.core.handlers.asgi', 'newrelic.hooks.framework_django',
+            'instrument_django_core_handlers_asgi'),
+    ('django.core.handlers.wsgi', 'newrelic.hooks.framework_django',
+            'instrument_django_core_handlers_wsgi'),
+    ('django.core.urlresolvers', 'newrelic.hooks.framework_django',
+            'instrument_django_core_urlresolvers'),
+    ('django.template', 'newrelic.hooks.framework_django',
+            'instrument_django_template'),
+    ('django.template.loader_tags', 'newrelic.hooks.framework_django',
+            'instrument_django_template_loader_tags'),
+    ('django.core.servers.basehttp', 'newrelic.hooks.framework_django',
+            'instrument_django_core_servers_basehttp'),
+    ('django.contrib.staticfiles.views', 'newrelic.hooks.framework_django',
+            'instrument_django_contrib_staticfiles_views'),
+    ('django.contrib.staticfiles.handlers', 'newrelic.hooks.framework_django',
+            'instrument_django_contrib_staticfiles_handlers'),
+    ('django.views.debug', 'newrelic.hooks.framework_django',
+            'instrument_django_views_debug'),
+    ('django.http.multipartparser', 'newrelic.hooks.framework_django',
+            'instrument_django_http_multipartparser'),
+    ('django.core.mail', 'newrelic.hooks.framework_django',
+            'instrument_django_core_mail'),
+    ('django.core.mail.message', 'newrelic.hooks.framework_django',
+            'instrument_django_core_mail_message'),
+    ('django.views.generic.base', 'newrelic.hooks.framework_django',
+            'instrument_django_views_generic_base'),
+    ('django.core.management.base', 'newrelic.hooks.framework_django',
+            'instrument_django_core_management_base'),
+    ('django.template.base', 'newrelic.hooks.framework_django',
+            'instrument_django_template_base'),
+    ('django.middleware.gzip', 'newrelic.hooks.framework_django',
+            'instrument_django_gzip_middleware'),
 
     # New modules in Django 1.10
-    _process_module_definition('django.urls.resolvers',
-            'newrelic.hooks.framework_django',
-            'instrument_django_core_urlresolvers')
-    _process_module_definition('django.urls.base',
-            'newrelic.hooks.framework_django',
-            'instrument_django_urls_base')
-    _process_module_definition('django.core.handlers.exception',
-            'newrelic.hooks.framework_django',
-            'instrument_django_core_handlers_exception')
-
-    _process_module_definition('falcon.api',
-            'newrelic.hooks.framework_falcon',
-            'instrument_falcon_api')
-    _process_module_definition('falcon.app',
-            'newrelic.hooks.framework_falcon',
-            'instrument_falcon_app')
-    _process_module_definition('falcon.routing.util',
-            'newrelic.hooks.framework_falcon',
-            'instrument_falcon_routing_util')
-
-    _process_module_definition('fastapi.routing',
-            'newrelic.hooks.framework_fastapi',
-            'instrument_fastapi_routing')
-
-    _process_module_definition('flask.app',
-            'newrelic.hooks.framework_flask',
-            'instrument_flask_app')
-    _process_module_definition('flask.templating',
-            'newrelic.hooks.framework_flask',
-            'instrument_flask_templating')
-    _process_module_definition('flask.blueprints',
-            'newrelic.hooks.framework_flask',
-            'instrument_flask_blueprints')
-    _process_module_definition('flask.views',
-            'newrelic.hooks.framework_flask',
-            'instrument_flask_views')
-
-    _process_module_definition('flask_compress',
-            'newrelic.hooks.middleware_flask_compress',
-            'instrument_flask_compress')
-
-    _process_module_definition('flask_restful',
-            'newrelic.hooks.component_flask_rest',
-            'instrument_flask_rest')
-    _process_module_definition('flask_restplus.api',
-            'newrelic.hooks.component_flask_rest',
-            'instrument_flask_rest')
-    _process_module_definition('flask_restx.api',
-            'newrelic.hooks.component_flask_rest',
-            'instrument_flask_rest')
-
-    # _process_module_definition('web.application',
-    #        'newrelic.hooks.framework_webpy')
-    # _process_module_definition('web.template',
-    #        'newrelic.hooks.framework_webpy')
-
-    _process_module_definition('gluon.compileapp',
-            'newrelic.hooks.framework_web2py',
-            'instrument_gluon_compileapp')
-    _process_module_definition('gluon.restricted',
-            'newrelic.hooks.framework_web2py',
-            'instrument_gluon_restricted')
-    _process_module_definition('gluon.main',
-            'newrelic.hooks.framework_web2py',
-            'instrument_gluon_main')
-    _process_module_definition('gluon.template',
-            'newrelic.hooks.framework_web2py',
-            'instrument_gluon_template')
-    _process_module_definition('gluon.tools',
-            'newrelic.hooks.framework_web2py',
-            'instrument_gluon_tools')
-    _process_module_definition('gluon.http',
-            'newrelic.hooks.framework_web2py',
-            'instrument_gluon_http')
-
-    _process_module_definition('httpx._client',
-            'newrelic.hooks.external_httpx',
-            'instrument_httpx_client')
-
-    _process_module_definition('gluon.contrib.feedparser',
-            'newrelic.hooks.external_feedparser')
-    _process_module_definition('gluon.contrib.memcache.memcache',
-            'newrelic.hooks.memcache_memcache')
-
-    _process_module_definition('grpc._channel',
-            'newrelic.hooks.framework_grpc',
-            'instrument_grpc__channel')
-    _process_module_definition('grpc._server',
-            'newrelic.hooks.framework_grpc',
-            'instrument_grpc_server')
-
-    _process_module_definition('pylons.wsgiapp',
-            'newrelic.hooks.framework_pylons')
-    _process_module_definition('pylons.controllers.core',
-            'newrelic.hooks.framework_pylons')
-    _process_module_definition('pylons.templating',
-            'newrelic.hooks.framework_pylons')
-
-    _process_module_definition('bottle',
-            'newrelic.hooks.framework_bottle',
-            'instrument_bottle')
-
-    _process_module_definition('cherrypy._cpreqbody',
-            'newrelic.hooks.framework_cherrypy',
-            'instrument_cherrypy__cpreqbody')
-    _process_module_definition('cherrypy._cprequest',
-            'newrelic.hooks.framework_cherrypy',
-            'instrument_cherrypy__cprequest')
-    _process_module_definition('cherrypy._cpdispatch',
-            'newrelic.hooks.framework_cherrypy',
-            'instrument_cherrypy__cpdispatch')
-    _process_module_definition('cherrypy._cpwsgi',
-            'newrelic.hooks.framework_cherrypy',
-            'instrument_cherrypy__cpwsgi')
-    _process_module_definition('cherrypy._cptree',
-            'newrelic.hooks.framework_cherrypy',
-            'instrument_cherrypy__cptree')
-
-    _process_module_definition('paste.httpserver',
-            'newrelic.hooks.adapter_paste',
-            'instrument_paste_httpserver')
-
-    _process_module_definition('gunicorn.app.base',
-            'newrelic.hooks.adapter_gunicorn',
-            'instrument_gunicorn_app_base')
-
-    _process_module_definition('cx_Oracle',
-            'newrelic.hooks.database_cx_oracle',
-            'instrument_cx_oracle')
-
-    _process_module_definition('ibm_db_dbi',
-            'newrelic.hooks.database_ibm_db_dbi',
-            'instrument_ibm_db_dbi')
-
-    _process_module_definition('mysql.connector',
-            'newrelic.hooks.database_mysql',
-            'instrument_mysql_connector')
-    _process_module_definition('MySQLdb',
-            'newrelic.hooks.database_mysqldb',
-            'instrument_mysqldb')
-    _process_module_definition('oursql',
-            'newrelic.hooks.database_oursql',
-            'instrument_oursql')
-    _process_module_definition('pymysql',
-            'newrelic.hooks.database_pymysql',
-            'instrument_pymysql')
-
-    _process_module_definition('pyodbc',
-            'newrelic.hooks.database_pyodbc',
-            'instrument_pyodbc')
-
-    _process_module_definition('pymssql',
-            'newrelic.hooks.database_pymssql',
-            'instrument_pymssql')
-
-    _process_module_definition('psycopg2',
-            'newrelic.hooks.database_psycopg2',
-            'instrument_psycopg2')
-    _process_module_definition('psycopg2._psycopg2',
-            'newrelic.hooks.database_psycopg2',
-            'instrument_psycopg2__psycopg2')
-    _process_module_definition('psycopg2.extensions',
-            'newrelic.hooks.database_psycopg2',
-            'instrument_psycopg2_extensions')
-    _process_module_definition('psycopg2._json',
-            'newrelic.hooks.database_psycopg2',
-            'instrument_psycopg2__json')
-    _process_module_definition('psycopg2._range',
-            'newrelic.hooks.database_psycopg2',
-            'instrument_psycopg2__range')
-    _process_module_definition('psycopg2.sql',
-            'newrelic.hooks.database_psycopg2',
-            'instrument_psycopg2_sql')
-
-    _process_module_definition('psycopg2ct',
-            'newrelic.hooks.database_psycopg2ct',
-            'instrument_psycopg2ct')
-    _process_module_definition('psycopg2ct.extensions',
-            'newrelic.hooks.database_psycopg2ct',
-            'instrument_psycopg2ct_extensions')
-
-    _process_module_definition('psycopg2cffi',
-            'newrelic.hooks.database_psycopg2cffi',
-            'instrument_psycopg2cffi')
-    _process_module_definition('psycopg2cffi.extensions',
-            'newrelic.hooks.database_psycopg2cffi',
-            'instrument_psycopg2cffi_extensions')
-
-    _process_module_definition('asyncpg.connect_utils',
-            'newrelic.hooks.database_asyncpg',
-            'instrument_asyncpg_connect_utils')
-    _process_module_definition('asyncpg.protocol',
-            'newrelic.hooks.database_asyncpg',
-            'instrument_asyncpg_protocol')
-
-    _process_module_definition('postgresql.driver.dbapi20',
-            'newrelic.hooks.database_postgresql',
-            'instrument_postgresql_driver_dbapi20')
-
-    _process_module_definition('postgresql.interface.proboscis.dbapi2',
-            'newrelic.hooks.database_postgresql',
-            'instrument_postgresql_interface_proboscis_dbapi2')
-
-    _process_module_definition('sqlite3',
-            'newrelic.hooks.database_sqlite',
-            'instrument_sqlite3')
-    _process_module_definition('sqlite3.dbapi2',
-            'newrelic.hooks.database_sqlite',
-            'instrument_sqlite3_dbapi2')
-
-    _process_module_definition('pysqlite2',
-            'newrelic.hooks.database_sqlite',
-            'instrument_sqlite3')
-    _process_module_definition('pysqlite2.dbapi2',
-            'newrelic.hooks.database_sqlite',
-            'instrument_sqlite3_dbapi2')
-
-    _process_module_definition('memcache',
-            'newrelic.hooks.datastore_memcache',
-            'instrument_memcache')
-    _process_module_definition('umemcache',
-            'newrelic.hooks.datastore_umemcache',
-            'instrument_umemcache')
-    _process_module_definition('pylibmc.client',
-            'newrelic.hooks.datastore_pylibmc',
-            'instrument_pylibmc_client')
-    _process_module_definition('bmemcached.client',
-            'newrelic.hooks.datastore_bmemcached',
-            'instrument_bmemcached_client')
-    _process_module_definition('pymemcache.client',
-            'newrelic.hooks.datastore_pymemcache',
-            'instrument_pymemcache_client')
-
-    _process_module_definition('jinja2.environment',
-            'newrelic.hooks.template_jinja2')
-
-    _process_module_definition('mako.runtime',
-            'newrelic.hooks.template_mako',
-            'instrument_mako_runtime')
-    _process_module_definition('mako.template',
-            'newrelic.hooks.template_mako',
-            'instrument_mako_template')
-
-    _process_module_definition('genshi.template.base',
-            'newrelic.hooks.template_genshi')
-
-    if six.PY2:
-        _process_module_definition('httplib',
-                'newrelic.hooks.external_httplib')
-    else:
-        _process_module_definition('http.client',
-                'newrelic.hooks.external_httplib')
+    ('django.urls.resolvers', 'newrelic.hooks.framework_django',
+            'instrument_django_core_urlresolvers'),
+    ('django.urls.base', 'newrelic.hooks.framework_django',
+            'instrument_django_urls_base'),
+    ('django.core.handlers.exception', 'newrelic.hooks.framework_django',
+            'instrument_django_core_handlers_exception'),
+
+    ('falcon.api', 'newrelic.hooks.framework_falcon', 'instrument_falcon_api'),
+    ('falcon.app', 'newrelic.hooks.framework_falcon', 'instrument_falcon_app'),
+    ('falcon.routing.util', 'newrelic.hooks.framework_falcon',
+            'instrument_falcon_routing_util'),
+
+    ('fastapi.routing', 'newrelic.hooks.framework_fastapi',
+            'instrument_fastapi_routing'),
+
+    ('flask.app', 'newrelic.hooks.framework_flask', 'instrument_flask_app'),
+    ('flask.templating', 'newrelic.hooks.framework_flask',
+            'instrument_flask_templating'),
+    ('flask.blueprints', 'newrelic.hooks.framework_flask',
+            'instrument_flask_blueprints'),
+    ('flask.views', 'newrelic.hooks.framework_flask',
+            'instrument_flask_views'),
+
+    ('flask_compress', 'newrelic.hooks.middleware_flask_compress',
+            'instrument_flask_compress'),
+
+    ('flask_restful', 'newrelic.hooks.component_flask_rest',
+            'instrument_flask_rest'),
+    ('flask_restplus.api', 'newrelic.hooks.component_flask_rest',
+            'instrument_flask_rest'),
+    ('flask_restx.api', 'newrelic.hooks.component_flask_rest',
+            'instrument_flask_rest'),
+
+    # ('web.application', 'newrelic.hooks.framework_webpy', 'instrument'),
+    # ('web.template', 'newrelic.hooks.framework_webpy', 'instrument'),
+
+    ('gluon.compileapp', 'newrelic.hooks.framework_web2py',
+            'instrument_gluon_compileapp'),
+    ('gluon.restricted', 'newrelic.hooks.framework_web2py',
+            'instrument_gluon_restricted'),
+    ('gluon.main', 'newrelic.hooks.framework_web2py', 'instrument_gluon_main'),
+    ('gluon.template', 'newrelic.hooks.framework_web2py',
+            'instrument_gluon_template'),
+    ('gluon.tools', 'newrelic.hooks.framework_web2py',
+            'instrument_gluon_tools'),
+    ('gluon.http', 'newrelic.hooks.framework_web2py', 'instrument_gluon_http'),
+
+    ('httpx._client', 'newrelic.hooks.external_httpx',
+            'instrument_httpx_client'),
+
+    ('gluon.contrib.feedparser', 'newrelic.hooks.external_feedparser',
+            'instrument'),
+    ('gluon.contrib.memcache.memcache', 'newrelic.hooks.memcache_memcache',
+            'instrument'),
+
+    ('grpc._channel', 'newrelic.hooks.framework_grpc',
+            'instrument_grpc__channel'),
+    ('grpc._server', 'newrelic.hooks.framework_grpc',
+            'instrument_grpc_server'),
+
+    ('pylons.wsgiapp', 'newrelic.hooks.framework_pylons', 'instrument'),
+    ('pylons.controllers.core', 'newrelic.hooks.framework_pylons',
+            'instrument'),
+    ('pylons.templating', 'newrelic.hooks.framework_pylons', 'instrument'),
+
+    ('bottle', 'newrelic.hooks.framework_bottle', 'instrument_bottle'),
+
+    ('cherrypy._cpreqbody', 'newrelic.hooks.framework_cherrypy',
+            'instrument_cherrypy__cpreqbody'),
+    ('cherrypy._cprequest', 'newrelic.hooks.framework_cherrypy',
+            'instrument_cherrypy__cprequest'),
+    ('cherrypy._cpdispatch', 'newrelic.hooks.framework_cherrypy',
+            'instrument_cherrypy__cpdispatch'),
+    ('cherrypy._cpwsgi', 'newrelic.hooks.framework_cherrypy',
+            'instrument_cherrypy__cpwsgi'),
+    ('cherrypy._cptree', 'newrelic.hooks.framework_cherrypy',
+            'instrument_cherrypy__cptree'),
+
+    ('paste.httpserver', 'newrelic.hooks.adapter_paste',
+            'instrument_paste_httpserver'),
+
+    ('gunicorn.app.base', 'newrelic.hooks.adapter_gunicorn',
+            'instrument_gunicorn_app_base'),
+
+    ('cx_Oracle', 'newrelic.hooks.database_cx_oracle', 'instrument_cx_oracle'),
+
+    ('ibm_db_dbi', 'newrelic.hooks.database_ibm_db_dbi',
+            'instrument_ibm_db_dbi'),
+
+    ('mysql.connector', 'newrelic.hooks.database_mysql',
+            'instrument_mysql_connector'),
+    ('MySQLdb', 'newrelic.hooks.database_mysqldb', 'instrument_mysqldb'),
+    ('oursql', 'newrelic.hooks.database_oursql', 'instrument_oursql'),
+    ('pymysql', 'newrelic.hooks.database_pymysql', 'instrument_pymysql'),
+
+    ('pyodbc', 'newrelic.hooks.database_pyodbc', 'instrument_pyodbc'),
+
+    ('pymssql', 'newrelic.hooks.database_pymssql', 'instrument_pymssql'),
+
+    ('psycopg2', 'newrelic.hooks.database_psycopg2', 'instrument_psycopg2'),
+    ('psycopg2._psycopg2', 'newrelic.hooks.database_psycopg2',
+            'instrument_psycopg2__psycopg2'),
+    ('psycopg2.extensions', 'newrelic.hooks.database_psycopg2',
+            'instrument_psycopg2_extensions'),
+    ('psycopg2._json', 'newrelic.hooks.database_psycopg2',
+            'instrument_psycopg2__json'),
+    ('psycopg2._range', 'newrelic.hooks.database_psycopg2',
+            'instrument_psycopg2__range'),
+    ('psycopg2.sql', 'newrelic.hooks.database_psycopg2',
+            'instrument_psycopg2_sql'),
+
+    ('psycopg2ct', 'newrelic.hooks.database_psycopg2ct',
+            'instrument_psycopg2ct'),
+    ('psycopg2ct.extensions', 'newrelic.hooks.database_psycopg2ct',
+            'instrument_psycopg2ct_extensions'),
+
+    ('psycopg2cffi', 'newrelic.hooks.database_psycopg2cffi',
+            'instrument_psycopg2cffi'),
+    ('psycopg2cffi.extensions', 'newrelic.hooks.database_psycopg2cffi',
+            'instrument_psycopg2cffi_extensions'),
+
+    ('asyncpg.connect_utils', 'newrelic.hooks.database_asyncpg',
+            'instrument_asyncpg_connect_utils'),
+    ('asyncpg.protocol', 'newrelic.hooks.database_asyncpg',
+            'instrument_asyncpg_protocol'),
+
+    ('postgresql.driver.dbapi20', 'newrelic.hooks.database_postgresql',
+            'instrument_postgresql_driver_dbapi20'),
+
+    ('postgresql.interface.proboscis.dbapi2',
+            'newrelic.hooks.database_postgresql', 'instrument_postgresql_interface_proboscis_dbapi2'),
+
+    ('sqlite3', 'newrelic.hooks.database_sqlite', 'instrument_sqlite3'),
+    ('sqlite3.dbapi2', 'newrelic.hooks.database_sqlite',
+            'instrument_sqlite3_dbapi2'),
+
+    ('pysqlite2', 'newrelic.hooks.database_sqlite', 'instrument_sqlite3'),
+    ('pysqlite2.dbapi2', 'newrelic.hooks.database_sqlite',
+            'instrument_sqlite3_dbapi2'),
+
+    ('memcache', 'newrelic.hooks.datastore_memcache', 'instrument_memcache'),
+    ('umemcache', 'newrelic.hooks.datastore_umemcache',
+            'instrument_umemcache'),
+    ('pylibmc.client', 'newrelic.hooks.datastore_pylibmc',
+            'instrument_pylibmc_client'),
+    ('bmemcached.client', 'newrelic.hooks.datastore_bmemcached',
+            'instrument_bmemcached_client'),
+    ('pymemcache.client', 'newrelic.hooks.datastore_pymemcache',
+            'instrument_pymemcache_client'),
+
+    ('jinja2.environment', 'newrelic.hooks.template_jinja2', 'instrument'),
+
+    ('mako.runtime', 'newrelic.hooks.template_mako',
+            'instrument_mako_runtime'),
+    ('mako.template', 'newrelic.hooks.template_mako',
+            'instrument_mako_template'),
+
+    ('genshi.template.base', 'newrelic.hooks.template_genshi', 'instrument'),
+
+    ('httplib2', 'newrelic.hooks.external_httplib2', 'instrument'),
+
+    ('urllib3.connectionpool', 'newrelic.hooks.external_urllib3',
+            'instrument_urllib3_connectionpool'),
+    ('urllib3.connection', 'newrelic.hooks.external_urllib3',
+            'instrument_urllib3_connection'),
+    ('requests.packages.urllib3.connection', 'newrelic.hooks.external_urllib3',
+            'instrument_urllib3_connection'),
+
+    ('starlette.requests', 'newrelic.hooks.framework_starlette',
+            'instrument_starlette_requests'),
+    ('starlette.routing', 'newrelic.hooks.framework_starlette',
+            'instrument_starlette_routing'),
+    ('starlette.applications', 'newrelic.hooks.framework_starlette',
+            'instrument_starlette_applications'),
+    ('starlette.middleware.errors', 'newrelic.hooks.framework_starlette',
+            'instrument_starlette_middleware_errors'),
+    ('starlette.exceptions', 'newrelic.hooks.framework_starlette',
+            'instrument_starlette_exceptions'),
+    ('starlette.background', 'newrelic.hooks.framework_starlette',
+            'instrument_starlette_background_task'),
+
+    ('uvicorn.config', 'newrelic.hooks.adapter_uvicorn',
+            'instrument_uvicorn_config'),
+
+    ('sanic.app', 'newrelic.hooks.framework_sanic', 'instrument_sanic_app'),
+    ('sanic.response', 'newrelic.hooks.framework_sanic',
+            'instrument_sanic_response'),
+
+    ('aiohttp.wsgi', 'newrelic.hooks.framework_aiohttp',
+            'instrument_aiohttp_wsgi'),
+    ('aiohttp.web', 'newrelic.hooks.framework_aiohttp',
+            'instrument_aiohttp_web'),
+    ('aiohttp.web_reqrep', 'newrelic.hooks.framework_aiohttp',
+            'instrument_aiohttp_web_response'),
+    ('aiohttp.web_response', 'newrelic.hooks.framework_aiohttp',
+            'instrument_aiohttp_web_response'),
+    ('aiohttp.web_urldispatcher', 'newrelic.hooks.framework_aiohttp',
+            'instrument_aiohttp_web_urldispatcher'),
+    ('aiohttp.client', 'newrelic.hooks.framework_aiohttp',
+            'instrument_aiohttp_client'),
+    ('aiohttp.client_reqrep', 'newrelic.hooks.framework_aiohttp',
+            'instrument_aiohttp_client_reqrep'),
+    ('aiohttp.protocol', 'newrelic.hooks.framework_aiohttp',
+            'instrument_aiohttp_protocol'),
+
+    ('requests.api', 'newrelic.hooks.external_requests',
+            'instrument_requests_api'),
+    ('requests.sessions', 'newrelic.hooks.external_requests',
+            'instrument_requests_sessions'),
+
+    ('feedparser', 'newrelic.hooks.external_feedparser', 'instrument'),
+
+    ('xmlrpclib', 'newrelic.hooks.external_xmlrpclib', 'instrument'),
+
+    ('dropbox', 'newrelic.hooks.external_dropbox', 'instrument'),
+
+    ('facepy.graph_api', 'newrelic.hooks.external_facepy', 'instrument'),
+
+    ('pysolr', 'newrelic.hooks.datastore_pysolr', 'instrument_pysolr'),
+
+    ('solr', 'newrelic.hooks.datastore_solrpy', 'instrument_solrpy'),
+
+    ('elasticsearch.client', 'newrelic.hooks.datastore_elasticsearch',
+            'instrument_elasticsearch_client'),
+    ('elasticsearch.client.cat', 'newrelic.hooks.datastore_elasticsearch',
+            'instrument_elasticsearch_client_cat'),
+    ('elasticsearch.client.cluster', 'newrelic.hooks.datastore_elasticsearch',
+            'instrument_elasticsearch_client_cluster'),
+    ('elasticsearch.client.indices', 'newrelic.hooks.datastore_elasticsearch',
+            'instrument_elasticsearch_client_indices'),
+    ('elasticsearch.client.nodes', 'newrelic.hooks.datastore_elasticsearch',
+            'instrument_elasticsearch_client_nodes'),
+    ('elasticsearch.client.snapshot', 'newrelic.hooks.datastore_elasticsearch',
+            'instrument_elasticsearch_client_snapshot'),
+    ('elasticsearch.client.tasks', 'newrelic.hooks.datastore_elasticsearch',
+            'instrument_elasticsearch_client_tasks'),
+    ('elasticsearch.client.ingest', 'newrelic.hooks.datastore_elasticsearch',
+            'instrument_elasticsearch_client_ingest'),
+    ('elasticsearch.connection.base', 'newrelic.hooks.datastore_elasticsearch',
+            'instrument_elasticsearch_connection_base'),
+    ('elasticsearch.transport', 'newrelic.hooks.datastore_elasticsearch',
+            'instrument_elasticsearch_transport'),
+
+    ('pika.adapters', 'newrelic.hooks.messagebroker_pika',
+            'instrument_pika_adapters'),
+    ('pika.channel', 'newrelic.hooks.messagebroker_pika',
+            'instrument_pika_channel'),
+    ('pika.spec', 'newrelic.hooks.messagebroker_pika', 'instrument_pika_spec'),
+
+    ('pyelasticsearch.client', 'newrelic.hooks.datastore_pyelasticsearch',
+            'instrument_pyelasticsearch_client'),
+
+    ('pymongo.connection', 'newrelic.hooks.datastore_pymongo',
+            'instrument_pymongo_connection'),
+    ('pymongo.mongo_client', 'newrelic.hooks.datastore_pymongo',
+            'instrument_pymongo_mongo_client'),
+    ('pymongo.collection', 'newrelic.hooks.datastore_pymongo',
+            'instrument_pymongo_collection'),
+
+    ('redis.connection', 'newrelic.hooks.datastore_redis',
+            'instrument_redis_connection'),
+    ('redis.client', 'newrelic.hooks.datastore_redis',
+            'instrument_redis_client'),
+
+    ('motor', 'newrelic.hooks.datastore_motor', 'patch_motor'),
+
+    ('piston.resource', 'newrelic.hooks.component_piston',
+            'instrument_piston_resource'),
+    ('piston.doc', 'newrelic.hooks.component_piston', 'instrument_piston_doc'),
+
+    ('tastypie.resources', 'newrelic.hooks.component_tastypie',
+            'instrument_tastypie_resources'),
+    ('tastypie.api', 'newrelic.hooks.component_tastypie',
+            'instrument_tastypie_api'),
+
+    ('rest_framework.views', 'newrelic.hooks.component_djangorestframework',
+            'instrument_rest_framework_views'),
+    ('rest_framework.decorators',
+            'newrelic.hooks.component_djangorestframework', 'instrument_rest_framework_decorators'),
+
+    ('celery.task.base', 'newrelic.hooks.application_celery',
+            'instrument_celery_app_task'),
+    ('celery.app.task', 'newrelic.hooks.application_celery',
+            'instrument_celery_app_task'),
+    ('celery.worker', 'newrelic.hooks.application_celery',
+            'instrument_celery_worker'),
+    ('celery.concurrency.processes', 'newrelic.hooks.application_celery',
+            'instrument_celery_worker'),
+    ('celery.concurrency.prefork', 'newrelic.hooks.application_celery',
+            'instrument_celery_worker'),
+    # ('celery.loaders.base', 'newrelic.hooks.application_celery',
+    #         'instrument_celery_loaders_base'),
+    ('celery.execute.trace', 'newrelic.hooks.application_celery',
+            'instrument_celery_execute_trace'),
+    ('celery.task.trace', 'newrelic.hooks.application_celery',
+            'instrument_celery_execute_trace'),
+    ('celery.app.trace', 'newrelic.hooks.application_celery',
+            'instrument_celery_execute_trace'),
+    ('billiard.pool', 'newrelic.hooks.application_celery',
+            'instrument_billiard_pool'),
+
+    ('flup.server.cgi', 'newrelic.hooks.adapter_flup',
+            'instrument_flup_server_cgi'),
+    ('flup.server.ajp_base', 'newrelic.hooks.adapter_flup',
+            'instrument_flup_server_ajp_base'),
+    ('flup.server.fcgi_base', 'newrelic.hooks.adapter_flup',
+            'instrument_flup_server_fcgi_base'),
+    ('flup.server.scgi_base', 'newrelic.hooks.adapter_flup',
+            'instrument_flup_server_scgi_base'),
+
+    ('pywapi', 'newrelic.hooks.external_pywapi', 'instrument_pywapi'),
+
+    ('meinheld.server', 'newrelic.hooks.adapter_meinheld',
+            'instrument_meinheld_server'),
+
+    ('waitress.server', 'newrelic.hooks.adapter_waitress',
+            'instrument_waitress_server'),
+
+    ('gevent.wsgi', 'newrelic.hooks.adapter_gevent', 'instrument_gevent_wsgi'),
+    ('gevent.pywsgi', 'newrelic.hooks.adapter_gevent',
+            'instrument_gevent_pywsgi'),
+
+    ('wsgiref.simple_server', 'newrelic.hooks.adapter_wsgiref',
+            'instrument_wsgiref_simple_server'),
+
+    ('cherrypy.wsgiserver', 'newrelic.hooks.adapter_cherrypy',
+            'instrument_cherrypy_wsgiserver'),
+
+    ('cheroot.wsgi', 'newrelic.hooks.adapter_cheroot',
+            'instrument_cheroot_wsgiserver'),
+
+    ('pyramid.router', 'newrelic.hooks.framework_pyramid',
+            'instrument_pyramid_router'),
+    ('pyramid.config', 'newrelic.hooks.framework_pyramid',
+            'instrument_pyramid_config_views'),
+    ('pyramid.config.views', 'newrelic.hooks.framework_pyramid',
+            'instrument_pyramid_config_views'),
+    ('pyramid.config.tweens', 'newrelic.hooks.framework_pyramid',
+            'instrument_pyramid_config_tweens'),
+
+    ('cornice.service', 'newrelic.hooks.component_cornice',
+            'instrument_cornice_service'),
+
+    # ('twisted.web.server', 'newrelic.hooks.framework_twisted',
+    #         'instrument_twisted_web_server'),
+    # ('twisted.web.http', 'newrelic.hooks.framework_twisted',
+    #         'instrument_twisted_web_http'),
+    # ('twisted.web.resource', 'newrelic.hooks.framework_twisted',
+    #         'instrument_twisted_web_resource'),
+    # ('twisted.internet.defer', 'newrelic.hooks.framework_twisted',
+    #         'instrument_twisted_internet_defer'),
+
+    ('gevent.monkey', 'newrelic.hooks.coroutines_gevent',
+            'instrument_gevent_monkey'),
+
+    ('weberror.errormiddleware', 'newrelic.hooks.middleware_weberror',
+            'instrument_weberror_errormiddleware'),
+    ('weberror.reporter', 'newrelic.hooks.middleware_weberror',
+            'instrument_weberror_reporter'),
+
+    ('thrift.transport.TSocket', 'newrelic.hooks.external_thrift',
+            'instrument'),
+
+    ('gearman.client', 'newrelic.hooks.application_gearman',
+            'instrument_gearman_client'),
+    ('gearman.connection_manager', 'newrelic.hooks.application_gearman',
+            'instrument_gearman_connection_manager'),
+    ('gearman.worker', 'newrelic.hooks.application_gearman',
+            'instrument_gearman_worker'),
+
+    ('botocore.endpoint', 'newrelic.hooks.external_botocore',
+            'instrument_botocore_endpoint'),
+    ('botocore.client', 'newrelic.hooks.external_botocore',
+            'instrument_botocore_client'),
+
+    ('tornado.httpserver', 'newrelic.hooks.framework_tornado',
+            'instrument_tornado_httpserver'),
+    ('tornado.httputil', 'newrelic.hooks.framework_tornado',
+            'instrument_tornado_httputil'),
+    ('tornado.httpclient', 'newrelic.hooks.framework_tornado',
+            'instrument_tornado_httpclient'),
+    ('tornado.routing', 'newrelic.hooks.framework_tornado',
+            'instrument_tornado_routing'),
+    ('tornado.web', 'newrelic.hooks.framework_tornado',
+            'instrument_tornado_web'),
+)
+
+if six.PY2:
+    _BUILTIN_STDLIB_IMPORT_HOOKS = (
+        ('httplib', 'newrelic.hooks.external_httplib', 'instrument'),
+        ('urllib', 'newrelic.hooks.external_urllib', 'instrument'),
+        ('urllib2', 'newrelic.hooks.external_urllib2', 'instrument'),
+    )
+else:
+    _BUILTIN_STDLIB_IMPORT_HOOKS = (
+        ('http.client', 'newrelic.hooks.external_httplib', 'instrument'),
+        ('urllib.request', 'newrelic.hooks.external_urllib', 'instrument'),
+    )
 
-    _process_module_definition('httplib2',
-            'newrelic.hooks.external_httplib2')
 
-    if six.PY2:
-        _process_module_definition('urllib',
-                'newrelic.hooks.external_urllib')
-    else:
-        _process_module_definition('urllib.request',
-                'newrelic.hooks.external_urllib')
-
-    if six.PY2:
-        _process_module_definition('urllib2',
-                'newrelic.hooks.external_urllib2')
-
-    _process_module_definition('urllib3.connectionpool',
-            'newrelic.hooks.external_urllib3',
-            'instrument_urllib3_connectionpool')
-    _process_module_definition('urllib3.connection',
-            'newrelic.hooks.external_urllib3',
-            'instrument_urllib3_connection')
-    _process_module_definition('requests.packages.urllib3.connection',
-            'newrelic.hooks.external_urllib3',
-            'instrument_urllib3_connection')
-
-    _process_module_definition('starlette.requests',
-            'newrelic.hooks.framework_starlette',
-            'instrument_starlette_requests')
-    _process_module_definition('starlette.routing',
-            'newrelic.hooks.framework_starlette',
-            'instrument_starlette_routing')
-    _process_module_definition('starlette.applications',
-            'newrelic.hooks.framework_starlette',
-            'instrument_starlette_applications')
-    _process_module_definition('starlette.middleware.errors',
-            'newrelic.hooks.framework_starlette',
-            'instrument_starlette_middleware_errors')
-    _process_module_definition('starlette.exceptions',
-            'newrelic.hooks.framework_starlette',
-            'instrument_starlette_exceptions')
-    _process_module_definition('starlette.background',
-            'newrelic.hooks.framework_starlette',
-            'instrument_starlette_background_task')
-
-    _process_module_definition('uvicorn.config',
-            'newrelic.hooks.adapter_uvicorn',
-            'instrument_uvicorn_config')
-
-    _process_module_definition('sanic.app',
-            'newrelic.hooks.framework_sanic',
-            'instrument_sanic_app')
-    _process_module_definition('sanic.response',
-            'newrelic.hooks.framework_sanic',
-            'instrument_sanic_response')
-
-    _process_module_definition('aiohttp.wsgi',
-            'newrelic.hooks.framework_aiohttp',
-            'instrument_aiohttp_wsgi')
-    _process_module_definition('aiohttp.web',
-            'newrelic.hooks.framework_aiohttp',
-            'instrument_aiohttp_web')
-    _process_module_definition('aiohttp.web_reqrep',
-            'newrelic.hooks.framework_aiohttp',
-            'instrument_aiohttp_web_response')
-    _process_module_definition('aiohttp.web_response',
-            'newrelic.hooks.framework_aiohttp',
-            'instrument_aiohttp_web_response')
-    _process_module_definition('aiohttp.web_urldispatcher',
-            'newrelic.hooks.framework_aiohttp',
-            'instrument_aiohttp_web_urldispatcher')
-    _process_module_definition('aiohttp.client',
-            'newrelic.hooks.framework_aiohttp',
-            'instrument_aiohttp_client')
-    _process_module_definition('aiohttp.client_reqrep',
-            'newrelic.hooks.framework_aiohttp',
-            'instrument_aiohttp_client_reqrep')
-    _process_module_definition('aiohttp.protocol',
-            'newrelic.hooks.framework_aiohttp',
-            'instrument_aiohttp_protocol')
-
-    _process_module_definition('requests.api',
-            'newrelic.hooks.external_requests',
-            'instrument_requests_api')
-    _process_module_definition('requests.sessions',
-            'newrelic.hooks.external_requests',
-            'instrument_requests_sessions')
-
-    _process_module_definition('feedparser',
-            'newrelic.hooks.external_feedparser')
-
-    _process_module_definition('xmlrpclib',
-            'newrelic.hooks.external_xmlrpclib')
-
-    _process_module_definition('dropbox',
-            'newrelic.hooks.external_dropbox')
-
-    _process_module_definition('facepy.graph_api',
-            'newrelic.hooks.external_facepy')
-
-    _process_module_definition('pysolr',
-            'newrelic.hooks.datastore_pysolr',
-            'instrument_pysolr')
-
-    _process_module_definition('solr',
-            'newrelic.hooks.datastore_solrpy',
-            'instrument_solrpy')
-
-    _process_module_definition('elasticsearch.client',
-            'newrelic.hooks.datastore_elasticsearch',
-            'instrument_elasticsearch_client')
-    _process_module_definition('elasticsearch.client.cat',
-            'newrelic.hooks.datastore_elasticsearch',
-            'instrument_elasticsearch_client_cat')
-    _process_module_definition('elasticsearch.client.cluster',
-            'newrelic.hooks.datastore_elasticsearch',
-            'instrument_elasticsearch_client_cluster')
-    _process_module_definition('elasticsearch.client.indices',
-            'newrelic.hooks.datastore_elasticsearch',
-            'instrument_elasticsearch_client_indices')
-    _process_module_definition('elasticsearch.client.nodes',
-            'newrelic.hooks.datastore_elasticsearch',
-            'instrument_elasticsearch_client_nodes')
-    _process_module_definition('elasticsearch.client.snapshot',
-            'newrelic.hooks.datastore_elasticsearch',
-            'instrument_elasticsearch_client_snapshot')
-    _process_module_definition('elasticsearch.client.tasks',
-            'newrelic.hooks.datastore_elasticsearch',
-            'instrument_elasticsearch_client_tasks')
-    _process_module_definition('elasticsearch.client.ingest',
-            'newrelic.hooks.datastore_elasticsearch',
-            'instrument_elasticsearch_client_ingest')
-    _process_module_definition('elasticsearch.connection.base',
-            'newrelic.hooks.datastore_elasticsearch',
-            'instrument_elasticsearch_connection_base')
-    _process_module_definition('elasticsearch.transport',
-            'newrelic.hooks.datastore_elasticsearch',
-            'instrument_elasticsearch_transport')
-
-    _process_module_definition('pika.adapters',
-            'newrelic.hooks.messagebroker_pika',
-            'instrument_pika_adapters')
-    _process_module_definition('pika.channel',
-            'newrelic.hooks.messagebroker_pika',
-            'instrument_pika_channel')
-    _process_module_definition('pika.spec',
-            'newrelic.hooks.messagebroker_pika',
-            'instrument_pika_spec')
-
-    _process_module_definition('pyelasticsearch.client',
-            'newrelic.hooks.datastore_pyelasticsearch',
-            'instrument_pyelasticsearch_client')
-
-    _process_module_definition('pymongo.connection',
-            'newrelic.hooks.datastore_pymongo',
-            'instrument_pymongo_connection')
-    _process_module_definition('pymongo.mongo_client',
-            'newrelic.hooks.datastore_pymongo',
-            'instrument_pymongo_mongo_client')
-    _process_module_definition('pymongo.collection',
-            'newrelic.hooks.datastore_pymongo',
-            'instrument_pymongo_collection')
-
-    _process_module_definition('redis.connection',
-            'newrelic.hooks.datastore_redis',
-            'instrument_redis_connection')
-    _process_module_definition('redis.client',
-            'newrelic.hooks.datastore_redis',
-            'instrument_redis_client')
-
-    _process_module_definition('motor',
-            'newrelic.hooks.datastore_motor', 'patch_motor')
-
-    _process_module_definition('piston.resource',
-            'newrelic.hooks.component_piston',
-            'instrument_piston_resource')
-    _process_module_definition('piston.doc',
-            'newrelic.hooks.component_piston',
-            'instrument_piston_doc')
-
-    _process_module_definition('tastypie.resources',
-            'newrelic.hooks.component_tastypie',
-            'instrument_tastypie_resources')
-    _process_module_definition('tastypie.api',
-            'newrelic.hooks.component_tastypie',
-            'instrument_tastypie_api')
-
-    _process_module_definition('rest_framework.views',
-            'newrelic.hooks.component_djangorestframework',
-            'instrument_rest_framework_views')
-    _process_module_definition('rest_framework.decorators',
-            'newrelic.hooks.component_djangorestframework',
-            'instrument_rest_framework_decorators')
-
-    _process_module_definition('celery.task.base',
-            'newrelic.hooks.application_celery',
-            'instrument_celery_app_task')
-    _process_module_definition('celery.app.task',
-            'newrelic.hooks.application_celery',
-            'instrument_celery_app_task')
-    _process_module_definition('celery.worker',
-            'newrelic.hooks.application_celery',
-            'instrument_celery_worker')
-    _process_module_definition('celery.concurrency.processes',
-            'newrelic.hooks.application_celery',
-            'instrument_celery_worker')
-    _process_module_definition('celery.concurrency.prefork',
-            'newrelic.hooks.application_celery',
-            'instrument_celery_worker')
-    # _process_module_definition('celery.loaders.base',
-    #        'newrelic.hooks.application_celery',
-    #        'instrument_celery_loaders_base')
-    _process_module_definition('celery.execute.trace',
-            'newrelic.hooks.application_celery',
-            'instrument_celery_execute_trace')
-    _process_module_definition('celery.task.trace',
-            'newrelic.hooks.application_celery',
-            'instrument_celery_execute_trace')
-    _process_module_definition('celery.app.trace',
-            'newrelic.hooks.application_celery',
-            'instrument_celery_execute_trace')
-    _process_module_definition('billiard.pool',
-            'newrelic.hooks.application_celery',
-            'instrument_billiard_pool')
-
-    _process_module_definition('flup.server.cgi',
-            'newrelic.hooks.adapter_flup',
-            'instrument_flup_server_cgi')
-    _process_module_definition('flup.server.ajp_base',
-            'newrelic.hooks.adapter_flup',
-            'instrument_flup_server_ajp_base')
-    _process_module_definition('flup.server.fcgi_base',
-            'newrelic.hooks.adapter_flup',
-            'instrument_flup_server_fcgi_base')
-    _process_module_definition('flup.server.scgi_base',
-            'newrelic.hooks.adapter_flup',
-            'instrument_flup_server_scgi_base')
-
-    _process_module_definition('pywapi',
-            'newrelic.hooks.external_pywapi',
-            'instrument_pywapi')
-
-    _process_module_definition('meinheld.server',
-            'newrelic.hooks.adapter_meinheld',
-            'instrument_meinheld_server')
-
-    _process_module_definition('waitress.server',
-            'newrelic.hooks.adapter_waitress',
-            'instrument_waitress_server')
-
-    _process_module_definition('gevent.wsgi',
-            'newrelic.hooks.adapter_gevent',
-            'instrument_gevent_wsgi')
-    _process_module_definition('gevent.pywsgi',
-            'newrelic.hooks.adapter_gevent',
-            'instrument_gevent_pywsgi')
-
-    _process_module_definition('wsgiref.simple_server',
-            'newrelic.hooks.adapter_wsgiref',
-            'instrument_wsgiref_simple_server')
-
-    _process_module_definition('cherrypy.wsgiserver',
-            'newrelic.hooks.adapter_cherrypy',
-            'instrument_cherrypy_wsgiserver')
-
-    _process_module_definition('cheroot.wsgi',
-            'newrelic.hooks.adapter_cheroot',
-            'instrument_cheroot_wsgiserver')
-
-    _process_module_definition('pyramid.router',
-            'newrelic.hooks.framework_pyramid',
-            'instrument_pyramid_router')
-    _process_module_definition('pyramid.config',
-            'newrelic.hooks.framework_pyramid',
-            'instrument_pyramid_config_views')
-    _process_module_definition('pyramid.config.views',
-            'newrelic.hooks.framework_pyramid',
-            'instrument_pyramid_config_views')
-    _process_module_definition('pyramid.config.tweens',
-            'newrelic.hooks.framework_pyramid',
-            'instrument_pyramid_config_tweens')
-
-    _process_module_definition('cornice.service',
-            'newrelic.hooks.component_cornice',
-            'instrument_cornice_service')
-
-    # _process_module_definition('twisted.web.server',
-    #        'newrelic.hooks.framework_twisted',
-    #        'instrument_twisted_web_server')
-    # _process_module_definition('twisted.web.http',
-    #        'newrelic.hooks.framework_twisted',
-    #        'instrument_twisted_web_http')
-    # _process_module_definition('twisted.web.resource',
-    #        'newrelic.hooks.framework_twisted',
-    #        'instrument_twisted_web_resource')
-    # _process_module_definition('twisted.internet.defer',
-    #        'newrelic.hooks.framework_twisted',
-    #        'instrument_twisted_internet_defer')
-
-    _process_module_definition('gevent.monkey',
-            'newrelic.hooks.coroutines_gevent',
-            'instrument_gevent_monkey')
-
-    _process_module_definition('weberror.errormiddleware',
-            'newrelic.hooks.middleware_weberror',
-            'instrument_weberror_errormiddleware')
-    _process_module_definition('weberror.reporter',
-            'newrelic.hooks.middleware_weberror',
-            'instrument_weberror_reporter')
-
-    _process_module_definition('thrift.transport.TSocket',
-            'newrelic.hooks.external_thrift')
-
-    _process_module_definition('gearman.client',
-            'newrelic.hooks.application_gearman',
-            'instrument_gearman_client')
-    _process_module_definition('gearman.connection_manager',
-            'newrelic.hooks.application_gearman',
-            'instrument_gearman_connection_manager')
-    _process_module_definition('gearman.worker',
-            'newrelic.hooks.application_gearman',
-            'instrument_gearman_worker')
-
-    _process_module_definition('botocore.endpoint',
-            'newrelic.hooks.external_botocore',
-            'instrument_botocore_endpoint')
-    _process_module_definition('botocore.client',
-            'newrelic.hooks.external_botocore',
-            'instrument_botocore_client')
-
-    _process_module_definition('tornado.httpserver',
-            'newrelic.hooks.framework_tornado',
-            'instrument_tornado_httpserver')
-    _process_module_definition('tornado.httputil',
-            'newrelic.hooks.framework_tornado',
-            'instrument_tornado_httputil')
-    _process_module_definition('tornado.httpclient',
-            'newrelic.hooks.framework_tornado',
-            'instrument_tornado_httpclient')
-    _process_module_definition('tornado.routing',
-            'newrelic.hooks.framework_tornado',
-            'instrument_tornado_routing')
-    _process_module_definition('tornado.web',
-            'newrelic.hooks.framework_tornado',
-            'instrument_tornado_web')
+def _process_module_builtin_defaults():
+    for target, module, function in _BUILTIN_IMPORT_HOOKS:
+        _process_module_definition(target, module, function)
 
+    for target, module, function in _BUILTIN_STDLIB_IMPORT_HOOKS:
+        _process_module_definition(target, module, function)
 
-def _process_module_entry_points():
-    try:
-        import pkg_resources
-    except ImportError:
-        return
 
+def _process_module_entry_points():
     group = 'newrelic.hooks'
 
-    for entrypoint in pkg_resources.iter_entry_points(group=group):
+    for entrypoint in iter_entry_points(group):
         target = entrypoint.name
 
         if target in _module_import_hook_registry:
@@ -2764,14 +2605,9 @@ def _setup_instrumentation():
 
 
 def _setup_extensions():
-    try:
-        import pkg_resources
-    except ImportError:
-        return
-
     group = 'newrelic.extension'
 
-    for entrypoint in pkg_resources.iter_entry_points(group=group):
+    for entrypoint in iter_entry_points(group):
         __import__(entrypoint.module_name)
         module = sys.modules[entrypoint.module_name]
         module.initialize()
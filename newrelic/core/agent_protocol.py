@@ -22,6 +22,7 @@ from newrelic.core.internal_metrics import internal_count_metric
 from newrelic.common.encoding_utils import (
     json_decode,
     json_encode,
+    json_encode_chunks,
     serverless_payload_encode,
 )
 from newrelic.common.utilization import (
@@ -32,6 +33,7 @@ from newrelic.common.utilization import (
     GCPUtilization,
     KubernetesUtilization,
     PCFUtilization,
+    detect_cloud_vendor,
 )
 from newrelic.core.config import (
     fetch_config_setting,
@@ -176,6 +178,7 @@ class AgentProtocol(object):
             compression_method=settings.compressed_content_encoding,
             max_payload_size_in_bytes=settings.max_payload_size_in_bytes,
             audit_log_fp=audit_log_fp,
+            max_connections=settings.agent_limits.max_harvest_connections,
         )
 
         self._params = {
@@ -249,7 +252,7 @@ class AgentProtocol(object):
                     "params": {
                         k: v for k, v in params.items() if k in self.PARAMS_ALLOWLIST
                     },
-                    "content": payload,
+                    "content": payload if isinstance(payload, bytes) else None,
                     "agent_run_id": self._run_token,
                 },
             )
@@ -263,7 +266,19 @@ class AgentProtocol(object):
         params["method"] = method
         if self._run_token:
             params["run_id"] = self._run_token
-        return params, self._headers, json_encode(payload).encode("utf-8")
+
+        # Where the client supports it, the payload is encoded in chunks
+        # as it is sent, so that the encoded and compressed forms of a
+        # large payload don't need to be held in memory at the same time.
+
+        if self.client.STREAM_PAYLOADS:
+            payload = (
+                chunk.encode("utf-8") for chunk in json_encode_chunks(payload)
+            )
+        else:
+            payload = json_encode(payload).encode("utf-8")
+
+        return params, self._headers, payload
 
     @staticmethod
     def _connect_payload(app_name, linked_applications, environment, settings):
@@ -331,11 +346,15 @@ class AgentProtocol(object):
             vendors.append(AzureUtilization)
 
         utilization_vendor_settings = {}
-        for vendor in vendors:
-            metadata = vendor.detect()
-            if metadata:
-                utilization_vendor_settings[vendor.VENDOR_NAME] = metadata
-                break
+        vendor = detect_cloud_vendor(
+            vendors,
+            boot_id,
+            settings["utilization.cache_file"],
+            settings["utilization.cache_ttl"],
+        )
+        if vendor:
+            vendor_name, metadata = vendor
+            utilization_vendor_settings[vendor_name] = metadata
 
         if settings["utilization.detect_docker"]:
             docker = DockerUtilization.detect()
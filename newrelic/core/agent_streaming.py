@@ -15,6 +15,8 @@
 import logging
 import threading
 
+from newrelic.common.streaming_utils import serialize_span_batch
+
 try:
     import grpc
     from newrelic.core.infinite_tracing_pb2 import Span, RecordStatus
@@ -33,8 +35,10 @@ class StreamingRpc(object):
     """
 
     PATH = "/com.newrelic.trace.v1.IngestService/RecordSpan"
+    BATCH_PATH = "/com.newrelic.trace.v1.IngestService/RecordSpanBatch"
 
-    def __init__(self, endpoint, stream_buffer, metadata, record_metric, ssl=True):
+    def __init__(self, endpoint, stream_buffer, metadata, record_metric,
+            ssl=True, batching=False):
         if ssl:
             credentials = grpc.ssl_channel_credentials()
             channel = grpc.secure_channel(endpoint, credentials)
@@ -48,9 +52,14 @@ class StreamingRpc(object):
         )
         self.response_processing_thread.daemon = True
         self.notify = self.condition()
-        self.rpc = self.channel.stream_stream(
-            self.PATH, Span.SerializeToString, RecordStatus.FromString
-        )
+        if batching:
+            self.rpc = self.channel.stream_stream(
+                self.BATCH_PATH, serialize_span_batch, RecordStatus.FromString
+            )
+        else:
+            self.rpc = self.channel.stream_stream(
+                self.PATH, Span.SerializeToString, RecordStatus.FromString
+            )
         self.record_metric = record_metric
 
     @staticmethod
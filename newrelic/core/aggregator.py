@@ -0,0 +1,467 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module implements the aggregation of the data recorded by agents
+in the many processes of a prefork server, such as gunicorn, uWSGI or
+celery, into a single process on the host, which then reports it to the
+data collector in one harvest.
+
+The first agent on the host to take the lock on the aggregator socket
+becomes the aggregator, and listens on a Unix domain socket. The agents
+in other processes connect to it, taking their configuration from it
+rather than registering with the data collector themselves, and at each
+harvest pass it a snapshot of their stats engine, which it merges into
+its own. If the aggregator goes away, the agents elect a new one.
+
+Snapshots are pickled when passed over the socket. The socket and the
+lock file are kept in a directory only accessible to the user the agents
+run as. Where the platform can say which process is at the other end of
+the socket, nothing is unpickled unless it is run as the same user and
+in the same process group, that of the master process of the server and
+its workers.
+
+"""
+
+import errno
+import hashlib
+import importlib
+import logging
+import os
+import socket
+import stat
+import struct
+import tempfile
+import threading
+import time
+import types
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from io import BytesIO
+
+from newrelic.packages.six.moves import cPickle as pickle
+
+_logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct('!I')
+
+# The process ID, user ID and group ID of the process at the other end of
+# a Unix domain socket, as returned for SO_PEERCRED.
+
+_PEERCRED = struct.Struct('3i')
+
+
+class AggregatorRefusedError(ValueError):
+    """Raised where the aggregator can't be used, as the process at the
+    other end of the socket or the directory holding it can't be trusted.
+    Unlike the aggregator not yet listening, this doesn't resolve itself
+    by trying again.
+
+    """
+
+
+def _persistent_id(obj):
+    # Database nodes hold a reference to the module for the database
+    # client. Modules can't be pickled, so are passed by name and imported
+    # again by the aggregator.
+
+    if isinstance(obj, types.ModuleType):
+        return obj.__name__
+
+
+def dumps(obj):
+    buffer = BytesIO()
+    pickler = pickle.Pickler(buffer, 2)
+    pickler.persistent_id = _persistent_id
+    pickler.dump(obj)
+    return buffer.getvalue()
+
+
+def loads(data):
+    unpickler = pickle.Unpickler(BytesIO(data))
+    unpickler.persistent_load = importlib.import_module
+    return unpickler.load()
+
+
+def _send_message(sock, message):
+    data = dumps(message)
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+
+    while size:
+        chunk = sock.recv(min(size, 65536))
+
+        if not chunk:
+            raise EOFError('Connection to the aggregator was closed.')
+
+        chunks.append(chunk)
+        size -= len(chunk)
+
+    return b''.join(chunks)
+
+
+def _recv_message(sock):
+    size, = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    return loads(_recv_exactly(sock, size))
+
+
+def _check_peer(sock):
+    """Raises an error unless the process at the other end of the socket
+    is run as the same user and is in the same process group as this one.
+    Where the platform doesn't provide the credentials of the process, the
+    permissions of the directory holding the socket are relied on alone.
+
+    """
+
+    so_peercred = getattr(socket, 'SO_PEERCRED', None)
+
+    if so_peercred is None:
+        return
+
+    pid, uid, gid = _PEERCRED.unpack(sock.getsockopt(socket.SOL_SOCKET,
+            so_peercred, _PEERCRED.size))
+
+    if uid != os.getuid():
+        raise AggregatorRefusedError('Process %d at the other end of the '
+                'aggregator socket is run as user %d.' % (pid, uid))
+
+    try:
+        pgid = os.getpgid(pid)
+    except OSError:
+        pgid = None
+
+    if pgid != os.getpgid(0):
+        raise AggregatorRefusedError('Process %d at the other end of the '
+                'aggregator socket is not in the same process group.' % pid)
+
+
+def _private_directory(path):
+    """Creates the directory which is to hold the socket, if it doesn't
+    already exist, so it is only accessible to the user the agents run as.
+    Raises an error if an existing directory isn't owned by that user or
+    is accessible to any other.
+
+    """
+
+    directory = os.path.dirname(os.path.abspath(path))
+
+    try:
+        os.mkdir(directory, 0o700)
+    except OSError as exc:
+        if exc.errno != errno.EEXIST:
+            raise
+
+    st = os.lstat(directory)
+
+    if (not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or
+            st.st_mode & 0o077):
+        raise AggregatorRefusedError('The directory %r holding the '
+                'aggregator socket must be owned by, and only accessible '
+                'to, the user the agents run as.' % directory)
+
+
+def default_socket_path(settings):
+    """Returns the path of the socket used when one isn't configured. It
+    is derived from the user, process group, license key and application
+    name, so only agents for the same application in the processes of the
+    same server share an aggregator. The socket is in a directory for the
+    user, as it must only be accessible to them.
+
+    """
+
+    uid = os.getuid()
+
+    key = '%s:%s:%s:%s' % (uid, os.getpgid(0), settings.license_key,
+            settings.app_name)
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+    return os.path.join(tempfile.gettempdir(),
+            'newrelic-aggregator-%d' % uid, '%s.sock' % digest)
+
+
+def _activate_application(app_name, linked_applications, timeout):
+    from newrelic.core.agent import agent_instance
+
+    agent = agent_instance()
+    agent.activate_application(app_name, linked_applications, timeout)
+
+    return agent.application(app_name)
+
+
+class AggregatorServer(object):
+
+    """Listens on the socket for the agents in other processes, handing
+    each its configuration when it connects, then merging the snapshots
+    it passes at each harvest into the data for the application.
+
+    """
+
+    def __init__(self, path, lock_file, timeout=10.0):
+        self.path = path
+        self.timeout = timeout
+        self.pid = os.getpid()
+
+        self._lock_file = lock_file
+        self._sock = None
+        self._connections = set()
+
+    def start(self):
+        # Clear away the socket of any prior aggregator, which can only
+        # have exited as we now hold the lock.
+
+        try:
+            os.unlink(self.path)
+        except OSError as exc:
+            if exc.errno != errno.ENOENT:
+                raise
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        umask = os.umask(0o177)
+
+        try:
+            sock.bind(self.path)
+        finally:
+            os.umask(umask)
+
+        sock.listen(128)
+
+        self._sock = sock
+
+        thread = threading.Thread(target=self._accept,
+                name='NR-Aggregator-Thread')
+        thread.daemon = True
+        thread.start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except Exception:
+                # The socket has been closed.
+
+                return
+
+            self._connections.add(conn)
+
+            thread = threading.Thread(target=self._serve, args=(conn,),
+                    name='NR-Aggregator-Connection-Thread')
+            thread.daemon = True
+            thread.start()
+
+    def _serve(self, conn):
+        applications = {}
+
+        try:
+            _check_peer(conn)
+
+        except Exception:
+            _logger.warning('Refusing a connection to the aggregator from '
+                    'a process which may not be an agent.', exc_info=True)
+
+            self._connections.discard(conn)
+            conn.close()
+
+            return
+
+        try:
+            while True:
+                try:
+                    message = _recv_message(conn)
+                except EOFError:
+                    return
+
+                request, app_name = message[:2]
+
+                if request == 'connect':
+                    application = _activate_application(app_name,
+                            message[2], self.timeout)
+                    applications[app_name] = application
+
+                    result = application and application.configuration
+
+                elif request == 'merge':
+                    application = applications.get(app_name)
+
+                    result = bool(application and
+                            application.merge_aggregated_stats(message[2]))
+
+                else:
+                    raise ValueError('Unknown aggregator request %r.' %
+                            request)
+
+                _send_message(conn, result)
+
+        except Exception:
+            _logger.exception('Unexpected error handling a request from '
+                    'an agent reporting through the aggregator.')
+
+        finally:
+            self._connections.discard(conn)
+            conn.close()
+
+    def close(self):
+        if self._sock is not None:
+            # Shutting down the sockets first wakes the threads blocked on
+            # them, which closing them alone doesn't do on all platforms.
+
+            for sock in [self._sock] + list(self._connections):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except Exception:
+                    pass
+
+            self._sock.close()
+            self._sock = None
+
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+        self._lock_file.close()
+
+
+class AggregatorClient(object):
+
+    """Connection from an agent to the aggregator. Requests are sent one
+    at a time, each waiting for the response of the aggregator.
+
+    """
+
+    def __init__(self, path, timeout=10.0):
+        self.path = path
+
+        self._lock = threading.Lock()
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+
+        try:
+            self._sock.connect(path)
+            _check_peer(self._sock)
+        except Exception:
+            self._sock.close()
+            raise
+
+    def request(self, *message):
+        with self._lock:
+            try:
+                _send_message(self._sock, message)
+                return _recv_message(self._sock)
+
+            except Exception:
+                # The connection can't be used again as the response may
+                # still arrive.
+
+                self.close()
+                raise
+
+    def connect(self, app_name, linked_applications):
+        """Returns the configuration of the application in the aggregator
+        or None if it hasn't yet been registered with the data collector.
+
+        """
+
+        return self.request('connect', app_name, linked_applications)
+
+    def merge(self, app_name, stats):
+        """Passes the stats engine snapshot to the aggregator to merge.
+        Returns whether the aggregator could accept it.
+
+        """
+
+        return self.request('merge', app_name, stats)
+
+    def close(self):
+        self._sock.close()
+
+
+_aggregator = None
+_aggregator_lock = threading.Lock()
+
+
+def aggregator_client(path, timeout=10.0):
+    """Returns a client connected to the aggregator listening on the
+    socket path. Where there is no aggregator, this process becomes the
+    aggregator and None is returned, meaning the agent in this process
+    reports to the data collector itself.
+
+    The directory holding the socket is created if it doesn't exist, and
+    must only be accessible to the user the agents run as.
+
+    """
+
+    global _aggregator
+
+    if fcntl is None:
+        return None
+
+    with _aggregator_lock:
+        # The aggregator of a parent process doesn't survive a fork, so
+        # the process ID is checked as well.
+
+        if _aggregator is not None and _aggregator.pid == os.getpid():
+            return None
+
+        _private_directory(path)
+
+        fd = os.open(path + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        lock_file = os.fdopen(fd, 'r+')
+
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+        except (IOError, OSError) as exc:
+            lock_file.close()
+
+            if exc.errno not in (errno.EAGAIN, errno.EACCES):
+                raise
+
+        else:
+            server = AggregatorServer(path, lock_file, timeout=timeout)
+
+            try:
+                server.start()
+            except Exception:
+                server.close()
+                raise
+
+            _logger.info('Aggregating the data reported by agents on this '
+                    'host in process %d.', server.pid)
+
+            _aggregator = server
+
+            return None
+
+    # Another process holds the lock, but if only just elected may not
+    # yet be listening on the socket.
+
+    deadline = time.time() + timeout
+
+    while True:
+        try:
+            return AggregatorClient(path, timeout)
+
+        except socket.error:
+            if time.time() >= deadline:
+                raise
+
+            time.sleep(0.1)
@@ -27,6 +27,11 @@ import imp
 
 from functools import partial
 
+try:
+    import thread
+except ImportError:
+    import _thread as thread
+
 from newrelic.samplers.data_sampler import DataSampler
 
 from newrelic.core.config import global_settings
@@ -41,13 +46,30 @@ from newrelic.core.internal_metrics import (InternalTrace,
         InternalTraceContext, internal_metric, internal_count_metric)
 from newrelic.core.profile_sessions import profile_session_manager
 
-from newrelic.core.database_utils import SQLConnections
+from newrelic.core.database_utils import ExplainPlanService
 from newrelic.common.object_names import callable_name
 from newrelic.core.adaptive_sampler import AdaptiveSampler
 
 _logger = logging.getLogger(__name__)
 
 
+class _StatsShard(object):
+
+    """Per thread stats engine into which transactions are merged when
+    the per thread shards accumulation mode is enabled. The lock is only
+    ever contended by the harvest thread swapping in a fresh stats engine,
+    never by other request threads.
+
+    """
+
+    def __init__(self, stats_engine):
+        self.lock = threading.Lock()
+        self.stats_engine = stats_engine
+        self.transaction_count = 0
+        self.last_transaction = 0.0
+        self.retired = False
+
+
 class Application(object):
 
     """Class which maintains recorded data for a single application.
@@ -93,6 +115,8 @@ class Application(object):
         self._stats_lock = threading.RLock()
         self._stats_engine = StatsEngine()
 
+        self._stats_shards = {}
+
         self._stats_custom_lock = threading.RLock()
         self._stats_custom_engine = StatsEngine()
 
@@ -100,6 +124,8 @@ class Application(object):
         self._data_samplers_lock = threading.Lock()
         self._data_samplers_started = False
 
+        self._explain_plan_service = None
+
         # We setup empty rules engines here even though they will be
         # replaced when application first registered. This is done to
         # avoid a race condition in setting it later. Otherwise we have
@@ -474,6 +500,8 @@ class Application(object):
                     configuration,
                     reset_stream=True)
 
+            self._retire_stats_shards()
+
             if configuration.serverless_mode.enabled:
                 sampling_target_period = 60.0
             else:
@@ -546,6 +574,11 @@ class Application(object):
 
         self.start_data_samplers()
 
+        # Start continuous profiling if enabled. Its profile is then
+        # reported along with that of any profiling session.
+
+        self.start_continuous_profiling()
+
         try:
             self._active_session.close_connection()
         except:
@@ -846,6 +879,17 @@ class Application(object):
                     if settings.debug.record_transaction_failure:
                         raise
 
+            # When per thread shards are enabled the workarea is merged
+            # into a stats engine owned by the current thread instead of
+            # the main one, so request threads don't contend on the stats
+            # lock. The shards are merged into the main stats engine when
+            # a harvest is performed.
+
+            if (settings.stats_engine.per_thread_shards and
+                    self._merge_into_stats_shard(stats, data,
+                    internal_metrics)):
+                return
+
             with self._stats_lock:
                 try:
                     self._transaction_count += 1
@@ -872,6 +916,106 @@ class Application(object):
                     if settings.debug.record_transaction_failure:
                         raise
 
+    def _merge_into_stats_shard(self, stats, data, internal_metrics):
+        """Merges the stats for a single transaction into the stats engine
+        shard for the current thread, creating the shard if this is the
+        first transaction recorded by the thread since the last harvest.
+        Returns False if the shard was retired by a concurrent harvest, in
+        which case the caller should merge into the main stats engine.
+
+        """
+
+        thread_id = thread.get_ident()
+
+        shard = self._stats_shards.get(thread_id)
+
+        if shard is None:
+            with self._stats_lock:
+                shard = _StatsShard(self._stats_engine.create_workarea())
+                self._stats_shards[thread_id] = shard
+
+        with shard.lock:
+            if shard.retired:
+                return False
+
+            try:
+                shard.transaction_count += 1
+                shard.last_transaction = data.end_time
+
+                shard.stats_engine.merge(stats)
+                shard.stats_engine.merge_custom_metrics(
+                        internal_metrics.metrics())
+
+            except Exception:
+                _logger.exception('The merging of transaction data has '
+                        'failed. This would indicate some sort of '
+                        'internal implementation issue with the agent. '
+                        'Please report this problem to New Relic support '
+                        'for further investigation.')
+
+                if data.settings.debug.record_transaction_failure:
+                    raise
+
+        return True
+
+    def _merge_stats_shards(self):
+        """Merges the data accumulated in the per thread stats engine
+        shards into the main stats engine. Shards for threads which did
+        not record any transactions since the last harvest are retired so
+        the set of shards doesn't grow as threads come and go. Must be
+        called with the stats lock held.
+
+        """
+
+        for thread_id, shard in list(self._stats_shards.items()):
+            with shard.lock:
+                stats = shard.stats_engine
+                transaction_count = shard.transaction_count
+                last_transaction = shard.last_transaction
+
+                if transaction_count:
+                    shard.stats_engine = self._stats_engine.create_workarea()
+                    shard.transaction_count = 0
+                else:
+                    shard.retired = True
+                    del self._stats_shards[thread_id]
+
+            if transaction_count:
+                self._transaction_count += transaction_count
+                self._last_transaction = max(self._last_transaction,
+                        last_transaction)
+
+                self._stats_engine.merge_shard(stats)
+
+    def _retire_stats_shards(self):
+        """Discards all per thread stats engine shards. Used when the
+        main stats engine is reset for a new agent run, as data recorded
+        against a prior agent run must not be reported. Must be called
+        with the stats lock held.
+
+        """
+
+        for shard in self._stats_shards.values():
+            with shard.lock:
+                shard.retired = True
+
+        self._stats_shards = {}
+
+    def merge_aggregated_stats(self, stats):
+        """Merges the snapshot of the data for a harvest passed to the
+        aggregator by the agent in another process. Returns whether the
+        data could be accepted.
+
+        """
+
+        if not self._active_session:
+            return False
+
+        with self._stats_lock:
+            self._stats_engine.merge_shard(stats)
+
+        return True
+
     def cmd_start_profiler(self, command_id=0, **kwargs):
         """Triggered by the start_profiler agent command to start a
         thread profiling session.
@@ -925,6 +1069,48 @@ class Application(object):
 
         return {command_id: {}}
 
+    def start_continuous_profiling(self):
+        """Starts continuous profiling where enabled by the agent
+        configuration.
+
+        """
+
+        settings = self._active_session.configuration.thread_profiler
+
+        if not (settings.enabled and settings.continuous.enabled):
+            return
+
+        from newrelic.core.data_collector import AggregatorSession
+
+        # Profiles aren't passed to the aggregator, so would never be
+        # reported from a process reporting through it.
+
+        if isinstance(self._active_session, AggregatorSession):
+            _logger.debug('Not starting continuous profiling for %r as '
+                    'data is reported through the aggregator.',
+                    self._app_name)
+            return
+
+        if not hasattr(sys, '_current_frames'):
+            _logger.warning('Continuous profiling was enabled for %r but '
+                    'thread profiling is not supported for the Python '
+                    'interpreter being used.', self._app_name)
+            return
+
+        success = self.profile_manager.start_continuous_profiling(
+                self._app_name, settings.continuous.sample_period,
+                settings.continuous.max_overhead)
+
+        if not success:
+            _logger.warning('Continuous profiling was enabled for %r but '
+                    'is already running for another application in this '
+                    'process. The profile is only reported for the first '
+                    'application.', self._app_name)
+            return
+
+        _logger.info('Starting continuous profiling for %r.',
+                self._app_name)
+
     def cmd_stop_profiler(self, command_id=0, **kwargs):
         """Triggered by the stop_profiler agent command to forcibly stop
         a thread profiling session prior to it having completed normally.
@@ -983,6 +1169,11 @@ class Application(object):
 
             return
 
+        from newrelic.core.data_collector import AggregatorSession
+
+        if isinstance(self._active_session, AggregatorSession):
+            return self._harvest_aggregated(shutdown, flexible)
+
         internal_metrics = CustomMetrics()
 
         call_metric = 'flexible' if flexible else 'default'
@@ -1004,9 +1195,11 @@ class Application(object):
                 _logger.debug('Snapshotting for harvest[%s] of %r.', call_metric, self._app_name)
 
                 configuration = self._active_session.configuration
-                transaction_count = self._transaction_count
 
                 with self._stats_lock:
+                    self._merge_stats_shards()
+
+                    transaction_count = self._transaction_count
                     self._transaction_count = 0
 
                     self._last_transaction = 0.0
@@ -1026,49 +1219,7 @@ class Application(object):
 
                     stats.merge_metric_stats(stats_custom)
 
-                    # Now merge in any metrics from the data samplers
-                    # associated with this application.
-                    #
-                    # NOTE If a data sampler has problems then what data was
-                    # collected up to that point is retained. The data
-                    # collector itself is still retained and would be used
-                    # again on future harvest. If it is a persistent problem
-                    # with the data sampler the issue would then reoccur
-                    # with every harvest. If data sampler is a user provided
-                    # data sampler, then should perhaps deregister it if it
-                    # keeps having problems.
-
-                    _logger.debug('Fetching metrics from data sources for '
-                            'harvest of %r.', self._app_name)
-
-                    for data_sampler in self._data_samplers:
-                        try:
-                            for sample in data_sampler.metrics():
-                                try:
-                                    name, value = sample
-                                    stats.record_custom_metric(name, value)
-                                except Exception:
-                                    _logger.exception('The merging of custom '
-                                            'metric sample %r from data '
-                                            'source %r has failed. Validate '
-                                            'the format of the sample. If '
-                                            'this issue persists then please '
-                                            'report this problem to the data '
-                                            'source provider or New Relic '
-                                            'support for further '
-                                            'investigation.', sample,
-                                            data_sampler.name)
-                                    break
-
-                        except Exception:
-                            _logger.exception('The merging of custom metric '
-                                    'samples from data source %r has failed. '
-                                    'Validate that the data source is '
-                                    'producing samples correctly. If this '
-                                    'issue persists then please report this '
-                                    'problem to the data source provider or '
-                                    'New Relic support for further '
-                                    'investigation.', data_sampler.name)
+                    self._merge_data_sampler_metrics(stats)
 
                     # Add a metric we can use to track how many harvest
                     # periods have occurred.
@@ -1086,6 +1237,18 @@ class Application(object):
                                     'Supportability/Uninstrumented/'
                                     '%s' % uninstrumented, 1)
 
+                    # Report how effective the cache in front of the
+                    # attribute filter rules has been.
+
+                    hits, misses = (configuration.attribute_filter.cache
+                            .reset_counts())
+
+                    if hits or misses:
+                        internal_count_metric('Supportability/Python/'
+                                'AttributeFilter/Cache/Hits', hits)
+                        internal_count_metric('Supportability/Python/'
+                                'AttributeFilter/Cache/Misses', misses)
+
                 # Create our time stamp as to when this reporting period
                 # ends and start reporting the data.
 
@@ -1108,6 +1271,27 @@ class Application(object):
                                 'forced harvest on shutdown.')
                         period_end = self._period_start + 1.001
 
+                # When the harvest is concurrent, the payloads are only
+                # queued as they are created, and are then sent at the
+                # same time over a pool of connections once all have been
+                # created. The data for each payload is reset in the
+                # snapshot only once it has been sent, so that a rollback
+                # only merges back what still needs to be sent. Audit
+                # logging and serverless mode are always sequential as
+                # neither can be written to from multiple threads.
+
+                from newrelic.core.data_collector import HarvestUploader
+
+                if (configuration.stats_engine.concurrent_harvest and
+                        not configuration.audit_log_file and
+                        not configuration.serverless_mode.enabled):
+                    max_connections = (configuration.agent_limits
+                            .max_harvest_connections)
+                else:
+                    max_connections = 1
+
+                uploads = HarvestUploader(max_connections, internal_metrics)
+
                 try:
                     # Send the transaction and custom metric data.
 
@@ -1121,11 +1305,14 @@ class Application(object):
                             _logger.debug('Sending synthetics event data for '
                                     'harvest of %r.', self._app_name)
 
-                            self._active_session.send_transaction_events(
-                                    synthetics_events.sampling_info,
-                                    synthetics_events)
-
-                        stats.reset_synthetics_events()
+                            uploads.send(
+                                    self._active_session
+                                    .send_transaction_events,
+                                    (synthetics_events.sampling_info,
+                                    synthetics_events),
+                                    stats.reset_synthetics_events)
+                        else:
+                            stats.reset_synthetics_events()
 
                     if (configuration.collect_analytics_events and
                             configuration.transaction_events.enabled):
@@ -1145,11 +1332,14 @@ class Application(object):
                                 _logger.debug('Sending analytics event data '
                                         'for harvest of %r.', self._app_name)
 
-                                self._active_session.send_transaction_events(
-                                        transaction_events.sampling_info,
-                                        transaction_events)
-
-                            stats.reset_transaction_events()
+                                uploads.send(
+                                        self._active_session
+                                        .send_transaction_events,
+                                        (transaction_events.sampling_info,
+                                        transaction_events),
+                                        stats.reset_transaction_events)
+                            else:
+                                stats.reset_transaction_events()
 
                     # Send span events
 
@@ -1173,16 +1363,22 @@ class Application(object):
                             spans = stats.span_events
                             if spans:
                                 if spans.num_samples > 0:
-                                    span_samples = list(spans)
+                                    span_samples = stats.span_event_data()
 
                                     _logger.debug(
                                             'Sending span event data '
                                             'for harvest of %r.',
                                             self._app_name)
 
-                                    self._active_session.send_span_events(
-                                        spans.sampling_info, span_samples)
+                                    uploads.send(
+                                            self._active_session
+                                            .send_span_events,
+                                            (spans.sampling_info,
+                                            span_samples),
+                                            stats.reset_span_events)
                                     span_samples = None
+                                else:
+                                    stats.reset_span_events()
 
                                 # As per spec
                                 spans_seen = spans.num_seen
@@ -1194,8 +1390,6 @@ class Application(object):
                                         'Supportability/SpanEvent/'
                                         'TotalEventsSent', spans_sampled)
 
-                                stats.reset_span_events()
-
                     # Send error events
 
                     if (configuration.collect_error_events and
@@ -1212,10 +1406,14 @@ class Application(object):
                                         'for harvest of %r.', self._app_name)
 
                                 samp_info = error_events.sampling_info
-                                self._active_session.send_error_events(
-                                        samp_info,
-                                        error_event_samples)
+                                uploads.send(
+                                        self._active_session
+                                        .send_error_events,
+                                        (samp_info, error_event_samples),
+                                        stats.reset_error_events)
                                 error_event_samples = None
+                            else:
+                                stats.reset_error_events()
 
                             # As per spec
                             internal_count_metric('Supportability/Events/'
@@ -1224,8 +1422,6 @@ class Application(object):
                             internal_count_metric('Supportability/Events/'
                                     'TransactionError/Sent', num_error_samples)
 
-                            stats.reset_error_events()
-
                     # Send custom events
 
                     if (configuration.collect_custom_events and
@@ -1240,9 +1436,15 @@ class Application(object):
                                 _logger.debug('Sending custom event data '
                                         'for harvest of %r.', self._app_name)
 
-                                self._active_session.send_custom_events(
-                                        customs.sampling_info, custom_samples)
+                                uploads.send(
+                                        self._active_session
+                                        .send_custom_events,
+                                        (customs.sampling_info,
+                                        custom_samples),
+                                        stats.reset_custom_events)
                                 custom_samples = None
+                            else:
+                                stats.reset_custom_events()
 
                             # As per spec
                             internal_count_metric('Supportability/Events/'
@@ -1250,8 +1452,6 @@ class Application(object):
                             internal_count_metric('Supportability/Events/'
                                     'Customer/Sent', customs.num_samples)
 
-                            stats.reset_custom_events()
-
                     # Send the accumulated error data.
 
                     if configuration.collect_errors:
@@ -1261,44 +1461,64 @@ class Application(object):
                             _logger.debug('Sending error data for harvest '
                                     'of %r.', self._app_name)
 
-                            self._active_session.send_errors(error_data)
+                            uploads.send(self._active_session.send_errors,
+                                    (error_data,))
 
                     if not flexible:
                         if configuration.collect_traces:
-                            connections = SQLConnections(
-                                    configuration.agent_limits
-                                    .max_sql_connections)
+                            explain_plans = self._explain_plans(
+                                    configuration)
 
-                            with connections:
-                                if configuration.slow_sql.enabled:
-                                    _logger.debug('Processing slow SQL data '
-                                            'for harvest of %r.',
-                                            self._app_name)
+                            # Run the explain plans concurrently, but only
+                            # wait on them for as long as the budget allows.
+                            # Any not yet done are left out this harvest.
 
-                                    slow_sql_data = stats.slow_sql_data(
-                                            connections)
+                            events = [explain_plans.submit(node) for node
+                                    in stats.explain_plan_nodes()]
 
-                                    if slow_sql_data:
-                                        _logger.debug(
-                                                'Sending slow SQL data for '
-                                                'harvest of %r.',
-                                                self._app_name)
+                            if not explain_plans.wait(events,
+                                    configuration.agent_limits
+                                    .sql_explain_plan_budget):
+                                _logger.debug('Explain plans did not '
+                                        'complete within the budget for '
+                                        'harvest of %r.', self._app_name)
 
-                                        self._active_session.send_sql_traces(
-                                                slow_sql_data)
+                                internal_count_metric('Supportability/'
+                                        'Python/ExplainPlans/'
+                                        'BudgetExceeded', 1)
 
-                                slow_transaction_data = (
-                                        stats.transaction_trace_data(
-                                        connections))
+                            if configuration.slow_sql.enabled:
+                                _logger.debug('Processing slow SQL data '
+                                        'for harvest of %r.',
+                                        self._app_name)
 
-                                if slow_transaction_data:
-                                    _logger.debug('Sending slow transaction '
-                                            'data for harvest of %r.',
+                                slow_sql_data = stats.slow_sql_data(
+                                        explain_plans)
+
+                                if slow_sql_data:
+                                    _logger.debug(
+                                            'Sending slow SQL data for '
+                                            'harvest of %r.',
                                             self._app_name)
 
-                                    self._active_session \
-                                    .send_transaction_traces(
-                                            slow_transaction_data)
+                                    uploads.send(
+                                            self._active_session
+                                            .send_sql_traces,
+                                            (slow_sql_data,))
+
+                            slow_transaction_data = (
+                                    stats.transaction_trace_data(
+                                    explain_plans))
+
+                            if slow_transaction_data:
+                                _logger.debug('Sending slow transaction '
+                                        'data for harvest of %r.',
+                                        self._app_name)
+
+                                uploads.send(
+                                        self._active_session
+                                        .send_transaction_traces,
+                                        (slow_transaction_data,))
 
                         # Create a metric_normalizer based on normalize_name
                         # If metric rename rules are empty, set normalizer
@@ -1328,15 +1548,6 @@ class Application(object):
                         _logger.debug('Sending metric data for harvest of %r.',
                                 self._app_name)
 
-                        # Send metrics
-                        self._active_session.send_metric_data(
-                                self._period_start, period_end, metric_data)
-
-                        _logger.debug('Done sending data for harvest of '
-                                '%r.', self._app_name)
-
-                        stats.reset_metric_stats()
-
                         # Successful, we reset the reporting period start time.
                         # If an error occurs after this point,
                         # any remaining data for the period being reported
@@ -1345,7 +1556,19 @@ class Application(object):
                         # only really want to count errors in being able to
                         # report the main transaction metrics.
 
-                        self._period_start = period_end
+                        def metric_data_sent():
+                            stats.reset_metric_stats()
+                            self._period_start = period_end
+
+                        # Send metrics
+                        uploads.send(self._active_session.send_metric_data,
+                                (self._period_start, period_end, metric_data),
+                                metric_data_sent)
+
+                        uploads.wait()
+
+                        _logger.debug('Done sending data for harvest of '
+                                '%r.', self._app_name)
 
                         # Fetch agent commands sent from the data collector
                         # and process them.
@@ -1372,6 +1595,9 @@ class Application(object):
                         _logger.debug('Finalizing data.')
                         self._active_session.finalize()
 
+                    else:
+                        uploads.wait()
+
                     # If this is a final forced harvest for the process
                     # then attempt to shutdown the session.
 
@@ -1422,7 +1648,12 @@ class Application(object):
                     internal_metric('Supportability/Python/Harvest/'
                             'Exception/%s' % callable_name(exc_type), 1)
 
-                    if self._period_start != period_end:
+                    # When the uploads were concurrent, the data for
+                    # those sent or discarded has already been reset in the
+                    # snapshot, so what remains must be rolled back even
+                    # if the metric data was sent.
+
+                    if self._period_start != period_end or uploads.concurrent:
                         self._stats_engine.rollback(stats)
 
                 except DiscardDataForRequest:
@@ -1472,6 +1703,114 @@ class Application(object):
         with self._stats_lock:
             self._stats_engine.merge_custom_metrics(internal_metrics.metrics())
 
+    def _harvest_aggregated(self, shutdown, flexible):
+        """Performs a harvest where reporting through the aggregator,
+        passing the snapshot of the data for the current reporting period
+        to the aggregator rather than sending it to the data collector.
+
+        """
+
+        internal_metrics = CustomMetrics()
+
+        call_metric = 'flexible' if flexible else 'default'
+
+        with InternalTraceContext(internal_metrics):
+            with InternalTrace('Supportability/Python/Aggregator/Harvest/'
+                    'Calls/' + call_metric):
+
+                self._harvest_count += 1
+
+                with self._stats_lock:
+                    self._merge_stats_shards()
+
+                    self._transaction_count = 0
+                    self._last_transaction = 0.0
+
+                    stats = self._stats_engine.harvest_snapshot(flexible)
+
+                if not flexible:
+                    with self._stats_custom_lock:
+                        self._global_events_account = 0
+
+                        stats_custom = \
+                                self._stats_custom_engine.harvest_snapshot()
+
+                    stats.merge_metric_stats(stats_custom)
+
+                    self._merge_data_sampler_metrics(stats)
+
+                _logger.debug('Passing data for harvest[%s] of %r to the '
+                        'aggregator.', call_metric, self._app_name)
+
+                try:
+                    self._active_session.send_stats(stats)
+
+                except Exception:
+                    # The aggregator has gone away. As with a restart
+                    # requested by the data collector, the session is
+                    # restarted, which elects a new aggregator, and the
+                    # data for the period is discarded.
+
+                    _logger.debug('Unable to pass data for harvest of %r '
+                            'to the aggregator.', self._app_name,
+                            exc_info=True)
+
+                    self.internal_agent_shutdown(restart=not shutdown)
+
+                else:
+                    if shutdown:
+                        self.internal_agent_shutdown(restart=False)
+
+        with self._stats_lock:
+            self._stats_engine.merge_custom_metrics(internal_metrics.metrics())
+
+    def _merge_data_sampler_metrics(self, stats):
+        """Merges in any metrics from the data samplers associated with
+        this application.
+
+        """
+
+        # NOTE If a data sampler has problems then what data was
+        # collected up to that point is retained. The data
+        # collector itself is still retained and would be used
+        # again on future harvest. If it is a persistent problem
+        # with the data sampler the issue would then reoccur
+        # with every harvest. If data sampler is a user provided
+        # data sampler, then should perhaps deregister it if it
+        # keeps having problems.
+
+        _logger.debug('Fetching metrics from data sources for '
+                'harvest of %r.', self._app_name)
+
+        for data_sampler in self._data_samplers:
+            try:
+                for sample in data_sampler.metrics():
+                    try:
+                        name, value = sample
+                        stats.record_custom_metric(name, value)
+                    except Exception:
+                        _logger.exception('The merging of custom '
+                                'metric sample %r from data '
+                                'source %r has failed. Validate '
+                                'the format of the sample. If '
+                                'this issue persists then please '
+                                'report this problem to the data '
+                                'source provider or New Relic '
+                                'support for further '
+                                'investigation.', sample,
+                                data_sampler.name)
+                        break
+
+            except Exception:
+                _logger.exception('The merging of custom metric '
+                        'samples from data source %r has failed. '
+                        'Validate that the data source is '
+                        'producing samples correctly. If this '
+                        'issue persists then please report this '
+                        'problem to the data source provider or '
+                        'New Relic support for further '
+                        'investigation.', data_sampler.name)
+
     def report_profile_data(self):
         """Report back any profile data.
 
@@ -1483,6 +1822,23 @@ class Application(object):
                         'for %r.', self._app_name)
                 self._active_session.send_profile_data(profile_data)
 
+    def _explain_plans(self, configuration):
+        """Returns the service running explain plans for the harvest,
+        creating it the first time. The service, along with the database
+        connections it holds, is kept from one harvest to the next.
+
+        """
+
+        if self._explain_plan_service is None:
+            agent_limits = configuration.agent_limits
+
+            self._explain_plan_service = ExplainPlanService(
+                    workers=agent_limits.sql_explain_plan_workers,
+                    max_connections=agent_limits.max_sql_connections,
+                    ttl=agent_limits.sql_explain_plan_cache_ttl)
+
+        return self._explain_plan_service
+
     def internal_agent_shutdown(self, restart=False):
         """Terminates the active agent session for this application and
         optionally triggers activation of a new session.
@@ -1508,6 +1864,12 @@ class Application(object):
 
         self.stop_data_samplers()
 
+        # Close the database connections held for running explain plans.
+
+        if self._explain_plan_service is not None:
+            self._explain_plan_service.shutdown()
+            self._explain_plan_service = None
+
         # Now shutdown the actual agent session.
 
         try:
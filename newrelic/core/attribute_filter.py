@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from newrelic.common.lru_cache import LRUCache
+
 # Attribute "destinations" represented as bitfields.
 
 DST_NONE = 0x0
@@ -57,12 +59,26 @@ class AttributeFilter(object):
     #      the bitfield.
     #
     #   4. Return the resulting bitfield after all rules have been applied.
+    #
+    # Each rule either sets or clears a fixed set of bits, so the effect of
+    # applying all the rules which match a name can be reduced to a single
+    # pair of bitfields, one for the bits which are kept and one for the bits
+    # which are then set. That pair doesn't depend on the default
+    # destinations, so is computed once per name. To do so, the rules are
+    # compiled into a trie keyed by the characters of the rule names, where
+    # each node holds the combined effect of the wildcard rules for names
+    # which are a prefix of that node. Looking up a name is then a single
+    # walk down the trie. The result for a name is kept in a bounded cache,
+    # as the number of distinct attribute names can be very large.
+
+    CACHE_MAXIMUM = 1000
 
     def __init__(self, flattened_settings):
 
         self.enabled_destinations = self._set_enabled_destinations(flattened_settings)
         self.rules = self._build_rules(flattened_settings)
-        self.cache = {}
+        self.trie = self._build_trie(self.rules)
+        self.cache = LRUCache(maximum=self.CACHE_MAXIMUM)
 
     def __repr__(self):
         return "<AttributeFilter: destinations: %s, rules: %s>" % (
@@ -135,27 +151,83 @@ class AttributeFilter(object):
 
         return tuple(rules)
 
+    def _apply_rule(self, rule, keep, add):
+
+        # Returns the keep and add bitfields after applying the rule, where
+        # the destinations after applying the rules so far is given by
+        # (destinations & keep) | add.
+
+        if rule.is_include:
+            return keep, add | (rule.destinations & self.enabled_destinations)
+        else:
+            return keep & ~rule.destinations, add & ~rule.destinations
+
+    def _build_trie(self, rules):
+
+        # Each node of the trie is a list holding the child nodes keyed by
+        # character, the keep and add bitfields for the wildcard rules
+        # matching any name with that prefix, and the keep and add bitfields
+        # for a name exactly matching the prefix, or None if the same.
+        #
+        # The rules are sorted by name, so a rule is only ever added after
+        # those for any shorter prefix of its name, and at each node, the
+        # wildcard rules come before the exact rules. This means that the
+        # bitfields of a node can be calculated from those of its parent,
+        # applying the rules in the same order as if applied one by one.
+
+        root = [{}, DST_ALL, DST_NONE, None]
+
+        for rule in rules:
+            node = root
+
+            for character in rule.name:
+                child = node[0].get(character)
+
+                if child is None:
+                    child = [{}, node[1], node[2], None]
+                    node[0][character] = child
+
+                node = child
+
+            if rule.is_wildcard:
+                node[1], node[2] = self._apply_rule(rule, node[1], node[2])
+            else:
+                keep, add = node[3] or (node[1], node[2])
+                node[3] = self._apply_rule(rule, keep, add)
+
+        return root
+
+    def _lookup(self, name):
+        node = self.trie
+
+        for character in name:
+            child = node[0].get(character)
+
+            if child is None:
+                return node[1], node[2]
+
+            node = child
+
+        return node[3] or (node[1], node[2])
+
     def apply(self, name, default_destinations):
         if self.enabled_destinations == DST_NONE:
             return DST_NONE
 
-        cache_index = (name, default_destinations)
+        destinations = self.enabled_destinations & default_destinations
 
-        if cache_index in self.cache:
-            return self.cache[cache_index]
+        if not self.rules:
+            return destinations
 
-        destinations = self.enabled_destinations & default_destinations
+        bitfields = self.cache.get(name)
+
+        if bitfields is None:
+            bitfields = self._lookup(name)
+            self.cache.put(name, bitfields)
 
-        for rule in self.rules:
-            if rule.name_match(name):
-                if rule.is_include:
-                    inc_dest = rule.destinations & self.enabled_destinations
-                    destinations |= inc_dest
-                else:
-                    destinations &= ~rule.destinations
+        keep, add = bitfields
 
-        self.cache[cache_index] = destinations
-        return destinations
+        return (destinations & keep) | add
 
 class AttributeFilterRule(object):
 
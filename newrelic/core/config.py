@@ -117,6 +117,10 @@ class ThreadProfilerSettings(Settings):
     pass
 
 
+class ThreadProfilerContinuousSettings(Settings):
+    pass
+
+
 class TransactionTracerSettings(Settings):
     pass
 
@@ -301,6 +305,18 @@ class InfiniteTracingSettings(Settings):
         return True
 
 
+class StatsEngineSettings(Settings):
+    pass
+
+
+class AggregatorSettings(Settings):
+    pass
+
+
+class TraceCacheSettings(Settings):
+    pass
+
+
 class EventHarvestConfigSettings(Settings):
     nested = True
     _lock = threading.Lock()
@@ -326,6 +342,7 @@ _settings = TopLevelSettings()
 _settings.attributes = AttributesSettings()
 _settings.gc_runtime_metrics = GCRuntimeMetricsSettings()
 _settings.thread_profiler = ThreadProfilerSettings()
+_settings.thread_profiler.continuous = ThreadProfilerContinuousSettings()
 _settings.transaction_tracer = TransactionTracerSettings()
 _settings.transaction_tracer.attributes = TransactionTracerAttributesSettings()
 _settings.error_collector = ErrorCollectorSettings()
@@ -363,6 +380,9 @@ _settings.transaction_segments.attributes = \
 _settings.distributed_tracing = DistributedTracingSettings()
 _settings.serverless_mode = ServerlessModeSettings()
 _settings.infinite_tracing = InfiniteTracingSettings()
+_settings.stats_engine = StatsEngineSettings()
+_settings.aggregator = AggregatorSettings()
+_settings.trace_cache = TraceCacheSettings()
 _settings.event_harvest_config = EventHarvestConfigSettings()
 _settings.event_harvest_config.harvest_limits = \
         EventHarvestConfigHarvestLimitSettings()
@@ -611,10 +631,14 @@ _settings.attributes.exclude = []
 _settings.attributes.include = []
 
 _settings.thread_profiler.enabled = True
+_settings.thread_profiler.continuous.enabled = False
+_settings.thread_profiler.continuous.sample_period = 0.1
+_settings.thread_profiler.continuous.max_overhead = 0.02
 _settings.cross_application_tracer.enabled = True
 
 _settings.gc_runtime_metrics.enabled = False
 _settings.gc_runtime_metrics.top_object_count_limit = 5
+_settings.gc_runtime_metrics.top_object_count_sample_size = 10000
 
 _settings.transaction_events.enabled = True
 _settings.transaction_events.attributes.enabled = True
@@ -685,6 +709,9 @@ _settings.agent_limits.slow_sql_stack_trace = 30
 _settings.agent_limits.max_sql_connections = 4
 _settings.agent_limits.sql_explain_plans = 30
 _settings.agent_limits.sql_explain_plans_per_harvest = 60
+_settings.agent_limits.sql_explain_plan_workers = 2
+_settings.agent_limits.sql_explain_plan_budget = 5.0
+_settings.agent_limits.sql_explain_plan_cache_ttl = 600.0
 _settings.agent_limits.slow_sql_data = 10
 _settings.agent_limits.merge_stats_maximum = None
 _settings.agent_limits.errors_per_transaction = 5
@@ -695,6 +722,24 @@ _settings.agent_limits.synthetics_events = 200
 _settings.agent_limits.synthetics_transactions = 20
 _settings.agent_limits.data_compression_threshold = 64 * 1024
 _settings.agent_limits.data_compression_level = None
+_settings.agent_limits.max_harvest_connections = 4
+_settings.agent_limits.segments_per_transaction = None
+
+_settings.stats_engine.per_thread_shards = _environ_as_bool(
+        'NEW_RELIC_STATS_ENGINE_PER_THREAD_SHARDS', default=False)
+_settings.stats_engine.columnar_metrics = _environ_as_bool(
+        'NEW_RELIC_STATS_ENGINE_COLUMNAR_METRICS', default=False)
+_settings.stats_engine.lazy_span_events = _environ_as_bool(
+        'NEW_RELIC_STATS_ENGINE_LAZY_SPAN_EVENTS', default=False)
+_settings.stats_engine.concurrent_harvest = _environ_as_bool(
+        'NEW_RELIC_STATS_ENGINE_CONCURRENT_HARVEST', default=False)
+_settings.stats_engine.incremental_time_metrics = _environ_as_bool(
+        'NEW_RELIC_STATS_ENGINE_INCREMENTAL_TIME_METRICS', default=False)
+_settings.stats_engine.prune_node_trees = _environ_as_bool(
+        'NEW_RELIC_STATS_ENGINE_PRUNE_NODE_TREES', default=True)
+
+_settings.trace_cache.context_vars = _environ_as_bool(
+        'NEW_RELIC_TRACE_CACHE_CONTEXT_VARS', default=False)
 
 _settings.infinite_tracing.trace_observer_host = os.environ.get(
         'NEW_RELIC_INFINITE_TRACING_TRACE_OBSERVER_HOST', None)
@@ -703,6 +748,8 @@ _settings.infinite_tracing.trace_observer_port = _environ_as_int(
 _settings.infinite_tracing.ssl = True
 _settings.infinite_tracing.span_queue_size = _environ_as_int(
         'NEW_RELIC_INFINITE_TRACING_SPAN_QUEUE_SIZE', 10000)
+_settings.infinite_tracing.batching = _environ_as_bool(
+        'NEW_RELIC_INFINITE_TRACING_BATCHING', default=False)
 
 _settings.event_harvest_config.harvest_limits.analytic_event_data = \
         DEFAULT_RESERVOIR_SIZE
@@ -754,6 +801,8 @@ _settings.utilization.total_ram_mib = _environ_as_int(
         'NEW_RELIC_UTILIZATION_TOTAL_RAM_MIB')
 _settings.utilization.billing_hostname = os.environ.get(
         'NEW_RELIC_UTILIZATION_BILLING_HOSTNAME')
+_settings.utilization.cache_file = None
+_settings.utilization.cache_ttl = 86400
 
 _settings.strip_exception_messages.enabled = False
 _settings.strip_exception_messages.whitelist = []
@@ -771,6 +820,12 @@ _settings.serverless_mode.enabled = _environ_as_bool(
         default=False)
 _settings.aws_lambda_metadata = {}
 
+_settings.aggregator.enabled = _environ_as_bool(
+        'NEW_RELIC_AGGREGATOR_ENABLED', default=False)
+_settings.aggregator.socket_path = os.environ.get(
+        'NEW_RELIC_AGGREGATOR_SOCKET_PATH', None)
+_settings.aggregator.timeout = 10.0
+
 _settings.event_loop_visibility.enabled = True
 _settings.event_loop_visibility.blocking_threshold = 0.1
 
@@ -19,15 +19,31 @@
 from __future__ import print_function
 
 import logging
+import sys
+import threading
 
+import newrelic.packages.six as six
 from newrelic.common.agent_http import (
     ApplicationModeClient,
     DeveloperModeClient,
     ServerlessModeClient,
 )
 from newrelic.core.agent_protocol import AgentProtocol, ServerlessModeProtocol
+from newrelic.core.aggregator import (
+    AggregatorRefusedError,
+    aggregator_client,
+    default_socket_path,
+)
 from newrelic.core.agent_streaming import StreamingRpc
 from newrelic.core.config import global_settings
+from newrelic.core.internal_metrics import InternalTraceContext
+from newrelic.core.stats_engine import CustomMetrics
+from newrelic.network.exceptions import (
+    DiscardDataForRequest,
+    ForceAgentDisconnect,
+    ForceAgentRestart,
+    RetryDataForRequest,
+)
 
 _logger = logging.getLogger(__name__)
 
@@ -61,6 +77,7 @@ class Session(object):
 
             port = self.configuration.infinite_tracing.trace_observer_port
             ssl = self.configuration.infinite_tracing.ssl
+            batching = self.configuration.infinite_tracing.batching
             endpoint = "{}:{}".format(host, port)
 
             if (
@@ -75,7 +92,8 @@ class Session(object):
                 )
 
                 rpc = self._rpc = StreamingRpc(
-                    endpoint, span_iterator, metadata, record_metric, ssl=ssl
+                    endpoint, span_iterator, metadata, record_metric, ssl=ssl,
+                    batching=batching
                 )
                 rpc.connect()
                 return rpc
@@ -195,6 +213,158 @@ class Session(object):
         return self._protocol.finalize()
 
 
+class HarvestUploader(object):
+    """Sends the payloads for a harvest to the data collector. Where the
+    uploader is sequential, each payload is sent as soon as it is given
+    to the uploader and any failure is raised straight away. Otherwise
+    the payloads are queued, and are then serialized, compressed and sent
+    from a small pool of threads when waiting on the uploads to complete,
+    with each thread reusing a keep-alive connection to the data collector.
+
+    """
+
+    # The failures which can be raised by the data collector, in order of
+    # precedence where more than one of the concurrent uploads fail.
+
+    FAILURES = (
+        ForceAgentDisconnect,
+        ForceAgentRestart,
+        RetryDataForRequest,
+        DiscardDataForRequest,
+    )
+
+    def __init__(self, max_connections=1, metrics=None):
+        self.max_connections = max_connections
+        self.metrics = metrics
+        self._uploads = []
+
+    @property
+    def concurrent(self):
+        return self.max_connections > 1
+
+    def send(self, send, args=(), reset=None):
+        """Sends a payload by calling send with args. Where reset is
+        supplied, it is called when the payload has been accepted by the
+        data collector, or was discarded by the data collector and so
+        should not be rolled back into the next harvest.
+
+        """
+
+        if not self.concurrent:
+            send(*args)
+            if reset is not None:
+                reset()
+            return
+
+        self._uploads.append(_HarvestUpload(send, args, reset))
+
+    def wait(self):
+        """Waits on any queued uploads to complete. Each of the uploads
+        succeeds or fails independently of the others. Once all have
+        completed, the reset for those which were sent or discarded is
+        called, such that a rollback of the harvest snapshot only merges
+        back the data for those uploads the data collector asked to be
+        retried. The failure with the highest precedence is then raised.
+
+        """
+
+        uploads, self._uploads = self._uploads, []
+
+        if not uploads:
+            return
+
+        pending = iter(uploads)
+        lock = threading.Lock()
+
+        threads = []
+        thread_metrics = []
+
+        for _ in range(min(self.max_connections, len(uploads))):
+            metrics = CustomMetrics()
+            thread = threading.Thread(target=self._upload,
+                    args=(pending, lock, metrics),
+                    name='NR-Harvest-Upload')
+            thread.daemon = True
+            thread.start()
+
+            threads.append(thread)
+            thread_metrics.append(metrics)
+
+        for thread in threads:
+            thread.join()
+
+        if self.metrics is not None:
+            for metrics in thread_metrics:
+                self.metrics.merge_custom_metrics(metrics.metrics())
+
+        failed = []
+
+        for upload in uploads:
+            if upload.exc_info is None or issubclass(upload.exc_info[0],
+                    DiscardDataForRequest):
+                if upload.reset is not None:
+                    upload.reset()
+
+            if upload.exc_info is not None:
+                failed.append(upload)
+
+        if not failed:
+            return
+
+        failed.sort(key=self._precedence)
+
+        for upload in failed[1:]:
+            if self._precedence(upload) < len(self.FAILURES):
+                _logger.debug('Harvest upload using %r also failed with '
+                        '%r.', upload.send, upload.exc_info[1])
+            else:
+                _logger.error('Unexpected exception when attempting to '
+                        'send harvest data to the data collector. Please '
+                        'report this problem to New Relic support for '
+                        'further investigation.', exc_info=upload.exc_info)
+
+        exc_info = failed[0].exc_info
+
+        try:
+            six.reraise(*exc_info)
+        finally:
+            exc_info = None
+            for upload in uploads:
+                upload.exc_info = None
+
+    def _precedence(self, upload):
+        for index, exc_type in enumerate(self.FAILURES):
+            if issubclass(upload.exc_info[0], exc_type):
+                return index
+        return len(self.FAILURES)
+
+    @staticmethod
+    def _upload(pending, lock, metrics):
+        with InternalTraceContext(metrics):
+            while True:
+                with lock:
+                    upload = next(pending, None)
+
+                if upload is None:
+                    return
+
+                try:
+                    upload.send(*upload.args)
+                except Exception:
+                    upload.exc_info = sys.exc_info()
+
+
+class _HarvestUpload(object):
+
+    __slots__ = ('send', 'args', 'reset', 'exc_info')
+
+    def __init__(self, send, args, reset):
+        self.send = send
+        self.args = args
+        self.reset = reset
+        self.exc_info = None
+
+
 class DeveloperModeSession(Session):
     CLIENT = DeveloperModeClient
 
@@ -222,8 +392,136 @@ class ServerlessModeSession(Session):
         pass
 
 
+class AggregatorSession(object):
+    """Session for an agent reporting through the aggregator process on
+    the host. The configuration is that of the application in the
+    aggregator, and the data for each harvest is passed to the aggregator
+    to merge into its own rather than being sent to the data collector.
+
+    """
+
+    def __init__(self, app_name, client, configuration):
+        self._app_name = app_name
+        self._client = client
+        self.configuration = configuration
+
+    @property
+    def agent_run_id(self):
+        return self.configuration.agent_run_id
+
+    @property
+    def collector_url(self):
+        return "aggregator:%s" % self._client.path
+
+    def send_stats(self, stats):
+        """Passes the stats engine snapshot for a harvest to the
+        aggregator.
+
+        """
+
+        if not self._client.merge(self._app_name, stats):
+            raise RetryDataForRequest(
+                "The aggregator is no longer reporting data for %r."
+                % self._app_name
+            )
+
+    def close_connection(self):
+        # The connection to the aggregator is kept open between harvests.
+
+        pass
+
+    @staticmethod
+    def connect_span_stream(*args, **kwargs):
+        pass
+
+    @staticmethod
+    def shutdown_span_stream():
+        pass
+
+    @staticmethod
+    def get_agent_commands(*args, **kwargs):
+        return ()
+
+    @staticmethod
+    def send_profile_data(profile_data):
+        # Profiling sessions are only started by agent commands, which
+        # are handled by the aggregator, and continuous profiling isn't
+        # started when reporting through the aggregator, so there is
+        # never profile data to send.
+
+        pass
+
+    def shutdown_session(self):
+        # The agent run belongs to the aggregator, so only the connection
+        # to it is closed.
+
+        self._client.close()
+
+    @staticmethod
+    def finalize():
+        pass
+
+
+def create_aggregator_session(app_name, linked_applications, settings):
+    """Returns a session for reporting through the aggregator on the host,
+    or None if this process has become the aggregator or the aggregator
+    can't be used, so the agent is to report to the data collector itself.
+    Raises RetryDataForRequest when the aggregator can't yet provide the
+    configuration for the application.
+
+    """
+
+    path = settings.aggregator.socket_path or default_socket_path(settings)
+
+    try:
+        client = aggregator_client(path, settings.aggregator.timeout)
+        if client is None:
+            return None
+
+        configuration = client.connect(app_name, linked_applications)
+
+    except AggregatorRefusedError:
+        # Trying again wouldn't change the outcome, and nor would the data
+        # ever be reported if it were left to do so.
+
+        _logger.warning(
+            "Unable to use the aggregator at %r, so reporting data for %r "
+            "directly.", path, app_name, exc_info=True
+        )
+        return None
+
+    except Exception:
+        _logger.debug(
+            "Unable to connect to the aggregator at %r.", path, exc_info=True
+        )
+        raise RetryDataForRequest("Unable to connect to the aggregator.")
+
+    if configuration is None:
+        client.close()
+
+        _logger.debug(
+            "The aggregator at %r has not yet registered %r with the data "
+            "collector.", path, app_name
+        )
+        raise RetryDataForRequest("Aggregator has no configuration.")
+
+    _logger.debug(
+        "Reporting data for %r through the aggregator at %r.", app_name, path
+    )
+
+    return AggregatorSession(app_name, client, configuration)
+
+
 def create_session(license_key, app_name, linked_applications, environment):
     settings = global_settings()
+
+    if settings.aggregator.enabled and not settings.serverless_mode.enabled:
+        session = create_aggregator_session(
+            app_name, linked_applications, settings
+        )
+        if session is not None:
+            return session
+
     if settings.serverless_mode.enabled:
         return ServerlessModeSession(
             app_name, linked_applications, environment, settings
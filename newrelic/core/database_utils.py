@@ -18,11 +18,17 @@ explain plans for SQL etc.
 """
 
 import logging
+import os
 import re
+import threading
+import time
 import weakref
 
 import newrelic.packages.six as six
 
+from newrelic.packages.six.moves import queue
+
+from newrelic.common.lru_cache import LRUCache
 from newrelic.core.internal_metrics import internal_metric
 from newrelic.core.config import global_settings
 
@@ -42,18 +48,13 @@ _logger = logging.getLogger(__name__)
 
 _single_quotes_p = r"'(?:[^']|'')*?(?:\\'.*|'(?!'))"
 _double_quotes_p = r'"(?:[^"]|"")*?(?:\\".*|"(?!"))'
-_dollar_quotes_p = r'(\$(?!\d)[^$]*?\$).*?(?:\1|$)'
+_dollar_quotes_p = r'(?P<dollar_tag>\$(?!\d)[^$]*?\$).*?(?:(?P=dollar_tag)|$)'
 _oracle_quotes_p = (r"q'\[.*?(?:\]'|$)|q'\{.*?(?:\}'|$)|"
         r"q'\<.*?(?:\>'|$)|q'\(.*?(?:\)'|$)")
 _any_quotes_p = _single_quotes_p + '|' + _double_quotes_p
 _single_dollar_p = _single_quotes_p + '|' + _dollar_quotes_p
 _single_oracle_p = _single_quotes_p + '|' + _oracle_quotes_p
 
-_single_quotes_re = re.compile(_single_quotes_p)
-_any_quotes_re = re.compile(_any_quotes_p)
-_single_dollar_re = re.compile(_single_dollar_p)
-_single_oracle_re = re.compile(_single_oracle_p)
-
 # Cleanup regexes. Presence of a quote will indicate that the now obfuscated
 # sql was actually malformed.
 
@@ -76,38 +77,67 @@ _single_dollar_cleanup_re = re.compile(_single_dollar_cleanup_p)
 # We add one variation here in that don't want to replace a number that
 # follows on from a ':'. This is because ':1' can be used as positional
 # parameter with database adapters where 'paramstyle' is 'numeric'.
+#
+# The literals are matched case insensitively. This is spelt out in the
+# patterns rather than using the IGNORECASE flag, as the patterns are
+# combined below with those for quoted strings, which must still be
+# matched case sensitively.
+
+_uuid_p = r'\{?(?:[0-9a-fA-F]\-?){32}\}?'
+_int_p = r'(?<!:)-?\b(?:[0-9]+\.)?[0-9]+(?:[eE][+-]?[0-9]+)?'
+_hex_p = r'0[xX][0-9a-fA-F]+'
+_bool_words_p = (r'(?:[tT][rR][uU][eE]|[fF][aA][lL][sS][eE]|'
+        r'[nN][uU][lL][lL])')
+_bool_p = r'\b' + _bool_words_p + r'\b'
+
+# Join all literals into one pattern. Longest expressions first to avoid
+# the situation of partial matches on shorter expressions. UUIDs might be
+# an example.
+
+_all_literals_p = '|'.join([_uuid_p, _hex_p, _int_p, _bool_p])
+
+# Oracle quoted strings start with a word character. When matching quoted
+# strings and literals in the one pass, a word boundary is therefore not
+# seen at the end of a boolean literal which is immediately followed by
+# such a string, where there would be one had the string already been
+# replaced with a '?'.
 
-_uuid_p = r'\{?(?:[0-9a-f]\-?){32}\}?'
-_int_p = r'(?<!:)-?\b(?:[0-9]+\.)?[0-9]+(e[+-]?[0-9]+)?'
-_hex_p = r'0x[0-9a-f]+'
-_bool_p = r'\b(?:true|false|null)\b'
+_oracle_bool_p = (r'\b' + _bool_words_p + r'(?:\b|(?=' +
+        _oracle_quotes_p + '))')
 
-# Join all literals into one compiled regular expression. Longest expressions
-# first to avoid the situation of partial matches on shorter expressions. UUIDs
-# might be an example.
+_oracle_literals_p = '|'.join([_uuid_p, _hex_p, _int_p, _oracle_bool_p])
+
+# The quoted strings and literals are replaced in a single pass over the
+# SQL, using one compiled regular expression for each quoting style. The
+# quoted strings come first in the pattern, so where a quoted string and
+# a literal could start at the same point, the quoted string wins. This
+# gives the same result as substituting all the quoted strings before
+# looking for literals, as no literal can contain a quote character.
+
+
+def _obfuscate_re(quotes_p, literals_p=_all_literals_p):
+    return re.compile(quotes_p + '|' + literals_p)
 
-_all_literals_p = '(' + ')|('.join([_uuid_p, _hex_p, _int_p, _bool_p]) + ')'
-_all_literals_re = re.compile(_all_literals_p, re.IGNORECASE)
 
 _quotes_table = {
-    'single': (_single_quotes_re, _single_quotes_cleanup_re),
-    'single+double': (_any_quotes_re, _any_quotes_cleanup_re),
-    'single+dollar': (_single_dollar_re, _single_dollar_cleanup_re),
-    'single+oracle': (_single_oracle_re, _single_quotes_cleanup_re),
+    'single': (_obfuscate_re(_single_quotes_p),
+            _single_quotes_cleanup_re),
+    'single+double': (_obfuscate_re(_any_quotes_p),
+            _any_quotes_cleanup_re),
+    'single+dollar': (_obfuscate_re(_single_dollar_p),
+            _single_dollar_cleanup_re),
+    'single+oracle': (_obfuscate_re(_single_oracle_p, _oracle_literals_p),
+            _single_quotes_cleanup_re),
 }
 
 
 def _obfuscate_sql(sql, database):
-    quotes_re, quotes_cleanup_re = _quotes_table.get(database.quoting_style,
-            (_single_quotes_re, _single_quotes_cleanup_re))
-
-    # Substitute quoted strings first.
+    obfuscate_re, quotes_cleanup_re = _quotes_table.get(
+            database.quoting_style, _quotes_table['single'])
 
-    sql = quotes_re.sub('?', sql)
+    # Substitute quoted strings and all other sensitive fields.
 
-    # Replace all other sensitive fields
-
-    sql = _all_literals_re.sub('?', sql)
+    sql = obfuscate_re.sub('?', sql)
 
     # Determine if the obfuscated query was malformed by searching for
     # remaining quote characters
@@ -138,25 +168,22 @@ def _obfuscate_sql(sql, database):
 
 _normalize_params_1_p = r'%\([^)]*\)s'
 _normalize_params_1_re = re.compile(_normalize_params_1_p)
-_normalize_params_2_p = r'%s'
+_normalize_params_2_p = r'%s|:\w+'
 _normalize_params_2_re = re.compile(_normalize_params_2_p)
-_normalize_params_3_p = r':\w+'
-_normalize_params_3_re = re.compile(_normalize_params_3_p)
 
 _normalize_values_p = r'\([^)]+\)'
 _normalize_values_re = re.compile(_normalize_values_p)
 
-_normalize_whitespace_1_p = r'\s+'
+_normalize_whitespace_1_p = r'(?<![\w\s])\s+|\s+(?![\w\s])'
 _normalize_whitespace_1_re = re.compile(_normalize_whitespace_1_p)
-_normalize_whitespace_2_p = r'\s+(?!\w)'
+_normalize_whitespace_2_p = r'\s+'
 _normalize_whitespace_2_re = re.compile(_normalize_whitespace_2_p)
-_normalize_whitespace_3_p = r'(?<!\w)\s+'
-_normalize_whitespace_3_re = re.compile(_normalize_whitespace_3_p)
 
 
 def _normalize_sql(sql):
     # Note we that do this as a series of regular expressions as
-    # using '|' in regular expressions is more expensive.
+    # using '|' in regular expressions is more expensive, except
+    # where alternatives can be matched in the one pass.
 
     # Convert param style of '%(name)s' to '?'. We need to do
     # this before collapsing sets of values to a single value
@@ -171,21 +198,14 @@ def _normalize_sql(sql):
     # Convert '%s', ':1' and ':name' param styles to '?'.
 
     sql = _normalize_params_2_re.sub('?', sql)
-    sql = _normalize_params_3_re.sub('?', sql)
-
-    # Strip leading and trailing white space.
-
-    sql = sql.strip()
 
-    # Collapse multiple white space to single white space.
+    # Drop white space adjacent to anything but an identifier,
+    # which includes leading and trailing white space. What is
+    # left is white space between identifiers, which is then
+    # collapsed to a single space.
 
-    sql = _normalize_whitespace_1_re.sub(' ', sql)
-
-    # Drop spaces adjacent to identifier except for case where
-    # identifiers follow each other.
-
-    sql = _normalize_whitespace_2_re.sub('', sql)
-    sql = _normalize_whitespace_3_re.sub('', sql)
+    sql = _normalize_whitespace_1_re.sub('', sql)
+    sql = _normalize_whitespace_2_re.sub(' ', sql)
 
     return sql
 
@@ -621,6 +641,20 @@ class SQLConnections(object):
 
         return connection
 
+    def discard(self, connection):
+        # Drops a connection which may no longer be usable, such as after
+        # the database reported an error, so it isn't used again.
+
+        for i, item in enumerate(self.connections):
+            if item[1] is connection:
+                del self.connections[i]
+                break
+
+        try:
+            connection.cleanup()
+        except Exception:
+            pass
+
     def cleanup(self):
         settings = global_settings()
 
@@ -677,6 +711,8 @@ def _explain_plan(connections, sql, database, connect_params, cursor_params,
         _logger.debug('Executing explain plan for %r on %r.', query,
                 database.client)
 
+    connection = None
+
     try:
         args, kwargs = connect_params
         connection = connections.connection(database, args, kwargs)
@@ -736,6 +772,12 @@ def _explain_plan(connections, sql, database, connect_params, cursor_params,
                     'execute_params=%r.', query, database.client,
                     cursor_params, execute_params)
 
+        # The connection could be left unusable, for example in a failed
+        # transaction, so isn't kept for subsequent explain plans.
+
+        if connection is not None:
+            connections.discard(connection)
+
     return None
 
 
@@ -757,6 +799,10 @@ def explain_plan(connections, sql_statement, connect_params, cursor_params,
     if sql_statement.operation not in database.explain_stmts:
         return
 
+    if isinstance(connections, ExplainPlanService):
+        return connections.explain_plan(sql_statement, connect_params,
+                sql_format)
+
     details = _explain_plan(connections, sql_statement.sql, database,
             connect_params, cursor_params, sql_parameters, execute_params)
 
@@ -765,6 +811,230 @@ def explain_plan(connections, sql_statement, connect_params, cursor_params,
 
     return details
 
+
+def _explain_plan_key(sql_statement, connect_params, sql_format):
+    # Explain plans are keyed by the database connected to and the
+    # normalized SQL, so statements differing only in their literal values
+    # share the one plan.
+
+    args, kwargs = connect_params
+
+    try:
+        key = (sql_statement.database.client, args,
+                frozenset(kwargs.items()), sql_statement.identifier,
+                sql_format)
+        hash(key)
+
+    except TypeError:
+        key = (sql_statement.database.client, repr(connect_params),
+                sql_statement.identifier, sql_format)
+
+    return key
+
+
+class ExplainPlanService(object):
+
+    """Runs explain plans on a fixed number of background threads, so they
+    can be run concurrently and the harvest need only wait on them for as
+    long as it can afford to.
+
+    Each thread keeps its own SQLConnections cache open from one harvest to
+    the next. The number of connections to any one database is therefore
+    bounded by the number of threads, and a connection is only ever used by
+    the thread which opened it, as some database clients require.
+
+    Plans are cached, including where no plan could be obtained, for ttl
+    seconds. Plans still being run when the harvest stops waiting on them
+    are thus available to the next harvest.
+
+    No more than queue_size plans are queued at any one time, with any
+    more being skipped until the queue has drained.
+
+    """
+
+    def __init__(self, workers=2, max_connections=4, ttl=600.0,
+            maximum=1000, queue_size=100):
+        self.workers = workers
+        self.max_connections = max_connections
+        self.ttl = ttl
+        self.queue_size = queue_size
+
+        self._plans = LRUCache(maximum)
+        self._pending = {}
+        self._queue = queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = os.getpid()
+
+    def _start_threads(self):
+        # The threads don't survive a fork, so after one the child starts
+        # its own, discarding what was queued or running in the parent as
+        # the events for it would never be set. Any thread which has died
+        # unexpectedly is also replaced.
+
+        pid = os.getpid()
+
+        if pid != self._pid:
+            self._pid = pid
+            self._pending = {}
+            self._queue = queue.Queue(self.queue_size)
+            self._threads = []
+
+        for i in range(self.workers):
+            if i < len(self._threads) and self._threads[i].is_alive():
+                continue
+
+            thread = threading.Thread(target=self._run,
+                    args=(self._queue,),
+                    name='NR-Explain-Plan-Thread-%d' % i)
+            thread.daemon = True
+            thread.start()
+
+            if i < len(self._threads):
+                self._threads[i] = thread
+            else:
+                self._threads.append(thread)
+
+    def _run(self, requests):
+        connections = SQLConnections(self.max_connections)
+
+        try:
+            while True:
+                request = requests.get()
+
+                if request is None:
+                    break
+
+                key, args, event = request
+
+                try:
+                    plan = explain_plan(connections, *args)
+                except Exception:
+                    _logger.exception('Unexpected error running explain '
+                            'plan.')
+                    plan = None
+
+                with self._lock:
+                    self._plans.put(key, (time.time() + self.ttl, plan))
+                    self._pending.pop(key, None)
+
+                event.set()
+
+        finally:
+            connections.cleanup()
+
+    def submit(self, node):
+        """Queues an explain plan for the database node, unless one is
+        already cached or queued, or the queue is full. Returns an event
+        which is set when the plan is available.
+
+        """
+
+        sql_statement = node.statement
+        connect_params = node.connect_params
+
+        if connect_params is None:
+            return None
+
+        if sql_statement.operation not in sql_statement.database.explain_stmts:
+            return None
+
+        key = _explain_plan_key(sql_statement, connect_params,
+                node.sql_format)
+
+        args = (sql_statement, connect_params, node.cursor_params,
+                node.sql_parameters, node.execute_params, node.sql_format)
+
+        with self._lock:
+            entry = self._plans.get(key)
+
+            if entry is not None and entry[0] > time.time():
+                return None
+
+            self._start_threads()
+
+            event = self._pending.get(key)
+
+            if event is not None:
+                return event
+
+            event = threading.Event()
+
+            try:
+                self._queue.put_nowait((key, args, event))
+            except queue.Full:
+                _logger.debug('Skipping explain plan as the queue of '
+                        'explain plans is full.')
+                return None
+
+            self._pending[key] = event
+
+        return event
+
+    def wait(self, events, timeout):
+        """Waits for the events returned by submit() to be set, for no more
+        than timeout seconds in total. Returns whether all of them were.
+
+        """
+
+        deadline = time.time() + timeout
+
+        for event in events:
+            if event is None or event.is_set():
+                continue
+
+            remaining = deadline - time.time()
+
+            if remaining <= 0.0 or not event.wait(remaining):
+                return False
+
+        return True
+
+    def explain_plan(self, sql_statement, connect_params, sql_format):
+        """Returns the cached explain plan for the SQL statement, without
+        waiting on one which hasn't completed.
+
+        """
+
+        key = _explain_plan_key(sql_statement, connect_params, sql_format)
+
+        entry = self._plans.get(key)
+
+        if entry is not None:
+            return entry[1]
+
+    def shutdown(self, timeout=None):
+        """Stops the background threads, closing their connections."""
+
+        with self._lock:
+            threads, self._threads = self._threads, []
+
+            # The threads of the parent aren't running after a fork.
+
+            if self._pid != os.getpid():
+                threads = []
+
+            # Plans still queued are discarded, so the queue has room for
+            # the requests for the threads to exit.
+
+            while True:
+                try:
+                    request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                if request is not None:
+                    key, args, event = request
+                    self._pending.pop(key, None)
+                    event.set()
+
+        for thread in threads:
+            self._queue.put(None)
+
+        for thread in threads:
+            thread.join(timeout)
+
+
 # Wrapper for information about a specific database.
 
 
@@ -776,6 +1046,12 @@ class SQLDatabase(object):
     def __getattr__(self, name):
         return getattr(self.dbapi2_module, name)
 
+    def __reduce__(self):
+        # Pickled by the module alone, so __getattr__() isn't called on a
+        # partially restored object when unpickled.
+
+        return (SQLDatabase, (self.dbapi2_module,))
+
     @property
     def product(self):
         return getattr(self.dbapi2_module, '_nr_database_product', None)
@@ -812,6 +1088,17 @@ class SQLDatabase(object):
         return result
 
 
+# Obfuscating and normalizing SQL is relatively expensive, yet the same
+# statements tend to be executed over and over again. The results are
+# therefore cached across all statements in a bounded cache, keyed on the
+# SQL and the quoting style. Very long statements, which are often bulk
+# operations with literal values embedded, are not cached so as to limit
+# the memory used by the cache.
+
+_sql_cache = LRUCache(maximum=1000)
+_sql_cache_maximum_length = 4096
+
+
 class SQLStatement(object):
 
     def __init__(self, sql, database=None):
@@ -858,17 +1145,40 @@ class SQLStatement(object):
             self._uncommented = _uncomment_sql(self.sql)
         return self._uncommented
 
+    def _obfuscated_entry(self):
+        # Results are shared through the cache with any other statement
+        # using the same SQL and quoting style. The cache entry is a list
+        # holding the obfuscated and normalized SQL, with the latter only
+        # being filled in if needed.
+
+        if len(self.sql) > _sql_cache_maximum_length:
+            return [_uncomment_sql(_obfuscate_sql(self.sql, self.database)),
+                    None]
+
+        key = (self.sql, self.database.quoting_style)
+
+        entry = _sql_cache.get(key)
+
+        if entry is None:
+            entry = [_uncomment_sql(_obfuscate_sql(self.sql, self.database)),
+                    None]
+            _sql_cache.put(key, entry)
+
+        return entry
+
     @property
     def obfuscated(self):
         if self._obfuscated is None:
-            self._obfuscated = _uncomment_sql(_obfuscate_sql(self.sql,
-                self.database))
+            self._obfuscated = self._obfuscated_entry()[0]
         return self._obfuscated
 
     @property
     def normalized(self):
         if self._normalized is None:
-            self._normalized = _normalize_sql(self.obfuscated)
+            entry = self._obfuscated_entry()
+            if entry[1] is None:
+                entry[1] = _normalize_sql(entry[0])
+            self._normalized = entry[1]
         return self._normalized
 
     @property
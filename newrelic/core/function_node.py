@@ -35,6 +35,21 @@ class FunctionNode(_FunctionNode, GenericNodeMixin):
 
         """
 
+        for metric in self.segment_time_metrics(stats, root, parent):
+            yield metric
+
+        # Now for the children.
+
+        for child in self.children:
+            for metric in child.time_metrics(stats, root, self):
+                yield metric
+
+    def segment_time_metrics(self, stats, root, parent):
+        """Return a generator yielding the timed metrics for this
+        function node alone.
+
+        """
+
         name = '%s/%s' % (self.group, self.name)
 
         yield TimeMetric(name=name, scope='', duration=self.duration,
@@ -81,12 +96,6 @@ class FunctionNode(_FunctionNode, GenericNodeMixin):
                     yield TimeMetric(name=rollup, scope=root.type,
                             duration=self.duration, exclusive=None)
 
-        # Now for the children.
-
-        for child in self.children:
-            for metric in child.time_metrics(stats, root, self):
-                yield metric
-
     def trace_node(self, stats, root, connections):
 
         name = '%s/%s' % (self.group, self.name)
@@ -18,14 +18,50 @@ from newrelic.core.attribute_filter import (DST_SPAN_EVENTS,
         DST_TRANSACTION_SEGMENTS)
 
 
+class LazySpanEvent(object):
+
+    """Reference to a node of a finished transaction from which a span
+    event can be built. This allows the building of the attributes for
+    the span event to be deferred until it is known to be required.
+
+    """
+
+    __slots__ = ('node', 'settings', 'base_attrs', 'parent_guid')
+
+    def __init__(self, node, settings, base_attrs, parent_guid):
+        self.node = node
+        self.settings = settings
+        self.base_attrs = base_attrs
+        self.parent_guid = parent_guid
+
+    def span_event(self):
+        return self.node.span_event(
+                self.settings,
+                base_attrs=self.base_attrs,
+                parent_guid=self.parent_guid)
+
+
 class GenericNodeMixin(object):
+    def segment_time_metrics(self, stats, root, parent):
+        # Only function nodes generate the time metrics for their
+        # children, so for all other nodes these are the same.
+
+        return self.time_metrics(stats, root, parent)
+
     @property
     def processed_user_attributes(self):
         if hasattr(self, '_processed_user_attributes'):
             return self._processed_user_attributes
 
+        # Most nodes have no user attributes, in which case there is
+        # nothing to process and no need to create an instance dictionary
+        # for the node to hold the result.
+
+        user_attributes = getattr(self, 'user_attributes', None)
+        if not user_attributes:
+            return {}
+
         self._processed_user_attributes = u_attrs = {}
-        user_attributes = getattr(self, 'user_attributes', u_attrs)
         for k, v in user_attributes.items():
             k, v = attribute.process_user_attribute(k, v)
             u_attrs[k] = v
@@ -81,20 +117,29 @@ class GenericNodeMixin(object):
         return [i_attrs, u_attrs, a_attrs]
 
     def span_events(self,
-            settings, base_attrs=None, parent_guid=None, attr_class=dict):
+            settings, base_attrs=None, parent_guid=None, attr_class=dict,
+            should_sample=None):
 
-        yield self.span_event(
-                settings,
-                base_attrs=base_attrs,
-                parent_guid=parent_guid,
-                attr_class=attr_class)
+        # Where should_sample is supplied and indicates the span event
+        # would not be retained, None is yielded in its place to avoid
+        # building the attributes for it.
+
+        if should_sample is None or should_sample():
+            yield self.span_event(
+                    settings,
+                    base_attrs=base_attrs,
+                    parent_guid=parent_guid,
+                    attr_class=attr_class)
+        else:
+            yield None
 
         for child in self.children:
             for event in child.span_events(
                     settings,
                     base_attrs=base_attrs,
                     parent_guid=self.guid,
-                    attr_class=attr_class):
+                    attr_class=attr_class,
+                    should_sample=should_sample):
                 yield event
 
 
@@ -19,6 +19,7 @@ import threading
 import zlib
 import base64
 
+from array import array
 from collections import deque, defaultdict
 
 import newrelic.packages.six as six
@@ -38,6 +39,17 @@ _logger = logging.getLogger(__name__)
 
 AGENT_PACKAGE_DIRECTORY = os.path.dirname(newrelic.__file__) + '/'
 
+# The profile from continuous profiling isn't the result of a profiling
+# session requested by the data collector, so has no profile ID of its
+# own. This is used in its place.
+
+CONTINUOUS_PROFILE_ID = 0
+
+# The CPU time used by the profiler thread is used to bound the overhead
+# of continuous profiling, where available.
+
+_thread_time = getattr(time, 'thread_time', time.time)
+
 
 class SessionState(object):
     RUNNING = 1
@@ -155,6 +167,25 @@ class ProfileSessionManager(object):
         self.profile_agent_code = False
         self.sample_period_s = 0.1
 
+        # Continuous profiling runs in the same profiler thread as any
+        # full profile session, with its own sample period.
+
+        self.continuous_profile = None
+        self.continuous_profile_app = None
+
+    def _start_profiler_thread(self):
+        # Create a background thread to collect stack traces. Do this only
+        # if a background thread doesn't already exist. Must be called with
+        # the lock held.
+
+        if not self._profiler_thread_running:
+            self._profiler_thread = threading.Thread(
+                    target=self._profiler_loop, name='NR-Profiler-Thread')
+            self._profiler_thread.setDaemon(True)
+
+            self._profiler_thread.start()
+            self._profiler_thread_running = True
+
     def start_profile_session(self, app_name, profile_id, stop_time,
             sample_period_s=0.1, profile_agent_code=False):
         """Start a new profiler session. If a full_profiler is already
@@ -183,16 +214,49 @@ class ProfileSessionManager(object):
             self.full_profile_session = ProfileSession(profile_id, stop_time)
             self.full_profile_app = app_name
 
-            # Create a background thread to collect stack traces. Do this only
-            # if a background thread doesn't already exist.
+            self._start_profiler_thread()
+
+        return True
+
+    def start_continuous_profiling(self, app_name, sample_period_s=0.1,
+            max_overhead=0.02, profile_agent_code=False):
+        """Start always on profiling, with the aggregated profile being
+        reported on each harvest. If continuous profiling is already
+        running, do nothing and return false.
+
+        """
+
+        with self._lock:
+            if self.continuous_profile is not None:
+                return False
+
+            self.continuous_profile = ContinuousProfile(sample_period_s,
+                    max_overhead, profile_agent_code)
+            self.continuous_profile_app = app_name
+
+            self._start_profiler_thread()
+
+        return True
+
+    def stop_continuous_profiling(self, app_name):
+        """Stop continuous profiling and return True when successful. Any
+        profile data not yet reported is kept to be reported with any data
+        for finished profile sessions.
+
+        """
+
+        with self._lock:
+            if (self.continuous_profile is None or
+                    app_name != self.continuous_profile_app):
+                return False
 
-            if not self._profiler_thread_running:
-                self._profiler_thread = threading.Thread(
-                        target=self._profiler_loop, name='NR-Profiler-Thread')
-                self._profiler_thread.setDaemon(True)
+            session = self.continuous_profile.profile_session()
 
-                self._profiler_thread.start()
-                self._profiler_thread_running = True
+            if session is not None:
+                self.finished_sessions[app_name].append(session)
+
+            self.continuous_profile = None
+            self.continuous_profile_app = None
 
         return True
 
@@ -242,6 +306,16 @@ class ProfileSessionManager(object):
 
             self.finished_sessions.pop(app_name)
 
+            # The profile from continuous profiling is reported on each
+            # harvest, starting afresh after each.
+
+            if (self.continuous_profile is not None and
+                    app_name == self.continuous_profile_app):
+                session = self.continuous_profile.profile_session()
+
+                if session is not None:
+                    yield session.profile_data()
+
     def _profiler_loop(self):
         """Infinite loop that wakes up periodically to collect stack traces,
         merge it into call tree if necessary, finally update the state of all
@@ -249,27 +323,62 @@ class ProfileSessionManager(object):
 
         """
 
+        next_full_profile = 0.0
+        next_continuous_profile = 0.0
+
         while True:
 
-            for category, stack in collect_stack_traces(
-                    self.profile_agent_code):
+            now = time.time()
+
+            if self.full_profile_session and now >= next_full_profile:
+                for category, stack in collect_stack_traces(
+                        self.profile_agent_code):
+
+                    # Merge the stack_trace to the call tree only for
+                    # full_profile_session.
+
+                    if self.full_profile_session:
+                        self.full_profile_session.update_call_tree(category,
+                                stack)
+
+                self.update_profile_sessions()
+
+                next_full_profile = now + self.sample_period_s
+
+            continuous_profile = self.continuous_profile
 
-                # Merge the stack_trace to the call tree only for
-                # full_profile_session.
+            if continuous_profile and now >= next_continuous_profile:
+                start = _thread_time()
 
-                if self.full_profile_session:
-                    self.full_profile_session.update_call_tree(category,
-                            stack)
+                with self._lock:
+                    continuous_profile.sample(trace_cache().active_threads())
 
-            self.update_profile_sessions()
+                # Where taking the sample took longer than the overhead
+                # allowed for relative to the sample period, we wait
+                # longer before taking the next sample.
+
+                elapsed = _thread_time() - start
+
+                next_continuous_profile = now + max(
+                        continuous_profile.sample_period_s,
+                        elapsed / continuous_profile.max_overhead)
 
             # Stop the profiler thread if there are no profile sessions.
 
-            if self.full_profile_session is None:
-                self._profiler_thread_running = False
-                return
+            with self._lock:
+                if (self.full_profile_session is None and
+                        self.continuous_profile is None):
+                    self._profiler_thread_running = False
+                    return
+
+            if self.continuous_profile is None:
+                next_sample = next_full_profile
+            elif self.full_profile_session is None:
+                next_sample = next_continuous_profile
+            else:
+                next_sample = min(next_full_profile, next_continuous_profile)
 
-            self._profiler_shutdown.wait(self.sample_period_s)
+            self._profiler_shutdown.wait(max(next_sample - time.time(), 0.0))
 
     def update_profile_sessions(self):
         """Check the current time and decide if any of the profile sessions
@@ -293,6 +402,9 @@ class ProfileSessionManager(object):
         if app_name == self.full_profile_app:
             self.stop_profile_session(app_name)
 
+        if app_name == self.continuous_profile_app:
+            self.stop_continuous_profiling(app_name)
+
         return True
 
 
@@ -313,15 +425,16 @@ class ProfileSession(object):
         self.sample_count = 0
         self.transaction_count = 0
 
-    def update_call_tree(self, bucket_type, stack_trace):
+    def update_call_tree(self, bucket_type, stack_trace, count=1):
         """Merge a single call stack trace into a call tree bucket. If
         no appropriate call tree is found then create a new call tree.
         An appropriate call tree will have the same root node as the
-        last method in the stack trace.
+        last method in the stack trace. The count is the number of
+        times the stack trace was seen.
 
         """
 
-        self.transaction_count += 1
+        self.transaction_count += count
 
         depth = 1
         try:
@@ -337,7 +450,7 @@ class ProfileSession(object):
                 self._node_list.append(call_tree)
                 bucket[method] = call_tree
 
-            call_tree.call_count += 1
+            call_tree.call_count += count
 
             # The call depth is incremented on each recursive call so we
             # know the depth of the call stack. We use this later when
@@ -443,6 +556,164 @@ class ProfileSession(object):
         return profile
 
 
+class ContinuousProfile(object):
+    """Aggregates samples of the stacks of all threads for continuous
+    profiling. Each distinct code object and line number seen in a stack
+    is interned into a table of frames, and each distinct stack is stored
+    once as a tuple of indices into that table, with the number of times
+    it has been seen kept in a flat array. Taking a sample of a stack
+    which has been seen before therefore only needs a lookup of the
+    stack by hash and an increment of its count.
+
+    """
+
+    def __init__(self, sample_period_s=0.1, max_overhead=0.02,
+            profile_agent_code=False):
+        self.sample_period_s = sample_period_s
+        self.max_overhead = max_overhead
+        self.profile_agent_code = profile_agent_code
+        self.reset_profile_data()
+
+    def reset_profile_data(self):
+        self.start_time_s = time.time()
+        self.sample_count = 0
+
+        # The code objects are held on to so that their IDs, which are
+        # used in the keys for stacks, can't be reused by another.
+
+        self._frame_index = {}
+        self._frame_codes = []
+        self._frame_data = []
+
+        self._stack_index = {}
+        self._stack_frames = []
+        self._stack_categories = []
+        self._stack_counts = array('L')
+
+    def sample(self, threads):
+        """Records a sample of the stacks for the threads, given as the
+        items returned by trace_cache().active_threads().
+
+        """
+
+        self.sample_count += 1
+
+        stack_index = self._stack_index
+        stack_counts = self._stack_counts
+
+        for _, _, category, frame in threads:
+            if category == 'AGENT' and not self.profile_agent_code:
+                continue
+
+            key = [category]
+            append = key.append
+
+            top = frame
+
+            while frame is not None:
+                append(id(frame.f_code))
+                append(frame.f_lineno)
+                frame = frame.f_back
+
+            key = tuple(key)
+
+            index = stack_index.get(key)
+
+            if index is None:
+                index = self._add_stack(key, category, top)
+
+            stack_counts[index] += 1
+
+    def _add_stack(self, key, category, frame):
+        frame_index = self._frame_index
+
+        frames = []
+
+        while frame is not None:
+            code = frame.f_code
+            line = frame.f_lineno
+
+            frame = frame.f_back
+
+            # As for format_stack_trace(), frames for the agent code are
+            # dropped except for agent threads.
+
+            if (category != 'AGENT' and
+                    code.co_filename.startswith(AGENT_PACKAGE_DIRECTORY)):
+                continue
+
+            index = frame_index.get((id(code), line))
+
+            if index is None:
+                index = len(self._frame_data)
+                frame_index[(id(code), line)] = index
+                self._frame_codes.append(code)
+                self._frame_data.append((intern(code.co_filename),
+                        intern(code.co_name), code.co_firstlineno, line))
+
+            frames.append(index)
+
+        frames.reverse()
+
+        index = len(self._stack_frames)
+
+        self._stack_index[key] = index
+        self._stack_frames.append(tuple(frames))
+        self._stack_categories.append(category)
+        self._stack_counts.append(0)
+
+        return index
+
+    def stack_traces(self):
+        """Generator that yields the (thread category, stack trace, count)
+        for each distinct stack sampled, with the stack trace in the same
+        form as returned by format_stack_trace().
+
+        """
+
+        frame_data = self._frame_data
+
+        for frames, category, count in zip(self._stack_frames,
+                self._stack_categories, self._stack_counts):
+
+            if not frames:
+                continue
+
+            stack_trace = [frame_data[index] for index in frames]
+
+            # Add the fake leaf node with line number of where the code
+            # was executing at the point of the sample.
+
+            filename, func_name, _, real_line = stack_trace[-1]
+            stack_trace.append((filename, func_name, real_line, real_line))
+
+            yield category, stack_trace, count
+
+    def profile_session(self):
+        """Returns a finished profile session holding the call tree for
+        the samples since this was last called, or None if there were no
+        samples. The aggregated data is reset.
+
+        """
+
+        if not self.sample_count:
+            return None
+
+        session = ProfileSession(CONTINUOUS_PROFILE_ID, time.time())
+        session.start_time_s = self.start_time_s
+
+        for category, stack_trace, count in self.stack_traces():
+            session.update_call_tree(category, stack_trace, count)
+
+        session.sample_count = self.sample_count
+        session.state = SessionState.FINISHED
+        session.actual_stop_time_s = time.time()
+
+        self.reset_profile_data()
+
+        return session
+
+
 class CallTree(object):
     def __init__(self, method_data, call_count=0, depth=1):
         self.method_data = method_data
@@ -16,6 +16,8 @@ import re
 
 from collections import namedtuple
 
+from newrelic.common.lru_cache import LRUCache
+
 _NormalizationRule = namedtuple('_NormalizationRule',
         ['match_expression', 'replacement', 'ignore', 'eval_order',
         'terminate_chain', 'each_segment', 'replace_all'])
@@ -37,6 +39,21 @@ class NormalizationRule(_NormalizationRule):
 
 class RulesEngine(object):
 
+    # The same names are normalized over and over, both when naming
+    # transactions and when renaming metrics at harvest time, so the
+    # result for each name is remembered in a bounded cache.
+    #
+    # For a name not yet in the cache, all the rules are first checked
+    # at once using a combined matcher. This consists of one regular
+    # expression alternating the patterns of the rules applied to the
+    # whole name, and another alternating the patterns of the rules
+    # applied to each segment of the name. A rule which doesn't match
+    # leaves the name unchanged, so if neither combined expression
+    # matches the name, no rule will match as they are applied in turn,
+    # and the name is returned unchanged without evaluating each rule.
+
+    CACHE_MAXIMUM = 10000
+
     def __init__(self, rules):
         self.__rules = []
 
@@ -49,10 +66,70 @@ class RulesEngine(object):
 
         self.__rules = sorted(self.__rules, key=lambda rule: rule.eval_order)
 
+        self.__string_matcher = self._combined_matcher(
+                [rule for rule in self.__rules if not rule.each_segment])
+        self.__segment_matcher = self._combined_matcher(
+                [rule for rule in self.__rules if rule.each_segment])
+
+        self.cache = LRUCache(maximum=self.CACHE_MAXIMUM)
+
     @property
     def rules(self):
         return self.__rules
 
+    @staticmethod
+    def _combined_matcher(rules):
+        """Returns a function which can be used to check whether any of
+        the rules would match a string, or None if the patterns of the
+        rules cannot be combined into a single regular expression.
+
+        """
+
+        if not rules:
+            return lambda string: False
+
+        # Combining the patterns changes the numbering of any groups, so
+        # patterns which refer back to a group can't be combined. Nor can
+        # patterns setting flags, as they would apply to all patterns.
+
+        for rule in rules:
+            if re.search(r'\\[1-9]|\(\?P=|\(\?[aiLmsux]+\)',
+                    rule.match_expression):
+                return None
+
+        pattern = u'|'.join([u'(?:%s)' % rule.match_expression
+                for rule in rules])
+
+        try:
+            return re.compile(pattern, re.IGNORECASE).search
+
+        except re.error:
+            return None
+
+    def _matches(self, string):
+        string_matcher = self.__string_matcher
+        segment_matcher = self.__segment_matcher
+
+        if string_matcher is None or segment_matcher is None:
+            return True
+
+        if string_matcher(string):
+            return True
+
+        segments = string.split('/')
+
+        # The leading empty segment is skipped when applying a rule to
+        # each segment, so is skipped here also.
+
+        if segments and not segments[0]:
+            segments = segments[1:]
+
+        for segment in segments:
+            if segment_matcher(segment):
+                return True
+
+        return False
+
     def normalize(self, string):
         # URLs are supposed to be ASCII but can get a
         # URL with illegal non ASCII characters. As the
@@ -66,6 +143,22 @@ class RulesEngine(object):
         if isinstance(string, bytes):
             string = string.decode('Latin-1')
 
+        if not self.__rules:
+            return (string, False)
+
+        result = self.cache.get(string)
+
+        if result is None:
+            if self._matches(string):
+                result = self._normalize(string)
+            else:
+                result = (string, False)
+
+            self.cache.put(string, result)
+
+        return result
+
+    def _normalize(self, string):
         final_string = string
         ignore = False
         for rule in self.__rules:
@@ -119,8 +212,11 @@ class SegmentCollapseEngine(object):
 
     COLLAPSE_STAR_RE = re.compile(r'((?:^|/)\*)(?:/\*)*')
 
+    CACHE_MAXIMUM = 10000
+
     def __init__(self, rules):
         self.rules = {}
+        self.cache = LRUCache(maximum=self.CACHE_MAXIMUM)
 
         prefixes = []
 
@@ -186,6 +282,18 @@ class SegmentCollapseEngine(object):
         if not match:
             return txn_name, False
 
+        # Only names matching a prefix are remembered, as checking the
+        # prefix is cheaper than looking up the cache.
+
+        result = self.cache.get(txn_name)
+
+        if result is None:
+            result = self._collapse(txn_name, match)
+            self.cache.put(txn_name, result)
+
+        return result
+
+    def _collapse(self, txn_name, match):
         prefix = match.group(1)
 
         whitelist_terms = self.rules.get(prefix)
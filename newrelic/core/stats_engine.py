@@ -27,7 +27,8 @@ import random
 import zlib
 import time
 import sys
-from heapq import heapreplace, heapify
+from array import array
+from heapq import heapify, heappop, heapreplace
 
 import newrelic.packages.six as six
 
@@ -38,11 +39,13 @@ from newrelic.core.attribute import process_user_attribute
 from newrelic.core.database_utils import explain_plan
 from newrelic.core.error_collector import TracedError
 from newrelic.core.metric import TimeMetric
+from newrelic.core.node_mixin import LazySpanEvent
 from newrelic.core.stack_trace import exception_stack
 
 from newrelic.api.settings import STRIP_EXCEPTION_MESSAGE
 from newrelic.common.encoding_utils import json_encode
-from newrelic.common.streaming_utils import StreamBuffer
+from newrelic.common.streaming_utils import (StreamBuffer,
+        SpanBatchStreamBuffer)
 
 _logger = logging.getLogger(__name__)
 
@@ -210,6 +213,20 @@ class CustomMetrics(object):
         else:
             stats.merge_stats(new_stats)
 
+    def merge_custom_metrics(self, metrics):
+        """Merges in a set of value metrics. The metrics should be provided
+        as an iterable where each item is a tuple of the metric name and
+        the accumulated stats for the metric.
+
+        """
+
+        for name, other in metrics:
+            stats = self.__stats_table.get(name)
+            if stats is None:
+                self.__stats_table[name] = copy.copy(other)
+            else:
+                stats.merge_stats(other)
+
     def metrics(self):
         """Returns an iterator over the set of value metrics. The items
         returned are a tuple consisting of the metric name and accumulated
@@ -227,6 +244,296 @@ class CustomMetrics(object):
         self.__stats_table = {}
 
 
+class StatsTable(dict):
+
+    """Table for accumulating apdex, time and value metrics, where each
+    (name, scope) key maps to its own stats object.
+
+    """
+
+    def record_time(self, key, duration, exclusive=None):
+        stats = self.get(key)
+        if stats is None:
+            if exclusive is None:
+                exclusive = duration
+            self[key] = TimeStats(call_count=1,
+                    total_call_time=duration,
+                    total_exclusive_call_time=exclusive,
+                    min_call_time=duration,
+                    max_call_time=duration,
+                    sum_of_squares=duration ** 2)
+        else:
+            stats.merge_raw_time_metric(duration, exclusive)
+
+    def record_apdex(self, key, metric):
+        stats = self.get(key)
+        if stats is None:
+            stats = ApdexStats(apdex_t=metric.apdex_t)
+            self[key] = stats
+        stats.merge_apdex_metric(metric)
+
+    def merge_stats(self, key, other):
+        stats = self.get(key)
+        if not stats:
+            self[key] = other
+        else:
+            stats.merge_stats(other)
+
+    def merge_table(self, other):
+        for key, other_stats in six.iteritems(other):
+            self.merge_stats(key, other_stats)
+
+    def normalize(self, normalizer):
+        result = StatsTable()
+        for key, value in six.iteritems(self):
+            key = (normalizer(key[0])[0], key[1])
+            stats = result.get(key)
+            if stats is None:
+                result[key] = copy.copy(value)
+            else:
+                stats.merge_stats(value)
+        return result
+
+    def metric_data(self):
+        return [(dict(name=key[0], scope=key[1]), value)
+                for key, value in six.iteritems(self)]
+
+
+_TIME_STATS = 0
+_APDEX_STATS = 1
+_COUNT_STATS = 2
+
+
+def _count(value):
+    # Counts are accumulated as doubles but are reported as integers
+    # where they hold whole numbers, as is the case for the stats objects.
+
+    return int(value) if value.is_integer() else value
+
+
+class MetricStatsTable(object):
+
+    """Columnar table for accumulating apdex, time and value metrics.
+    Rather than holding a stats object per (name, scope) key, the keys map
+    to a row index into parallel arrays of doubles, one per field of the
+    stats. This avoids a list and six boxed numbers per metric, which
+    for applications with tens of thousands of unique metrics is a large
+    part of the memory used by the stats engine and of the objects the
+    garbage collector has to track.
+
+    The table supports the read only mapping interface of StatsTable,
+    with values materialized as stats objects on access, so it can be
+    used in place of it. Changing a stats object obtained from the table
+    does not change the table.
+
+    For apdex metrics the count, total, exclusive, min and max columns
+    hold the satisfying, tolerating and frustrating counts and the
+    minimum and maximum apdex_t respectively.
+
+    """
+
+    def __init__(self):
+        self._index = {}
+        self._keys = []
+        self._kind = array('b')
+        self._call_count = array('d')
+        self._total = array('d')
+        self._exclusive = array('d')
+        self._min = array('d')
+        self._max = array('d')
+        self._sum_of_squares = array('d')
+
+    def _add_row(self, key, kind):
+        row = len(self._keys)
+        self._index[key] = row
+        self._keys.append(key)
+        self._kind.append(kind)
+        self._call_count.append(0.0)
+        self._total.append(0.0)
+        self._exclusive.append(0.0)
+        self._min.append(0.0)
+        self._max.append(0.0)
+        self._sum_of_squares.append(0.0)
+        return row
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __getitem__(self, key):
+        return self._stats(self._index[key])
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def keys(self):
+        return list(self._keys)
+
+    def get(self, key, default=None):
+        row = self._index.get(key)
+        if row is None:
+            return default
+        return self._stats(row)
+
+    def items(self):
+        return [(key, self._stats(row)) for row, key in enumerate(self._keys)]
+
+    def values(self):
+        return [self._stats(row) for row in range(len(self._keys))]
+
+    iteritems = items
+
+    def _stats(self, row):
+        kind = self._kind[row]
+        if kind == _APDEX_STATS:
+            stats = ApdexStats(_count(self._call_count[row]),
+                    _count(self._total[row]), _count(self._exclusive[row]))
+            stats[3] = self._min[row]
+            stats[4] = self._max[row]
+            return stats
+
+        cls = kind == _COUNT_STATS and CountStats or TimeStats
+        return cls(_count(self._call_count[row]), self._total[row],
+                self._exclusive[row], self._min[row], self._max[row],
+                self._sum_of_squares[row])
+
+    def record_time(self, key, duration, exclusive=None):
+        if exclusive is None:
+            exclusive = duration
+
+        row = self._index.get(key)
+        if row is None:
+            row = self._add_row(key, _TIME_STATS)
+        elif self._kind[row] != _TIME_STATS:
+            return
+
+        if self._call_count[row]:
+            self._min[row] = min(self._min[row], duration)
+            self._max[row] = max(self._max[row], duration)
+        else:
+            self._min[row] = duration
+            self._max[row] = duration
+
+        self._call_count[row] += 1
+        self._total[row] += duration
+        self._exclusive[row] += exclusive
+        self._sum_of_squares[row] += duration ** 2
+
+    def record_apdex(self, key, metric):
+        row = self._index.get(key)
+        if row is None:
+            row = self._add_row(key, _APDEX_STATS)
+            self._min[row] = metric.apdex_t
+            self._max[row] = metric.apdex_t
+
+        self._merge_apdex_row(row, metric.satisfying, metric.tolerating,
+                metric.frustrating, metric.apdex_t)
+
+    def _merge_apdex_row(self, row, satisfying, tolerating, frustrating,
+            apdex_t):
+        self._call_count[row] += satisfying
+        self._total[row] += tolerating
+        self._exclusive[row] += frustrating
+
+        if (self._call_count[row] or self._total[row] or
+                self._exclusive[row]):
+            self._min[row] = min(self._min[row], apdex_t)
+        else:
+            self._min[row] = apdex_t
+        self._max[row] = max(self._max[row], apdex_t)
+
+    def _merge_row(self, row, kind, call_count, total, exclusive,
+            min_call_time, max_call_time, sum_of_squares):
+        if kind == _APDEX_STATS:
+            # Matches ApdexStats.merge_stats(), where the minimum apdex_t
+            # of the other stats is used for both the minimum and maximum.
+
+            self._merge_apdex_row(row, call_count, total, exclusive,
+                    min_call_time)
+
+        elif kind == _COUNT_STATS:
+            self._call_count[row] += call_count
+
+        else:
+            if self._call_count[row]:
+                self._min[row] = min(self._min[row], min_call_time)
+            else:
+                self._min[row] = min_call_time
+            self._max[row] = max(self._max[row], max_call_time)
+
+            self._call_count[row] += call_count
+            self._total[row] += total
+            self._exclusive[row] += exclusive
+            self._sum_of_squares[row] += sum_of_squares
+
+    def _merge(self, key, kind, values):
+        row = self._index.get(key)
+        if row is None:
+            row = self._add_row(key, kind)
+            (self._call_count[row], self._total[row], self._exclusive[row],
+                    self._min[row], self._max[row],
+                    self._sum_of_squares[row]) = values
+        else:
+            self._merge_row(row, self._kind[row], *values)
+
+    def merge_stats(self, key, other):
+        if isinstance(other, ApdexStats):
+            kind = _APDEX_STATS
+        elif isinstance(other, CountStats):
+            kind = _COUNT_STATS
+        else:
+            kind = _TIME_STATS
+
+        self._merge(key, kind, (other[0], other[1], other[2] or 0.0,
+                other[3], other[4], other[5]))
+
+    def merge_table(self, other):
+        if not isinstance(other, MetricStatsTable):
+            for key, other_stats in six.iteritems(other):
+                self.merge_stats(key, other_stats)
+            return
+
+        # Merge row by row straight from the columns of the other table
+        # without materializing any stats objects.
+
+        columns = (other._call_count, other._total, other._exclusive,
+                other._min, other._max, other._sum_of_squares)
+
+        for other_row, key in enumerate(other._keys):
+            self._merge(key, other._kind[other_row],
+                    [column[other_row] for column in columns])
+
+    def normalize(self, normalizer):
+        result = MetricStatsTable()
+        names = {}
+
+        columns = (self._call_count, self._total, self._exclusive,
+                self._min, self._max, self._sum_of_squares)
+
+        for row, key in enumerate(self._keys):
+            # The same name is commonly used with many scopes, so only
+            # apply the normalizer once for each distinct name.
+
+            name = key[0]
+            normalized = names.get(name)
+            if normalized is None:
+                normalized = names[name] = normalizer(name)[0]
+
+            result._merge((normalized, key[1]), self._kind[row],
+                    [column[row] for column in columns])
+
+        return result
+
+    def metric_data(self):
+        return [(dict(name=key[0], scope=key[1]), self._stats(row))
+                for row, key in enumerate(self._keys)]
+
+
 class SlowSqlStats(list):
 
     def __init__(self):
@@ -272,6 +579,17 @@ class SlowSqlStats(list):
 
 
 class SampledDataSet(object):
+
+    """Reservoir of samples, each with a priority, which retains the samples
+    with the highest priorities up to capacity. Where priorities are equal,
+    the samples seen first are retained. Once at capacity, the samples are
+    kept as a heap, so the lowest priority retained, which a new sample
+    must exceed to be added, can be checked in constant time. The check
+    can be made using should_sample() before constructing a sample, with
+    skip() being used to count any sample not constructed as a result.
+
+    """
+
     def __init__(self, capacity=100):
         self.pq = []
         self.heap = False
@@ -310,13 +628,18 @@ class SampledDataSet(object):
         if self.heap:
             # self.pq[0] is always the minimal
             # priority sample in the queue
-            if priority > self.pq[0][0]:
-                return True
-            else:
-                return False
+            return priority > self.pq[0][0]
 
         # Always sample if under capacity
-        return True
+        return self.capacity > 0
+
+    def skip(self, count=1):
+        """Counts samples which were seen, but not added as should_sample()
+        had indicated they would not be retained.
+
+        """
+
+        self.num_seen += count
 
     def add(self, sample, priority=None):
         self.num_seen += 1
@@ -324,26 +647,56 @@ class SampledDataSet(object):
         if priority is None:
             priority = random.random()
 
-        entry = (priority, self.num_seen, sample)
-        if self.num_seen == self.capacity:
-            self.pq.append(entry)
-            self.heap = self.heap or heapify(self.pq) or True
-        elif not self.heap:
-            self.pq.append(entry)
+        # The entries in the queue use the negated sequence number of the
+        # sample as the tie breaker for equal priorities, so that of the
+        # samples with the lowest priority, the last seen is replaced
+        # first. The sequence number being unique also means the samples
+        # themselves are never compared.
+
+        if self.heap:
+            if priority > self.pq[0][0]:
+                heapreplace(self.pq, (priority, -self.num_seen, sample))
         else:
-            sampled = self.should_sample(priority)
-            if not sampled:
-                return
-            heapreplace(self.pq, entry)
+            self.pq.append((priority, -self.num_seen, sample))
+            if len(self.pq) >= self.capacity:
+                heapify(self.pq)
+                self.heap = True
 
     def merge(self, other_data_set):
-        for priority, seen_at, sample in other_data_set.pq:
-            self.add(sample, priority)
+        entries = other_data_set.pq
 
-        # Merge the num_seen from the other_data_set, but take care not to
-        # double-count the actual samples of other_data_set since the .add
-        # call above will add one to self.num_seen each time
-        self.num_seen += other_data_set.num_seen - other_data_set.num_samples
+        # Where already at capacity, first discard any samples which do
+        # not have a high enough priority to be retained.
+
+        if self.heap:
+            minimum = self.pq[0][0]
+            entries = [entry for entry in entries if entry[0] > minimum]
+
+        if entries and self.capacity > 0:
+            # Sequence the samples from the other data set as being seen
+            # after those in this data set, keeping the order in which
+            # they were originally seen.
+
+            entries = sorted(entries, key=operator.itemgetter(1),
+                    reverse=True)
+
+            sequence = self.num_seen
+            entries = [(priority, -(sequence + index), sample)
+                    for index, (priority, _, sample) in enumerate(entries, 1)]
+
+            if self.heap:
+                for entry in entries:
+                    if entry[0] > self.pq[0][0]:
+                        heapreplace(self.pq, entry)
+            else:
+                self.pq.extend(entries)
+                if len(self.pq) >= self.capacity:
+                    heapify(self.pq)
+                    while len(self.pq) > self.capacity:
+                        heappop(self.pq)
+                    self.heap = True
+
+        self.num_seen += other_data_set.num_seen
 
 
 class LimitedDataSet(list):
@@ -426,12 +779,13 @@ class StatsEngine(object):
 
     def __init__(self):
         self.__settings = None
-        self.__stats_table = {}
+        self.__stats_table = StatsTable()
         self._transaction_events = SampledDataSet()
         self._error_events = SampledDataSet()
         self._custom_events = SampledDataSet()
         self._span_events = SampledDataSet()
         self._span_stream = None
+        self._parent = None
         self.__sql_stats_table = {}
         self.__slow_transaction = None
         self.__slow_transaction_map = {}
@@ -501,11 +855,7 @@ class StatsEngine(object):
         # as an empty string anyway.
 
         key = (metric.name, '')
-        stats = self.__stats_table.get(key)
-        if stats is None:
-            stats = ApdexStats(apdex_t=metric.apdex_t)
-            self.__stats_table[key] = stats
-        stats.merge_apdex_metric(metric)
+        self.__stats_table.record_apdex(key, metric)
 
         return key
 
@@ -535,17 +885,7 @@ class StatsEngine(object):
         # scope of None is reserved for apdex metrics.
 
         key = (metric.name, metric.scope or '')
-        stats = self.__stats_table.get(key)
-        if stats is None:
-            stats = TimeStats(call_count=1,
-                    total_call_time=metric.duration,
-                    total_exclusive_call_time=metric.exclusive,
-                    min_call_time=metric.duration,
-                    max_call_time=metric.duration,
-                    sum_of_squares=metric.duration ** 2)
-            self.__stats_table[key] = stats
-        else:
-            stats.merge_time_metric(metric)
+        self.__stats_table.record_time(key, metric.duration, metric.exclusive)
 
         return key
 
@@ -562,6 +902,20 @@ class StatsEngine(object):
         for metric in metrics:
             self.record_time_metric(metric)
 
+    def merge_time_metrics(self, metrics):
+        """Merges in a set of time metrics which have already been
+        accumulated. The metrics should be provided as an iterable where
+        each item is a tuple of the (name, scope) key and the accumulated
+        stats for the metric.
+
+        """
+
+        if not self.__settings:
+            return
+
+        for key, other in metrics:
+            self.__stats_table.merge_stats(key, other)
+
     def record_exception(self, exc=None, value=None, tb=None, params={},
             ignore_errors=[]):
 
@@ -769,11 +1123,7 @@ class StatsEngine(object):
         else:
             new_stats = TimeStats(1, value, value, value, value, value**2)
 
-        stats = self.__stats_table.get(key)
-        if stats is None:
-            self.__stats_table[key] = new_stats
-        else:
-            stats.merge_stats(new_stats)
+        self.__stats_table.merge_stats(key, new_stats)
 
         return key
 
@@ -906,6 +1256,8 @@ class StatsEngine(object):
 
         self.record_time_metrics(transaction.time_metrics(self))
 
+        self.merge_time_metrics(transaction.folded_time_metrics())
+
         # Capture any errors if error collection is enabled.
         # Only retain maximum number allowed per harvest.
 
@@ -985,8 +1337,57 @@ class StatsEngine(object):
                 for event in transaction.span_protos(settings):
                     self._span_stream.put(event)
             elif transaction.sampled:
-                for event in transaction.span_events(self.__settings):
-                    self._span_events.add(event, priority=transaction.priority)
+                # Check whether each span event would be retained before
+                # its attributes are built, so that span events which would
+                # only be discarded again are just counted. For a workarea,
+                # this includes checking against the span events held by
+                # the stats engine it will be merged into. That check is
+                # made without holding the lock for that stats engine, but
+                # the lowest priority retained there only increases until
+                # the next harvest.
+
+                span_events = self._span_events
+                priority = transaction.priority
+
+                parent = self._parent
+                parent_span_events = parent and parent._span_events
+
+                def should_sample():
+                    if (parent_span_events is not None and
+                            not parent_span_events.should_sample(priority)):
+                        return False
+                    return span_events.should_sample(priority)
+
+                # Where enabled, only references to the nodes the span
+                # events would be built from are retained, with the span
+                # events only being built when harvested.
+
+                if settings.stats_engine.lazy_span_events:
+                    events = transaction.lazy_span_events(self.__settings,
+                            should_sample=should_sample)
+                else:
+                    events = transaction.span_events(self.__settings,
+                            should_sample=should_sample)
+
+                for event in events:
+                    if event is None:
+                        span_events.skip()
+                    else:
+                        span_events.add(event, priority=priority)
+
+    def span_event_data(self):
+        """Returns a list of the span events retained for the reporting
+        period. Where references to the nodes of transactions were
+        retained in place of span events, the span events are built from
+        those nodes at this point.
+
+        """
+
+        if not self._span_events:
+            return []
+
+        return [event.span_event() if isinstance(event, LazySpanEvent)
+                else event for event in self._span_events]
 
     def metric_data(self, normalizer=None):
         """Returns a list containing the low level metric data for
@@ -1003,9 +1404,6 @@ class StatsEngine(object):
         if not self.__settings:
             return []
 
-        result = []
-        normalized_stats = {}
-
         # Metric Renaming and Re-Aggregation. After applying the metric
         # renaming rules, the metrics are re-aggregated to collapse the
         # metrics with same names after the renaming.
@@ -1016,13 +1414,7 @@ class StatsEngine(object):
                     list(six.iteritems(self.__stats_table)))
 
         if normalizer is not None:
-            for key, value in six.iteritems(self.__stats_table):
-                key = (normalizer(key[0])[0], key[1])
-                stats = normalized_stats.get(key)
-                if stats is None:
-                    normalized_stats[key] = copy.copy(value)
-                else:
-                    stats.merge_stats(value)
+            normalized_stats = self.__stats_table.normalize(normalizer)
         else:
             normalized_stats = self.__stats_table
 
@@ -1031,11 +1423,7 @@ class StatsEngine(object):
                     self.__settings.app_name,
                     list(six.iteritems(normalized_stats)))
 
-        for key, value in six.iteritems(normalized_stats):
-            key = dict(name=key[0], scope=key[1])
-            result.append((key, value))
-
-        return result
+        return normalized_stats.metric_data()
 
     def metric_data_count(self):
         """Returns a count of the number of unique metrics.
@@ -1058,6 +1446,89 @@ class StatsEngine(object):
 
         return self.__transaction_errors
 
+    def _slow_sql_stats_nodes(self):
+        maximum = self.__settings.agent_limits.slow_sql_data
+
+        return sorted(six.itervalues(self.__sql_stats_table),
+                key=lambda x: x.max_call_time)[-maximum:]
+
+    def _transaction_traces(self):
+        # Create a set 'traces' that is a union of slow transaction,
+        # and Synthetics transactions. This ensures we don't send
+        # duplicates of a transaction.
+
+        traces = set()
+        if self.__slow_transaction:
+            traces.add(self.__slow_transaction)
+        traces.update(self.__synthetics_transactions)
+
+        return traces
+
+    def _flag_explain_plans(self, traces):
+        # We want to limit the number of explain plans we do across
+        # these. So work out what were the slowest and tag them.
+        # Later the explain plan will only be run on those which are
+        # tagged.
+
+        agent_limits = self.__settings.agent_limits
+        explain_plan_limit = agent_limits.sql_explain_plans_per_harvest
+        maximum_nodes = agent_limits.transaction_traces_nodes
+
+        database_nodes = []
+
+        if explain_plan_limit != 0:
+            for trace in traces:
+                for node in trace.slow_sql:
+                    # Make sure we clear any flag for explain plans on
+                    # the nodes in case a transaction trace was merged
+                    # in from previous harvest period.
+
+                    node.generate_explain_plan = False
+
+                    # Node should be excluded if not for an operation
+                    # that we can't do an explain plan on. Also should
+                    # not be one which would not be included in the
+                    # transaction trace because limit was reached.
+
+                    if (node.node_count < maximum_nodes and
+                            node.connect_params and node.statement.operation in
+                            node.statement.database.explain_stmts):
+                        database_nodes.append(node)
+
+            database_nodes = sorted(database_nodes,
+                    key=lambda x: x.duration)[-explain_plan_limit:]
+
+            for node in database_nodes:
+                node.generate_explain_plan = True
+
+        else:
+            for trace in traces:
+                for node in trace.slow_sql:
+                    node.generate_explain_plan = True
+                    database_nodes.append(node)
+
+        return database_nodes
+
+    def explain_plan_nodes(self):
+        """Returns the database nodes that slow_sql_data() and
+        transaction_trace_data() would run explain plans for, so the
+        explain plans can be run ahead of generating the data.
+
+        """
+
+        if not self.__settings:
+            return []
+
+        nodes = []
+
+        if self.__sql_stats_table and self.__settings.slow_sql.enabled:
+            nodes.extend(stats_node.slow_sql_node
+                    for stats_node in self._slow_sql_stats_nodes())
+
+        nodes.extend(self._flag_explain_plans(self._transaction_traces()))
+
+        return nodes
+
     def slow_sql_data(self, connections):
 
         _logger.debug('Generating slow SQL data.')
@@ -1071,14 +1542,9 @@ class StatsEngine(object):
         if not self.__settings.slow_sql.enabled:
             return []
 
-        maximum = self.__settings.agent_limits.slow_sql_data
-
-        slow_sql_nodes = sorted(six.itervalues(self.__sql_stats_table),
-                key=lambda x: x.max_call_time)[-maximum:]
-
         result = []
 
-        for stats_node in slow_sql_nodes:
+        for stats_node in self._slow_sql_stats_nodes():
 
             slow_sql_node = stats_node.slow_sql_node
 
@@ -1152,61 +1618,16 @@ class StatsEngine(object):
         if not self.__settings:
             return []
 
-        # Create a set 'traces' that is a union of slow transaction,
-        # and Synthetics transactions. This ensures we don't send
-        # duplicates of a transaction.
-
-        traces = set()
-        if self.__slow_transaction:
-            traces.add(self.__slow_transaction)
-        traces.update(self.__synthetics_transactions)
+        traces = self._transaction_traces()
 
         # Return an empty list if no transactions were captured.
 
         if not traces:
             return []
 
-        # We want to limit the number of explain plans we do across
-        # these. So work out what were the slowest and tag them.
-        # Later the explain plan will only be run on those which are
-        # tagged.
-
-        agent_limits = self.__settings.agent_limits
-        explain_plan_limit = agent_limits.sql_explain_plans_per_harvest
-        maximum_nodes = agent_limits.transaction_traces_nodes
-
-        database_nodes = []
-
-        if explain_plan_limit != 0:
-            for trace in traces:
-                for node in trace.slow_sql:
-                    # Make sure we clear any flag for explain plans on
-                    # the nodes in case a transaction trace was merged
-                    # in from previous harvest period.
-
-                    node.generate_explain_plan = False
-
-                    # Node should be excluded if not for an operation
-                    # that we can't do an explain plan on. Also should
-                    # not be one which would not be included in the
-                    # transaction trace because limit was reached.
-
-                    if (node.node_count < maximum_nodes and
-                            node.connect_params and node.statement.operation in
-                            node.statement.database.explain_stmts):
-                        database_nodes.append(node)
-
-            database_nodes = sorted(database_nodes,
-                    key=lambda x: x.duration)[-explain_plan_limit:]
-
-            for node in database_nodes:
-                node.generate_explain_plan = True
+        self._flag_explain_plans(traces)
 
-        else:
-            for trace in traces:
-                for node in trace.slow_sql:
-                    node.generate_explain_plan = True
-                    database_nodes.append(node)
+        maximum_nodes = self.__settings.agent_limits.transaction_traces_nodes
 
         # Now generate the transaction traces. We need to cap the
         # number of nodes capture to the specified limit.
@@ -1324,7 +1745,7 @@ class StatsEngine(object):
         """
 
         self.__settings = settings
-        self.__stats_table = {}
+        self.__stats_table = self._create_stats_table()
         self.__sql_stats_table = {}
         self.__slow_transaction = None
         self.__slow_transaction_map = {}
@@ -1339,8 +1760,12 @@ class StatsEngine(object):
         self.reset_synthetics_events()
         # streams are never reset after instantiation
         if reset_stream:
-            self._span_stream = StreamBuffer(
-                settings.infinite_tracing.span_queue_size)
+            if settings.infinite_tracing.batching:
+                self._span_stream = SpanBatchStreamBuffer(
+                    settings.infinite_tracing.span_queue_size)
+            else:
+                self._span_stream = StreamBuffer(
+                    settings.infinite_tracing.span_queue_size)
 
     def reset_metric_stats(self):
         """Resets the accumulated statistics back to initial state for
@@ -1348,7 +1773,13 @@ class StatsEngine(object):
 
         """
 
-        self.__stats_table = {}
+        self.__stats_table = self._create_stats_table()
+
+    def _create_stats_table(self):
+        settings = self.__settings
+        if settings is not None and settings.stats_engine.columnar_metrics:
+            return MetricStatsTable()
+        return StatsTable()
 
     def reset_transaction_events(self):
         """Resets the accumulated statistics back to initial state for
@@ -1434,7 +1865,7 @@ class StatsEngine(object):
         self.__slow_transaction = None
         self.__synthetics_transactions = []
         self.__sql_stats_table = {}
-        self.__stats_table = {}
+        self.__stats_table = self._create_stats_table()
         self.__transaction_errors = []
 
     def harvest_snapshot(self, flexible=False):
@@ -1493,6 +1924,7 @@ class StatsEngine(object):
 
         stats = copy.copy(self)
         stats.reset_stats(self.__settings)
+        stats._parent = self
 
         return stats
 
@@ -1514,6 +1946,26 @@ class StatsEngine(object):
         self._merge_sql(snapshot)
         self._merge_traces(snapshot)
 
+    def merge_shard(self, shard):
+        """Merges data from a long lived stats engine shard. Unlike the
+        snapshot passed to merge(), a shard holds the data for all the
+        transactions recorded against it by one thread since the last
+        harvest, so all of its transaction events need to be merged in.
+        """
+
+        if not self.__settings:
+            return
+
+        self.merge_metric_stats(shard)
+        self._merge_transaction_events(shard, rollback=True)
+        self._merge_synthetics_events(shard)
+        self._merge_error_events(shard)
+        self._merge_error_traces(shard)
+        self._merge_custom_events(shard)
+        self._merge_span_events(shard)
+        self._merge_sql(shard)
+        self._merge_traces(shard)
+
     def rollback(self, snapshot):
         """Performs a "rollback" merge after a failed harvest. Snapshot is a
         copy of the main StatsEngine data that we attempted to harvest, but
@@ -1544,12 +1996,7 @@ class StatsEngine(object):
         if not self.__settings:
             return
 
-        for key, other in six.iteritems(snapshot.__stats_table):
-            stats = self.__stats_table.get(key)
-            if not stats:
-                self.__stats_table[key] = other
-            else:
-                stats.merge_stats(other)
+        self.__stats_table.merge_table(snapshot.__stats_table)
 
     def _merge_transaction_events(self, snapshot, rollback=False):
 
@@ -1663,12 +2110,7 @@ class StatsEngine(object):
             return
 
         for name, other in metrics:
-            key = (name, '')
-            stats = self.__stats_table.get(key)
-            if not stats:
-                self.__stats_table[key] = other
-            else:
-                stats.merge_stats(other)
+            self.__stats_table.merge_stats((name, ''), other)
 
     def _snapshot(self):
         copy = object.__new__(StatsEngineSnapshot)
@@ -1677,6 +2119,17 @@ class StatsEngine(object):
 
 
 class StatsEngineSnapshot(StatsEngine):
+    def __getstate__(self):
+        # A snapshot is pickled when passed to the aggregator in another
+        # process, which merges it using its own settings. The span stream
+        # and parent only apply in the process the snapshot was taken in.
+
+        state = dict(self.__dict__)
+        state['_StatsEngine__settings'] = None
+        state['_span_stream'] = None
+        state['_parent'] = None
+        return state
+
     def reset_transaction_events(self):
         self._transaction_events = None
 
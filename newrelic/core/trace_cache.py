@@ -28,6 +28,11 @@ try:
 except ImportError:
     import _thread as thread
 
+try:
+    import contextvars
+except ImportError:
+    contextvars = None
+
 from newrelic.core.config import global_settings
 from newrelic.core.loop_node import LoopNode
 
@@ -97,6 +102,11 @@ class TraceCache(object):
     asyncio = cached_module("asyncio")
     greenlet = cached_module("greenlet")
 
+    # Whether the current trace is carried over automatically into any
+    # asyncio task created while it is active.
+
+    propagates_context = False
+
     def __init__(self):
         self._cache = weakref.WeakValueDictionary()
 
@@ -130,6 +140,35 @@ class TraceCache(object):
 
         return thread.get_ident()
 
+    def is_coroutine(self, thread_id):
+        """Returns whether the thread ID, as returned by calling
+        current_thread_id() from the caller, is that of a greenlet or
+        asyncio task rather than of a thread.
+
+        This only needs to look at the greenlet or task the caller is
+        running in. Looking for the thread ID amongst the IDs of all
+        threads in sys._current_frames() would take time proportional
+        to the number of threads.
+
+        """
+
+        # Where greenlets are used, thread.get_ident() may have been
+        # monkey patched to return the ID of the current greenlet, in
+        # which case that of the root greenlet is also treated as being
+        # for a coroutine.
+
+        if self.greenlet:
+            current = self.greenlet.getcurrent()
+            if current is not None and id(current) == thread_id:
+                return True
+
+        if self.asyncio:
+            task = current_task(self.asyncio)
+            if task is not None and id(task) == thread_id:
+                return True
+
+        return False
+
     def task_start(self, task):
         trace = self.current_trace()
         if trace:
@@ -228,6 +267,19 @@ class TraceCache(object):
 
         return trace
 
+    def _check_active_root(self, cached, trace):
+        cache_root = cached.root
+        if cache_root and cache_root is not trace.root and not cache_root.exited:
+            # Cached trace exists and has a valid root still
+            _logger.error(
+                "Runtime instrumentation error. Attempt to "
+                "save a trace from an inactive transaction. "
+                "Report this issue to New Relic support.\n%s",
+                "".join(traceback.format_stack()[:-1]),
+            )
+
+            raise TraceCacheActiveTraceError("transaction already active")
+
     def save_trace(self, trace):
         """Saves the specified trace away under the thread ID of
         the current executing thread. Will also cache a reference to the
@@ -239,39 +291,22 @@ class TraceCache(object):
         thread_id = trace.thread_id
 
         if thread_id in self._cache:
-            cache_root = self._cache[thread_id].root
-            if cache_root and cache_root is not trace.root and not cache_root.exited:
-                # Cached trace exists and has a valid root still
-                _logger.error(
-                    "Runtime instrumentation error. Attempt to "
-                    "save a trace from an inactive transaction. "
-                    "Report this issue to New Relic support.\n%s",
-                    "".join(traceback.format_stack()[:-1]),
-                )
-
-                raise TraceCacheActiveTraceError("transaction already active")
+            self._check_active_root(self._cache[thread_id], trace)
 
         self._cache[thread_id] = trace
 
-        # We judge whether we are actually running in a coroutine by
-        # seeing if the current thread ID is actually listed in the set
-        # of all current frames for executing threads. If we are
-        # executing within a greenlet, then thread.get_ident() will
-        # return the greenlet identifier. This will not be a key in
-        # dictionary of all current frames because that will still be
-        # the original standard thread which all greenlets are running
-        # within.
+        # If we are actually running in a coroutine, the thread ID will
+        # be that of the greenlet or task rather than of the thread.
 
         trace._greenlet = None
 
-        if hasattr(sys, "_current_frames"):
-            if thread_id not in sys._current_frames():
-                if self.greenlet:
-                    trace._greenlet = weakref.ref(self.greenlet.getcurrent())
+        if self.is_coroutine(thread_id):
+            if self.greenlet:
+                trace._greenlet = weakref.ref(self.greenlet.getcurrent())
 
-                if self.asyncio and not hasattr(trace, "_task"):
-                    task = current_task(self.asyncio)
-                    trace._task = task
+            if self.asyncio and not hasattr(trace, "_task"):
+                task = current_task(self.asyncio)
+                trace._task = task
 
     def thread_start(self, trace):
         current_thread_id = self.current_thread_id()
@@ -403,10 +438,129 @@ class TraceCache(object):
             )
             transaction = root.transaction
             transaction._process_node(node)
+            transaction._fold_node(node, root, leaf=False)
             root.increment_child_count()
             root.add_child(node)
 
 
+class ContextTraceCache(TraceCache):
+    """A trace cache which tracks the current trace in a context variable.
+
+    Looking up the current trace is then a single context variable
+    lookup rather than first working out the ID of the current thread,
+    greenlet or task. As asyncio tasks run in a copy of the context they
+    were created in, a task inherits the trace which was current when it
+    was created without needing task_start() and task_stop() to be
+    called.
+
+    The context variable holds a weak reference to the trace, the same
+    as the dictionary keyed by thread ID does. That dictionary is still
+    maintained as it is what is used to find the traces for all threads
+    and tasks, such as by active_threads() for the thread profiler.
+
+    """
+
+    propagates_context = True
+
+    def __init__(self):
+        super(ContextTraceCache, self).__init__()
+        self._context = contextvars.ContextVar("newrelic_trace", default=None)
+
+    def _set_current(self, trace):
+        self._context.set(weakref.ref(trace) if trace is not None else None)
+
+    def task_start(self, task):
+        pass
+
+    def task_stop(self, task):
+        pass
+
+    def current_transaction(self):
+        trace = self.current_trace()
+        return trace and trace.transaction
+
+    def current_trace(self):
+        ref = self._context.get()
+        trace = ref and ref()
+
+        # A trace can be completed from outside of the context it is
+        # current in, such as when a transaction completes while there
+        # are still children running in other tasks. Once completed it
+        # no longer has a parent and should not be used.
+
+        if trace is not None and trace.exited and trace.parent is None:
+            return None
+
+        return trace
+
+    def prepare_for_root(self):
+        trace = self.current_trace()
+        if not trace:
+            return None
+
+        if not hasattr(trace, "_task"):
+            return trace
+
+        task = current_task(self.asyncio)
+        if (task is not None and id(trace._task) != id(task)) or (
+            trace.root and trace.root.exited
+        ):
+            thread_id = self.current_thread_id()
+            if self._cache.get(thread_id) is trace:
+                self._cache.pop(thread_id, None)
+            self._set_current(None)
+            return None
+
+        return trace
+
+    def save_trace(self, trace):
+        # A trace inherited from the context the task was created in is
+        # not held under the ID of the task, so check against the
+        # current trace rather than relying on the check against the
+        # trace held for the thread ID.
+
+        current = self.current_trace()
+        if current is not None:
+            self._check_active_root(current, trace)
+
+        super(ContextTraceCache, self).save_trace(trace)
+        self._set_current(trace)
+
+    def thread_start(self, trace):
+        thread_id = super(ContextTraceCache, self).thread_start(trace)
+        if thread_id is not None:
+            self._set_current(trace)
+        return thread_id
+
+    def thread_stop(self, thread_id):
+        if thread_id:
+            self._cache.pop(thread_id, None)
+            self._set_current(None)
+
+    def pop_current(self, trace):
+        if hasattr(trace, "_task"):
+            delattr(trace, "_task")
+
+        thread_id = trace.thread_id
+        parent = trace.parent
+
+        # Where the parent was inherited from the context the task was
+        # created in, drop the entry for the task rather than leaving it
+        # around. Otherwise it could be found by a later task which is
+        # given the same ID.
+
+        if parent is not None and parent.thread_id == thread_id:
+            self._cache[thread_id] = parent
+        else:
+            self._cache.pop(thread_id, None)
+
+        self._set_current(parent)
+
+    def complete_root(self, root):
+        super(ContextTraceCache, self).complete_root(root)
+        self._set_current(None)
+
+
 _trace_cache = TraceCache()
 
 
@@ -414,7 +568,54 @@ def trace_cache():
     return _trace_cache
 
 
+def _context_vars_supported(greenlet):
+    # Greenlets only each have their own context where greenlet has been
+    # built with support for context variables.
+
+    return not greenlet or getattr(greenlet, "GREENLET_USE_CONTEXT_VARS", False)
+
+
+def use_context_trace_cache():
+    """Replaces the trace cache with one which tracks the current trace
+    in a context variable. This needs to be done before any traces are
+    created. Returns whether the trace cache was replaced.
+
+    """
+
+    global _trace_cache
+
+    if contextvars is None:
+        _logger.warning(
+            "Tracking traces using context variables requires Python "
+            "3.7 or later. Traces will be tracked by thread ID instead."
+        )
+        return False
+
+    if not _context_vars_supported(sys.modules.get("greenlet")):
+        _logger.warning(
+            "Tracking traces using context variables is not supported "
+            "by the version of greenlet being used. Traces will be "
+            "tracked by thread ID instead."
+        )
+        return False
+
+    if not isinstance(_trace_cache, ContextTraceCache):
+        _trace_cache = ContextTraceCache()
+
+    return True
+
+
 def greenlet_loaded(module):
+    global _trace_cache
+
+    if _trace_cache.propagates_context and not _context_vars_supported(module):
+        _logger.warning(
+            "Tracking traces using context variables is not supported "
+            "by the version of greenlet being used. Traces will be "
+            "tracked by thread ID instead."
+        )
+        _trace_cache = TraceCache()
+
     _trace_cache.greenlet = module
 
 
@@ -28,8 +28,9 @@ from newrelic.core.string_table import StringTable
 from newrelic.core.attribute import create_user_attributes
 from newrelic.core.attribute_filter import (DST_ERROR_COLLECTOR,
         DST_TRANSACTION_TRACER, DST_TRANSACTION_EVENTS)
+from newrelic.core.node_mixin import LazySpanEvent
 
-from newrelic.common.streaming_utils import SpanProtoAttrs
+from newrelic.common.streaming_utils import set_attribute_values
 
 try:
     from newrelic.core.infinite_tracing_pb2 import Span
@@ -64,6 +65,8 @@ class TransactionNode(_TransactionNode):
     def __new__(cls, *args, **kwargs):
         node = _TransactionNode.__new__(cls, *args, **kwargs)
         node.include_transaction_trace_request_uri = False
+        node.folded_metrics = ()
+        node.incremental_time_metrics = False
         return node
 
     def __hash__(self):
@@ -230,11 +233,31 @@ class TransactionNode(_TransactionNode):
                     duration=0.0,
                     exclusive=None)
 
-        # Now for the children.
+        # Now for the children. Where the time metrics for the children
+        # were generated as they completed, they are instead reported by
+        # folded_time_metrics().
+
+        if self.incremental_time_metrics:
+            return
+
         for child in self.root.children:
             for metric in child.time_metrics(stats, self, self):
                 yield metric
 
+    def folded_time_metrics(self):
+        """Return the time metrics accumulated for segments as they
+        completed, either as incremental time metrics were enabled or as
+        they were folded into the transaction once its segment budget was
+        used up, as pairs of the (name, scope) key and the accumulated
+        stats.
+
+        """
+
+        if not self.base_name:
+            return ()
+
+        return self.folded_metrics
+
     def apdex_metrics(self, stats):
         """Return a generator yielding the apdex metrics for this node.
 
@@ -583,25 +606,68 @@ class TransactionNode(_TransactionNode):
         return intrinsics
 
     def span_protos(self, settings):
-        for i_attrs, u_attrs, a_attrs in self.span_events(
-                    settings, attr_class=SpanProtoAttrs):
-            yield Span(trace_id=self.trace_id,
-                       intrinsics=i_attrs,
-                       user_attributes=u_attrs,
-                       agent_attributes=a_attrs)
-
-    def span_events(self, settings, attr_class=dict):
-        base_attrs = attr_class((
+        # The attributes are built as for span events and then set in
+        # place on each span, to avoid creating each attribute value
+        # twice, once on its own and then again when copied into the
+        # span.
+
+        for i_attrs, u_attrs, a_attrs in self.span_events(settings):
+            span = Span(trace_id=self.trace_id)
+            set_attribute_values(span.intrinsics, i_attrs)
+            set_attribute_values(span.user_attributes, u_attrs)
+            set_attribute_values(span.agent_attributes, a_attrs)
+            yield span
+
+    def _span_event_base_attrs(self, attr_class=dict):
+        return attr_class((
             ('transactionId', self.guid),
             ('traceId', self.trace_id),
             ('sampled', self.sampled),
             ('priority', self.priority),
         ))
 
+    def lazy_span_events(self, settings, should_sample=None):
+        """Yields a reference to each node of the transaction from which
+        the span event for that node can later be built. The references
+        are yielded in the same order as span_events() yields the span
+        events, with should_sample having the same meaning.
+
+        """
+
+        base_attrs = self._span_event_base_attrs()
+
+        # Walk the tree using a stack, rather than nested generators as
+        # done when building the span events, as the references are
+        # cheap enough to create that the generators would dominate.
+
+        stack = [(self.root, self.parent_span)]
+
+        while stack:
+            node, parent_guid = stack.pop()
+
+            if should_sample is None or should_sample():
+                yield LazySpanEvent(node, settings, base_attrs, parent_guid)
+            else:
+                yield None
+
+            guid = node.guid
+            stack.extend([(child, guid) for child in reversed(node.children)])
+
+    def span_events(self, settings, attr_class=dict, should_sample=None):
+        """Yields the span events for the transaction. If should_sample
+        is supplied, it is called with no arguments before the attributes
+        of each span event are built. Where it returns False, None is
+        yielded in place of that span event.
+
+        """
+
+        base_attrs = self._span_event_base_attrs(attr_class)
+
         for event in self.root.span_events(
             settings,
             base_attrs,
             parent_guid=self.parent_span,
             attr_class=attr_class,
+            should_sample=should_sample,
         ):
             yield event
@@ -45,6 +45,12 @@ def wrap_create_task(wrapped, instance, args, kwargs):
 
 
 def instrument_asyncio_base_events(module):
+    # Where the trace cache uses context variables, tasks already inherit
+    # the current trace from the context they were created in.
+
+    if trace_cache().propagates_context:
+        return
+
     wrap_out_function(
         module,
         'BaseEventLoop.create_task',
@@ -52,6 +58,9 @@ def instrument_asyncio_base_events(module):
 
 
 def instrument_asyncio_events(module):
+    if trace_cache().propagates_context:
+        return
+
     wrap_function_wrapper(
         module,
         'BaseDefaultEventLoopPolicy.set_event_loop',
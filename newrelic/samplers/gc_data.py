@@ -12,25 +12,115 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import bisect
 import gc
 import os
 import platform
+import sys
 import time
 from collections import Counter
+from itertools import islice
 
 from newrelic.common.object_names import callable_name
 from newrelic.core.config import global_settings
-from newrelic.core.stats_engine import CustomMetrics
+from newrelic.core.stats_engine import TimeStats
 from newrelic.samplers.decorators import data_source_factory
 
+# The objects tracked by the garbage collector can only be listed for a
+# single generation from Python 3.8.
+
+GC_OBJECTS_BY_GENERATION = sys.version_info >= (3, 8)
+
+# Upper bounds in seconds of the buckets for the histograms of the time
+# taken by each collection, along with the labels used for the buckets in
+# metric names. The final bucket is for anything longer.
+
+GC_PAUSE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+GC_PAUSE_BUCKET_LABELS = (
+    "0-1ms",
+    "1-5ms",
+    "5-10ms",
+    "10-50ms",
+    "50-100ms",
+    "100-500ms",
+    "500-1000ms",
+    "1000ms+",
+)
+
+
+class _GCMetricNames(object):
+    """Names of the metrics reported for a process, formatted up front so
+    it isn't done each time they are reported.
+
+    """
+
+    # The metrics broken down by generation are indexed by generation, with
+    # the entry for all generations being the last.
+
+    generations = ("0", "1", "2", "all")
+
+    def __init__(self, pid):
+        self.pid = pid
+
+        self.objects_all = "GC/objects/%d/all" % pid
+        self.objects = tuple(
+            "GC/objects/%d/generation/%d" % (pid, gen) for gen in range(3)
+        )
+
+        self.time = tuple("GC/time/%d/%s" % (pid, gen) for gen in self.generations)
+        self.pauses = tuple(
+            tuple(
+                "GC/pauses/%d/%s/%s" % (pid, gen, label)
+                for label in GC_PAUSE_BUCKET_LABELS
+            )
+            for gen in self.generations
+        )
+
+        self.stats = {}
+        self.types = {}
+
+    def stat_names(self, stat_name):
+        names = self.stats.get(stat_name)
+        if names is None:
+            names = self.stats[stat_name] = tuple(
+                "GC/%s/%d/%s" % (stat_name, self.pid, gen) for gen in self.generations
+            )
+        return names
+
+    def type_name(self, obj_type):
+        name = self.types.get(obj_type)
+        if name is None:
+            name = self.types[obj_type] = "GC/objects/%d/type/%s" % (
+                self.pid,
+                callable_name(obj_type),
+            )
+        return name
+
 
 @data_source_factory(name="Garbage Collector Metrics")
 class _GCDataSource(object):
     def __init__(self, settings, environ):
-        self.gc_time_metrics = CustomMetrics()
         self.start_time = 0.0
         self.previous_stats = {}
         self.pid = os.getpid()
+        self.metric_names = _GCMetricNames(self.pid)
+
+        # The settings are looked up when the data source is started and
+        # on each harvest, rather than on every callback from the garbage
+        # collector.
+
+        self._enabled = False
+        self._top_object_count_limit = 0
+        self._top_object_count_sample_size = 0
+
+        # The latest counts of the types of the objects in each generation,
+        # along with the generation to be walked next.
+
+        self._census = {}
+        self._census_generation = 0
+
+        self._reset_gc_time_metrics()
 
     @property
     def enabled(self):
@@ -45,31 +135,55 @@ class _GCDataSource(object):
         settings = global_settings()
         return settings.gc_runtime_metrics.top_object_count_limit
 
+    @property
+    def top_object_count_sample_size(self):
+        settings = global_settings()
+        return settings.gc_runtime_metrics.top_object_count_sample_size
+
+    def _update_settings(self):
+        self._enabled = self.enabled
+        self._top_object_count_limit = self.top_object_count_limit
+        self._top_object_count_sample_size = self.top_object_count_sample_size
+
+    def _reset_gc_time_metrics(self):
+        # The time taken by collections is accumulated by generation, with
+        # the entry for all generations being the last. Metric names are
+        # only attached when reporting the values.
+
+        self.gc_time_metrics = [TimeStats() for _ in range(4)]
+        self.gc_pause_counts = [
+            [0] * len(GC_PAUSE_BUCKET_LABELS) for _ in range(4)
+        ]
+
     def record_gc(self, phase, info):
-        if not self.enabled:
+        if not self._enabled:
             return
 
-        current_generation = info["generation"]
-
         if phase == "start":
             self.start_time = time.time()
         elif phase == "stop":
             total_time = time.time() - self.start_time
-            self.gc_time_metrics.record_custom_metric(
-                "GC/time/%d/all" % self.pid, total_time
-            )
+
+            current_generation = info["generation"]
+            gc_time_metrics = self.gc_time_metrics
+
             for gen in range(0, 3):
                 if gen <= current_generation:
-                    self.gc_time_metrics.record_custom_metric(
-                        "GC/time/%d/%d" % (self.pid, gen), total_time
-                    )
+                    gc_time_metrics[gen].merge_raw_time_metric(total_time)
                 else:
-                    self.gc_time_metrics.record_custom_metric(
-                        "GC/time/%d/%d" % (self.pid, gen), 0
-                    )
+                    gc_time_metrics[gen].merge_raw_time_metric(0)
+
+            gc_time_metrics[3].merge_raw_time_metric(total_time)
+
+            bucket = bisect.bisect_left(GC_PAUSE_BUCKETS, total_time)
+            gc_pause_counts = self.gc_pause_counts
+            gc_pause_counts[current_generation][bucket] += 1
+            gc_pause_counts[3][bucket] += 1
 
     def start(self):
-        if hasattr(gc, "callbacks"):
+        self._update_settings()
+
+        if hasattr(gc, "callbacks") and self.record_gc not in gc.callbacks:
             gc.callbacks.append(self.record_gc)
 
     def stop(self):
@@ -79,49 +193,107 @@ class _GCDataSource(object):
         if hasattr(gc, "callbacks") and self.record_gc in gc.callbacks:
             gc.callbacks.remove(self.record_gc)
 
-        self.gc_time_metrics.reset_metric_stats()
+        self._reset_gc_time_metrics()
         self.start_time = 0.0
 
+    def _count_object_types(self, objects, sample_size):
+        # Where there are more objects than the sample size, the types of
+        # an evenly spaced sample of the objects are counted instead, with
+        # the counts scaled up to give an estimate for all the objects.
+
+        stride = 1
+        if sample_size > 0 and len(objects) > sample_size:
+            stride = len(objects) // sample_size
+
+        counts = Counter(map(type, islice(objects, 0, None, stride)))
+
+        if stride > 1:
+            for obj_type in counts:
+                counts[obj_type] *= stride
+
+        return counts
+
+    def top_object_counts(self, limit, sample_size):
+        """Returns the counts of objects tracked by the garbage collector
+        for the types with the most objects, or an empty list until the
+        objects in every generation have been counted.
+
+        Only one generation is walked on each call, in rotation, with the
+        counts for the other generations being those from when each was
+        last walked. Where a single generation can't be walked, the whole
+        heap is walked instead once per rotation.
+
+        """
+
+        generation = self._census_generation
+        self._census_generation = (generation + 1) % 3
+
+        if GC_OBJECTS_BY_GENERATION:
+            objects = gc.get_objects(generation=generation)
+        elif generation == 0:
+            objects = gc.get_objects()
+        else:
+            objects = None
+
+        if objects is not None:
+            self._census[generation] = self._count_object_types(
+                objects, sample_size
+            )
+            del objects
+
+        if len(self._census) < (3 if GC_OBJECTS_BY_GENERATION else 1):
+            return []
+
+        counts = Counter()
+        for census in self._census.values():
+            counts.update(census)
+
+        return counts.most_common(limit)
+
     def __call__(self):
-        if not self.enabled:
+        self._update_settings()
+
+        if not self._enabled:
             return
 
+        # The process may have been forked since the names were formatted.
+        pid = os.getpid()
+        if pid != self.pid:
+            self.pid = pid
+            self.metric_names = _GCMetricNames(pid)
+            self.previous_stats = {}
+            self._census = {}
+            self._census_generation = 0
+
+        metric_names = self.metric_names
+
         # Record object count in total and per generation
         if hasattr(gc, "get_count"):
             counts = gc.get_count()
-            yield ("GC/objects/%d/all" % self.pid, {"count": sum(counts)})
+            yield (metric_names.objects_all, {"count": sum(counts)})
             for gen, count in enumerate(counts):
-                yield (
-                    "GC/objects/%d/generation/%d" % (self.pid, gen),
-                    {"count": count},
-                )
+                yield (metric_names.objects[gen], {"count": count})
 
         # Record object count for top five types with highest count
-        if hasattr(gc, "get_objects"):
-            object_types = map(type, gc.get_objects())
-            if self.top_object_count_limit > 0:
-                highest_types = Counter(object_types).most_common(
-                    self.top_object_count_limit
-                )
-                for obj_type, count in highest_types:
-                    yield (
-                        "GC/objects/%d/type/%s" % (self.pid, callable_name(obj_type)),
-                        {"count": count},
-                    )
+        if self._top_object_count_limit > 0 and hasattr(gc, "get_objects"):
+            highest_types = self.top_object_counts(
+                self._top_object_count_limit, self._top_object_count_sample_size
+            )
+            for obj_type, count in highest_types:
+                yield (metric_names.type_name(obj_type), {"count": count})
 
         if hasattr(gc, "get_stats"):
             stats_by_gen = gc.get_stats()
             if isinstance(stats_by_gen, list):
                 for stat_name in stats_by_gen[0].keys():
+                    names = metric_names.stat_names(stat_name)
+
                     # Aggregate metrics for /all
                     count = sum(stats[stat_name] for stats in stats_by_gen)
                     previous_value = self.previous_stats.get((stat_name, "all"), 0)
                     self.previous_stats[(stat_name, "all")] = count
                     change_in_value = count - previous_value
-                    yield (
-                        "GC/%s/%d/all" % (stat_name, self.pid),
-                        {"count": change_in_value},
-                    )
+                    yield (names[3], {"count": change_in_value})
 
                     # Breakdowns by generation
                     for gen, stats in enumerate(stats_by_gen):
@@ -129,22 +301,22 @@ class _GCDataSource(object):
                         self.previous_stats[(stat_name, gen)] = stats[stat_name]
                         change_in_value = stats[stat_name] - previous_value
 
-                        yield (
-                            "GC/%s/%d/%d" % (stat_name, self.pid, gen),
-                            {"count": change_in_value},
-                        )
+                        yield (names[gen], {"count": change_in_value})
 
         # In order to avoid a concurrency issue with getting interrupted by the
-        # garbage collector, we save a reference to the old metrics table, and overwrite
-        # self.gc_time_metrics with a new empty table via reset_metric_stats().
-        # This guards against losing data points, or having inconsistent data points
-        # reported between /all and the totals of /generation/%d metrics.
-        gc_time_metrics = self.gc_time_metrics.metrics()
-        self.gc_time_metrics.reset_metric_stats()
-
-        for metric in gc_time_metrics:
-            raw_metric = metric[1]
-            yield metric[0], {
+        # garbage collector, we save a reference to the old metrics, and replace
+        # them with new empty ones before reporting them. This guards against
+        # losing data points, or having inconsistent data points reported
+        # between /all and the totals of /generation/%d metrics.
+        gc_time_metrics = self.gc_time_metrics
+        gc_pause_counts = self.gc_pause_counts
+        self._reset_gc_time_metrics()
+
+        for name, raw_metric in zip(metric_names.time, gc_time_metrics):
+            if not raw_metric.call_count:
+                continue
+
+            yield name, {
                 "count": raw_metric.call_count,
                 "total": raw_metric.total_call_time,
                 "min": raw_metric.min_call_time,
@@ -152,5 +324,10 @@ class _GCDataSource(object):
                 "sum_of_squares": raw_metric.sum_of_squares,
             }
 
+        for names, counts in zip(metric_names.pauses, gc_pause_counts):
+            for name, count in zip(names, counts):
+                if count:
+                    yield name, {"count": count}
+
 
 garbage_collector_data_source = _GCDataSource
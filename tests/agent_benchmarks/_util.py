@@ -0,0 +1,260 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Helpers shared by the agent benchmarks. The benchmarks follow the
+airspeed velocity (asv) layout, so each benchmark is a class with setup()
+and time_*/peakmem_* methods, but they don't depend on asv being installed.
+
+"""
+
+import copy
+import threading
+import time
+
+from newrelic.packages.six.moves import BaseHTTPServer, socketserver
+
+from newrelic.api.application import application_instance
+from newrelic.core.application import Application
+from newrelic.core.config import (global_settings, apply_config_setting,
+        finalize_application_settings)
+from newrelic.core.function_node import FunctionNode
+from newrelic.core.root_node import RootNode
+from newrelic.core.stats_engine import CustomMetrics, SampledDataSet
+from newrelic.core.transaction_node import TransactionNode
+
+
+class override_settings(object):
+
+    """Temporarily applies overrides to the global settings object."""
+
+    def __init__(self, overrides):
+        self.overrides = overrides
+        self.backup = None
+
+    def __enter__(self):
+        settings = global_settings()
+        self.backup = copy.deepcopy(settings.__dict__)
+        for name, value in self.overrides.items():
+            apply_config_setting(settings, name, value)
+        return settings
+
+    def __exit__(self, *args):
+        settings = global_settings()
+        settings.__dict__.clear()
+        settings.__dict__.update(self.backup)
+
+
+class FakeCollectorHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        time.sleep(self.server.latency)
+
+        body = b'{"return_value": []}'
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeCollector(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    """Data collector listening on the loopback interface, which answers
+    every request with an empty result after the given latency.
+
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.0):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0),
+                FakeCollectorHandler)
+        self.latency = latency
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
+
+
+def connected_application(name='Python Agent Benchmark', **overrides):
+    """Returns an application connected to the developer mode collector,
+    which answers all requests locally without using the network.
+
+    """
+
+    settings = {
+        'developer_mode': True,
+        'license_key': '**NOT A LICENSE KEY**',
+    }
+    settings.update(overrides)
+
+    with override_settings(settings):
+        application = Application(name)
+        application.connect_to_data_collector(None)
+
+    return application
+
+
+def active_application(name='Python Agent Benchmark'):
+    """Returns the API application object for an application activated
+    with the agent against the developer mode collector, so transactions
+    can be run against it. The agent is enabled for the remainder of the
+    process, but its harvest thread isn't started.
+
+    """
+
+    settings = global_settings()
+    settings.enabled = True
+    settings.developer_mode = True
+    settings.license_key = '**NOT A LICENSE KEY**'
+    settings.debug.disable_harvest_until_shutdown = True
+
+    application = application_instance(name)
+    application.activate(timeout=10.0)
+
+    # Activation gives up waiting early if the activation thread doesn't
+    # get going quickly, as it then assumes it may be deadlocked, so wait
+    # for the session to be available.
+
+    deadline = time.time() + 10.0
+    while application.settings is None and time.time() < deadline:
+        time.sleep(0.01)
+
+    return application
+
+
+def function_nodes(count, depth=1, name='foo'):
+    """Returns a tuple of count sibling function nodes, each of which has a
+    chain of depth - 1 descendants.
+
+    """
+
+    nodes = []
+    for index in range(count):
+        children = ()
+        for level in range(depth - 1, -1, -1):
+            children = (FunctionNode(
+                    group='Function',
+                    name='%s/%d/%d' % (name, index % 50, level),
+                    children=children,
+                    start_time=0.0,
+                    end_time=0.001,
+                    duration=0.001,
+                    exclusive=0.001,
+                    label=None,
+                    params=None,
+                    rollup=None,
+                    guid='%016x' % (index * depth + level),
+                    agent_attributes={},
+                    user_attributes={}),)
+        nodes.extend(children)
+    return tuple(nodes)
+
+
+def transaction_node(settings=None, children=(), sampled=True,
+        priority=1.0, path='OtherTransaction/Function/main'):
+    """Returns a finished transaction node suitable for passing to
+    Application.record_transaction().
+
+    """
+
+    if settings is None:
+        settings = finalize_application_settings(
+                {'agent_run_id': '1234567'})
+
+    root = RootNode(
+            name='Function/main',
+            children=children,
+            start_time=1524764430.0,
+            end_time=1524764430.1,
+            duration=0.1,
+            exclusive=0.1,
+            guid='4485b89db608aece',
+            agent_attributes={},
+            user_attributes={},
+            path=path,
+            trusted_parent_span=None,
+            tracing_vendors=None)
+
+    return TransactionNode(
+            settings=settings,
+            path=path,
+            type='OtherTransaction',
+            group='Function',
+            base_name='main',
+            name_for_metric='Function/main',
+            port=None,
+            request_uri=None,
+            queue_start=0.0,
+            start_time=1524764430.0,
+            end_time=1524764430.1,
+            last_byte_time=0.0,
+            total_time=0.1,
+            response_time=0.1,
+            duration=0.1,
+            exclusive=0.1,
+            root=root,
+            errors=(),
+            slow_sql=(),
+            custom_events=SampledDataSet(),
+            apdex_t=0.5,
+            suppress_apdex=False,
+            custom_metrics=CustomMetrics(),
+            guid='4485b89db608aece',
+            cpu_time=0.0,
+            suppress_transaction_trace=False,
+            client_cross_process_id=None,
+            referring_transaction_guid=None,
+            record_tt=False,
+            synthetics_resource_id=None,
+            synthetics_job_id=None,
+            synthetics_monitor_id=None,
+            synthetics_header=None,
+            is_part_of_cat=False,
+            trip_id='4485b89db608aece',
+            path_hash=None,
+            referring_path_hash=None,
+            alternate_path_hashes=[],
+            trace_intrinsics={},
+            distributed_trace_intrinsics={},
+            agent_attributes=[],
+            user_attributes=[],
+            priority=priority,
+            parent_transport_duration=None,
+            parent_span=None,
+            parent_type=None,
+            parent_account=None,
+            parent_app=None,
+            parent_tx=None,
+            parent_transport_type=None,
+            sampled=sampled,
+            root_span_guid=None,
+            trace_id='4485b89db608aece',
+            loop_time=0.0)
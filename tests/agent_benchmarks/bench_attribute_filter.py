@@ -0,0 +1,68 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from newrelic.core.attribute_filter import DST_ALL, AttributeFilter
+
+DESTINATIONS = ('transaction_events', 'transaction_tracer', 'error_collector',
+        'browser_monitoring', 'span_events', 'transaction_segments')
+
+ATTRIBUTES = ['request.headers.contentType', 'request.headers.userAgent',
+        'request.method', 'request.uri', 'response.status', 'host',
+        'port', 'user.id', 'order.total', 'password']
+
+
+def _settings(rules):
+    settings = {'attributes.enabled': True}
+    for destination in DESTINATIONS:
+        settings['%s.attributes.enabled' % destination] = True
+
+    if rules:
+        settings['attributes.include'] = ['request.headers.userAgent']
+        settings['attributes.exclude'] = ['request.headers.*', 'password',
+                'tenant.*'] + ['custom.%d.*' % index for index in range(50)]
+        settings['span_events.attributes.exclude'] = ['user.*']
+
+    return settings
+
+
+class AttributeFilterSuite(object):
+
+    """Applies the attribute filter to a small set of attribute names which
+    are repeated, as for agent attributes, and to a large set of distinct
+    names, as for custom attributes keyed by tenant.
+
+    """
+
+    params = [False, True]
+    param_names = ['rules']
+
+    def setup(self, rules):
+        self.attribute_filter = AttributeFilter(_settings(rules))
+        self.tenant_attributes = ['tenant.%d.plan' % index
+                for index in range(20000)]
+
+    def time_apply_repeated_names(self, rules):
+        apply = self.attribute_filter.apply
+        for _ in range(5000):
+            for name in ATTRIBUTES:
+                apply(name, DST_ALL)
+
+    def time_apply_distinct_names(self, rules):
+        apply = self.attribute_filter.apply
+        for name in self.tenant_attributes:
+            apply(name, DST_ALL)
+
+    def track_cache_size(self, rules):
+        self.time_apply_distinct_names(rules)
+        return len(self.attribute_filter.cache)
@@ -0,0 +1,63 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from newrelic.common.agent_http import InsecureHttpClient
+from newrelic.core.agent_protocol import AgentProtocol
+
+from ._util import (FakeCollector, connected_application, function_nodes,
+        transaction_node)
+
+
+class TimeHarvest(object):
+
+    """Harvests transaction events, span events, custom events and metrics
+    to a local data collector with the given latency, comparing sending
+    each payload in turn with sending the payloads concurrently.
+
+    """
+
+    params = ([0.05, 0.3], [False, True])
+    param_names = ['latency', 'concurrent_harvest']
+
+    def setup(self, latency, concurrent_harvest):
+        self.collector = FakeCollector(latency)
+
+        self.application = connected_application(**{
+            'distributed_tracing.enabled': True,
+            'stats_engine.concurrent_harvest': concurrent_harvest,
+        })
+
+        # Replace the developer mode client with one which talks to the
+        # local data collector.
+
+        session = self.application._active_session
+        configuration = session.configuration
+        configuration.host = '127.0.0.1'
+        configuration.port = self.collector.port
+        session._protocol = AgentProtocol(configuration,
+                client_cls=InsecureHttpClient)
+
+        self.node = transaction_node(children=function_nodes(100))
+
+    def teardown(self, latency, concurrent_harvest):
+        self.application.harvest(shutdown=True)
+        self.collector.close()
+
+    def _record(self):
+        self.application.record_transaction(self.node)
+        self.application.record_custom_event('Benchmark', {'value': 1})
+
+    def time_harvest(self, latency, concurrent_harvest):
+        self._record()
+        self.application.harvest()
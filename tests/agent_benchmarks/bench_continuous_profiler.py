@@ -0,0 +1,116 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+from newrelic.core.profile_sessions import (ContinuousProfile,
+        ProfileSession, ProfileSessionManager, collect_stack_traces)
+from newrelic.core.trace_cache import trace_cache
+
+THREADS = 20
+DEPTH = 30
+
+
+def _blocked(event, depth):
+    if depth:
+        return _blocked(event, depth - 1)
+    event.wait()
+
+
+def _workload():
+    total = 0
+    for i in range(2000000):
+        total += i * i
+    return total
+
+
+class ProfilerSuite(object):
+
+    """Samples the stacks of 20 threads blocked 30 frames deep, comparing
+    a profiling session requested by the data collector, which formats
+    each stack and merges it into a call tree on every sample, with the
+    continuous profile, which only looks up stacks it has already seen.
+    The time taken for each sample is tracked, along with what that is as
+    a percentage of the sample period, as the profiler thread holds the
+    GIL while sampling. The time for a CPU bound workload to run while
+    the profiler is running is also tracked.
+
+    """
+
+    params = (['session', 'continuous'], [0.01, 0.1])
+    param_names = ['mode', 'sample_period']
+
+    def setup(self, mode, sample_period):
+        self.event = threading.Event()
+        self.threads = [threading.Thread(target=_blocked,
+                args=(self.event, DEPTH)) for _ in range(THREADS)]
+        for thread in self.threads:
+            thread.start()
+
+        if mode == 'session':
+            session = ProfileSession(0, time.time() + 3600.0)
+
+            def sample():
+                for category, stack in collect_stack_traces():
+                    session.update_call_tree(category, stack)
+
+        else:
+            profile = ContinuousProfile(sample_period)
+
+            def sample():
+                profile.sample(trace_cache().active_threads())
+
+        self.sample = sample
+
+    def teardown(self, mode, sample_period):
+        self.event.set()
+        for thread in self.threads:
+            thread.join()
+
+    def _sample_seconds(self):
+        self.sample()
+        start = time.time()
+        for _ in range(100):
+            self.sample()
+        return (time.time() - start) / 100
+
+    def track_sample_microseconds(self, mode, sample_period):
+        return round(self._sample_seconds() * 1e6, 1)
+
+    def track_overhead_percent(self, mode, sample_period):
+        return round(self._sample_seconds() / sample_period * 100.0, 2)
+
+    def time_workload(self, mode, sample_period):
+        manager = ProfileSessionManager()
+
+        if mode == 'session':
+            manager.start_profile_session('bench', 0, time.time() + 3600.0,
+                    sample_period)
+        else:
+            manager.start_continuous_profiling('bench', sample_period)
+
+        try:
+            _workload()
+        finally:
+            manager.shutdown('bench')
+            manager._profiler_thread.join()
+
+
+class BaselineSuite(object):
+
+    """Runs the same CPU bound workload without any profiling."""
+
+    def time_workload(self):
+        _workload()
@@ -0,0 +1,103 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+
+from newrelic.api.background_task import BackgroundTask
+from newrelic.api.function_trace import function_trace
+
+from ._util import active_application
+
+CALLS = 2000
+
+
+@function_trace()
+def function():
+    pass
+
+
+@function_trace()
+async def coroutine():
+    pass
+
+
+@function_trace()
+def generator():
+    yield
+
+
+@function_trace()
+async def async_generator():
+    yield
+
+
+class Class(object):
+    @function_trace()
+    def method(self):
+        pass
+
+
+class TimeFunctionTraceWrapper(object):
+
+    """Calls functions decorated with function_trace() within a
+    transaction, to check the overhead of the wrapper for each call.
+
+    """
+
+    params = ['function', 'method', 'generator', 'coroutine',
+            'async_generator']
+    param_names = ['kind']
+
+    def setup(self, kind):
+        self.application = active_application()
+        self.loop = asyncio.new_event_loop()
+
+    def teardown(self, kind):
+        self.loop.close()
+
+    def _call(self, kind):
+        if kind == 'function':
+            for _ in range(CALLS):
+                function()
+
+        elif kind == 'method':
+            instance = Class()
+            for _ in range(CALLS):
+                instance.method()
+
+        elif kind == 'generator':
+            for _ in range(CALLS):
+                for _ in generator():
+                    pass
+
+    async def _call_async(self, kind):
+        if kind == 'coroutine':
+            for _ in range(CALLS):
+                await coroutine()
+
+        elif kind == 'async_generator':
+            for _ in range(CALLS):
+                async for _ in async_generator():
+                    pass
+
+    def time_calls(self, kind):
+        if kind in ('coroutine', 'async_generator'):
+            async def _test():
+                with BackgroundTask(self.application, 'bench_function_trace'):
+                    await self._call_async(kind)
+
+            self.loop.run_until_complete(_test())
+
+        else:
+            with BackgroundTask(self.application, 'bench_function_trace'):
+                self._call(kind)
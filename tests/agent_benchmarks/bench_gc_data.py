@@ -0,0 +1,85 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gc
+
+from newrelic.core.config import global_settings
+from newrelic.samplers.gc_data import garbage_collector_data_source
+
+
+def _data_source():
+    return garbage_collector_data_source(settings=())['factory'](environ=())
+
+
+class GCCallbackSuite(object):
+
+    """Calls the callback the garbage collector makes at the start and
+    end of each collection, as the cost of it is added to every pause.
+
+    """
+
+    def setup(self):
+        settings = global_settings().gc_runtime_metrics
+        self.backup = settings.enabled
+        settings.enabled = True
+
+        self.data_source = _data_source()
+        self.data_source.start()
+
+    def teardown(self):
+        self.data_source.stop()
+        global_settings().gc_runtime_metrics.enabled = self.backup
+
+    def time_record_gc(self):
+        record_gc = self.data_source.record_gc
+        for generation in (0, 1, 2) * 10000:
+            info = {'generation': generation}
+            record_gc('start', info)
+            record_gc('stop', info)
+
+
+class HarvestSuite(object):
+
+    """Harvests the metrics with a million objects tracked by the garbage
+    collector, counting the types of all of them or of a sample of them.
+
+    """
+
+    params = [0, 10000]
+    param_names = ['top_object_count_sample_size']
+
+    def setup(self, top_object_count_sample_size):
+        settings = global_settings().gc_runtime_metrics
+        self.backup = (settings.enabled,
+                settings.top_object_count_sample_size)
+        settings.enabled = True
+        settings.top_object_count_sample_size = top_object_count_sample_size
+
+        self.objects = [[] for _ in range(1000000)]
+
+        self.data_source = _data_source()
+        self.data_source.start()
+
+    def teardown(self, top_object_count_sample_size):
+        self.data_source.stop()
+
+        settings = global_settings().gc_runtime_metrics
+        (settings.enabled,
+                settings.top_object_count_sample_size) = self.backup
+
+        del self.objects
+
+    def time_harvest(self, top_object_count_sample_size):
+        for _ in range(5):
+            list(self.data_source())
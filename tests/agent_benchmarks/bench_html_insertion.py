@@ -0,0 +1,184 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from wsgiref.util import setup_testing_defaults
+
+from newrelic.api.asgi_application import asgi_application
+from newrelic.api.wsgi_application import wsgi_application
+
+from ._util import active_application
+
+BODY = b''.join((
+    b'<body>',
+    8192 * b'<p>Lorem ipsum dolor sit amet.</p>\n',
+    b'</body></html>',
+))
+
+# With a head element the insertion point is the end of the charset meta
+# tag, but the rest of the head has to be held back until the body is
+# seen, as another meta tag could still move the insertion point. With
+# no head element or meta tags the start of the body is the insertion
+# point, so everything before it can be passed on.
+
+PAGES = {
+    'head': b''.join((
+        b'<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">',
+        b'<title>Benchmark</title><style>',
+        1024 * b'p { margin: 0 0 1em 0; }\n',
+        b'</style></head>',
+        BODY,
+    )),
+    'no_head': b''.join((
+        b'<!DOCTYPE html><html lang="en"><script>',
+        1024 * b'console.log(1 + 2 + 3);\n',
+        b'</script>',
+        BODY,
+    )),
+}
+
+CHUNK_SIZE = 512
+
+
+class ChunkedResponseSuite(object):
+
+    """Runs a 300KB HTML page, yielded in 512 byte chunks, through the
+    browser monitoring middleware for WSGI and ASGI applications, with
+    and without a content length. Without a content length the response
+    is treated as being streamed. Besides the time taken, the most bytes
+    the middleware held back at any point while the application was
+    producing the response is tracked.
+
+    """
+
+    params = (['wsgi', 'asgi'], [False, True], ['head', 'no_head'])
+    param_names = ['protocol', 'content_length', 'page']
+
+    def setup(self, protocol, content_length, page):
+        self.application = active_application()
+
+        settings = self.application.settings
+        self.backup = (settings.browser_monitoring.enabled,
+                settings.browser_monitoring.auto_instrument,
+                settings.js_agent_loader)
+        settings.browser_monitoring.enabled = True
+        settings.browser_monitoring.auto_instrument = True
+        settings.js_agent_loader = u'<!-- NREUM HEADER -->'
+
+        headers = [('Content-Type', 'text/html; charset=utf-8')]
+
+        if content_length:
+            headers.append(('Content-Length', str(len(PAGES[page]))))
+
+        self.headers = headers
+        self.page = PAGES[page]
+        self.chunks = [self.page[i:i+CHUNK_SIZE]
+                for i in range(0, len(self.page), CHUNK_SIZE)]
+        self.held = 0
+
+        if protocol == 'wsgi':
+            self.request = self._wsgi_request
+        else:
+            self.loop = asyncio.new_event_loop()
+            self.request = self._asgi_request
+
+    def teardown(self, protocol, content_length, page):
+        settings = self.application.settings
+        (settings.browser_monitoring.enabled,
+                settings.browser_monitoring.auto_instrument,
+                settings.js_agent_loader) = self.backup
+
+        if protocol == 'asgi':
+            self.loop.close()
+
+    def _wsgi_request(self):
+        state = {'produced': 0, 'passed': 0}
+
+        @wsgi_application(application=self.application.name)
+        def _application(environ, start_response):
+            start_response('200 OK', list(self.headers))
+
+            for data in self.chunks:
+                self.held = max(self.held, state['produced'] -
+                        state['passed'])
+                state['produced'] += len(data)
+                yield data
+
+        environ = {}
+        setup_testing_defaults(environ)
+
+        iterable = _application(environ, lambda *args: None)
+
+        try:
+            for data in iterable:
+                state['passed'] += len(data)
+        finally:
+            iterable.close()
+
+        return state['passed']
+
+    def _asgi_request(self):
+        state = {'produced': 0, 'passed': 0}
+
+        headers = [(name.lower().encode('utf-8'), value.encode('utf-8'))
+                for name, value in self.headers]
+
+        @asgi_application(application=self.application.name)
+        async def _application(scope, receive, send):
+            await send({'type': 'http.response.start', 'status': 200,
+                    'headers': headers})
+
+            for data in self.chunks:
+                state['produced'] += len(data)
+                await send({'type': 'http.response.body', 'body': data,
+                        'more_body': data is not self.chunks[-1]})
+                self.held = max(self.held, state['produced'] -
+                        state['passed'])
+
+        async def receive():
+            return {'type': 'http.request'}
+
+        async def send(message):
+            if message['type'] == 'http.response.body':
+                state['passed'] += len(message.get('body', b''))
+
+        scope = {
+            'type': 'http',
+            'asgi': {'spec_version': '2.1', 'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': '/',
+            'raw_path': b'/',
+            'root_path': '',
+            'query_string': b'',
+            'headers': [],
+            'client': ('127.0.0.1', 54768),
+            'server': ('127.0.0.1', 8000),
+        }
+
+        self.loop.run_until_complete(_application(scope, receive, send))
+
+        return state['passed']
+
+    def time_response(self, protocol, content_length, page):
+        for _ in range(20):
+            self.request()
+
+    def track_inserted_bytes(self, protocol, content_length, page):
+        return self.request() - len(self.page)
+
+    def track_held_bytes(self, protocol, content_length, page):
+        self.request()
+        return self.held
@@ -0,0 +1,192 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import newrelic.config
+
+# A package the size of Django, and one the size of Flask together with the
+# packages it depends on. Each holds the modules of that name the agent has
+# import hooks for, plus as many other modules as are needed to make up the
+# numbers. Some of the modules try to import optional dependencies which
+# aren't installed, as real packages do.
+
+_PACKAGES = (
+    ('django', 800),
+    ('flask', 40),
+    ('werkzeug', 60),
+    ('jinja2', 30),
+    ('click', 15),
+    ('itsdangerous', 5),
+    ('markupsafe', 5),
+)
+
+_OPTIONAL_IMPORTS = ('MySQLdb', 'psycopg2', 'pymongo', 'redis', 'gevent')
+
+_SCRIPT = """
+import sys
+import time
+
+mode, root, hooks = sys.argv[1:]
+
+sys.path.insert(0, root)
+
+if mode != 'none':
+    import newrelic.api.import_hook as import_hook
+
+    with open(hooks) as fh:
+        for name in fh.read().split():
+            import_hook.register_import_hook(name, lambda module: None)
+
+    finder = import_hook.ImportHookFinder()
+
+    if mode == 'find_module':
+        class _Finder(object):
+            find_module = finder.find_module
+        finder = _Finder()
+
+    sys.meta_path.insert(0, finder)
+
+start = time.time()
+
+%s
+
+sys.stdout.write('%%f' %% (time.time() - start))
+""" % '\n'.join('import %s' % name for name, _ in _PACKAGES)
+
+
+def _hooked_modules():
+    names = []
+
+    def _process_module_definition(target, *args, **kwargs):
+        names.append(target)
+
+    original = newrelic.config._process_module_definition
+    newrelic.config._process_module_definition = _process_module_definition
+
+    try:
+        newrelic.config._process_module_builtin_defaults()
+    finally:
+        newrelic.config._process_module_definition = original
+
+    return names
+
+
+def _write_module(root, name, imports=()):
+    parts = name.split('.')
+    directory = os.path.join(root, *parts[:-1])
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    for index in range(1, len(parts)):
+        path = os.path.join(root, *(parts[:index] + ['__init__.py']))
+        if not os.path.exists(path):
+            open(path, 'w').close()
+
+    source = []
+
+    for optional in imports:
+        source.append('try:\n    import %s\nexcept ImportError:\n'
+                '    pass\n' % optional)
+
+    source.append('def function(*args, **kwargs):\n    return args\n')
+    source.append('class Class(object):\n    pass\n')
+
+    path = os.path.join(root, *parts) + '.py'
+
+    if os.path.exists(os.path.join(root, *parts)):
+        path = os.path.join(root, *(parts + ['__init__.py']))
+
+    with open(path, 'a') as fh:
+        fh.write('\n'.join(source))
+
+
+def _write_packages(root, hooks):
+    for package, count in _PACKAGES:
+        modules = [name for name in hooks
+                if name.split('.')[0] == package and name != package]
+
+        # Spread the rest over subpackages of twenty modules each.
+
+        for index in range(count - len(modules)):
+            modules.append('%s.sub%d.module%d' % (package, index // 20,
+                    index))
+
+        imports = []
+
+        for index, name in enumerate(modules):
+            optional = _OPTIONAL_IMPORTS[index % len(_OPTIONAL_IMPORTS)]
+            _write_module(root, name, index % 10 == 0 and (optional,) or ())
+            imports.append(name)
+
+        _write_module(root, package, imports)
+
+
+class StartupSuite(object):
+
+    """Imports Django and Flask sized package trees in a fresh interpreter
+    with the agent's import hooks registered, reporting how much the import
+    hook finder adds to the time taken compared to no hooks at all.
+
+    """
+
+    params = ['find_module', 'find_spec']
+    param_names = ['finder']
+
+    repeat = 5
+
+    def setup(self, finder):
+        self.root = tempfile.mkdtemp()
+
+        hooks = _hooked_modules()
+
+        self.hooks = os.path.join(self.root, 'hooks.txt')
+
+        with open(self.hooks, 'w') as fh:
+            fh.write('\n'.join(hooks))
+
+        self.packages = os.path.join(self.root, 'packages')
+
+        _write_packages(self.packages, hooks)
+
+        self.env = dict(os.environ)
+        self.env['PYTHONPATH'] = os.pathsep.join(p for p in sys.path if p)
+
+        # Run the imports the once so the byte code has been written out.
+
+        self._import_time('none')
+
+    def teardown(self, finder):
+        shutil.rmtree(self.root)
+
+    def _import_time(self, mode):
+        output = subprocess.check_output([sys.executable, '-c', _SCRIPT,
+                mode, self.packages, self.hooks], env=self.env)
+        return float(output)
+
+    def track_import_time_delta(self, finder):
+        deltas = []
+
+        for _ in range(self.repeat):
+            baseline = self._import_time('none')
+            deltas.append(self._import_time(finder) - baseline)
+
+        return 1000.0 * sorted(deltas)[len(deltas) // 2]
+
+    track_import_time_delta.unit = 'milliseconds'
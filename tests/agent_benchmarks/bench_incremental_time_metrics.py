@@ -0,0 +1,93 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import tracemalloc
+
+from newrelic.api.background_task import BackgroundTask
+from newrelic.api.datastore_trace import DatastoreTrace
+from newrelic.api.function_trace import FunctionTrace
+
+from ._util import active_application
+
+
+class TransactionExitSuite(object):
+
+    """Records a transaction with 100 function traces each making 50
+    datastore calls, comparing generating time metrics from the finished
+    trace with accumulating them as each trace completes, and with the
+    tree of nodes being dropped at exit where it isn't needed, as for an
+    unsampled transaction below the transaction trace threshold. The time
+    taken to exit the transaction, which includes recording it, is tracked
+    separately as that is the latency added at the end of the request,
+    as is the memory still held while the transaction object is kept
+    alive after it has exited.
+
+    """
+
+    params = ([False, True], [False, True])
+    param_names = ['incremental_time_metrics', 'prune_node_trees']
+
+    def setup(self, incremental_time_metrics, prune_node_trees):
+        self.application = active_application()
+
+        stats_engine = self.application.settings.stats_engine
+        self.backup = (stats_engine.incremental_time_metrics,
+                stats_engine.prune_node_trees)
+        stats_engine.incremental_time_metrics = incremental_time_metrics
+        stats_engine.prune_node_trees = prune_node_trees
+
+    def teardown(self, incremental_time_metrics, prune_node_trees):
+        stats_engine = self.application.settings.stats_engine
+        (stats_engine.incremental_time_metrics,
+                stats_engine.prune_node_trees) = self.backup
+
+    def _transaction(self):
+        transaction = BackgroundTask(self.application,
+                'bench_incremental_time_metrics')
+        transaction.__enter__()
+
+        for _ in range(100):
+            with FunctionTrace('function'):
+                for _ in range(50):
+                    with DatastoreTrace('product', 'target', 'operation'):
+                        pass
+
+        return transaction
+
+    def _record(self):
+        transaction = self._transaction()
+
+        start = time.time()
+        transaction.__exit__(None, None, None)
+        return time.time() - start
+
+    def time_record(self, incremental_time_metrics, prune_node_trees):
+        for _ in range(10):
+            self._record()
+
+    def track_exit_milliseconds(self, incremental_time_metrics,
+            prune_node_trees):
+        return round(min(self._record() for _ in range(10)) * 1000.0, 1)
+
+    def track_retained_bytes(self, incremental_time_metrics,
+            prune_node_trees):
+        tracemalloc.start()
+        try:
+            start = tracemalloc.get_traced_memory()[0]
+            transaction = self._transaction()
+            transaction.__exit__(None, None, None)
+            return tracemalloc.get_traced_memory()[0] - start
+        finally:
+            tracemalloc.stop()
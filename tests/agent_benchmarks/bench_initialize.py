@@ -0,0 +1,81 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+_CONFIG = """
+[newrelic]
+developer_mode = true
+"""
+
+_SCRIPT = """
+import sys
+import time
+
+import newrelic.agent
+
+start = time.time()
+
+newrelic.agent.initialize(sys.argv[1])
+
+sys.stdout.write('%f' % (time.time() - start))
+"""
+
+
+class ColdStartSuite(object):
+
+    """Calls initialize() in a fresh interpreter, as a Lambda function or
+    a short lived command line or cron job would. The time taken is held
+    to a budget, with the benchmark failing if it is exceeded.
+
+    """
+
+    budget = 50.0
+
+    repeat = 5
+
+    def setup(self):
+        self.root = tempfile.mkdtemp()
+
+        self.config_file = os.path.join(self.root, 'newrelic.ini')
+
+        with open(self.config_file, 'w') as fh:
+            fh.write(_CONFIG)
+
+        self.env = dict(os.environ)
+        self.env['PYTHONPATH'] = os.pathsep.join(p for p in sys.path if p)
+        self.env.pop('NEW_RELIC_CONFIG_FILE', None)
+
+    def teardown(self):
+        shutil.rmtree(self.root)
+
+    def _initialize_time(self):
+        output = subprocess.check_output([sys.executable, '-c', _SCRIPT,
+                self.config_file], env=self.env)
+        return 1000.0 * float(output)
+
+    def track_initialize_time(self):
+        times = sorted(self._initialize_time() for _ in range(self.repeat))
+        median = times[len(times) // 2]
+
+        assert median <= self.budget, ('initialize() took %.1fms, over '
+                'the budget of %.1fms' % (median, self.budget))
+
+        return median
+
+    track_initialize_time.unit = 'milliseconds'
@@ -0,0 +1,66 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+
+from newrelic.core.config import finalize_application_settings
+
+from ._util import (connected_application, function_nodes,
+        override_settings, transaction_node)
+
+TRANSACTIONS = 20
+
+
+class TimeLazySpanEvents(object):
+
+    """Records high fanout transactions with random priorities, such that
+    most of the span events are discarded by the reservoir, comparing
+    building the span events when recorded with building them when
+    harvested.
+
+    """
+
+    params = ([100, 1000], [False, True])
+    param_names = ['spans', 'lazy_span_events']
+
+    def setup(self, spans, lazy_span_events):
+        overrides = {
+            'distributed_tracing.enabled': True,
+            'event_harvest_config.harvest_limits.span_event_data': 2000,
+            'stats_engine.lazy_span_events': lazy_span_events,
+        }
+
+        self.application = connected_application(**overrides)
+
+        with override_settings(overrides):
+            settings = finalize_application_settings(
+                    {'agent_run_id': '1234567'})
+
+        random.seed(0)
+
+        self.nodes = [transaction_node(settings,
+                function_nodes(spans // 10, depth=10),
+                priority=random.random()) for _ in range(TRANSACTIONS)]
+
+    def teardown(self, spans, lazy_span_events):
+        self.application.harvest(shutdown=True)
+
+    def time_record_transaction(self, spans, lazy_span_events):
+        for node in self.nodes:
+            self.application.record_transaction(node)
+
+    def time_record_transaction_and_harvest(self, spans, lazy_span_events):
+        for node in self.nodes:
+            self.application.record_transaction(node)
+        self.application._stats_engine.span_event_data()
@@ -0,0 +1,71 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gc
+
+from newrelic.core.stats_engine import MetricStatsTable, StatsTable
+
+TABLES = {
+    'dict': StatsTable,
+    'columnar': MetricStatsTable,
+}
+
+
+def _populate(table, metrics):
+    for index in range(metrics):
+        table.record_time(('Function/module:function_%d' % index,
+                'WebTransaction/Uri/%d' % (index % 100)), 0.001)
+    return table
+
+
+def _normalizer(name):
+    return name.rsplit('_', 1)[0], False
+
+
+class MetricStatsTableSuite(object):
+
+    """Compares a stats table with a stats object per metric against the
+    columnar table for applications with many unique metrics.
+
+    """
+
+    params = ([1000, 50000], ['dict', 'columnar'])
+    param_names = ['metrics', 'table']
+
+    def setup(self, metrics, table):
+        self.table = _populate(TABLES[table](), metrics)
+        self.other = _populate(TABLES[table](), metrics)
+
+    def peakmem_populate(self, metrics, table):
+        _populate(TABLES[table](), metrics)
+
+    def track_gc_objects(self, metrics, table):
+        gc.collect()
+        before = len(gc.get_objects())
+        populated = _populate(TABLES[table](), metrics)
+        gc.collect()
+        return len(gc.get_objects()) - before
+
+    def time_record_time(self, metrics, table):
+        for key in list(self.table.keys()):
+            self.table.record_time(key, 0.002)
+
+    def time_merge_table(self, metrics, table):
+        self.table.merge_table(self.other)
+
+    def time_normalize(self, metrics, table):
+        self.table.normalize(_normalizer)
+
+    def time_metric_data(self, metrics, table):
+        self.table.metric_data()
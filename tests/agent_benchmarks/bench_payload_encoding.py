@@ -0,0 +1,82 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+
+from newrelic.common.agent_http import InsecureHttpClient
+from newrelic.core.agent_protocol import AgentProtocol
+from newrelic.core.config import finalize_application_settings
+
+from ._util import FakeCollector
+
+
+class BufferedHttpClient(InsecureHttpClient):
+    STREAM_PAYLOADS = False
+
+
+def _span_events(count):
+    random.seed(0)
+    return [[{
+        'type': 'Span',
+        'traceId': '%016x' % random.getrandbits(64),
+        'guid': '%016x' % random.getrandbits(64),
+        'parentId': '%016x' % random.getrandbits(64),
+        'transactionId': '%016x' % random.getrandbits(64),
+        'sampled': True,
+        'priority': random.random(),
+        'timestamp': 1524764430000 + index,
+        'duration': random.random(),
+        'name': 'Function/module:function_%d' % (index % 100),
+        'category': 'generic',
+        'nr.entryPoint': index == 0,
+    }, {}, {'code.lineno': index}] for index in range(count)]
+
+
+class PayloadEncodingSuite(object):
+
+    """Encodes, compresses and sends span event payloads to a local data
+    collector, comparing encoding the whole payload before compressing it
+    with encoding the payload in chunks as it is compressed.
+
+    """
+
+    params = ([1000, 10000], [False, True])
+    param_names = ['spans', 'stream_payloads']
+
+    def setup(self, spans, stream_payloads):
+        self.collector = FakeCollector()
+
+        settings = finalize_application_settings({
+            'agent_run_id': '1234567',
+            'host': '127.0.0.1',
+            'port': self.collector.port,
+            'max_payload_size_in_bytes': 100000000,
+        })
+
+        client_cls = stream_payloads and InsecureHttpClient or \
+                BufferedHttpClient
+        self.protocol = AgentProtocol(settings, client_cls=client_cls)
+
+        self.payload = ('1234567', {'events_seen': spans,
+                'reservoir_size': spans}, _span_events(spans))
+
+    def teardown(self, spans, stream_payloads):
+        self.protocol.close_connection()
+        self.collector.close()
+
+    def time_send(self, spans, stream_payloads):
+        self.protocol.send('span_event_data', self.payload)
+
+    def peakmem_send(self, spans, stream_payloads):
+        self.protocol.send('span_event_data', self.payload)
@@ -0,0 +1,100 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+
+from newrelic.core.rules_engine import RulesEngine, SegmentCollapseEngine
+
+# Rule sets of the form returned by the data collector on connect.
+
+URL_RULES = [{
+    'match_expression': '.*\\.(ace|arj|ini|txt|udl|plist|css|gif|ico|jpe?g'
+            '|js|png|swf|woff|caf|aiff|m4v|mpe?g|mp3|mp4|mov)$',
+    'replacement': '/*.\\1', 'ignore': False, 'eval_order': 1000,
+    'terminate_chain': True, 'each_segment': False, 'replace_all': False,
+}, {
+    'match_expression': '^[0-9][0-9a-f_,.-]*$',
+    'replacement': '*', 'ignore': False, 'eval_order': 1001,
+    'terminate_chain': False, 'each_segment': True, 'replace_all': False,
+}, {
+    'match_expression': '^(.*)/[0-9][0-9a-f_,-]*\\.([0-9a-z][0-9a-z]*)$',
+    'replacement': '\\1/.*\\2', 'ignore': False, 'eval_order': 1002,
+    'terminate_chain': False, 'each_segment': False, 'replace_all': False,
+}]
+
+METRIC_RULES = [{
+    'match_expression': '^(Datastore/statement/Redis)/[^/]+/(.*)$',
+    'replacement': '\\1/*/\\2', 'ignore': False, 'eval_order': 1,
+    'terminate_chain': True, 'each_segment': False, 'replace_all': False,
+}, {
+    'match_expression': '^External/[0-9.]+/',
+    'replacement': 'External/*/', 'ignore': False, 'eval_order': 2,
+    'terminate_chain': True, 'each_segment': False, 'replace_all': False,
+}, {
+    'match_expression': '^Function/.*/ignored$',
+    'replacement': '', 'ignore': True, 'eval_order': 3,
+    'terminate_chain': True, 'each_segment': False, 'replace_all': False,
+}]
+
+SEGMENT_TERMS = [
+    {'prefix': 'WebTransaction/Uri', 'terms': ['api', 'v1', 'users',
+            'orders', 'items', 'search']},
+]
+
+
+def _urls(count):
+    random.seed(0)
+    paths = ['/api/v1/users/%d', '/api/v1/orders/%d/items',
+            '/static/img/%d.png', '/search', '/api/v1/users/%d/profile']
+    return [random.choice(paths).replace('%d', str(random.randint(0, 50)))
+            for _ in range(count)]
+
+
+def _metric_names(count):
+    return ['Function/module:function_%d' % (index % 200)
+            for index in range(count)] + ['External/10.0.0.%d/requests'
+            % (index % 20) for index in range(count)]
+
+
+class RulesEngineSuite(object):
+
+    """Normalizes transaction names and metric names which repeat, as
+    they would over a number of harvests, using realistic rule sets.
+
+    """
+
+    def setup(self):
+        self.url_rules = RulesEngine(URL_RULES)
+        self.metric_rules = RulesEngine(METRIC_RULES)
+        self.segment_rules = SegmentCollapseEngine(SEGMENT_TERMS)
+
+        self.urls = _urls(10000)
+        self.transaction_names = ['WebTransaction/Uri' + url
+                for url in self.urls]
+        self.metric_names = _metric_names(5000)
+
+    def time_normalize_urls(self):
+        normalize = self.url_rules.normalize
+        for url in self.urls:
+            normalize(url)
+
+    def time_normalize_metric_names(self):
+        normalize = self.metric_rules.normalize
+        for name in self.metric_names:
+            normalize(name)
+
+    def time_collapse_segments(self):
+        normalize = self.segment_rules.normalize
+        for name in self.transaction_names:
+            normalize(name)
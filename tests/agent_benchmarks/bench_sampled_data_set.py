@@ -0,0 +1,88 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+
+from newrelic.core.stats_engine import SampledDataSet
+
+from ._util import connected_application, function_nodes, transaction_node
+
+
+def _sampled_data_set(capacity, count):
+    data_set = SampledDataSet(capacity)
+    for index in range(count):
+        data_set.add(index, random.random())
+    return data_set
+
+
+class SampledDataSetSuite(object):
+
+    """Adds samples to and merges reservoirs the size of the span event
+    reservoir, where the reservoir is already full.
+
+    """
+
+    params = [1000, 10000]
+    param_names = ['capacity']
+
+    def setup(self, capacity):
+        random.seed(0)
+        self.data_set = _sampled_data_set(capacity, capacity)
+        self.transaction = _sampled_data_set(capacity, 50)
+        self.snapshot = _sampled_data_set(capacity, capacity)
+        self.priorities = [random.random() for _ in range(capacity)]
+
+    def time_add(self, capacity):
+        for priority in self.priorities:
+            self.data_set.add(None, priority)
+
+    def time_merge_transaction(self, capacity):
+        for _ in range(100):
+            self.data_set.merge(self.transaction)
+
+    def time_merge_rollback(self, capacity):
+        self.data_set.merge(self.snapshot)
+
+
+class TimeRecordSpanEvents(object):
+
+    """Records transactions with many spans once the span event reservoir
+    of the application is full.
+
+    """
+
+    params = [100, 1000]
+    param_names = ['spans']
+
+    def setup(self, spans):
+        self.application = connected_application(**{
+            'distributed_tracing.enabled': True,
+            'event_harvest_config.harvest_limits.span_event_data': 1000,
+        })
+
+        # Fill the reservoir with spans of a higher priority than those
+        # of the transactions being timed.
+
+        self.application.record_transaction(transaction_node(
+                children=function_nodes(1000), priority=1.5))
+
+        self.node = transaction_node(children=function_nodes(spans),
+                priority=1.0)
+
+    def teardown(self, spans):
+        self.application.harvest(shutdown=True)
+
+    def time_record_transaction(self, spans):
+        for _ in range(20):
+            self.application.record_transaction(self.node)
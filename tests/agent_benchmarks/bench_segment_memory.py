@@ -0,0 +1,157 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import gc
+import tracemalloc
+
+from newrelic.api.background_task import BackgroundTask
+from newrelic.api.database_trace import DatabaseTrace
+from newrelic.api.datastore_trace import DatastoreTrace
+from newrelic.api.external_trace import ExternalTrace
+from newrelic.api.function_trace import FunctionTrace
+from newrelic.api.message_trace import MessageTrace
+from newrelic.api.time_trace import current_trace
+
+from ._util import active_application
+
+CHAINS = 20
+DEPTH = 50
+SEGMENTS = 2 * CHAINS * DEPTH
+
+LEAVES = {
+    'function': lambda parent: FunctionTrace('leaf', parent=parent),
+    'database': lambda parent: DatabaseTrace('SELECT * FROM table',
+            parent=parent),
+    'external': lambda parent: ExternalTrace('library',
+            'http://localhost/', parent=parent),
+    'datastore': lambda parent: DatastoreTrace('product', 'target',
+            'operation', parent=parent),
+    'message': lambda parent: MessageTrace('library', 'Produce',
+            'Exchange', 'name', parent=parent),
+}
+
+
+class DeepTraceSuite(object):
+
+    """Records a transaction with chains of nested function traces, each
+    function trace having a leaf trace of the given kind, for 2,000
+    segments in all. The memory used for each segment is that in use
+    with all the function traces still active, plus that used by the
+    nodes once they have all exited, before the transaction completes.
+
+    """
+
+    params = sorted(LEAVES)
+    param_names = ['leaf']
+
+    def setup(self, leaf):
+        self.application = active_application()
+        self.leaf = LEAVES[leaf]
+
+    def _record(self, on_active=None, on_exited=None):
+        with BackgroundTask(self.application, 'bench_segment_memory'):
+            root = current_trace()
+
+            chains = []
+            for _ in range(CHAINS):
+                chain = []
+                parent = root
+                for _ in range(DEPTH):
+                    trace = FunctionTrace('node', parent=parent)
+                    trace.__enter__()
+                    chain.append(trace)
+
+                    leaf = self.leaf(trace)
+                    leaf.__enter__()
+                    leaf.__exit__(None, None, None)
+
+                    parent = trace
+
+                chains.append(chain)
+
+            if on_active:
+                on_active()
+
+            for chain in chains:
+                for trace in reversed(chain):
+                    trace.__exit__(None, None, None)
+
+            del chains, chain, trace, leaf
+
+            if on_exited:
+                on_exited()
+
+    def time_record(self, leaf):
+        self._record()
+
+    def track_bytes_per_segment(self, leaf):
+        sizes = []
+
+        def _measure():
+            sizes.append(tracemalloc.get_traced_memory()[0])
+
+        tracemalloc.start()
+        try:
+            _measure()
+            self._record(_measure, _measure)
+        finally:
+            tracemalloc.stop()
+
+        start, active, exited = sizes
+        return ((active - start) + (exited - start)) // SEGMENTS
+
+    def track_gen0_collections(self, leaf):
+        gc.collect()
+        collections = gc.get_stats()[0]['collections']
+        for _ in range(10):
+            self._record()
+        return gc.get_stats()[0]['collections'] - collections
+
+
+class BatchTransactionSuite(object):
+
+    """Records a long running background task making 50,000 datastore
+    calls, with and without a segment budget for the transaction.
+
+    """
+
+    params = [None, 2000]
+    param_names = ['segments_per_transaction']
+
+    def setup(self, segments_per_transaction):
+        self.application = active_application()
+
+        agent_limits = self.application.settings.agent_limits
+        self.backup = agent_limits.segments_per_transaction
+        agent_limits.segments_per_transaction = segments_per_transaction
+
+    def teardown(self, segments_per_transaction):
+        agent_limits = self.application.settings.agent_limits
+        agent_limits.segments_per_transaction = self.backup
+
+    def _record(self):
+        with BackgroundTask(self.application, 'bench_segment_budget'):
+            for _ in range(50000):
+                with DatastoreTrace('product', 'target', 'operation'):
+                    pass
+
+    def time_record(self, segments_per_transaction):
+        self._record()
+
+    def track_peak_bytes(self, segments_per_transaction):
+        tracemalloc.start()
+        try:
+            self._record()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
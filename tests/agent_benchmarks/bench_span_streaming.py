@@ -0,0 +1,134 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+from concurrent import futures
+
+import grpc
+
+from newrelic.common.streaming_utils import (StreamBuffer,
+        SpanBatchStreamBuffer)
+from newrelic.core.agent_streaming import StreamingRpc
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.infinite_tracing_pb2 import RecordStatus, Span, SpanBatch
+
+from ._util import function_nodes, override_settings, transaction_node
+
+SPANS = 20000
+
+
+class TraceObserver(object):
+
+    """Trace observer running in process, which counts the spans it
+    receives, whether sent one at a time or in batches.
+
+    """
+
+    def __init__(self):
+        self.received = 0
+        self.expected = None
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        self.server.add_generic_rpc_handlers((
+            grpc.method_handlers_generic_handler(
+                'com.newrelic.trace.v1.IngestService', {
+                    'RecordSpan': grpc.stream_stream_rpc_method_handler(
+                            self.record_span, Span.FromString,
+                            RecordStatus.SerializeToString),
+                    'RecordSpanBatch': grpc.stream_stream_rpc_method_handler(
+                            self.record_span_batch, SpanBatch.FromString,
+                            RecordStatus.SerializeToString),
+                }),))
+        self.port = self.server.add_insecure_port('127.0.0.1:0')
+        self.server.start()
+
+    def _received(self, count):
+        with self.lock:
+            self.received += count
+            if self.received == self.expected:
+                self.done.set()
+
+    def record_span(self, request, context):
+        for span in request:
+            self._received(1)
+            yield RecordStatus(messages_seen=1)
+
+    def record_span_batch(self, request, context):
+        for span_batch in request:
+            self._received(len(span_batch.spans))
+            yield RecordStatus(messages_seen=len(span_batch.spans))
+
+    def close(self):
+        self.server.stop(grace=None)
+
+
+class SpanStreamingSuite(object):
+
+    """Builds the spans for transactions and streams them to a trace
+    observer running in process, comparing sending a gRPC message per
+    span with sending batches of spans.
+
+    """
+
+    params = [False, True]
+    param_names = ['batching']
+
+    def setup(self, batching):
+        self.observer = TraceObserver()
+
+        if batching:
+            self.stream_buffer = SpanBatchStreamBuffer(SPANS)
+        else:
+            self.stream_buffer = StreamBuffer(SPANS)
+
+        self.rpc = StreamingRpc('127.0.0.1:%d' % self.observer.port,
+                self.stream_buffer, (), lambda *args, **kwargs: None,
+                ssl=False, batching=batching)
+        self.rpc.connect()
+
+        with override_settings({'distributed_tracing.enabled': True}):
+            settings = finalize_application_settings(
+                    {'agent_run_id': '1234567'})
+
+        self.settings = settings
+        self.node = transaction_node(settings, function_nodes(99))
+
+    def teardown(self, batching):
+        self.stream_buffer.shutdown()
+        self.rpc.close()
+        self.observer.close()
+
+    def _stream_spans(self):
+        self.observer.expected = SPANS
+
+        put = self.stream_buffer.put
+        for _ in range(SPANS // 100):
+            for span in self.node.span_protos(self.settings):
+                put(span)
+
+        assert self.observer.done.wait(60)
+
+    def time_stream_spans(self, batching):
+        self._stream_spans()
+
+    def track_spans_per_second(self, batching):
+        start = time.time()
+        self._stream_spans()
+        return int(SPANS / (time.time() - start))
+
+    track_spans_per_second.unit = 'spans/s'
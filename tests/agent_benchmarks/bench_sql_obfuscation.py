@@ -0,0 +1,110 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+
+import newrelic.core.database_utils as database_utils
+from newrelic.core.database_utils import SQLStatement
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(
+        os.path.realpath(__file__))), 'cross_agent', 'fixtures',
+        'sql_obfuscation', 'sql_obfuscation.json')
+
+_quoting_styles = {
+    'sqlite': 'single',
+    'mysql': 'single+double',
+    'postgres': 'single+dollar',
+    'oracle': 'single+oracle',
+    'cassandra': 'single',
+}
+
+# Statements of the shape generated by ORMs such as the Django ORM and
+# SQLAlchemy, with literals either inlined or passed as parameters.
+
+ORM_STATEMENTS = [
+    'SELECT "auth_user"."id", "auth_user"."password", '
+    '"auth_user"."last_login", "auth_user"."is_superuser", '
+    '"auth_user"."username", "auth_user"."email" FROM "auth_user" '
+    'WHERE "auth_user"."id" = %s LIMIT 21',
+    'SELECT "django_session"."session_key", '
+    '"django_session"."session_data", "django_session"."expire_date" '
+    'FROM "django_session" WHERE ("django_session"."expire_date" > '
+    '\'2020-06-01T10:00:00.000000\'::timestamp AND '
+    '"django_session"."session_key" = \'8x1hfl2k0sldk3jf9s0dk2ls0dkf3k2s\')',
+    'INSERT INTO "orders" ("customer_id", "total", "status", "created") '
+    'VALUES (%s, %s, %s, %s) RETURNING "orders"."id"',
+    'UPDATE "inventory" SET "quantity" = ("inventory"."quantity" - 1) '
+    'WHERE "inventory"."sku" = \'SKU-000123\'',
+    'SELECT orders.id AS orders_id, orders.total AS orders_total, '
+    'customers.name AS customers_name FROM orders JOIN customers ON '
+    'customers.id = orders.customer_id WHERE orders.created > :created_1 '
+    'AND orders.status IN (:status_1, :status_2, :status_3) '
+    'ORDER BY orders.created DESC LIMIT :param_1',
+    "SELECT * FROM products WHERE price BETWEEN 10.50 AND 99.99 AND "
+    "deleted = false AND category_id IN (1, 2, 3, 4, 5) "
+    "/* controller:products,action:index */",
+    "DELETE FROM cache WHERE expires < 1591005600 AND key LIKE 'user:%'",
+    "SELECT COUNT(*) FROM events WHERE uuid = "
+    "'6ba7b810-9dad-11d1-80b4-00c04fd430c8' OR id = 0x1F -- lookup",
+]
+
+
+def _load_cross_agent_tests():
+    with open(FIXTURES) as fh:
+        tests = json.load(fh)
+    return [test for test in tests if not test.get('pathological')]
+
+
+class DummyDB(object):
+    def __init__(self, quoting_style):
+        self.quoting_style = quoting_style
+
+
+class SQLObfuscationSuite(object):
+
+    """Times obfuscating and normalizing a corpus of SQL, both by calling
+    the obfuscator directly and through SQLStatement, which shares results
+    for repeated statements through a cache.
+
+    """
+
+    params = ['single', 'single+double', 'single+dollar', 'single+oracle']
+    param_names = ['quoting_style']
+
+    def setup(self, quoting_style):
+        # Only time the obfuscator where it passes the cross agent tests.
+
+        for test in _load_cross_agent_tests():
+            for dialect in test['dialects']:
+                database = DummyDB(_quoting_styles[dialect])
+                obfuscated = SQLStatement(test['sql'], database).obfuscated
+                assert obfuscated in test['obfuscated'], (test['name'],
+                        obfuscated)
+
+        self.database = DummyDB(quoting_style)
+        self.corpus = ORM_STATEMENTS + [test['sql'] for test in
+                _load_cross_agent_tests()]
+
+    def time_obfuscate_and_normalize(self, quoting_style):
+        for _ in range(20):
+            for sql in self.corpus:
+                database_utils._normalize_sql(
+                        database_utils._obfuscate_sql(sql, self.database))
+
+    def time_sql_statement_identifier(self, quoting_style):
+        database_utils._sql_cache.clear()
+        for _ in range(20):
+            for sql in self.corpus:
+                SQLStatement(sql, self.database).identifier
@@ -0,0 +1,65 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+from newrelic.core.config import finalize_application_settings
+
+from ._util import (connected_application, function_nodes,
+        override_settings, transaction_node)
+
+TRANSACTIONS_PER_THREAD = 200
+
+
+class TimeRecordTransactionContention(object):
+
+    """Records transactions from many threads at once, comparing merging
+    each transaction into the main stats engine under the stats lock with
+    merging into per thread stats engine shards.
+
+    """
+
+    params = ([1, 8, 32], [False, True])
+    param_names = ['threads', 'per_thread_shards']
+
+    def setup(self, threads, per_thread_shards):
+        overrides = {'stats_engine.per_thread_shards': per_thread_shards}
+
+        self.application = connected_application(**overrides)
+
+        with override_settings(overrides):
+            settings = finalize_application_settings(
+                    {'agent_run_id': '1234567'})
+
+        self.node = transaction_node(settings, function_nodes(20))
+
+    def teardown(self, threads, per_thread_shards):
+        self.application.harvest(shutdown=True)
+
+    def _record(self):
+        for _ in range(TRANSACTIONS_PER_THREAD):
+            self.application.record_transaction(self.node)
+
+    def time_record_transaction(self, threads, per_thread_shards):
+        workers = [threading.Thread(target=self._record)
+                for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        # Include the cost of merging the shards in the harvest.
+
+        with self.application._stats_lock:
+            self.application._merge_stats_shards()
@@ -0,0 +1,102 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+
+import newrelic.core.trace_cache as trace_cache_module
+from newrelic.api.background_task import BackgroundTask
+from newrelic.api.function_trace import FunctionTrace
+from newrelic.api.time_trace import current_trace
+
+from ._util import active_application
+
+CALLS = 2000
+
+
+class TimeNestedFunctionTrace(object):
+
+    """Enters and exits nested function traces within a transaction while
+    the given number of other threads are alive, to check the cost of
+    each trace doesn't grow with the number of threads.
+
+    """
+
+    params = [0, 16, 64, 256]
+    param_names = ['threads']
+
+    def setup(self, threads):
+        self.application = active_application()
+
+        self.event = threading.Event()
+        self.threads = [threading.Thread(target=self.event.wait)
+                for _ in range(threads)]
+        for thread in self.threads:
+            thread.start()
+
+        # The transaction is started and ended outside of the benchmark,
+        # so that only the cost of the function traces is measured.
+
+        self.transaction = BackgroundTask(self.application,
+                'bench_trace_cache')
+        self.transaction.__enter__()
+
+    def teardown(self, threads):
+        self.transaction.__exit__(None, None, None)
+
+        self.event.set()
+        for thread in self.threads:
+            thread.join()
+
+    def time_nested_function_traces(self, threads):
+        for _ in range(CALLS):
+            with FunctionTrace('outer'):
+                with FunctionTrace('inner'):
+                    pass
+
+
+class TimeCurrentTrace(object):
+
+    """Looks up the current trace from within an asyncio task, comparing
+    the trace cache keyed by thread ID with that using a context variable.
+
+    """
+
+    params = ['thread_id', 'context_vars']
+    param_names = ['backend']
+
+    def setup(self, backend):
+        self.application = active_application()
+
+        self.trace_cache = trace_cache_module._trace_cache
+        if backend == 'context_vars':
+            trace_cache_module._trace_cache = \
+                    trace_cache_module.ContextTraceCache()
+        else:
+            trace_cache_module._trace_cache = trace_cache_module.TraceCache()
+
+        self.loop = asyncio.new_event_loop()
+
+    def teardown(self, backend):
+        self.loop.close()
+        trace_cache_module._trace_cache = self.trace_cache
+
+    async def _lookups(self):
+        with BackgroundTask(self.application, 'bench_current_trace'):
+            with FunctionTrace('outer'):
+                for _ in range(CALLS * 10):
+                    current_trace()
+
+    def time_current_trace(self, backend):
+        self.loop.run_until_complete(self._lookups())
@@ -0,0 +1,104 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import functools
+import pytest
+
+from newrelic.api.background_task import background_task
+from newrelic.api.database_trace import database_trace
+from newrelic.api.datastore_trace import datastore_trace
+from newrelic.api.function_trace import function_trace
+from newrelic.api.external_trace import external_trace
+from newrelic.api.memcache_trace import memcache_trace
+from newrelic.api.message_trace import message_trace
+
+from testing_support.fixtures import (validate_transaction_metrics,
+        capture_transaction_metrics)
+
+
+@pytest.mark.parametrize('trace,metric', [
+    (functools.partial(function_trace, name='simple_gen'),
+            'Function/simple_gen'),
+    (functools.partial(external_trace, library='lib', url='http://foo.com'),
+            'External/foo.com/lib/'),
+    (functools.partial(database_trace, 'select * from foo'),
+            'Datastore/statement/None/foo/select'),
+    (functools.partial(datastore_trace, 'lib', 'foo', 'bar'),
+            'Datastore/statement/lib/foo/bar'),
+    (functools.partial(message_trace, 'lib', 'op', 'typ', 'name'),
+            'MessageBroker/lib/typ/op/Named/name'),
+    (functools.partial(memcache_trace, 'cmd'),
+            'Memcache/cmd'),
+])
+def test_async_generator_timing(trace, metric):
+
+    @trace()
+    async def agen():
+        for value in range(2):
+            await asyncio.sleep(0.05)
+            yield value
+
+    @background_task(name='test_async_generator')
+    async def parent():
+        return [value async for value in agen()]
+
+    metrics = []
+    full_metrics = {}
+
+    @capture_transaction_metrics(metrics, full_metrics)
+    @validate_transaction_metrics(
+            'test_async_generator',
+            background_task=True,
+            scoped_metrics=[(metric, 1)],
+            rollup_metrics=[(metric, 1)])
+    def _test():
+        loop = asyncio.get_event_loop()
+        assert loop.run_until_complete(parent()) == [0, 1]
+
+    _test()
+
+    # Check that async generators time the total iteration time
+    metric_key = (metric, '')
+    assert full_metrics[metric_key].total_call_time >= 0.1
+
+
+@validate_transaction_metrics(
+        'test_async_generator_send_throw',
+        background_task=True,
+        scoped_metrics=[('Function/agen', 1)],
+        rollup_metrics=[('Function/agen', 1)])
+def test_async_generator_send_throw():
+
+    @function_trace(name='agen')
+    async def agen():
+        received = []
+        try:
+            value = yield 'first'
+            received.append(value)
+            yield 'second'
+        except ValueError:
+            yield received
+
+    @background_task(name='test_async_generator_send_throw')
+    async def parent():
+        gen = agen()
+        assert await gen.asend(None) == 'first'
+        assert await gen.asend('sent') == 'second'
+        assert await gen.athrow(ValueError) == ['sent']
+
+        with pytest.raises(StopAsyncIteration):
+            await gen.asend(None)
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(parent())
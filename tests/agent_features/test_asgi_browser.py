@@ -872,3 +872,49 @@ def test_html_insertion_manual_rum_insertion():
 
     assert b'NREUM HEADER' not in response.body
     assert b'NREUM.info' not in response.body
+
+
+@asgi_application()
+async def target_asgi_application_streamed(scope, receive, send):
+    output = [b'<html><head>', b'<title>x</title>', b'</head><bo',
+            b'dy><p>RESPONSE</p></body></html>']
+
+    # No content length, so the response can be streamed.
+
+    response_headers = [(b'content-type', b'text/html; charset=utf-8')]
+
+    await send({"type": "http.response.start", "status": 200, "headers": response_headers})
+
+    for data in output:
+        more_body = data is not output[-1]
+        await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        # Content before the insertion point is passed on as soon as it
+        # is sent, rather than being held back until the body.
+
+        if data is output[0]:
+            assert target_application_streamed.output_queue.qsize() == 2
+
+
+target_application_streamed = AsgiTest(target_asgi_application_streamed)
+
+_test_html_insertion_streamed_settings = {
+    'browser_monitoring.enabled': True,
+    'browser_monitoring.auto_instrument': True,
+    'js_agent_loader': u'<!-- NREUM HEADER -->',
+}
+
+
+@override_application_settings(_test_html_insertion_streamed_settings)
+def test_html_insertion_streamed():
+    response = target_application_streamed.get('/')
+    assert response.status == 200
+
+    assert 'content-type' in response.headers
+    assert 'content-length' not in response.headers
+
+    assert response.body.startswith(b'<html><head><script')
+    assert b'NREUM HEADER' in response.body
+    assert b'NREUM.info' in response.body
+    assert response.body.endswith(b'<title>x</title></head><body>'
+            b'<p>RESPONSE</p></body></html>')
@@ -985,3 +985,66 @@ def test_html_insertion_manual_rum_insertion():
     # footer added by the agent.
 
     response.mustcontain(no=['NREUM HEADER', 'NREUM.info'])
+
+
+_test_html_insertion_streamed_output = [b'<html><head>', b'<title>x</title>',
+        b'</head><body>', b'<p>RESPONSE</p></body></html>']
+
+_test_html_insertion_streamed_yielded = []
+
+
+@wsgi_application()
+def target_wsgi_application_streamed(environ, start_response):
+    status = '200 OK'
+
+    # No content length, so the response can be streamed.
+
+    response_headers = [('Content-Type', 'text/html; charset=utf-8')]
+    start_response(status, response_headers)
+
+    for data in _test_html_insertion_streamed_output:
+        _test_html_insertion_streamed_yielded.append(data)
+        yield data
+
+
+_test_html_insertion_streamed_settings = {
+    'browser_monitoring.enabled': True,
+    'browser_monitoring.auto_instrument': True,
+    'js_agent_loader': u'<!-- NREUM HEADER -->',
+}
+
+
+@override_application_settings(_test_html_insertion_streamed_settings)
+def test_html_insertion_streamed():
+    del _test_html_insertion_streamed_yielded[:]
+
+    environ = webtest.TestRequest.blank('/').environ
+    response_headers = []
+
+    def start_response(status, headers, *args):
+        response_headers.extend(headers)
+
+    iterable = target_wsgi_application_streamed(environ, start_response)
+
+    try:
+        output = iter(iterable)
+
+        # Content before the insertion point is passed on as soon as it
+        # is yielded, rather than being held back until the body.
+
+        assert next(output) == b'<html><head>'
+        assert response_headers
+        assert len(_test_html_insertion_streamed_yielded) == 1
+
+        body = b'<html><head>' + b''.join(output)
+
+    finally:
+        iterable.close()
+
+    assert 'Content-Length' not in dict(response_headers)
+
+    assert body.startswith(b'<html><head><script')
+    assert b'NREUM HEADER' in body
+    assert b'NREUM.info' in body
+    assert body.endswith(b'<title>x</title></head><body>'
+            b'<p>RESPONSE</p></body></html>')
@@ -469,3 +469,6 @@ def test_trace_outlives_transaction():
 
 if sys.version_info >= (3, 5):
     from _test_async_coroutine_trace import *  # NOQA
+
+if sys.version_info >= (3, 6):
+    from _test_async_generator_trace import *  # NOQA
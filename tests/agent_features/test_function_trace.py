@@ -15,7 +15,7 @@
 import time
 
 from newrelic.api.background_task import background_task
-from newrelic.api.function_trace import FunctionTrace
+from newrelic.api.function_trace import FunctionTrace, function_trace
 
 from testing_support.fixtures import (validate_transaction_metrics,
         validate_tt_parenting)
@@ -127,3 +127,58 @@ def test_function_trace_settings():
 def test_function_trace_settings_no_transaction():
     with FunctionTrace("test_trace") as trace:
         assert not trace.settings
+
+
+@function_trace()
+def function_trace_name():
+    pass
+
+
+class FunctionTraceBase(object):
+    @function_trace()
+    def method(self):
+        pass
+
+
+class FunctionTraceSubclass(FunctionTraceBase):
+    pass
+
+
+_test_function_trace_wrapper_names_scoped_metrics = [
+        ('Function/test_function_trace:function_trace_name', 1),
+        ('Function/test_function_trace:FunctionTraceBase.method', 1),
+        ('Function/test_function_trace:FunctionTraceSubclass.method', 2),
+]
+
+
+@validate_transaction_metrics(
+        'test_function_trace:test_function_trace_wrapper_names',
+        scoped_metrics=_test_function_trace_wrapper_names_scoped_metrics,
+        background_task=True)
+@background_task()
+def test_function_trace_wrapper_names():
+    function_trace_name()
+
+    # The name of a method is that of the class of the instance it is
+    # called on, even where the method is defined on a base class.
+
+    FunctionTraceBase().method()
+    FunctionTraceSubclass().method()
+    FunctionTraceSubclass().method()
+
+
+@validate_transaction_metrics(
+        'test_function_trace:test_function_trace_wrapper_generator',
+        scoped_metrics=[('Function/generator', 1)],
+        background_task=True)
+@background_task()
+def test_function_trace_wrapper_generator():
+    @function_trace(name='generator')
+    def generator():
+        value = yield 1
+        yield value
+
+    gen = generator()
+    assert next(gen) == 1
+    assert gen.send(2) == 2
+    assert list(gen) == []
@@ -0,0 +1,115 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from newrelic.api.background_task import background_task
+from newrelic.api.datastore_trace import DatastoreTrace
+from newrelic.api.external_trace import ExternalTrace
+from newrelic.api.function_trace import FunctionTrace
+from newrelic.api.transaction import set_transaction_name
+
+from testing_support.fixtures import (override_application_settings,
+        validate_transaction_metrics, validate_tt_parenting)
+
+_test_incremental_time_metrics_scoped_metrics = [
+    ('Function/outer', 1),
+    ('Function/inner', 2),
+    ('Function/leaf', 1),
+    ('Datastore/statement/Redis/key/get', 2),
+    ('External/localhost/library/GET', 1),
+]
+
+_test_incremental_time_metrics_rollup_metrics = [
+    ('Function/outer', 1),
+    ('Function/inner', 2),
+    ('Datastore/all', 2),
+    ('Datastore/allOther', 2),
+    ('External/all', 1),
+    ('External/allOther', 1),
+    ('Custom/all', 1),
+    ('Custom/allOther', 1),
+]
+
+_test_incremental_time_metrics_tt_parenting = (
+    'TransactionNode', [
+        ('FunctionNode', [
+            ('FunctionNode', [
+                ('DatastoreNode', []),
+            ]),
+            ('FunctionNode', [
+                ('DatastoreNode', []),
+            ]),
+            ('FunctionNode', []),
+        ]),
+        ('ExternalNode', []),
+    ]
+)
+
+
+@pytest.mark.parametrize('incremental', (False, True))
+def test_incremental_time_metrics(incremental):
+
+    @override_application_settings({
+        'stats_engine.incremental_time_metrics': incremental,
+    })
+    @validate_tt_parenting(_test_incremental_time_metrics_tt_parenting)
+    @validate_transaction_metrics('renamed', background_task=True,
+            scoped_metrics=_test_incremental_time_metrics_scoped_metrics,
+            rollup_metrics=_test_incremental_time_metrics_rollup_metrics)
+    @background_task(name='test_incremental_time_metrics')
+    def _test():
+        with FunctionTrace('outer'):
+            for _ in range(2):
+                with FunctionTrace('inner'):
+                    with DatastoreTrace('Redis', 'key', 'get'):
+                        pass
+
+            with FunctionTrace('leaf', terminal=True, rollup='Custom/all'):
+                pass
+
+        with ExternalTrace('library', 'http://localhost/', 'GET'):
+            pass
+
+        # The scope of the metrics already generated must follow the
+        # final name of the transaction.
+
+        set_transaction_name('renamed')
+
+    _test()
+
+
+@pytest.mark.parametrize('incremental', (False, True))
+def test_incremental_time_metrics_below_external(incremental):
+
+    # Only function nodes generate the time metrics of their children.
+
+    @override_application_settings({
+        'stats_engine.incremental_time_metrics': incremental,
+    })
+    @validate_transaction_metrics(
+            'test_incremental_time_metrics_below_external',
+            background_task=True,
+            scoped_metrics=[
+                ('External/localhost/library/GET', 1),
+                ('Function/inner', None),
+            ],
+            rollup_metrics=[('Function/inner', None)])
+    @background_task(name='test_incremental_time_metrics_below_external')
+    def _test():
+        with ExternalTrace('library', 'http://localhost/', 'GET'):
+            with FunctionTrace('inner'):
+                pass
+
+    _test()
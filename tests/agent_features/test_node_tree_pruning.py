@@ -0,0 +1,88 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from newrelic.api.background_task import background_task
+from newrelic.api.datastore_trace import DatastoreTrace
+from newrelic.api.function_trace import FunctionTrace
+from newrelic.api.transaction import current_transaction
+from newrelic.common.object_wrapper import transient_function_wrapper
+
+from testing_support.fixtures import (override_application_settings,
+        validate_transaction_metrics)
+
+
+def validate_node_tree(retained):
+
+    @transient_function_wrapper('newrelic.core.stats_engine',
+            'StatsEngine.record_transaction')
+    def _validate_node_tree(wrapped, instance, args, kwargs):
+        transaction = args[0]
+
+        assert bool(transaction.root.children) == retained
+
+        return wrapped(*args, **kwargs)
+
+    return _validate_node_tree
+
+
+_test_node_tree_pruning_scoped_metrics = [
+    ('Function/outer', 1),
+    ('Function/inner', 3),
+    ('Datastore/statement/Redis/key/get', 3),
+]
+
+_test_node_tree_pruning_rollup_metrics = [
+    ('Function/outer', 1),
+    ('Function/inner', 3),
+    ('Datastore/all', 3),
+    ('Datastore/allOther', 3),
+]
+
+
+@pytest.mark.parametrize('settings,sampled,retained', (
+    ({}, False, False),
+    ({'stats_engine.prune_node_trees': False}, False, True),
+    ({'transaction_tracer.transaction_threshold': 0.0}, False, True),
+    ({'transaction_tracer.enabled': False}, False, False),
+    ({'distributed_tracing.enabled': True}, False, False),
+    ({'distributed_tracing.enabled': True}, True, True),
+    ({'distributed_tracing.enabled': True,
+            'span_events.enabled': False}, True, False),
+    ({'stats_engine.incremental_time_metrics': True}, False, False),
+))
+def test_node_tree_pruning(settings, sampled, retained):
+    _settings = {'transaction_tracer.transaction_threshold': 100.0}
+    _settings.update(settings)
+
+    @override_application_settings(_settings)
+    @validate_node_tree(retained)
+    @validate_transaction_metrics('test_node_tree_pruning',
+            background_task=True,
+            scoped_metrics=_test_node_tree_pruning_scoped_metrics,
+            rollup_metrics=_test_node_tree_pruning_rollup_metrics)
+    @background_task(name='test_node_tree_pruning')
+    def _test():
+        transaction = current_transaction()
+        transaction._sampled = sampled
+        transaction._priority = sampled and 2.0 or 0.0
+
+        with FunctionTrace('outer'):
+            for _ in range(3):
+                with FunctionTrace('inner'):
+                    with DatastoreTrace('Redis', 'key', 'get'):
+                        pass
+
+    _test()
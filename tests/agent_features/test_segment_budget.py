@@ -0,0 +1,147 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from newrelic.api.background_task import background_task
+from newrelic.api.datastore_trace import DatastoreTrace
+from newrelic.api.external_trace import ExternalTrace
+from newrelic.api.function_trace import FunctionTrace
+from newrelic.api.transaction import set_transaction_name
+from newrelic.common.object_wrapper import transient_function_wrapper
+
+from testing_support.fixtures import (override_application_settings,
+        validate_transaction_metrics)
+
+FOLDED_METRIC = 'Supportability/Python/Transaction/Segments/Folded'
+
+
+def validate_retained_segments(expected):
+
+    @transient_function_wrapper('newrelic.core.stats_engine',
+            'StatsEngine.record_transaction')
+    def _validate_retained_segments(wrapped, instance, args, kwargs):
+        transaction = args[0]
+
+        def _count(node):
+            return sum(1 + _count(child) for child in node.children)
+
+        assert _count(transaction.root) == expected
+
+        return wrapped(*args, **kwargs)
+
+    return _validate_retained_segments
+
+
+@override_application_settings({
+    'agent_limits.segments_per_transaction': 5,
+})
+@validate_retained_segments(5)
+@validate_transaction_metrics('test_segment_budget_folds_leaves',
+        background_task=True,
+        scoped_metrics=[('Function/leaf', 20)],
+        rollup_metrics=[('Function/leaf', 20), (FOLDED_METRIC, 15)])
+@background_task(name='test_segment_budget_folds_leaves')
+def test_segment_budget_folds_leaves():
+    for _ in range(20):
+        with FunctionTrace('leaf'):
+            pass
+
+
+@override_application_settings({
+    'agent_limits.segments_per_transaction': 2,
+})
+@validate_retained_segments(3)
+@validate_transaction_metrics('test_segment_budget_keeps_parents',
+        background_task=True,
+        scoped_metrics=[('Function/parent', 1), ('Function/leaf', 10)],
+        rollup_metrics=[(FOLDED_METRIC, 8)])
+@background_task(name='test_segment_budget_keeps_parents')
+def test_segment_budget_keeps_parents():
+    # The parent completes after the budget is used up, but is kept as the
+    # leaves retained beneath it would otherwise be lost as well.
+
+    with FunctionTrace('parent'):
+        for _ in range(10):
+            with FunctionTrace('leaf'):
+                pass
+
+
+@override_application_settings({
+    'agent_limits.segments_per_transaction': 0,
+})
+@validate_retained_segments(0)
+@validate_transaction_metrics('renamed', background_task=True,
+        scoped_metrics=[('Datastore/statement/Redis/key/get', 3)],
+        rollup_metrics=[
+            ('Datastore/statement/Redis/key/get', 3),
+            ('Datastore/operation/Redis/get', 3),
+            ('Datastore/Redis/allOther', 3),
+            ('Datastore/allOther', 3),
+            (FOLDED_METRIC, 3),
+        ])
+@background_task(name='test_segment_budget_scope_follows_rename')
+def test_segment_budget_scope_follows_rename():
+    for _ in range(3):
+        with DatastoreTrace('Redis', 'key', 'get'):
+            pass
+
+    set_transaction_name('renamed')
+
+
+@validate_retained_segments(20)
+@validate_transaction_metrics('test_segment_budget_disabled',
+        background_task=True,
+        scoped_metrics=[('Function/leaf', 20)],
+        rollup_metrics=[(FOLDED_METRIC, None)])
+@background_task(name='test_segment_budget_disabled')
+def test_segment_budget_disabled():
+    for _ in range(20):
+        with FunctionTrace('leaf'):
+            pass
+
+
+class NonTerminalExternalTrace(ExternalTrace):
+
+    def terminal_node(self):
+        return False
+
+
+@pytest.mark.parametrize('limit,folded', ((None, None), (0, 2)))
+def test_segment_budget_below_external(limit, folded):
+
+    # Only function nodes generate the time metrics of their children, so
+    # folding a segment below an external mustn't add any either.
+
+    @override_application_settings({
+        'agent_limits.segments_per_transaction': limit,
+    })
+    @validate_transaction_metrics('test_segment_budget_below_external',
+            background_task=True,
+            scoped_metrics=[
+                ('External/localhost/library/GET', 1),
+                ('Function/inner', None),
+            ],
+            rollup_metrics=[
+                ('Function/inner', None),
+                (FOLDED_METRIC, folded),
+            ])
+    @background_task(name='test_segment_budget_below_external')
+    def _test():
+        with NonTerminalExternalTrace('library', 'http://localhost/',
+                'GET'):
+            with FunctionTrace('inner'):
+                pass
+
+    _test()
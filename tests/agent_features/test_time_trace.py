@@ -13,10 +13,18 @@
 # limitations under the License.
 
 import logging
+import pytest
+import weakref
 
 from newrelic.api.transaction import end_of_transaction
 from newrelic.api.background_task import background_task
+from newrelic.api.database_trace import DatabaseTrace
+from newrelic.api.datastore_trace import DatastoreTrace
+from newrelic.api.external_trace import ExternalTrace
 from newrelic.api.function_trace import FunctionTrace
+from newrelic.api.memcache_trace import MemcacheTrace
+from newrelic.api.message_trace import MessageTrace
+from newrelic.api.time_trace import current_trace
 
 
 from testing_support.fixtures import validate_transaction_metrics
@@ -36,3 +44,26 @@ def test_trace_after_end_of_transaction(caplog):
     error_messages = [record for record in caplog.records
             if record.levelno >= logging.ERROR]
     assert not error_messages
+
+
+@pytest.mark.parametrize('trace_factory', [
+    lambda: FunctionTrace('name'),
+    lambda: DatabaseTrace('select * from foo'),
+    lambda: DatastoreTrace('product', 'target', 'operation'),
+    lambda: ExternalTrace('library', 'http://localhost/'),
+    lambda: MemcacheTrace('get'),
+    lambda: MessageTrace('library', 'Produce', 'Exchange', 'name'),
+])
+@background_task(name='test_trace_slots')
+def test_trace_slots(trace_factory):
+    root = current_trace()
+    assert not hasattr(root, '__dict__')
+
+    with trace_factory() as trace:
+        # Traces use slots rather than an instance dictionary, but must
+        # still allow weak references to be held by the trace cache.
+
+        assert not hasattr(trace, '__dict__')
+        assert current_trace() is trace
+        assert weakref.ref(trace)() is trace
+        assert trace.parent is root
@@ -15,7 +15,7 @@
 from concurrent import futures
 
 import grpc
-from newrelic.core.infinite_tracing_pb2 import RecordStatus, Span
+from newrelic.core.infinite_tracing_pb2 import RecordStatus, Span, SpanBatch
 
 
 def record_span(request, context):
@@ -35,13 +35,26 @@ def record_span(request, context):
         yield RecordStatus(messages_seen=1)
 
 
+def record_span_batch(request, context):
+    metadata = dict(context.invocation_metadata())
+    assert 'agent_run_token' in metadata
+    assert 'license_key' in metadata
+
+    for span_batch in request:
+        yield RecordStatus(messages_seen=len(span_batch.spans))
+
+
 HANDLERS = (
     grpc.method_handlers_generic_handler(
         "com.newrelic.trace.v1.IngestService",
         {
             "RecordSpan": grpc.stream_stream_rpc_method_handler(
                 record_span, Span.FromString, RecordStatus.SerializeToString
-            )
+            ),
+            "RecordSpanBatch": grpc.stream_stream_rpc_method_handler(
+                record_span_batch, SpanBatch.FromString,
+                RecordStatus.SerializeToString
+            ),
         },
     ),
 )
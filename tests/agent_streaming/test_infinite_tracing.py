@@ -18,6 +18,7 @@ import threading
 from newrelic.core.config import global_settings
 from testing_support.fixtures import override_generic_settings
 
+from newrelic.common.streaming_utils import SpanBatchStreamBuffer
 from newrelic.core.application import Application
 from newrelic.core.agent_streaming import StreamingRpc
 from newrelic.core.infinite_tracing_pb2 import Span, AttributeValue
@@ -157,6 +158,46 @@ def test_reconnect_on_failure(monkeypatch, mock_grpc_server,
     _test()
 
 
+def test_infinite_tracing_span_batching(mock_grpc_server, buffer_empty_event,
+        app):
+
+    span = Span(
+        intrinsics={},
+        agent_attributes={},
+        user_attributes={})
+
+    @override_generic_settings(settings, {
+        'distributed_tracing.enabled': True,
+        'span_events.enabled': True,
+        'infinite_tracing.trace_observer_host': 'localhost',
+        'infinite_tracing.trace_observer_port': mock_grpc_server,
+        'infinite_tracing.ssl': False,
+        'infinite_tracing.batching': True,
+    })
+    @validate_metric_payload(metrics=[
+        ('Supportability/InfiniteTracing/Span/Seen', 2),
+        ('Supportability/InfiniteTracing/Span/Sent', 2),
+    ])
+    def _test():
+        app.connect_to_data_collector(None)
+
+        span_stream = app._stats_engine.span_stream
+        assert isinstance(span_stream, SpanBatchStreamBuffer)
+
+        buffer_empty_event.clear()
+
+        span_stream.put(span)
+        span_stream.put(span)
+
+        # Wait for the stream buffer to empty meaning all spans have been
+        # sent.
+        assert buffer_empty_event.wait(10)
+
+        app.harvest(shutdown=True)
+
+    _test()
+
+
 def test_agent_restart(app):
     # Get the application connected to the actual 8T endpoint
     app.connect_to_data_collector(None)
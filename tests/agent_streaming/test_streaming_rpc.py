@@ -12,11 +12,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import pytest
 import threading
 
 from newrelic.core.agent_streaming import StreamingRpc
-from newrelic.common.streaming_utils import StreamBuffer
-from newrelic.core.infinite_tracing_pb2 import Span, AttributeValue
+from newrelic.common.streaming_utils import (StreamBuffer,
+        SpanBatchStreamBuffer, SpanProtoAttrs, serialize_span_batch,
+        set_attribute_values)
+from newrelic.core.infinite_tracing_pb2 import Span, SpanBatch, AttributeValue
 
 
 CONDITION_CLS = type(threading.Condition())
@@ -104,3 +107,77 @@ def test_close_while_awaiting_reconnect(mock_grpc_server, monkeypatch):
     rpc.close()
     # Make sure the processing_thread is closed
     assert not rpc.response_processing_thread.is_alive()
+
+
+def test_close_while_connected_batching(mock_grpc_server, buffer_empty_event):
+    endpoint = "localhost:%s" % mock_grpc_server
+    stream_buffer = SpanBatchStreamBuffer(1000)
+
+    rpc = StreamingRpc(
+        endpoint, stream_buffer, DEFAULT_METADATA, record_metric, ssl=False,
+        batching=True
+    )
+
+    rpc.connect()
+    assert rpc.response_processing_thread.is_alive()
+
+    buffer_empty_event.clear()
+
+    for _ in range(250):
+        stream_buffer.put(
+                Span(intrinsics={}, agent_attributes={}, user_attributes={}))
+
+    assert buffer_empty_event.wait(5)
+    assert stream_buffer.stats() == (250, 0)
+
+    rpc.close()
+    assert not rpc.response_processing_thread.is_alive()
+
+
+def test_span_batch_stream_buffer():
+    stream_buffer = SpanBatchStreamBuffer(200, batch_size=100)
+
+    for index in range(250):
+        stream_buffer.put(Span(trace_id=str(index)))
+
+    # Spans beyond the capacity of the buffer displace the oldest spans.
+
+    assert stream_buffer.stats() == (250, 50)
+    assert stream_buffer.stats() == (0, 0)
+
+    span_batches = [next(stream_buffer), next(stream_buffer)]
+
+    assert [len(spans) for spans in span_batches] == [100, 100]
+    assert span_batches[0][0].trace_id == '50'
+    assert span_batches[1][-1].trace_id == '249'
+
+    stream_buffer.put(Span(trace_id='250'))
+
+    assert stream_buffer.stats() == (1, 0)
+    assert len(next(stream_buffer)) == 1
+
+    stream_buffer.shutdown()
+
+    with pytest.raises(StopIteration):
+        next(stream_buffer)
+
+
+def test_set_attribute_values():
+    attributes = {'bool': True, 'float': 1.5, 'int': 1, 'str': 'value',
+            'other': None}
+
+    span = Span()
+    set_attribute_values(span.intrinsics, attributes)
+
+    assert span == Span(intrinsics=SpanProtoAttrs(attributes))
+
+
+def test_serialize_span_batch():
+    spans = [Span(trace_id=str(index) * 100,
+            intrinsics={'index': AttributeValue(int_value=index)})
+            for index in range(3)]
+
+    serialized = serialize_span_batch(spans)
+
+    assert SpanBatch.FromString(serialized) == SpanBatch(spans=spans)
+    assert serialize_span_batch([]) == b''
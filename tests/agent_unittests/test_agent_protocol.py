@@ -24,7 +24,12 @@ import pytest
 import newrelic.packages.six as six
 from newrelic.common import certs, system_info
 from newrelic.common.agent_http import DeveloperModeClient
-from newrelic.common.encoding_utils import json_decode, serverless_payload_decode
+from newrelic.common.encoding_utils import (
+    json_decode,
+    json_encode,
+    json_encode_chunks,
+    serverless_payload_decode,
+)
 from newrelic.common.utilization import CommonUtilization
 from newrelic.core.agent_protocol import AgentProtocol, ServerlessModeProtocol
 from newrelic.core.config import (
@@ -33,7 +38,7 @@ from newrelic.core.config import (
     global_settings,
 )
 from newrelic.core.internal_metrics import InternalTraceContext
-from newrelic.core.stats_engine import CustomMetrics
+from newrelic.core.stats_engine import CustomMetrics, SampledDataSet
 from newrelic.network.exceptions import (
     DiscardDataForRequest,
     ForceAgentDisconnect,
@@ -104,6 +109,10 @@ class HttpClientRecorder(DeveloperModeClient):
         HttpClientRecorder.STATE -= 1
 
 
+class StreamingHttpClientRecorder(HttpClientRecorder):
+    STREAM_PAYLOADS = True
+
+
 class HttpClientException(DeveloperModeClient):
     def send_request(
         self,
@@ -218,6 +227,49 @@ def test_send(status_code):
     assert protocol.finalize() is None
 
 
+def test_send_streamed_payload():
+    HttpClientRecorder.STATUS_CODE = 202
+    settings = finalize_application_settings({"agent_run_id": "RUN_TOKEN"})
+    protocol = AgentProtocol(settings, client_cls=StreamingHttpClientRecorder)
+
+    events = [{"name": u"event", "value": index} for index in range(1000)]
+    protocol.send("span_event_data", ("RUN_TOKEN", {}, events))
+
+    request = HttpClientRecorder.SENT[0]
+
+    assert not isinstance(request.payload, bytes)
+    assert b"".join(request.payload) == json_encode(
+        ("RUN_TOKEN", {}, events)
+    ).encode("utf-8")
+
+
+def _sampled_data_set(*samples):
+    data_set = SampledDataSet()
+    for sample in samples:
+        data_set.add(sample)
+    return data_set
+
+
+@pytest.mark.parametrize(
+    "payload",
+    (
+        lambda: (),
+        lambda: ("RUN_TOKEN", 1.5, 2.5, [[{"name": "Metric", "scope": ""}, [1, 2.0]]]),
+        lambda: ("RUN_TOKEN", {"events_seen": 2}, _sampled_data_set([{}, {"a": 1}])),
+        lambda: ("RUN_TOKEN", (event for event in [[{"a": b"\xe9"}], [{"b": None}]])),
+        lambda: ([[[1, [2]], u"\u2603"], {"key": [1, 2]}], b"bytes", None, True),
+    ),
+)
+def test_json_encode_chunks(payload):
+    # Generators can only be consumed once, so each payload is created
+    # separately for each encoding.
+
+    chunks = list(json_encode_chunks(payload(), chunk_size=4))
+
+    assert len(chunks) > 1 or not payload()
+    assert "".join(chunks) == json_encode(payload())
+
+
 @pytest.mark.parametrize(
     "status_code,expected_exc,log_level",
     (
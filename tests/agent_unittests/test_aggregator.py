@@ -0,0 +1,371 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import socket
+import sqlite3
+import stat
+import subprocess
+import sys
+import time
+from collections import namedtuple
+
+import pytest
+
+from newrelic.packages.six import StringIO
+
+import newrelic.core.aggregator as aggregator
+
+from newrelic.core.aggregator import (AggregatorRefusedError,
+        aggregator_client, default_socket_path, dumps, loads)
+from newrelic.core.application import Application
+from newrelic.core.config import global_settings, finalize_application_settings
+from newrelic.core.data_collector import (AggregatorSession,
+        DeveloperModeSession)
+from newrelic.core.database_utils import SQLDatabase
+from newrelic.packages import six
+from newrelic.core.stats_engine import StatsEngine
+
+from testing_support.fixtures import override_generic_settings
+
+from test_harvest_loop import transaction_node  # noqa
+
+settings = global_settings()
+
+_Node = namedtuple('_Node', ['dbapi2_module', 'database'])
+
+
+@pytest.fixture
+def aggregator_path(tmpdir, monkeypatch):
+    monkeypatch.setattr(aggregator, '_aggregator', None)
+
+    yield str(tmpdir.join('aggregator', 'aggregator.sock'))
+
+    if aggregator._aggregator is not None:
+        aggregator._aggregator.close()
+
+
+def test_pickle_database_module():
+    node = loads(dumps(_Node(sqlite3, SQLDatabase(sqlite3))))
+
+    assert node.dbapi2_module is sqlite3
+    assert node.database.dbapi2_module is sqlite3
+    assert node.database.client == 'sqlite3'
+
+
+def test_pickle_stats_engine_snapshot():
+    stats = StatsEngine()
+    stats.reset_stats(finalize_application_settings())
+    stats.record_custom_metric('Custom/Value', 2)
+
+    snapshot = loads(dumps(stats.harvest_snapshot()))
+
+    assert snapshot.settings is None
+    assert snapshot.span_stream is None
+
+    stats.merge_shard(snapshot)
+
+    assert stats.stats_table[('Custom/Value', '')][0] == 1
+
+
+_aggregator_process = """
+import sys
+
+import newrelic.core.aggregator as aggregator
+
+class Application(object):
+    configuration = {'agent_run_id': 'aggregator'}
+
+    def merge_aggregated_stats(self, stats):
+        return stats == ['stats']
+
+aggregator._activate_application = lambda *args: Application()
+
+assert aggregator.aggregator_client(sys.argv[1]) is None
+
+sys.stdout.write('ready\\n')
+sys.stdout.flush()
+sys.stdin.read()
+"""
+
+
+def test_aggregator_election(aggregator_path):
+    process = subprocess.Popen([sys.executable, '-c', _aggregator_process,
+            aggregator_path], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    try:
+        assert process.stdout.readline() == b'ready\n'
+
+        client = aggregator_client(aggregator_path)
+
+        assert client is not None
+        assert client.connect('app', []) == {'agent_run_id': 'aggregator'}
+        assert client.merge('app', ['stats']) is True
+
+        client.close()
+
+    finally:
+        process.stdin.close()
+        process.wait()
+
+    # Once the aggregator has exited, the next process to look for one
+    # becomes the aggregator.
+
+    assert aggregator_client(aggregator_path) is None
+    assert aggregator_client(aggregator_path) is None
+
+
+def test_aggregator_directory(aggregator_path):
+    assert aggregator_client(aggregator_path) is None
+
+    # The directory holding the socket is created so only the user the
+    # agents run as can access it.
+
+    directory = os.path.dirname(aggregator_path)
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+
+    aggregator._aggregator.close()
+    aggregator._aggregator = None
+
+    # An existing directory which other users can access is refused.
+
+    os.chmod(directory, 0o755)
+
+    with pytest.raises(ValueError):
+        aggregator_client(aggregator_path)
+
+    assert aggregator._aggregator is None
+
+
+_peer_process = """
+import socket
+import sys
+
+from newrelic.core.aggregator import _send_message
+
+sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+sock.connect(sys.argv[1])
+
+try:
+    _send_message(sock, ('connect', 'app', []))
+    data = sock.recv(1)
+except socket.error:
+    data = b''
+
+sys.stdout.write('%d\\n' % len(data))
+"""
+
+
+@pytest.mark.skipif(six.PY2 or not hasattr(socket, 'SO_PEERCRED'),
+        reason='The credentials of the peer process are not available')
+def test_aggregator_peer_process_group(aggregator_path, monkeypatch):
+    requests = []
+
+    monkeypatch.setattr(aggregator, '_activate_application',
+            lambda *args: requests.append(args))
+
+    assert aggregator_client(aggregator_path) is None
+
+    # A process outside the process group of the aggregator has its
+    # connection closed before anything it sends is unpickled.
+
+    output = subprocess.check_output([sys.executable, '-c', _peer_process,
+            aggregator_path], start_new_session=True)
+
+    assert output == b'0\n'
+    assert requests == []
+
+    # Nor does an agent accept an aggregator outside its process group.
+
+    aggregator._aggregator.close()
+    aggregator._aggregator = None
+
+    process = subprocess.Popen([sys.executable, '-c', _aggregator_process,
+            aggregator_path], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            start_new_session=True)
+
+    try:
+        assert process.stdout.readline() == b'ready\n'
+
+        with pytest.raises(AggregatorRefusedError):
+            aggregator_client(aggregator_path, timeout=1.0)
+
+    finally:
+        process.stdin.close()
+        process.wait()
+
+
+@pytest.mark.skipif(six.PY2 or not hasattr(socket, 'SO_PEERCRED'),
+        reason='The credentials of the peer process are not available')
+def test_aggregator_refused_reports_directly(aggregator_path):
+    # An aggregator outside the process group of the agent, such as that
+    # of another server with the same socket path configured, is refused
+    # and the agent reports to the data collector itself.
+
+    process = subprocess.Popen([sys.executable, '-c', _aggregator_process,
+            aggregator_path], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            start_new_session=True)
+
+    try:
+        assert process.stdout.readline() == b'ready\n'
+
+        @override_generic_settings(settings, {
+            'developer_mode': True,
+            'license_key': '**NOT A LICENSE KEY**',
+            'feature_flag': set(),
+            'aggregator.enabled': True,
+            'aggregator.socket_path': aggregator_path,
+        })
+        def _test():
+            app = Application('Python Agent Test (Aggregator)')
+            app.connect_to_data_collector(None)
+
+            assert isinstance(app._active_session, DeveloperModeSession)
+            assert aggregator._aggregator is None
+
+            app.internal_agent_shutdown()
+
+        _test()
+
+    finally:
+        process.stdin.close()
+        process.wait()
+
+
+def test_default_socket_path(monkeypatch):
+    # Each server, with its own process group, has its own aggregator.
+
+    path = default_socket_path(settings)
+
+    monkeypatch.setattr(aggregator.os, 'getpgid', lambda pid: -1)
+
+    assert default_socket_path(settings) != path
+    assert os.path.dirname(default_socket_path(settings)) == \
+            os.path.dirname(path)
+
+
+def test_aggregated_harvest(transaction_node, aggregator_path, monkeypatch):
+
+    @override_generic_settings(settings, {
+        'developer_mode': True,
+        'license_key': '**NOT A LICENSE KEY**',
+        'feature_flag': set(),
+        'aggregator.enabled': True,
+        'aggregator.socket_path': aggregator_path,
+    })
+    def _test():
+        app = Application('Python Agent Test (Aggregator)')
+
+        monkeypatch.setattr(aggregator, '_activate_application',
+                lambda *args: app)
+
+        app.connect_to_data_collector(None)
+
+        assert isinstance(app._active_session, DeveloperModeSession)
+
+        # Agents in other processes can't see the aggregator started in
+        # this one, so forget it here for the next application.
+
+        server, aggregator._aggregator = aggregator._aggregator, None
+
+        worker = Application('Python Agent Test (Aggregator)')
+        worker.connect_to_data_collector(None)
+
+        assert isinstance(worker._active_session, AggregatorSession)
+        assert worker.configuration.agent_run_id == \
+                app.configuration.agent_run_id
+
+        output = StringIO()
+        worker.dump(output)
+
+        assert 'Collector URL: aggregator:%s' % aggregator_path in \
+                output.getvalue()
+
+        worker.record_transaction(transaction_node)
+        worker.harvest()
+
+        key = ('OtherTransaction/Function/main', '')
+
+        assert worker._stats_engine.stats_table.get(key) is None
+        assert app._stats_engine.stats_table[key][0] == 1
+        assert app._stats_engine.transaction_events.num_seen == 1
+
+        # When the aggregator goes away, the worker becomes the new
+        # aggregator.
+
+        server.close()
+
+        worker.record_transaction(transaction_node)
+        worker.harvest()
+
+        deadline = time.time() + 10.0
+
+        while not worker.active and time.time() < deadline:
+            time.sleep(0.05)
+
+        assert isinstance(worker._active_session, DeveloperModeSession)
+
+        worker.internal_agent_shutdown()
+        app.internal_agent_shutdown()
+
+    _test()
+
+
+def test_aggregated_continuous_profiling(aggregator_path, monkeypatch):
+
+    @override_generic_settings(settings, {
+        'developer_mode': True,
+        'license_key': '**NOT A LICENSE KEY**',
+        'feature_flag': set(),
+        'aggregator.enabled': True,
+        'aggregator.socket_path': aggregator_path,
+        'thread_profiler.enabled': True,
+        'thread_profiler.continuous.enabled': True,
+    })
+    def _test():
+        app = Application('Python Agent Test (Aggregator)')
+
+        monkeypatch.setattr(aggregator, '_activate_application',
+                lambda *args: app)
+
+        app.connect_to_data_collector(None)
+
+        server, aggregator._aggregator = aggregator._aggregator, None
+
+        try:
+            # The profile of a worker would never be reported, so isn't
+            # collected in the first place.
+
+            started = []
+
+            worker = Application('Python Agent Test (Aggregator)')
+
+            monkeypatch.setattr(worker.profile_manager,
+                    'start_continuous_profiling',
+                    lambda *args: started.append(args))
+
+            worker.connect_to_data_collector(None)
+
+            assert isinstance(worker._active_session, AggregatorSession)
+            assert started == []
+
+            worker._active_session.send_profile_data([])
+
+            worker.internal_agent_shutdown()
+
+        finally:
+            server.close()
+            app.internal_agent_shutdown()
+
+    _test()
@@ -0,0 +1,249 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import threading
+import time
+
+import pytest
+
+from newrelic.packages.six.moves import BaseHTTPServer, socketserver
+
+from newrelic.common.utilization import (AWSUtilization, AzureUtilization,
+        GCPUtilization, UtilizationHttpClient, detect_cloud_vendor)
+
+AWS_DATA = {
+    'availabilityZone': 'us-west-2b',
+    'instanceId': 'i-test.19characters',
+    'instanceType': 't2.micro',
+}
+
+AZURE_DATA = {
+    'location': 'westus',
+    'name': 'test-vm',
+    'vmId': '00000000-0000-0000-0000-000000000000',
+    'vmSize': 'Standard_DS1_v2',
+}
+
+GCP_DATA = {
+    'id': '3161347020215157000',
+    'machineType': 'custom-1-1024',
+    'name': 'aef-default-20170501t160547-7gh8',
+    'zone': 'us-central1-c',
+}
+
+BOOT_ID = '00000000-0000-0000-0000-000000000000'
+
+
+class StubMetadataHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        self.server.requests.append(path)
+
+        delay, data = self.server.responses.get(path, (0.0, None))
+
+        time.sleep(delay)
+
+        if data is None:
+            status, body = 404, b''
+        else:
+            status, body = 200, json.dumps(data).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubMetadataServer(socketserver.ThreadingMixIn,
+        BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0),
+                StubMetadataHandler)
+        self.responses = {}
+        self.requests = []
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
+
+
+@pytest.fixture
+def server():
+    server = StubMetadataServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def vendors(server):
+    port = server.server_address[1]
+
+    class StubClient(UtilizationHttpClient):
+        def __init__(self, host, **kwargs):
+            super(StubClient, self).__init__(host, port, **kwargs)
+
+    def _stub(vendor):
+        return type(vendor.__name__, (vendor,), {
+            'METADATA_HOST': '127.0.0.1',
+            'CLIENT_CLS': StubClient,
+        })
+
+    return [_stub(AWSUtilization), _stub(GCPUtilization),
+            _stub(AzureUtilization)]
+
+
+def test_detect_cloud_vendor_concurrently(server, vendors):
+    server.responses = {
+        AWSUtilization.METADATA_PATH: (0.2, None),
+        GCPUtilization.METADATA_PATH: (0.2, None),
+        AzureUtilization.METADATA_PATH: (0.2, AZURE_DATA),
+    }
+
+    start = time.time()
+    detected = detect_cloud_vendor(vendors)
+    duration = time.time() - start
+
+    assert detected == ('azure', AZURE_DATA)
+
+    # Probing the vendors one after another would take at least 0.6s.
+
+    assert duration < 0.5
+
+
+def test_detect_cloud_vendor_order(server, vendors):
+    # The first vendor in order wins, even if it is the slowest to answer.
+
+    server.responses = {
+        AWSUtilization.METADATA_PATH: (0.2, AWS_DATA),
+        GCPUtilization.METADATA_PATH: (0.0, GCP_DATA),
+        AzureUtilization.METADATA_PATH: (0.0, AZURE_DATA),
+    }
+
+    assert detect_cloud_vendor(vendors) == ('aws', AWS_DATA)
+
+
+def test_detect_cloud_vendor_none(server, vendors):
+    assert detect_cloud_vendor(vendors) is None
+    assert len(server.requests) == 3
+
+
+def test_detect_cloud_vendor_cache(server, vendors, tmpdir):
+    cache_file = str(tmpdir.join('utilization.json'))
+
+    server.responses = {
+        GCPUtilization.METADATA_PATH: (0.0, GCP_DATA),
+    }
+
+    def _detect(boot_id=BOOT_ID, cache_ttl=60):
+        del server.requests[:]
+        return detect_cloud_vendor(vendors, boot_id, cache_file, cache_ttl)
+
+    assert _detect() == ('gcp', {
+        'id': GCP_DATA['id'],
+        'machineType': 'custom-1-1024',
+        'name': GCP_DATA['name'],
+        'zone': 'us-central1-c',
+    })
+    assert len(server.requests) >= 2
+
+    # Another process started on the same boot of the host uses the results
+    # of the probes without making them again.
+
+    detected = _detect()
+    assert detected[0] == 'gcp'
+    assert server.requests == []
+
+    # The cache doesn't apply once it has expired, or after the host is
+    # rebooted.
+
+    with open(cache_file) as fh:
+        cache = json.load(fh)
+    cache['timestamp'] -= 120
+    with open(cache_file, 'w') as fh:
+        json.dump(cache, fh)
+
+    assert _detect()[0] == 'gcp'
+    assert server.requests
+
+    assert _detect()[0] == 'gcp'
+    assert server.requests == []
+
+    assert _detect(boot_id='11111111-1111-1111-1111-111111111111')[0] == 'gcp'
+    assert server.requests
+
+
+def test_detect_cloud_vendor_cache_disabled(server, vendors, tmpdir):
+    cache_file = tmpdir.join('utilization.json')
+
+    assert detect_cloud_vendor(vendors, BOOT_ID, str(cache_file), 0) is None
+    assert detect_cloud_vendor(vendors, None, str(cache_file), 60) is None
+    assert not cache_file.check()
+
+
+def test_detect_cloud_vendor_cache_timeout(server, vendors, tmpdir):
+    cache_file = tmpdir.join('utilization.json')
+
+    # The probe of the first vendor times out, so may yet find a match and
+    # isn't cached, whereas the not found responses of the others are.
+
+    server.responses = {
+        AWSUtilization.METADATA_PATH: (0.5, AWS_DATA),
+    }
+
+    for vendor in vendors:
+        vendor.FETCH_TIMEOUT = 0.1
+
+    assert detect_cloud_vendor(vendors, BOOT_ID, str(cache_file), 60) is None
+
+    cache = json.loads(cache_file.read())
+    assert cache['vendors'] == {'gcp': None, 'azure': None}
+
+    # Once the metadata endpoint answers in time, the vendor is detected.
+
+    del server.requests[:]
+    server.responses[AWSUtilization.METADATA_PATH] = (0.0, AWS_DATA)
+
+    assert detect_cloud_vendor(vendors, BOOT_ID, str(cache_file), 60) == (
+            'aws', AWS_DATA)
+    assert server.requests == [AWSUtilization.METADATA_PATH]
+
+
+def test_detect_cloud_vendor_cache_invalid(server, vendors, tmpdir):
+    cache_file = tmpdir.join('utilization.json')
+
+    server.responses = {
+        AWSUtilization.METADATA_PATH: (0.0, {'instanceId': 'i-partial'}),
+        GCPUtilization.METADATA_PATH: (0.0, GCP_DATA),
+    }
+
+    assert detect_cloud_vendor(vendors, BOOT_ID, str(cache_file),
+            60)[0] == 'gcp'
+
+    cache = json.loads(cache_file.read())
+    assert 'aws' not in cache['vendors']
+    assert cache['vendors']['gcp']
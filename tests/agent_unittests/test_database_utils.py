@@ -0,0 +1,99 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+import newrelic.core.database_utils as database_utils
+from newrelic.core.database_utils import SQLStatement
+
+
+class DummyDB(object):
+    def __init__(self, quoting_style):
+        self.quoting_style = quoting_style
+
+
+_normalize_tests = [
+    ('SELECT * FROM t WHERE a = %(a)s AND b = %s',
+            'SELECT*FROM t WHERE a=?AND b=?'),
+    ('  INSERT INTO t (a, b)\n  VALUES (:1, :name)  ',
+            'INSERT INTO t(?)VALUES(?)'),
+    ('SELECT a , b FROM t', 'SELECT a,b FROM t'),
+    ('SELECT\ta\t\tFROM\n\nt', 'SELECT a FROM t'),
+    ('SELECT * FROM t WHERE a IN (%(a)s, %(b)s)',
+            'SELECT*FROM t WHERE a IN(?)'),
+]
+
+
+@pytest.mark.parametrize('sql,normalized', _normalize_tests)
+def test_normalize_sql(sql, normalized):
+    assert database_utils._normalize_sql(sql) == normalized
+
+
+_obfuscate_tests = [
+    ('single+oracle', "SELECT * FROM t WHERE a = trueq'[x]'",
+            'SELECT * FROM t WHERE a = ??'),
+    ('single+oracle', "SELECT * FROM t WHERE a = trueq'x'",
+            'SELECT * FROM t WHERE a = trueq?'),
+    ('single+dollar', 'SELECT $tag$x$tag$, $1 FROM t',
+            'SELECT ?, $? FROM t'),
+    ('single', "SELECT * FROM t WHERE a = 'x' AND b = TRUE",
+            'SELECT * FROM t WHERE a = ? AND b = ?'),
+    ('single+double', 'SELECT * FROM t WHERE a = "x" AND b = 0X1F',
+            'SELECT * FROM t WHERE a = ? AND b = ?'),
+]
+
+
+@pytest.mark.parametrize('quoting_style,sql,obfuscated', _obfuscate_tests)
+def test_obfuscate_sql(quoting_style, sql, obfuscated):
+    assert database_utils._obfuscate_sql(sql, DummyDB(quoting_style)) == (
+            obfuscated)
+
+
+def test_sql_statement_cache(monkeypatch):
+    calls = []
+
+    def _obfuscate_sql(sql, database):
+        calls.append(sql)
+        return original(sql, database)
+
+    original = database_utils._obfuscate_sql
+    monkeypatch.setattr(database_utils, '_obfuscate_sql', _obfuscate_sql)
+    database_utils._sql_cache.clear()
+
+    sql = 'SELECT * FROM t WHERE a = 1'
+
+    first = SQLStatement(sql, DummyDB('single'))
+    second = SQLStatement(sql, DummyDB('single'))
+    other = SQLStatement(sql, DummyDB('single+double'))
+
+    assert first.identifier == second.identifier == other.identifier
+    assert first.obfuscated == 'SELECT * FROM t WHERE a = ?'
+    assert second.obfuscated == first.obfuscated
+    assert first.normalized == 'SELECT*FROM t WHERE a=?'
+
+    # The result is shared between statements for the same SQL and
+    # quoting style, but not for a different quoting style.
+
+    assert calls == [sql, sql]
+
+
+def test_sql_statement_cache_long_sql(monkeypatch):
+    monkeypatch.setattr(database_utils, '_sql_cache_maximum_length', 10)
+    database_utils._sql_cache.clear()
+
+    statement = SQLStatement('SELECT * FROM t WHERE a = 1',
+            DummyDB('single'))
+
+    assert statement.normalized == 'SELECT*FROM t WHERE a=?'
+    assert len(database_utils._sql_cache) == 0
@@ -0,0 +1,75 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import subprocess
+import sys
+
+import pytest
+
+import newrelic.common.entry_points as entry_points
+from newrelic.common.entry_points import EntryPoint, iter_entry_points
+
+_ENTRY_POINTS = """
+[newrelic.hooks]
+fake_module = fake_hooks:instrument_fake.inner
+other_module = fake_hooks [extra]
+"""
+
+
+@pytest.fixture
+def fake_distribution(monkeypatch, tmpdir):
+    dist_info = tmpdir.mkdir("fake_package-1.0.dist-info")
+    dist_info.join("METADATA").write("Name: fake_package\nVersion: 1.0\n")
+    dist_info.join("entry_points.txt").write(_ENTRY_POINTS)
+
+    # The same distribution being found twice mustn't duplicate anything.
+
+    monkeypatch.setattr(sys, "path", [str(tmpdir), str(tmpdir)] + sys.path)
+    monkeypatch.setattr(entry_points, "_installed_entry_points", None)
+
+
+def test_iter_entry_points(fake_distribution):
+    assert sorted(iter_entry_points("newrelic.hooks")) == [
+        EntryPoint("fake_module", "fake_hooks", ("instrument_fake", "inner")),
+        EntryPoint("other_module", "fake_hooks", ()),
+    ]
+
+    assert list(iter_entry_points("newrelic.extension")) == []
+
+
+def test_initialize_defers_hook_modules(tmpdir):
+    # A hook module must only be imported once the module it instruments
+    # has been, so none should be for modules which haven't been.
+
+    config_file = tmpdir.join("newrelic.ini")
+    config_file.write("[newrelic]\ndeveloper_mode = true\n")
+
+    script = (
+        "import sys\n"
+        "import newrelic.agent\n"
+        "import newrelic.config\n"
+        "newrelic.agent.initialize(sys.argv[1])\n"
+        "targets = {}\n"
+        "for target, module, _ in newrelic.config._BUILTIN_IMPORT_HOOKS:\n"
+        "    targets.setdefault(module, []).append(target)\n"
+        "for module in targets:\n"
+        "    if module in sys.modules and not any(\n"
+        "            target in sys.modules for target in targets[module]):\n"
+        "        print(module)\n"
+    )
+
+    output = subprocess.check_output([sys.executable, "-c", script,
+            str(config_file)])
+
+    assert output.decode("utf-8").split() == []
@@ -0,0 +1,230 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sqlite3
+import threading
+import time
+import types
+from collections import namedtuple
+
+import pytest
+
+from newrelic.core.database_utils import (ExplainPlanService, explain_plan,
+        sql_statement)
+
+_Node = namedtuple('_Node', ['statement', 'connect_params', 'cursor_params',
+        'sql_parameters', 'execute_params', 'sql_format'])
+
+
+class Database(object):
+
+    """Stands in for a DBAPI2 module, connecting to a sqlite database and
+    counting the connections made from each thread.
+
+    """
+
+    def __init__(self, path, delay=0.0):
+        self.module = types.ModuleType('explain_plan_sqlite3')
+        self.module.connect = self.connect
+        self.module.NotSupportedError = sqlite3.NotSupportedError
+        self.module._nr_explain_query = 'EXPLAIN QUERY PLAN'
+        self.module._nr_explain_stmts = ('select',)
+
+        self.path = path
+        self.delay = delay
+        self.connects = []
+
+        connection = sqlite3.connect(path)
+        connection.execute('create table a (b, c)')
+        connection.commit()
+        connection.close()
+
+    def connect(self, *args, **kwargs):
+        time.sleep(self.delay)
+        self.connects.append(threading.current_thread())
+        return sqlite3.connect(*args, **kwargs)
+
+    def node(self, sql):
+        return _Node(sql_statement(sql, self.module), ((self.path,), {}),
+                None, None, None, 'obfuscated')
+
+
+def _explain_plan(service, node):
+    return explain_plan(service, node.statement, node.connect_params,
+            node.cursor_params, node.sql_parameters, node.execute_params,
+            node.sql_format)
+
+
+@pytest.fixture
+def database(tmpdir):
+    return Database(str(tmpdir.join('database.sqlite')))
+
+
+@pytest.fixture
+def service():
+    service = ExplainPlanService(workers=2)
+    yield service
+    service.shutdown()
+
+
+def test_explain_plans(database, service):
+    nodes = [database.node('SELECT * FROM a WHERE b = %d' % i)
+            for i in range(10)]
+    nodes.append(database.node('SELECT * FROM a WHERE c = 1'))
+
+    events = [service.submit(node) for node in nodes]
+
+    assert service.wait(events, 10.0)
+
+    for node in nodes:
+        columns, rows = _explain_plan(service, node)
+        assert rows
+
+    # Statements differing only in their literal values share a plan, so
+    # only two are run.
+
+    assert len(set(event for event in events if event is not None)) == 2
+
+    # Plans aren't run again while they're cached.
+
+    assert service.submit(nodes[0]) is None
+
+
+def test_explain_plan_connections_persist(database, service):
+    for i in range(5):
+        events = [service.submit(database.node(
+                'SELECT * FROM a WHERE b = %d AND c = %d' % (i, j)))
+                for j in range(i + 1)]
+        assert service.wait(events, 10.0)
+
+    # Connections are kept from one harvest to the next, and each is only
+    # used by the thread which opened it, as sqlite requires.
+
+    assert 1 <= len(database.connects) <= service.workers
+    assert len(set(database.connects)) == len(database.connects)
+
+
+def test_explain_plan_budget(tmpdir, service):
+    database = Database(str(tmpdir.join('database.sqlite')), delay=0.5)
+    node = database.node('SELECT * FROM a')
+
+    events = [service.submit(node)]
+
+    start = time.time()
+    assert not service.wait(events, 0.1)
+    assert time.time() - start < 0.4
+
+    assert _explain_plan(service, node) is None
+
+    # The plan is still run and cached for the next harvest.
+
+    events[0].wait(10.0)
+
+    assert _explain_plan(service, node) is not None
+
+
+def test_explain_plan_cache_ttl(database):
+    service = ExplainPlanService(ttl=0.0)
+
+    try:
+        node = database.node('SELECT * FROM a')
+
+        for _ in range(2):
+            event = service.submit(node)
+            assert event is not None
+            assert service.wait([event], 10.0)
+
+    finally:
+        service.shutdown()
+
+
+def test_explain_plan_error_discards_connection(database):
+    service = ExplainPlanService(workers=1)
+
+    try:
+        node = database.node('SELECT * FROM missing')
+        assert service.wait([service.submit(node)], 10.0)
+        assert _explain_plan(service, node) is None
+
+        node = database.node('SELECT * FROM a')
+        assert service.wait([service.submit(node)], 10.0)
+        assert _explain_plan(service, node) is not None
+
+        assert len(database.connects) == 2
+
+    finally:
+        service.shutdown()
+
+
+def test_explain_plan_queue_full(database):
+    # Without any threads to run them, plans are left queued.
+
+    service = ExplainPlanService(workers=0, queue_size=2)
+
+    try:
+        events = [service.submit(database.node('SELECT * FROM a WHERE b = 1')),
+                service.submit(database.node('SELECT * FROM a WHERE c = 1'))]
+
+        assert all(events)
+
+        # Once the queue is full, further plans are skipped rather than
+        # queued or left pending.
+
+        node = database.node('SELECT * FROM a')
+        assert service.submit(node) is None
+        assert service.submit(node) is None
+
+    finally:
+        service.shutdown()
+
+    # The plans still queued are discarded on shutdown.
+
+    assert all(event.is_set() for event in events)
+
+
+def test_explain_plan_threads_restarted(database):
+    service = ExplainPlanService(workers=1)
+
+    try:
+        node = database.node('SELECT * FROM a WHERE b = 1')
+        assert service.wait([service.submit(node)], 10.0)
+
+        # A thread which has exited is replaced.
+
+        thread = service._threads[0]
+        service._queue.put(None)
+        thread.join(10.0)
+
+        node = database.node('SELECT * FROM a WHERE c = 1')
+        assert service.wait([service.submit(node)], 10.0)
+        assert service._threads[0] is not thread
+
+        # As are the threads after a fork, which only run in the parent,
+        # along with the queue they read from.
+
+        thread, requests = service._threads[0], service._queue
+        service._pid = None
+
+        try:
+            node = database.node('SELECT * FROM a')
+            assert service.wait([service.submit(node)], 10.0)
+            assert service._threads[0] is not thread
+            assert service._queue is not requests
+
+        finally:
+            requests.put(None)
+            thread.join(10.0)
+
+    finally:
+        service.shutdown()
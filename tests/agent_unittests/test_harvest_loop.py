@@ -16,6 +16,7 @@ import random
 import pytest
 import six
 import tempfile
+import threading
 import time
 
 from newrelic.common.object_wrapper import (transient_function_wrapper,
@@ -26,14 +27,18 @@ from testing_support.fixtures import (override_generic_settings,
 
 from newrelic.common.agent_http import DeveloperModeClient
 from newrelic.core.application import Application
+from newrelic.core.data_collector import HarvestUploader
+from newrelic.core.internal_metrics import internal_count_metric
 from newrelic.core.stats_engine import CustomMetrics, SampledDataSet
 from newrelic.core.transaction_node import TransactionNode
 from newrelic.core.root_node import RootNode
 from newrelic.core.custom_event import create_custom_event
 from newrelic.core.error_node import ErrorNode
 from newrelic.core.function_node import FunctionNode
+from newrelic.core.node_mixin import LazySpanEvent
 
-from newrelic.network.exceptions import RetryDataForRequest, ForceAgentDisconnect
+from newrelic.network.exceptions import (RetryDataForRequest,
+        DiscardDataForRequest, ForceAgentDisconnect)
 
 settings = global_settings()
 
@@ -450,6 +455,54 @@ def test_transaction_count(transaction_node):
     assert app._transaction_count == 0
 
 
+@override_generic_settings(settings, {
+    'developer_mode': True,
+    'license_key': '**NOT A LICENSE KEY**',
+    'feature_flag': set(),
+    'collect_custom_events': False,
+    'stats_engine.per_thread_shards': True,
+})
+def test_per_thread_shards(transaction_node):
+    app = Application('Python Agent Test (Harvest Loop)')
+    app.connect_to_data_collector(None)
+
+    def _record():
+        app.record_transaction(transaction_node)
+
+    _record()
+    thread = threading.Thread(target=_record)
+    thread.start()
+    thread.join()
+
+    # Transactions are held in the per thread shards until a harvest
+    assert len(app._stats_shards) == 2
+    assert app._transaction_count == 0
+    assert app._stats_engine.transaction_events.num_samples == 0
+
+    stats_key = ('OtherTransaction/Function/main', '')
+    assert stats_key not in app._stats_engine.stats_table
+
+    metric_totals = {}
+
+    @transient_function_wrapper('newrelic.core.stats_engine',
+            'StatsEngine.metric_data')
+    def _capture_metric_data(wrapped, instance, args, kwargs):
+        result = wrapped(*args, **kwargs)
+        for key, stats in result:
+            metric_totals[(key['name'], key['scope'])] = stats[0]
+        return result
+
+    _capture_metric_data(app.harvest)()
+
+    # The shards for both threads are merged into a single harvest
+    assert metric_totals[stats_key] == 2
+    assert app._transaction_count == 0
+
+    # Shards for threads which went idle are retired on the next harvest
+    app.harvest()
+    assert not app._stats_shards
+
+
 @override_generic_settings(settings, {
     'developer_mode': True,
     'license_key': '**NOT A LICENSE KEY**',
@@ -510,6 +563,90 @@ def test_reservoir_sizes(transaction_node):
     assert app._stats_engine.span_events.num_samples == 102
 
 
+@override_generic_settings(settings, {
+    'developer_mode': True,
+    'license_key': '**NOT A LICENSE KEY**',
+    'feature_flag': set(),
+    'distributed_tracing.enabled': True,
+    'event_harvest_config.harvest_limits.span_event_data': 10,
+})
+def test_span_events_over_reservoir_size_not_built(transaction_node):
+    span_events_built = []
+
+    @transient_function_wrapper('newrelic.core.function_node',
+            'FunctionNode.span_event')
+    def _capture_span_event(wrapped, instance, args, kwargs):
+        span_events_built.append(True)
+        return wrapped(*args, **kwargs)
+
+    app = Application('Python Agent Test (Harvest Loop)')
+    app.connect_to_data_collector(None)
+
+    _capture_span_event(app.record_transaction)(transaction_node)
+
+    # The root span is built, along with the function spans up to the
+    # reservoir size. All of the spans are still counted as seen.
+
+    assert len(span_events_built) == 9
+    assert app._stats_engine.span_events.num_samples == 10
+    assert app._stats_engine.span_events.num_seen == 102
+
+    # The application reservoir is now full with spans of the same
+    # priority, so none of the spans need to be built.
+
+    del span_events_built[:]
+
+    _capture_span_event(app.record_transaction)(transaction_node)
+
+    assert not span_events_built
+    assert app._stats_engine.span_events.num_samples == 10
+    assert app._stats_engine.span_events.num_seen == 204
+
+
+def test_lazy_span_events(transaction_node):
+
+    def _harvested_span_events(lazy_span_events):
+        span_events = []
+
+        @transient_function_wrapper('newrelic.core.data_collector',
+                'Session.send_span_events')
+        def _capture_span_events(wrapped, instance, args, kwargs):
+            span_events.extend(args[1])
+            return wrapped(*args, **kwargs)
+
+        @override_generic_settings(settings, {
+            'developer_mode': True,
+            'license_key': '**NOT A LICENSE KEY**',
+            'feature_flag': set(),
+            'distributed_tracing.enabled': True,
+            'stats_engine.lazy_span_events': lazy_span_events,
+        })
+        def _test():
+            app = Application('Python Agent Test (Harvest Loop)')
+            app.connect_to_data_collector(None)
+
+            app.record_transaction(transaction_node)
+
+            # Span events are only built when harvested where lazy span
+            # events are enabled.
+
+            for event in app._stats_engine.span_events:
+                assert isinstance(event, LazySpanEvent) == lazy_span_events
+
+            _capture_span_events(app.harvest)()
+
+            assert app._stats_engine.span_events.num_samples == 0
+
+        _test()
+
+        return span_events
+
+    lazy_span_events = _harvested_span_events(True)
+
+    assert len(lazy_span_events) == 102
+    assert lazy_span_events == _harvested_span_events(False)
+
+
 @pytest.mark.parametrize('harvest_name, event_name', [
     ('analytic_event_data', 'transaction_events'),
     ('error_event_data', 'error_events'),
@@ -872,6 +1009,139 @@ def test_flexible_harvest_rollback():
     assert app._stats_engine.stats_table[stats_key].call_count == 1
 
 
+@pytest.mark.parametrize('concurrent_harvest', (False, True))
+def test_concurrent_harvest(transaction_node, concurrent_harvest):
+
+    @override_generic_settings(settings, {
+        'developer_mode': True,
+        'license_key': '**NOT A LICENSE KEY**',
+        'distributed_tracing.enabled': True,
+        'stats_engine.concurrent_harvest': concurrent_harvest,
+    })
+    def _test():
+        app = Application('Python Agent Test (Harvest Loop)')
+        app.connect_to_data_collector(None)
+
+        app.record_transaction(transaction_node)
+
+        endpoint_threads = {}
+
+        @transient_function_wrapper('newrelic.core.agent_protocol',
+                'AgentProtocol.send')
+        def _capture_threads(wrapped, instance, args, kwargs):
+            endpoint_threads[args[0]] = threading.current_thread()
+            return wrapped(*args, **kwargs)
+
+        _capture_threads(app.harvest)()
+
+        assert set(endpoint_threads) == set(('analytic_event_data',
+                'span_event_data', 'error_event_data', 'custom_event_data',
+                'error_data', 'metric_data', 'get_agent_commands'))
+
+        harvest_thread = threading.current_thread()
+        upload_threads = set(thread for endpoint, thread in
+                endpoint_threads.items() if endpoint != 'get_agent_commands')
+
+        if concurrent_harvest:
+            assert harvest_thread not in upload_threads
+        else:
+            assert upload_threads == set((harvest_thread,))
+
+        assert endpoint_threads['get_agent_commands'] is harvest_thread
+
+    _test()
+
+
+def test_harvest_uploader():
+    metrics = CustomMetrics()
+    uploads = HarvestUploader(2, metrics)
+
+    reset = []
+
+    def _send(exc_type=None):
+        internal_count_metric('Supportability/Harvest/Upload', 1)
+        if exc_type is not None:
+            raise exc_type()
+
+    uploads.send(_send, (), lambda: reset.append('sent'))
+    uploads.send(_send, (DiscardDataForRequest,),
+            lambda: reset.append('discarded'))
+    uploads.send(_send, (RetryDataForRequest,),
+            lambda: reset.append('retried'))
+
+    assert not reset
+
+    # The failure with the highest precedence is raised and only those
+    # which need not be retried are reset.
+
+    with pytest.raises(RetryDataForRequest):
+        uploads.wait()
+
+    assert sorted(reset) == ['discarded', 'sent']
+
+    # The metrics recorded by each of the threads are merged together.
+
+    assert dict(metrics.metrics())['Supportability/Harvest/Upload'][0] == 3
+
+
+@pytest.mark.parametrize('raises,rolled_back', (
+    (RetryDataForRequest, True),
+    (DiscardDataForRequest, False),
+))
+def test_concurrent_harvest_rollback(raises, rolled_back):
+
+    @failing_endpoint('span_event_data', raises=raises)
+    @override_generic_settings(settings, {
+        'developer_mode': True,
+        'license_key': '**NOT A LICENSE KEY**',
+        'distributed_tracing.enabled': True,
+        'stats_engine.concurrent_harvest': True,
+    })
+    def _test():
+        app = Application('Python Agent Test (Harvest Loop)')
+        app.connect_to_data_collector(None)
+
+        app._stats_engine.transaction_events.add('transaction event')
+        app._stats_engine.span_events.add('span event')
+        app._stats_engine.record_custom_metric(
+                'Custom/test_concurrent_harvest_rollback', 1)
+
+        app.harvest()
+
+        # Only the data for the endpoint which failed is rolled back into
+        # the next harvest, as the other endpoints were sent.
+
+        assert app._stats_engine.span_events.num_samples == int(rolled_back)
+        assert app._stats_engine.transaction_events.num_seen == 0
+
+        stats_key = ('Custom/test_concurrent_harvest_rollback', '')
+        assert stats_key not in app._stats_engine.stats_table
+
+    _test()
+
+
+@validate_metric_payload(metrics=[
+        ('Supportability/Python/AttributeFilter/Cache/Hits', 2),
+        ('Supportability/Python/AttributeFilter/Cache/Misses', 1),
+])
+@override_generic_settings(settings, {
+        'developer_mode': True,
+        'attributes.exclude': ['password'],
+})
+def test_attribute_filter_cache_metrics():
+    app = Application('Python Agent Test (Harvest Loop)')
+    app.connect_to_data_collector(None)
+
+    attribute_filter = app.configuration.attribute_filter
+
+    for _ in range(3):
+        attribute_filter.apply('password', 0xff)
+
+    app.harvest()
+
+    assert attribute_filter.cache.reset_counts() == (0, 0)
+
+
 @override_generic_settings(settings, {
         'developer_mode': True,
 })
@@ -0,0 +1,120 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from newrelic.api.html_insertion import (insert_html_snippet,
+        HTMLInsertionScanner)
+
+SNIPPET = b'<!-- SNIPPET -->'
+
+_test_documents = (
+    b'<html><body><p>RESPONSE</p></body></html>',
+    b'<html><head><title>x</title></head><body></body></html>',
+    b'<html><HEAD lang="en"><meta charset="utf-8"></head><body></body>',
+    b'<html><head><meta http-equiv="X-UA-Compatible" content="IE=edge">'
+    b'<meta charset="utf-8"></head><body></body></html>',
+    b'<html><head>< meta charset="utf-8"><meta http-equiv="x-ua-compatible"'
+    b' content="IE=edge"></head><BODY class="x"></BODY></html>',
+    b'<html><head><meta http-equiv="content-disposition" '
+    b'content="attachment; filename=x.html"></head><body></body></html>',
+    b'<html><head><meta charset=<body></head></html>',
+    b'<html><head></head><p>RESPONSE</p></html>',
+    b'',
+)
+
+
+def _scan(data, chunk_size, streaming, search_limit=64*1024):
+    scanner = HTMLInsertionScanner(lambda: SNIPPET, search_limit,
+            streaming=streaming)
+
+    output = []
+
+    for i in range(0, len(data), chunk_size):
+        output.append(scanner.feed(data[i:i+chunk_size]))
+
+    if not scanner.finished:
+        output.append(scanner.close())
+
+    return b''.join(output)
+
+
+@pytest.mark.parametrize('streaming', (False, True))
+@pytest.mark.parametrize('chunk_size', (1, 2, 3, 7, 1024))
+@pytest.mark.parametrize('data', _test_documents)
+def test_html_insertion_scanner_chunk_boundaries(data, chunk_size, streaming):
+    # The insertion must be the same however the document is split up.
+
+    expected = insert_html_snippet(data, lambda: SNIPPET)
+
+    if expected is None:
+        expected = data
+
+    assert _scan(data, chunk_size, streaming) == expected
+
+
+@pytest.mark.parametrize('streaming', (False, True))
+@pytest.mark.parametrize('search_limit', (20, 21, 22, 64*1024))
+def test_html_insertion_scanner_search_limit(search_limit, streaming):
+    data = 15*b' ' + b'<body></body>'
+
+    expected = insert_html_snippet(data, lambda: SNIPPET, search_limit)
+
+    if expected is None:
+        expected = data
+
+    assert _scan(data, 4, streaming, search_limit) == expected
+
+
+def test_html_insertion_scanner_streaming():
+    scanner = HTMLInsertionScanner(lambda: SNIPPET, streaming=True)
+
+    # Nothing before the end of the head element can be affected by the
+    # insertion, so it is passed on straight away. The incomplete tag
+    # at the end may still turn out to be a meta tag, so is held back.
+
+    assert scanner.feed(b'<html><head lang="en"><title>x</title><me') == (
+            b'<html><head lang="en">')
+
+    assert scanner.feed(b'ta charset="utf-8"><title>') == (
+            b'<title>x</title><meta charset="utf-8">')
+
+    assert scanner.feed(b'</title></head>') == b''
+    assert not scanner.finished
+
+    assert scanner.feed(b'<body>') == SNIPPET + b'<title></title></head><body>'
+    assert scanner.finished
+    assert scanner.inserted == len(SNIPPET)
+
+    assert scanner.feed(b'</body></html>') == b'</body></html>'
+
+
+def test_html_insertion_scanner_not_streaming():
+    scanner = HTMLInsertionScanner(lambda: SNIPPET)
+
+    assert scanner.feed(b'<html><head></head>') == b''
+    assert scanner.feed(b'<p>') == b''
+
+    assert scanner.close() == b'<html><head></head><p>'
+    assert scanner.finished
+    assert scanner.inserted == 0
+
+
+def test_html_insertion_scanner_empty_snippet():
+    scanner = HTMLInsertionScanner(lambda: b'')
+
+    assert scanner.feed(b'<html><head></head><body>') == (
+            b'<html><head></head><body>')
+    assert scanner.finished
+    assert scanner.inserted == 0
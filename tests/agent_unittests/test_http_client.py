@@ -27,6 +27,7 @@ from newrelic.common.agent_http import (
     HttpClient,
     InsecureHttpClient,
     ServerlessModeClient,
+    SupportabilityMixin,
 )
 from newrelic.common.encoding_utils import ensure_str
 from newrelic.common.object_names import callable_name
@@ -336,6 +337,61 @@ def test_http_payload_compression(server, client_cls, method, threshold):
     assert sent_payload == payload
 
 
+class InsecureApplicationModeClient(SupportabilityMixin, InsecureHttpClient):
+    pass
+
+
+@pytest.mark.parametrize("method", ("gzip", "deflate"))
+@pytest.mark.parametrize("threshold", (0, 10, 100))
+def test_http_payload_compression_chunks(insecure_server, method, threshold):
+    chunks = [b"*" * 8, b"-" * 8, b"+" * 8]
+    payload = b"".join(chunks)
+
+    internal_metrics = CustomMetrics()
+
+    with InsecureApplicationModeClient(
+        "localhost",
+        insecure_server.port,
+        compression_method=method,
+        compression_threshold=threshold,
+    ) as client:
+        with InternalTraceContext(internal_metrics):
+            status, data = client.send_request(
+                payload=iter(chunks), params={"method": "test"}
+            )
+
+    assert status == 200
+    data = data.split(b"\n")
+    sent_payload = data[-1]
+    headers = dict(
+        header.lower().split(b":", 1) for header in data[1:-1]
+    )
+
+    internal_metrics = dict(internal_metrics.metrics())
+
+    if threshold < len(payload):
+        assert headers[b"content-encoding"].strip() == method.encode("utf-8")
+        wbits = 31 if method == "gzip" else 15
+        assert zlib.decompress(sent_payload, wbits) == payload
+
+        # The original payload length is recorded, even though it was never
+        # held as a whole.
+
+        assert internal_metrics["Supportability/Python/Collector/ZLIB/Bytes/test"][
+            :2
+        ] == [1, len(payload)]
+    else:
+        assert headers[b"content-encoding"].strip() == b"identity"
+        assert sent_payload == payload
+        assert "Supportability/Python/Collector/ZLIB/Bytes/test" not in (
+            internal_metrics
+        )
+
+    assert internal_metrics["Supportability/Python/Collector/Output/Bytes/test"][
+        :2
+    ] == [1, len(sent_payload)]
+
+
 def test_cert_path(server):
     with HttpClient("localhost", server.port, ca_bundle_path=SERVER_CERT) as client:
         status, data = client.send_request()
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
 import sys
 
 import newrelic.api.import_hook as import_hook
@@ -59,3 +60,78 @@ def test_import_hook_finder(monkeypatch):
     # Finding a module that exists, and is registered, finds that module.
     module = finder.find_module("newrelic.api")
     assert module is not None
+
+
+@pytest.mark.skipif(six.PY2, reason="find_spec is only used on Python 3")
+def test_import_hook_finder_find_spec(monkeypatch, tmpdir):
+    package = tmpdir.mkdir("hooked_package")
+    package.join("__init__.py").write("")
+    package.join("hooked_module.py").write("value = 1\n")
+    monkeypatch.syspath_prepend(str(tmpdir))
+
+    finder = import_hook.ImportHookFinder()
+    monkeypatch.setattr(sys, "meta_path", [finder] + sys.meta_path)
+
+    hooked = []
+    registered_hooks = {"hooked_package.hooked_module": [hooked.append]}
+    monkeypatch.setattr(import_hook, "_import_hooks", registered_hooks)
+
+    # The other finders are asked for the spec the once, rather than the
+    # lookup going back through import.
+
+    lookups = []
+    original_find_spec = import_hook._find_spec_on_meta_path
+
+    def _find_spec_on_meta_path(*args):
+        lookups.append(args[0])
+        return original_find_spec(*args)
+
+    monkeypatch.setattr(import_hook, "_find_spec_on_meta_path",
+            _find_spec_on_meta_path)
+
+    try:
+        from hooked_package import hooked_module
+    finally:
+        sys.modules.pop("hooked_package.hooked_module", None)
+        sys.modules.pop("hooked_package", None)
+
+    assert lookups == ["hooked_package.hooked_module"]
+    assert hooked == [hooked_module]
+    assert hooked_module.value == 1
+
+    # The module is left with the loader it would have had without the hook.
+
+    assert not isinstance(hooked_module.__loader__,
+            import_hook._ImportHookChainedSpecLoader)
+    assert hooked_module.__spec__.loader is hooked_module.__loader__
+
+
+@pytest.mark.skipif(six.PY2, reason="find_spec is only used on Python 3")
+def test_import_hook_finder_module_created_after_failed_import(monkeypatch,
+        tmpdir):
+    monkeypatch.syspath_prepend(str(tmpdir))
+
+    finder = import_hook.ImportHookFinder()
+    monkeypatch.setattr(sys, "meta_path", [finder] + sys.meta_path)
+
+    hooked = []
+    registered_hooks = {"nrhooked_mod": [hooked.append]}
+    monkeypatch.setattr(import_hook, "_import_hooks", registered_hooks)
+
+    with pytest.raises(ImportError):
+        import nrhooked_mod
+
+    # The module only becomes available after the failed import. The
+    # directory modification time is moved on so the path finder sees it
+    # without its caches being invalidated.
+
+    tmpdir.join("nrhooked_mod.py").write("value = 1\n")
+    mtime = tmpdir.stat().mtime + 10
+    os.utime(str(tmpdir), (mtime, mtime))
+
+    try:
+        import nrhooked_mod
+    finally:
+        sys.modules.pop("nrhooked_mod", None)
+
+    assert hooked == [nrhooked_mod]
@@ -24,6 +24,7 @@ INI_FILE_INFINITE_TRACING = b"""
 infinite_tracing.trace_observer_host = y
 infinite_tracing.trace_observer_port = 1234
 infinite_tracing.span_queue_size = 2000
+infinite_tracing.batching = false
 """
 
 
@@ -81,3 +82,17 @@ def test_infinite_tracing_span_queue_size(ini, env,
 
     settings = global_settings()
     assert settings.infinite_tracing.span_queue_size == expected_size
+
+
+@pytest.mark.parametrize('ini,env,expected_batching', (
+    (INI_FILE_EMPTY, {}, False),
+    (INI_FILE_EMPTY,
+     {'NEW_RELIC_INFINITE_TRACING_BATCHING': 'true'}, True),
+    (INI_FILE_INFINITE_TRACING,
+     {'NEW_RELIC_INFINITE_TRACING_BATCHING': 'true'}, False),
+))
+def test_infinite_tracing_batching(ini, env,
+        expected_batching, global_settings):
+
+    settings = global_settings()
+    assert settings.infinite_tracing.batching == expected_batching
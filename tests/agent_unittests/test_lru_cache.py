@@ -0,0 +1,73 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+
+from newrelic.common.lru_cache import LRUCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maximum=2)
+
+    cache.put('a', 1)
+    cache.put('b', 2)
+
+    # Looking up 'a' makes 'b' the least recently used item.
+
+    assert cache.get('a') == 1
+
+    cache.put('c', 3)
+
+    assert len(cache) == 2
+    assert 'b' not in cache
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_lru_cache_put_existing_key():
+    cache = LRUCache(maximum=2)
+
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.put('a', 3)
+    cache.put('c', 4)
+
+    assert len(cache) == 2
+    assert cache.get('a') == 3
+    assert cache.get('b') is None
+
+
+def test_lru_cache_counts():
+    cache = LRUCache(maximum=2)
+
+    cache.put('a', 1)
+
+    cache.get('a')
+    cache.get('a')
+    cache.get('b')
+
+    assert cache.reset_counts() == (2, 1)
+    assert cache.reset_counts() == (0, 0)
+
+
+def test_lru_cache_deepcopy():
+    cache = LRUCache(maximum=2)
+
+    cache.put('a', 1)
+
+    cache_copy = copy.deepcopy(cache)
+
+    assert cache_copy.maximum == 2
+    assert len(cache_copy) == 0
+    assert len(cache) == 1
@@ -0,0 +1,138 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import base64
+import json
+import sys
+import threading
+import time
+import zlib
+
+import pytest
+
+from newrelic.core.profile_sessions import (ContinuousProfile,
+        ProfileSessionManager, format_stack_trace, CONTINUOUS_PROFILE_ID)
+
+
+@pytest.fixture
+def waiting_thread():
+    event = threading.Event()
+
+    def _wait_for_event():
+        event.wait()
+
+    thread = threading.Thread(target=_wait_for_event)
+    thread.start()
+
+    # Wait for the thread to be blocked on the event.
+    time.sleep(0.05)
+
+    yield thread
+
+    event.set()
+    thread.join()
+
+
+def _thread_frame(thread):
+    return sys._current_frames()[thread.ident]
+
+
+def test_continuous_profile_deduplicates_stacks(waiting_thread):
+    profile = ContinuousProfile()
+
+    frame = _thread_frame(waiting_thread)
+
+    for _ in range(3):
+        profile.sample([(None, waiting_thread.ident, 'OTHER', frame)])
+
+    stack_traces = list(profile.stack_traces())
+
+    assert len(stack_traces) == 1
+
+    category, stack_trace, count = stack_traces[0]
+
+    assert category == 'OTHER'
+    assert count == 3
+    assert stack_trace == list(format_stack_trace(frame, 'OTHER'))
+
+
+def test_continuous_profile_skips_agent_threads(waiting_thread):
+    profile = ContinuousProfile()
+
+    frame = _thread_frame(waiting_thread)
+    profile.sample([(None, waiting_thread.ident, 'AGENT', frame)])
+
+    assert not list(profile.stack_traces())
+
+    profile = ContinuousProfile(profile_agent_code=True)
+    profile.sample([(None, waiting_thread.ident, 'AGENT', frame)])
+
+    assert len(list(profile.stack_traces())) == 1
+
+
+def test_continuous_profile_session(waiting_thread):
+    profile = ContinuousProfile()
+
+    assert profile.profile_session() is None
+
+    frame = _thread_frame(waiting_thread)
+
+    profile.sample([(None, waiting_thread.ident, 'OTHER', frame)])
+    profile.sample([(None, waiting_thread.ident, 'REQUEST', frame)])
+
+    session = profile.profile_session()
+
+    # The aggregated data starts afresh once reported.
+
+    assert profile.sample_count == 0
+    assert not list(profile.stack_traces())
+
+    data = session.profile_data()[0]
+
+    assert data[0] == CONTINUOUS_PROFILE_ID
+    assert data[3] == 2
+
+    call_tree = json.loads(zlib.decompress(base64.standard_b64decode(
+            data[4])).decode('utf-8'))
+
+    assert sorted(call_tree) == ['OTHER', 'REQUEST']
+
+    for bucket in call_tree.values():
+        root, = bucket
+        assert root[1] == 1
+
+
+def test_continuous_profiling_reported_on_harvest():
+    manager = ProfileSessionManager()
+
+    assert manager.start_continuous_profiling('app', sample_period_s=0.01)
+    assert not manager.start_continuous_profiling('other', 0.01)
+
+    try:
+        time.sleep(0.1)
+
+        assert not list(manager.profile_data('other'))
+
+        profiles = list(manager.profile_data('app'))
+
+        assert len(profiles) == 1
+        assert profiles[0][0][3] > 1
+
+    finally:
+        assert manager.shutdown('app')
+
+    manager._profiler_thread.join(1.0)
+
+    assert not manager._profiler_thread.is_alive()
+    assert manager.continuous_profile is None
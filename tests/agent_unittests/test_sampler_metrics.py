@@ -22,7 +22,10 @@ from testing_support.fixtures import override_generic_settings
 from newrelic.core.config import global_settings
 from newrelic.packages import six
 from newrelic.samplers.cpu_usage import cpu_usage_data_source
-from newrelic.samplers.gc_data import garbage_collector_data_source
+from newrelic.samplers.gc_data import (
+    GC_OBJECTS_BY_GENERATION,
+    garbage_collector_data_source,
+)
 from newrelic.samplers.memory_usage import memory_usage_data_source
 
 settings = global_settings()
@@ -100,6 +103,15 @@ def test_gc_metrics_collection(gc_data_source, top_object_count_limit):
         },
     )
     def _test():
+        # The settings are only looked up when the data source is started
+        # and on each harvest.
+        gc_data_source.start()
+
+        # The object counts by type are only reported once every
+        # generation has been walked, which takes a harvest for each.
+        for _ in range(2):
+            list(gc_data_source() or ())
+
         gc.collect()
         metrics_table = set(m[0] for m in (gc_data_source() or ()))
 
@@ -133,6 +145,92 @@ def test_gc_metrics_config(gc_data_source, enabled):
     _test()
 
 
+@pytest.mark.skipif(
+    platform.python_implementation() == "PyPy" or not hasattr(gc, "callbacks"),
+    reason="GC callbacks are not available",
+)
+def test_gc_pause_histogram(gc_data_source):
+    @override_generic_settings(
+        settings,
+        {
+            "gc_runtime_metrics.enabled": True,
+            "gc_runtime_metrics.top_object_count_limit": 0,
+        },
+    )
+    def _test():
+        gc_data_source.start()
+
+        # Restarting doesn't register the callback a second time.
+        assert gc.callbacks.count(gc_data_source.record_gc) == 1
+
+        # Discard anything recorded before now.
+        list(gc_data_source())
+
+        gc.collect(0)
+        gc.collect(2)
+
+        metrics = dict(gc_data_source() or ())
+
+        pauses = dict(
+            (name, value["count"])
+            for name, value in metrics.items()
+            if name.startswith("GC/pauses/")
+        )
+
+        def _total(generation):
+            prefix = "GC/pauses/%d/%s/" % (PID, generation)
+            return sum(c for name, c in pauses.items() if name.startswith(prefix))
+
+        assert _total("all") == metrics["GC/time/%d/all" % PID]["count"]
+        assert _total("2") >= 1
+        assert _total("0") >= 1
+
+    _test()
+
+
+@pytest.mark.parametrize("sample_size", (0, 1000))
+def test_gc_top_object_counts_sampled(gc_data_source, sample_size):
+    # Keep enough objects of a single type alive for it to have the most.
+    objects = [[] for _ in range(len(gc.get_objects()) * 2)]
+    gc.collect()
+
+    for _ in range(3):
+        counts = gc_data_source.top_object_counts(1, sample_size)
+
+    assert len(counts) == 1
+    assert counts[0][0] is list
+
+    if sample_size:
+        assert 0.9 * len(objects) < counts[0][1] < 1.1 * len(objects) + 1000
+    else:
+        assert counts[0][1] > len(objects)
+
+
+@pytest.mark.skipif(
+    not GC_OBJECTS_BY_GENERATION,
+    reason="Objects can't be listed by generation",
+)
+def test_gc_top_object_counts_by_generation(gc_data_source, monkeypatch):
+    get_objects = gc.get_objects
+    generations = []
+
+    def _get_objects(generation=None):
+        generations.append(generation)
+        return get_objects(generation=generation)
+
+    monkeypatch.setattr(gc, "get_objects", _get_objects)
+
+    # Nothing is reported until every generation has been walked, with
+    # only one being walked each time.
+
+    assert gc_data_source.top_object_counts(1, 0) == []
+    assert gc_data_source.top_object_counts(1, 0) == []
+    assert len(gc_data_source.top_object_counts(1, 0)) == 1
+    assert len(gc_data_source.top_object_counts(1, 0)) == 1
+
+    assert generations == [0, 1, 2, 0]
+
+
 EXPECTED_CPU_METRICS = (
     "CPU/User Time",
     "CPU/User/Utilization",
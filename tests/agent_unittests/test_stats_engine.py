@@ -0,0 +1,193 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.metric import ApdexMetric, TimeMetric
+from newrelic.core.stats_engine import (ApdexStats, CountStats,
+        MetricStatsTable, SampledDataSet, StatsEngine, StatsTable, TimeStats)
+
+
+def _stats_engine(columnar_metrics):
+    settings = finalize_application_settings()
+    settings.stats_engine.columnar_metrics = columnar_metrics
+
+    engine = StatsEngine()
+    engine.reset_stats(settings)
+    return engine
+
+
+def _record_metrics(engine):
+    engine.record_time_metric(TimeMetric(name='Function/a', scope='',
+            duration=1.0, exclusive=0.5))
+    engine.record_time_metric(TimeMetric(name='Function/a', scope='',
+            duration=0.25, exclusive=None))
+    engine.record_time_metric(TimeMetric(name='Function/a',
+            scope='WebTransaction/Uri/a', duration=2.0, exclusive=2.0))
+    engine.record_time_metric(TimeMetric(name='Function/b', scope='',
+            duration=0.0, exclusive=0.0))
+
+    engine.record_apdex_metric(ApdexMetric(name='Apdex/a', satisfying=1,
+            tolerating=0, frustrating=0, apdex_t=0.5))
+    engine.record_apdex_metric(ApdexMetric(name='Apdex/a', satisfying=0,
+            tolerating=1, frustrating=0, apdex_t=0.25))
+
+    engine.record_custom_metric('Custom/value', 3)
+    engine.record_custom_metric('Custom/value', 1.5)
+    engine.record_custom_metric('Custom/count', {'count': 2})
+    engine.record_custom_metric('Custom/count', {'count': 3})
+    engine.record_custom_metric('Custom/summary', {'count': 2,
+            'total': 4.0, 'min': 1.0, 'max': 3.0, 'sum_of_squares': 10.0})
+
+    engine.merge_custom_metrics([('Custom/value', TimeStats(1, 2.0, 2.0,
+            2.0, 2.0, 4.0)), ('Custom/other', CountStats(call_count=1))])
+
+
+def _metric_data(engine, normalizer=None):
+    return sorted((key['name'], key['scope'], type(value), list(value))
+            for key, value in engine.metric_data(normalizer))
+
+
+def _normalizer(name):
+    return name.startswith('Function/') and 'Function/*' or name, False
+
+
+@pytest.mark.parametrize('normalizer', (None, _normalizer))
+def test_columnar_metrics_match_stats_table(normalizer):
+    expected = _stats_engine(False)
+    _record_metrics(expected)
+
+    engine = _stats_engine(True)
+    _record_metrics(engine)
+
+    assert type(expected.stats_table) is StatsTable
+    assert type(engine.stats_table) is MetricStatsTable
+
+    assert _metric_data(engine, normalizer) == _metric_data(expected,
+            normalizer)
+    assert engine.metric_data_count() == expected.metric_data_count()
+
+
+@pytest.mark.parametrize('columnar_metrics', (False, True))
+def test_columnar_metrics_merge(columnar_metrics):
+    expected = _stats_engine(False)
+    _record_metrics(expected)
+    _record_metrics(expected)
+
+    engine = _stats_engine(True)
+    _record_metrics(engine)
+
+    snapshot = _stats_engine(columnar_metrics)
+    _record_metrics(snapshot)
+
+    engine.merge_metric_stats(snapshot)
+
+    assert _metric_data(engine) == _metric_data(expected)
+
+
+def test_columnar_metrics_mapping():
+    engine = _stats_engine(True)
+    _record_metrics(engine)
+
+    table = engine.stats_table
+
+    assert ('Function/a', '') in table
+    assert ('Function/c', '') not in table
+    assert table.get(('Function/c', '')) is None
+
+    stats = table[('Function/a', '')]
+    assert type(stats) is TimeStats
+    assert stats.call_count == 2
+    assert stats.total_call_time == 1.25
+    assert stats.total_exclusive_call_time == 0.75
+    assert stats.min_call_time == 0.25
+    assert stats.max_call_time == 1.0
+
+    apdex = table[('Apdex/a', '')]
+    assert type(apdex) is ApdexStats
+    assert list(apdex) == [1, 1, 0, 0.25, 0.5, 0]
+
+    assert type(table[('Custom/count', '')]) is CountStats
+    assert table[('Custom/count', '')].call_count == 5
+
+    # Changing the materialized stats must not change the table.
+
+    stats.merge_stats(stats)
+    assert table[('Function/a', '')].call_count == 2
+
+
+def _sampled_data_set(capacity, priorities):
+    data_set = SampledDataSet(capacity)
+    for index, priority in enumerate(priorities):
+        data_set.add(index, priority)
+    return data_set
+
+
+def test_sampled_data_set_retains_highest_priorities():
+    data_set = _sampled_data_set(3, [0.5, 0.1, 0.9, 0.3, 0.7])
+
+    assert data_set.num_seen == 5
+    assert sorted(data_set.samples) == [0, 2, 4]
+
+    assert not data_set.should_sample(0.5)
+    assert data_set.should_sample(0.6)
+
+
+def test_sampled_data_set_equal_priorities_retains_first_seen():
+    data_set = _sampled_data_set(3, [0.5] * 5)
+
+    assert sorted(data_set.samples) == [0, 1, 2]
+
+
+def test_sampled_data_set_skip():
+    data_set = _sampled_data_set(0, [0.5])
+
+    assert not data_set.should_sample(1.0)
+
+    data_set.skip(2)
+    assert data_set.num_seen == 3
+    assert data_set.num_samples == 0
+
+
+@pytest.mark.parametrize('capacity,first,second', (
+    (10, [0.1, 0.2], [0.3, 0.4]),
+    (3, [0.1, 0.2], [0.3, 0.4]),
+    (3, [0.1, 0.5, 0.7, 0.2], [0.3, 0.6, 0.8]),
+    (3, [0.5, 0.5], [0.5, 0.5]),
+    (3, [], [0.5, 0.4, 0.3, 0.2]),
+))
+def test_sampled_data_set_merge(capacity, first, second):
+    data_set = _sampled_data_set(capacity, first)
+    other = SampledDataSet(capacity)
+    for index, priority in enumerate(second, len(first)):
+        other.add(index, priority)
+    other_entries = list(other.pq)
+
+    expected = _sampled_data_set(capacity, first + second)
+
+    data_set.merge(other)
+
+    assert data_set.num_seen == len(first) + len(second)
+    assert sorted(data_set.samples) == sorted(expected.samples)
+    assert other.pq == other_entries
+
+    # Samples added after the merge must still be sequenced after those
+    # which were merged.
+
+    data_set.add('last', 1.0)
+    expected.add('last', 1.0)
+
+    assert sorted(map(str, data_set.samples)) == sorted(
+            map(str, expected.samples))
@@ -0,0 +1,186 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import threading
+
+from newrelic.core.trace_cache import TraceCache
+
+
+class Trace(object):
+    root = None
+    parent = None
+    exited = False
+
+
+def _save_trace(cache):
+    trace = Trace()
+    trace.thread_id = cache.current_thread_id()
+    cache.save_trace(trace)
+    return trace
+
+
+def test_is_coroutine_thread():
+    cache = TraceCache()
+    results = []
+
+    def _test():
+        thread_id = cache.current_thread_id()
+        results.append(cache.is_coroutine(thread_id))
+
+    thread = threading.Thread(target=_test)
+    thread.start()
+    thread.join()
+
+    assert results == [False]
+
+    trace = _save_trace(cache)
+    assert trace._greenlet is None
+    assert not hasattr(trace, '_task')
+
+
+def test_is_coroutine_asyncio_task():
+    asyncio = pytest.importorskip('asyncio')
+
+    cache = TraceCache()
+
+    @asyncio.coroutine
+    def _test():
+        thread_id = cache.current_thread_id()
+        assert cache.is_coroutine(thread_id)
+
+        trace = _save_trace(cache)
+        assert trace._task is not None
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(_test())
+    finally:
+        loop.close()
+
+
+def test_is_coroutine_greenlet():
+    greenlet = pytest.importorskip('greenlet')
+
+    cache = TraceCache()
+    results = []
+
+    def _test():
+        thread_id = cache.current_thread_id()
+        results.append(cache.is_coroutine(thread_id))
+
+        trace = _save_trace(cache)
+        results.append(trace._greenlet() is greenlet.getcurrent())
+
+    greenlet.greenlet(_test).switch()
+
+    assert results == [True, True]
+
+    # The root greenlet is treated as the thread.
+
+    assert not cache.is_coroutine(cache.current_thread_id())
+
+
+class Transaction(object):
+    background_task = True
+    _greenlet = None
+
+
+def test_context_trace_cache_threads():
+    pytest.importorskip('contextvars')
+
+    from newrelic.core.trace_cache import ContextTraceCache
+
+    cache = ContextTraceCache()
+
+    trace = _save_trace(cache)
+    trace.transaction = Transaction()
+
+    assert cache.current_trace() is trace
+    assert cache.current_transaction() is trace.transaction
+
+    results = []
+    started = threading.Event()
+    finish = threading.Event()
+
+    def _test():
+        # The trace is not visible from another thread.
+        results.append(cache.current_trace())
+
+        other = _save_trace(cache)
+        other.transaction = Transaction()
+        results.append(cache.current_trace() is other)
+
+        started.set()
+        finish.wait()
+
+        cache.thread_stop(other.thread_id)
+
+    thread = threading.Thread(target=_test)
+    thread.start()
+    started.wait()
+
+    try:
+        # Traces for both threads are found by the thread profiler.
+        threads = [item[:3] for item in cache.active_threads()
+                if item[0] is not None]
+    finally:
+        finish.set()
+        thread.join()
+
+    assert results == [None, True]
+    assert (trace.transaction, trace.thread_id, 'BACKGROUND') in threads
+    assert len(threads) == 2
+
+    cache.thread_stop(trace.thread_id)
+    assert cache.current_trace() is None
+    assert not cache._cache
+
+
+def test_context_trace_cache_asyncio_task():
+    asyncio = pytest.importorskip('asyncio')
+    pytest.importorskip('contextvars')
+
+    from newrelic.core.trace_cache import ContextTraceCache
+
+    cache = ContextTraceCache()
+
+    @asyncio.coroutine
+    def _child(parent):
+        # The trace is inherited from the context the task was created
+        # in without it being held under the ID of the task.
+        assert cache.current_trace() is parent
+        assert cache.current_thread_id() not in cache._cache
+
+        trace = _save_trace(cache)
+        trace.parent = parent
+        assert cache.current_trace() is trace
+
+        cache.pop_current(trace)
+        assert cache.current_trace() is parent
+        assert cache.current_thread_id() not in cache._cache
+
+    @asyncio.coroutine
+    def _test():
+        trace = _save_trace(cache)
+        yield from asyncio.ensure_future(_child(trace))
+        assert cache.current_trace() is trace
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(_test())
+    finally:
+        loop.close()
+
+    assert cache.current_trace() is None
@@ -399,4 +399,53 @@ def test_transaction_end_on_different_task():
         await task
 
     loop = asyncio.get_event_loop()
-    loop.run_until_complete(test())
\ No newline at end of file
+    loop.run_until_complete(test())
+
+
+@pytest.fixture()
+def context_trace_cache(monkeypatch):
+    import newrelic.core.trace_cache as trace_cache_module
+
+    cache = trace_cache_module.ContextTraceCache()
+    monkeypatch.setattr(trace_cache_module, '_trace_cache', cache)
+    return cache
+
+
+@pytest.mark.parametrize('loop_policy', (None, uvloop.EventLoopPolicy()))
+@pytest.mark.parametrize('schedule', (
+    'create_task',
+    'ensure_future',
+))
+@validate_transaction_metrics(
+    'test_context_propagation',
+    background_task=True,
+    scoped_metrics=(
+        ('Function/waiter1', 2),
+        ('Function/waiter2', 2),
+        ('Function/waiter3', 2),
+    ),
+)
+def test_context_propagation_context_vars(context_trace_cache, schedule,
+        loop_policy):
+    import asyncio
+    asyncio.set_event_loop_policy(loop_policy)
+    loop = asyncio.get_event_loop()
+
+    exceptions = []
+
+    def handle_exception(loop, context):
+        exceptions.append(context)
+
+    loop.set_exception_handler(handle_exception)
+
+    schedule = getattr(asyncio, schedule, None) or getattr(loop, schedule)
+
+    _ = loop.run_until_complete(_test(asyncio, schedule))
+
+    # The traces were propagated onto the tasks through the context rather
+    # than being held under the ID of each task, so nothing is left behind
+    # once the tasks have completed.
+    assert not context_trace_cache._cache
+    assert context_trace_cache.current_trace() is None
+
+    assert not exceptions, exceptions
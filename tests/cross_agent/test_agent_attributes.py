@@ -112,3 +112,28 @@ def test_attribute_filter_rule_equality(testname, rule1, rule2):
     second = af.AttributeFilterRule(*rule2)
 
     assert first == second
+
+def test_attribute_filter_cache():
+    settings = _default_settings()
+    settings['attributes.exclude'] = ['request.*']
+    settings['transaction_tracer.attributes.include'] = ['request.uri']
+
+    attribute_filter = af.AttributeFilter(settings)
+    attribute_filter.cache.maximum = 2
+
+    # The cached result for a name must still take into account the
+    # default destinations passed in.
+
+    destinations = af.DST_TRANSACTION_EVENTS | af.DST_TRANSACTION_TRACER
+    assert attribute_filter.apply('request.uri', destinations) == \
+            af.DST_TRANSACTION_TRACER
+    assert attribute_filter.apply('request.uri', af.DST_NONE) == \
+            af.DST_TRANSACTION_TRACER
+    assert attribute_filter.apply('user', destinations) == destinations
+    assert attribute_filter.apply('user', af.DST_ERROR_COLLECTOR) == \
+            af.DST_ERROR_COLLECTOR
+
+    for index in range(10):
+        attribute_filter.apply('request.%d' % index, destinations)
+
+    assert len(attribute_filter.cache) == 2
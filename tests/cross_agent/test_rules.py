@@ -66,3 +66,32 @@ def test_rules_engine(test_group):
             assert expected == ''
         else:
             assert result == expected
+
+_combined_matcher_tests = [
+    ('no match', '/alpha/beta', ('/alpha/beta', False)),
+    ('string rule', '/alpha/psi', ('/alpha/gamma', False)),
+    ('segment rule', '/alpha/123', ('/alpha/*', True)),
+    ('chained rules', '/123/psi', ('/*/gamma', True)),
+]
+
+@pytest.mark.parametrize('backreference', [False, True])
+@pytest.mark.parametrize('testname,input_str,expected',
+        _combined_matcher_tests)
+def test_rules_engine_combined_matcher(testname, input_str, expected,
+        backreference):
+
+    # A pattern with a back reference can't be combined with other
+    # patterns, so the rules are then always applied one by one.
+
+    rules = _prepare_rules([
+        {'match_expression': '^[0-9]+$', 'replacement': '*',
+            'ignore': True, 'eval_order': 0, 'each_segment': True},
+        {'match_expression': backreference and '(p)(s)\\2?i' or 'psi',
+            'replacement': 'gamma', 'ignore': False, 'eval_order': 1},
+    ])
+    rules_engine = RulesEngine(rules)
+
+    for _ in range(2):
+        assert rules_engine.normalize(input_str) == expected
+
+    assert rules_engine.cache.reset_counts() == (1, 1)
@@ -64,8 +64,7 @@ def validate_span_events(count=1,
                 raise
             else:
                 if not instance.settings.infinite_tracing.enabled:
-                    events = [event for priority, seen_at, event
-                                    in instance.span_events.pq]
+                    events = instance.span_event_data()
 
                 recorded_span_events.append(events)
 